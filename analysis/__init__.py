@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Модули анализа результатов side-channel эксперимента
+
+В отличие от пакета sidechannel, используются только на стороне анализа
+и зависят от NumPy/pandas
+"""
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Сопоставление событий victim с раундами attacker по времени
+
+Границы раундов (attacker_timestamps.npy) и события victim
+(victim_events.npy) сняты одними часами CLOCK_MONOTONIC. Для каждого
+раунда двоичным поиском по отсортированным меткам времени
+(numpy.searchsorted) определяются:
+  - secret      - секрет, действовавший в момент окончания probe
+  - secret_start - секрет на начало раунда
+  - accesses    - число обработок секрета внутри окна раунда
+  - last_index  - индекс последнего обращения victim в окне (-1, если не было)
+Сложность O((N + M) log M) для N раундов и M событий - без вложенных циклов.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sidechannel.events import EVENT_COLUMNS, EVENT_SECRET, EVENT_ACCESS
+from sidechannel.npyfile import open_npy
+
+NO_SECRET = -1  # раунд до первого события victim
+
+_TS = EVENT_COLUMNS.index('timestamp_ns')
+_KIND = EVENT_COLUMNS.index('kind')
+_SECRET = EVENT_COLUMNS.index('secret')
+_INDEX = EVENT_COLUMNS.index('index')
+
+
+def load_victim_events(path):
+    """Открывает события victim (mmap) или возвращает None, если файла нет"""
+    if not Path(path).exists():
+        return None
+    return open_npy(path)
+
+
+def _sorted_by_time(timestamps, *columns):
+    """Упорядочивает столбцы по времени, если запись шла не строго по порядку"""
+    if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+        return (timestamps[order],) + tuple(column[order] for column in columns)
+    return (timestamps,) + columns
+
+
+def _value_at(timestamps, values, moments):
+    """Значение ступенчатой функции (последнее событие не позже момента)"""
+    idx = np.searchsorted(timestamps, moments, side='right') - 1
+    result = np.full(len(moments), NO_SECRET, dtype=np.int64)
+    known = idx >= 0
+    result[known] = values[idx[known]]
+    return result
+
+
+def align_rounds(round_bounds, events):
+    """
+    Метки ground truth для каждого раунда attacker
+
+    round_bounds - массив (N, 2): начало и конец раунда, нс
+    events       - массив (M, len(EVENT_COLUMNS)) событий victim
+    Возвращает DataFrame из N строк (индекс - номер строки матрицы раундов)
+    """
+    round_bounds = np.asarray(round_bounds)
+    starts = round_bounds[:, 0]
+    ends = round_bounds[:, 1]
+
+    kinds = np.asarray(events[:, _KIND])
+    secret_events = np.asarray(events[kinds == EVENT_SECRET])
+    access_events = np.asarray(events[kinds == EVENT_ACCESS])
+
+    secret_ts, secret_values = _sorted_by_time(secret_events[:, _TS], secret_events[:, _SECRET])
+    access_ts, access_secrets, access_index = _sorted_by_time(
+        access_events[:, _TS], access_events[:, _SECRET], access_events[:, _INDEX])
+
+    # Окно раунда [start, end): первая и следующая за последней обработки в окне
+    lo = np.searchsorted(access_ts, starts, side='left')
+    hi = np.searchsorted(access_ts, ends, side='left')
+    accesses = hi - lo
+
+    last_index = np.full(len(starts), -1, dtype=np.int64)
+    active = accesses > 0
+    last_index[active] = access_index[hi[active] - 1]
+
+    # Секрет берём из событий смены, а при их отсутствии - из обращений
+    if len(secret_ts):
+        secret = _value_at(secret_ts, secret_values, ends)
+        secret_start = _value_at(secret_ts, secret_values, starts)
+    else:
+        secret = _value_at(access_ts, access_secrets, ends)
+        secret_start = _value_at(access_ts, access_secrets, starts)
+
+    return pd.DataFrame({
+        'start_ns': starts,
+        'end_ns': ends,
+        'secret': secret,
+        'secret_start': secret_start,
+        'secret_changed': secret != secret_start,
+        'accesses': accesses,
+        'last_index': last_index,
+    })
+
+
+def summarize_labels(labels):
+    """Краткая сводка по меткам раундов (для вывода в консоль)"""
+    known = labels['secret'] != NO_SECRET
+    return {
+        'rounds': len(labels),
+        'labelled_rounds': int(known.sum()),
+        'active_rounds': int((labels['accesses'] > 0).sum()),
+        'secret_changes': int(labels['secret_changed'].sum()),
+        'distinct_secrets': int(labels.loc[known, 'secret'].nunique()),
+        'mean_accesses': float(labels['accesses'].mean()) if len(labels) else 0.0,
+    }
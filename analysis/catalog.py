@@ -0,0 +1,656 @@
+# -*- coding: utf-8 -*-
+"""
+Каталог прогонов: индекс SQLite и столбцовые файлы каждого прогона
+
+attacker и victim перезаписывают logs/ при каждом запуске, поэтому
+результаты сохраняются в каталоге (по умолчанию catalog/ в корне репозитория):
+  catalog.sqlite               - индекс прогонов:
+      runs       - строка на прогон: источник, размещение и CPU, хост,
+                   сводные статистики (analysis.pipeline.compute_stats)
+                   и итоги оценки утечки
+      params     - параметры прогона (программа, имя, значение): явно заданные
+                   (run.json sweep.py, synthetic_truth.json, --param) и значения
+                   по умолчанию - константы из исходников victim/attacker;
+                   прочие ключи конфигурации запуска - программа harness
+      set_scores - среднее и дисперсия времени по наборам, оценки утечки
+  runs/<run_id>/<столбец>.npy  - столбцы CSV измерений (чтение через mmap)
+
+При регистрации CSV читается один раз: те же блоки идут в потоковые агрегаты
+конвейера и в столбцовые файлы. Запросы и агрегаты по сотням прогонов
+выполняются по индексам SQLite без обращения к исходным данным.
+
+Фильтры - строки ИМЯ<оп>ЗНАЧЕНИЕ (оп: =, !=, <, <=, >, >=). ИМЯ - столбец
+runs (placement, rounds, leakage_max_t, ...) или параметр: NUM_SETS - в любой
+программе, attacker.NUM_SETS - только в attacker. Числовые значения
+сравниваются как числа. Сортировка - список имён, "-" в начале - по убыванию.
+"""
+
+import ast
+import hashlib
+import json
+import operator
+import os
+import re
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from analysis import pipeline
+from sidechannel.affinity import host_info
+from sidechannel.config import DEFAULT_LOG_DIR, parse_value
+from sidechannel.npyfile import NpyAppendWriter, open_npy
+from sidechannel.workload import summarize_rate
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PATH = REPO_ROOT / "catalog" / "catalog.sqlite"
+SCHEMA_VERSION = 2  # 2: столбцы пропускной способности rounds_per_s, victim_rate
+PROGRAMS = {
+    'victim': REPO_ROOT / "victim" / "victim.py",
+    'attacker': REPO_ROOT / "attacker" / "attacker.py",
+}
+SYNTHETIC = 'synthetic'  # Программа параметров синтетической модели (analysis.synthetic)
+HARNESS = 'harness'  # Прочие ключи конфигурации запуска (pairs, instance у scale_out.py)
+CONFIG_KEYS = ('placement', 'repeat')  # Ключи конфигурации, хранящиеся в столбцах runs
+
+# Файлы прогона в каталоге логов (имена без префикса /logs)
+MEASUREMENTS_NAME = "attacker_measurements.csv"
+SETS_MATRIX_NAME = "attacker_sets.npy"
+TIMESTAMPS_NAME = "attacker_timestamps.npy"
+EVENTS_NAME = "victim_events.npy"
+RATE_NAME = "victim_rate.csv"
+RUN_RECORD_NAME = "run.json"  # Запись запуска sweep.py
+TRUTH_NAME = "synthetic_truth.json"  # Параметры генерации analysis.synthetic
+
+# Целочисленные столбцы CSV; остальные хранятся как float64
+INTEGER_COLUMNS = ('round', 'suspicious_count', 'log_events', 'gc_events')
+SET_CHUNK_ROWS = 16_384  # Строк матрицы раунд x набор в одном блоке
+
+# Столбцы runs: имя -> тип SQLite. Статистики - одноимённые ключи compute_stats
+RUN_COLUMNS = {
+    'run_id': 'TEXT PRIMARY KEY',
+    'label': 'TEXT',
+    'kind': 'TEXT',  # logs, sweep или synthetic
+    'source': 'TEXT',
+    'registered_at': 'TEXT',
+    'placement': 'TEXT',
+    'repeat': 'INTEGER',
+    'victim_cpus': 'TEXT',
+    'attacker_cpus': 'TEXT',
+    'host': 'TEXT',
+    'cpu_model': 'TEXT',
+    'cpu_count': 'INTEGER',
+    'kernel': 'TEXT',
+    'python': 'TEXT',
+    'data_sha256': 'TEXT',
+    'complete': 'INTEGER',
+    'rounds': 'INTEGER',
+    'duration_s': 'REAL',
+    'avg_mean': 'REAL',
+    'avg_median': 'REAL',
+    'avg_std': 'REAL',
+    'avg_min': 'REAL',
+    'avg_max': 'REAL',
+    'max_mean': 'REAL',
+    'suspicious_mean': 'REAL',
+    'anomaly_rounds': 'INTEGER',
+    'snr_median': 'REAL',
+    'overrun_p99': 'REAL',
+    'late_rounds': 'INTEGER',
+    'rounds_per_s': 'REAL',  # пропускная способность attacker
+    'victim_rate': 'REAL',  # достигнутая частота нагрузки victim, оп/с
+    'num_sets': 'INTEGER',
+    'leakage_rounds': 'INTEGER',
+    'leaky_sets': 'INTEGER',
+    'leakage_max_t': 'REAL',
+    'leakage_max_set': 'INTEGER',
+    'leakage_fvr_t': 'REAL',
+    'leakage_max_mi': 'REAL',
+    'stats': 'TEXT',  # все статистики compute_stats (JSON)
+}
+STAT_COLUMNS = ('rounds', 'duration_s', 'avg_mean', 'avg_median', 'avg_std', 'avg_min', 'avg_max',
+                'max_mean', 'suspicious_mean', 'anomaly_rounds', 'snr_median', 'overrun_p99',
+                'late_rounds')
+HOST_COLUMNS = ('host', 'cpu_model', 'cpu_count', 'kernel', 'python')
+# Столбцы set_scores после run_id (имена - как в таблице analysis.leakage)
+SET_SCORE_COLUMNS = ('set', 'mean_ns', 'var_ns', 'max_class_t', 'max_class', 'fixed_vs_random_t',
+                     'mutual_information_bits', 'leaky')
+# Столбцы, которые query возвращает по умолчанию
+LIST_COLUMNS = ('run_id', 'label', 'placement', 'rounds', 'avg_mean', 'avg_std', 'num_sets',
+                'leaky_sets', 'leakage_max_t', 'registered_at')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    {', '.join(f'"{name}" {kind}' for name, kind in RUN_COLUMNS.items())}
+);
+CREATE INDEX IF NOT EXISTS runs_placement ON runs (placement, leakage_max_t);
+CREATE INDEX IF NOT EXISTS runs_leakage ON runs (leakage_max_t);
+CREATE INDEX IF NOT EXISTS runs_registered ON runs (registered_at);
+CREATE TABLE IF NOT EXISTS params (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    target TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    number REAL,
+    explicit INTEGER NOT NULL,
+    PRIMARY KEY (run_id, target, name)
+);
+CREATE INDEX IF NOT EXISTS params_value ON params (name, value, run_id);
+CREATE INDEX IF NOT EXISTS params_number ON params (name, number, run_id);
+CREATE TABLE IF NOT EXISTS set_scores (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    "set" INTEGER NOT NULL,
+    mean_ns REAL,
+    var_ns REAL,
+    max_class_t REAL,
+    max_class INTEGER,
+    fixed_vs_random_t REAL,
+    mi_bits REAL,
+    leaky INTEGER,
+    PRIMARY KEY (run_id, "set")
+);
+"""
+
+FILTER_PATTERN = re.compile(r"^\s*([\w.]+)\s*(<=|>=|!=|=|<|>)\s*(.*?)\s*$")
+_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+               ast.FloorDiv: operator.floordiv, ast.Div: operator.truediv, ast.Pow: operator.pow}
+
+
+def _constant(node):
+    """Значение выражения из литералов и арифметики (256 * 4096); ValueError - иначе"""
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _BINARY_OPS[type(node.op)](_constant(node.left), _constant(node.right))
+    return ast.literal_eval(node)
+
+
+def program_defaults(path):
+    """
+    Константы модуля victim/attacker со значениями по умолчанию
+
+    Исходник разбирается без импорта (модули запускают эксперимент при импорте).
+    Учитываются те же константы, что переопределяет apply_env, кроме путей
+    к файлам логов
+    """
+    tree = ast.parse(Path(path).read_text(encoding='utf-8'))
+    defaults = {}
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id.isupper()):
+            continue
+        try:
+            value = _constant(node.value)
+        except (ValueError, TypeError, SyntaxError):
+            continue
+        if not isinstance(value, (bool, int, float, str, type(None))):
+            continue
+        if isinstance(value, str) and value.startswith(DEFAULT_LOG_DIR + "/"):
+            continue
+        defaults[node.targets[0].id] = value
+    return defaults
+
+
+def _number(value):
+    """Числовое представление параметра для индекса (None - не число)"""
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('true', 'false'):
+            return float(lowered == 'true')
+        try:
+            return float(lowered.replace('_', ''))
+        except ValueError:
+            return None
+    return None
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ','.join(map(str, value))
+    return str(value)
+
+
+def parse_filter(text):
+    """'NUM_SETS>=512' -> ('NUM_SETS', '>=', '512')"""
+    match = FILTER_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Фильтр должен иметь вид ИМЯ<оп>ЗНАЧЕНИЕ: {text!r}")
+    return match.groups()
+
+
+def parse_assignment(text):
+    """'attacker.NUM_SETS=512' -> ('attacker', 'NUM_SETS', '512')"""
+    key, _, value = text.partition('=')
+    target, _, name = key.strip().partition('.')
+    if target not in PROGRAMS or not name or not _:
+        raise ValueError(f"Ожидалось victim.ИМЯ=значение или attacker.ИМЯ=значение: {text!r}")
+    return target, name.upper(), value
+
+
+def find_runs(path):
+    """
+    Каталоги прогонов внутри path
+
+    path - каталог логов (с attacker_measurements.csv), каталог запуска sweep.py
+    или набор данных sweep.py (runs/*/run.json - берутся запуски со статусом ok)
+    """
+    path = Path(path)
+    if (path / MEASUREMENTS_NAME).exists():
+        return [path]
+    runs = []
+    for record_path in sorted(path.glob(f"runs/*/{RUN_RECORD_NAME}")):
+        try:
+            record = json.loads(record_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        if record.get('status') == 'ok' and (record_path.parent / MEASUREMENTS_NAME).exists():
+            runs.append(record_path.parent)
+    return runs
+
+
+def _read_json(path):
+    try:
+        return json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def set_moments(matrix, chunk_rows=SET_CHUNK_ROWS):
+    """Среднее и дисперсия (ddof=1) по наборам блоками строк матрицы (формулы Чана)"""
+    width = matrix.shape[1]
+    count, mean, m2 = 0, np.zeros(width), np.zeros(width)
+    for lo in range(0, len(matrix), chunk_rows):
+        block = np.asarray(matrix[lo:lo + chunk_rows], dtype=np.float64)
+        n_b = len(block)
+        mean_b = block.mean(axis=0)
+        m2_b = ((block - mean_b) ** 2).sum(axis=0)
+        n = count + n_b
+        delta = mean_b - mean
+        mean += delta * n_b / n
+        m2 += m2_b + delta ** 2 * count * n_b / n
+        count = n
+    variance = m2 / (count - 1) if count > 1 else np.full(width, np.nan)
+    return mean, variance
+
+
+class Catalog:
+    """
+    Каталог прогонов
+
+    Использование:
+        with Catalog() as catalog:
+            catalog.register("logs")
+            runs = catalog.query(["NUM_SETS=512", "placement=same-core"], sort=["-leakage_max_t"])
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{self.path}: схема каталога версии {version}, "
+                             f"поддерживается {SCHEMA_VERSION}")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            # Столбцы runs, добавленные в следующих версиях схемы, дописываются к старому каталогу
+            existing = {row[1] for row in self.db.execute("PRAGMA table_info(runs)")}
+            for name, kind in RUN_COLUMNS.items():
+                if name not in existing:
+                    self.db.execute(f'ALTER TABLE runs ADD COLUMN "{name}" {kind}')
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def run_dir(self, run_id):
+        return self.root / "runs" / run_id
+
+    # Регистрация
+
+    def register(self, directory, run_id=None, label=None, placement=None, params=(),
+                 leakage=True, workers=1):
+        """
+        Регистрирует прогон из каталога логов; возвращает строку runs (dict)
+
+        params - явные параметры [(программа, ИМЯ, значение)] в дополнение
+        к run.json / synthetic_truth.json. Повторная регистрация тех же
+        данных (тот же run_id) заменяет запись
+        """
+        directory = Path(directory)
+        measurements = directory / MEASUREMENTS_NAME
+        if not measurements.exists():
+            raise FileNotFoundError(f"{measurements}: нет файла измерений")
+        record = _read_json(directory / RUN_RECORD_NAME)
+        truth = _read_json(directory / TRUTH_NAME)
+
+        tmp = self.root / "runs" / f".tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        try:
+            sha, complete, stats = self._ingest(measurements, tmp)
+            if not stats['rounds']:
+                raise ValueError(f"{measurements}: нет ни одного раунда")
+
+            if record is not None:
+                kind = 'sweep'
+                placement = placement or record['config'].get('placement')
+                run_id = run_id or record.get('run_id') or directory.name
+            elif truth is not None:
+                kind = SYNTHETIC
+                run_id = run_id or f"{SYNTHETIC}-{sha[:12]}"
+            else:
+                kind = 'logs'
+                run_id = run_id or f"{placement or 'run'}-{sha[:12]}"
+
+            row = {name: stats.get(name) for name in STAT_COLUMNS}
+            if stats['rounds'] > 1 and stats['duration_s'] > 0:
+                row['rounds_per_s'] = (stats['rounds'] - 1) / stats['duration_s']
+            row['victim_rate'] = summarize_rate(directory / RATE_NAME).get('victim_rate')
+            # Хост - из записи запуска sweep.py, иначе - машина, где прогон регистрируется
+            host = (record or {}).get('host') or host_info()
+            row.update({name: host.get(name) for name in HOST_COLUMNS})
+            cpus = (record or {}).get('cpus', {})
+            row.update({
+                'run_id': run_id,
+                'label': label or '',
+                'kind': kind,
+                'source': str(directory.resolve()),
+                'registered_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'placement': placement,
+                'repeat': (record or {}).get('config', {}).get('repeat'),
+                'victim_cpus': " ".join(map(str, cpus.get('victim', []))) or None,
+                'attacker_cpus': " ".join(map(str, cpus.get('attacker', []))) or None,
+                'data_sha256': sha,
+                'complete': int(complete),
+            })
+            scores = self._set_scores(directory, leakage, workers)
+            if scores is not None:
+                row['num_sets'] = len(scores)
+                if 'max_class_t' in scores:
+                    best = int(scores['max_class_t'].idxmax())
+                    row.update({
+                        'leakage_rounds': scores.attrs['rounds'],
+                        'leaky_sets': int(scores['leaky'].sum()),
+                        'leakage_max_t': float(scores['max_class_t'].max()),
+                        'leakage_max_set': int(scores['set'][best]),
+                        'leakage_fvr_t': float(scores['fixed_vs_random_t'].abs().max()),
+                        'leakage_max_mi': float(scores['mutual_information_bits'].max()),
+                    })
+            row['stats'] = json.dumps(stats)
+
+            final = self.run_dir(run_id)
+            shutil.rmtree(final, ignore_errors=True)
+            os.replace(tmp, final)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        columns = [name for name in RUN_COLUMNS if name in row]
+        names = ", ".join(f'"{name}"' for name in columns)
+        with self.db:
+            self.db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            self.db.execute(f"INSERT INTO runs ({names}) VALUES ({', '.join('?' * len(columns))})",
+                            [row[name] for name in columns])
+            self.db.executemany("INSERT INTO params VALUES (?, ?, ?, ?, ?, ?)",
+                                [(run_id,) + entry for entry in self._params(kind, record, truth, params)])
+            if scores is not None:
+                # NaN (нет оценки утечки) SQLite сохраняет как NULL
+                values = scores.reindex(columns=SET_SCORE_COLUMNS).to_numpy(dtype=np.float64)
+                self.db.executemany(f"INSERT INTO set_scores VALUES (?{', ?' * len(SET_SCORE_COLUMNS)})",
+                                    [(run_id, *entry) for entry in values.tolist()])
+        return row
+
+    def _ingest(self, measurements, directory):
+        """
+        Один проход по CSV: агрегаты конвейера и столбцы в directory/<столбец>.npy
+
+        Возвращает (sha256 прочитанных данных, complete, статистики)
+        """
+        params = dict(pipeline.DEFAULT_PARAMS)
+        hasher = hashlib.sha256()
+        aggregates, writers = None, {}
+        try:
+            for chunk in pipeline.read_chunks(measurements, hasher):
+                if aggregates is None:
+                    aggregates = pipeline.RunAggregates(chunk.columns, params['rolling_window'],
+                                                        params['max_points'], params['late_round_ns'])
+                    writers = {column: NpyAppendWriter(directory / f"{column}.npy",
+                                                       'q' if column in INTEGER_COLUMNS else 'd', 1)
+                               for column in chunk.columns}
+                aggregates.update(chunk)
+                for column, writer in writers.items():
+                    dtype = '<i8' if column in INTEGER_COLUMNS else '<f8'
+                    writer.write_block(np.ascontiguousarray(chunk[column].to_numpy(), dtype=dtype))
+        finally:
+            for writer in writers.values():
+                writer.close()
+        _, complete = pipeline.committed_length(measurements)
+        if aggregates is None:
+            return hasher.hexdigest(), complete, {'rounds': 0}
+        stats, _ = pipeline.compute_stats(aggregates, params)
+        return hasher.hexdigest(), complete, stats
+
+    def _set_scores(self, directory, leakage, workers):
+        """Таблица по наборам (среднее, дисперсия, оценки утечки) или None без матрицы"""
+        import pandas as pd
+
+        matrix_path = directory / SETS_MATRIX_NAME
+        if not matrix_path.exists():
+            return None
+        matrix = open_npy(matrix_path)
+        if not len(matrix):
+            return None
+        mean, variance = set_moments(matrix)
+        table = pd.DataFrame({'set': np.arange(matrix.shape[1]), 'mean_ns': mean, 'var_ns': variance})
+
+        timestamps_path, events_path = directory / TIMESTAMPS_NAME, directory / EVENTS_NAME
+        if not (leakage and timestamps_path.exists() and events_path.exists()):
+            return table
+        from analysis.alignment import align_rounds, load_victim_events
+        from analysis.leakage import assess_leakage
+
+        timestamps, events = open_npy(timestamps_path), load_victim_events(events_path)
+        rows = min(len(matrix), len(timestamps))
+        if not rows or not len(events):
+            return table
+        labels = align_rounds(timestamps[:rows], events)
+        scores, _ = assess_leakage(matrix[:rows], labels['secret'].to_numpy(),
+                                   workers=workers, matrix_path=matrix_path)
+        merged = table.merge(scores.drop(columns='mean_ns'), on='set')
+        merged.attrs.update(scores.attrs)
+        return merged
+
+    def _params(self, kind, record, truth, explicit):
+        """Строки params: (программа, ИМЯ, значение, число, явно задан)"""
+        defaults = {target: program_defaults(path) for target, path in PROGRAMS.items()}
+        values = {}
+        if kind == SYNTHETIC:
+            # Параметры модели - в верхнем регистре, как одноимённые константы attacker
+            for name, value in truth['params'].items():
+                values[(SYNTHETIC, name.upper())] = (value, True)
+        else:
+            config = (record or {}).get('config', {})
+            for target in PROGRAMS:
+                for name, value in defaults[target].items():
+                    values[(target, name)] = (value, False)
+                for name, value in (config.get(target) or {}).items():
+                    values[(target, name)] = (value, True)
+            for name, value in config.items():
+                if name not in PROGRAMS and name not in CONFIG_KEYS:
+                    values[(HARNESS, name.upper())] = (value, True)
+        for target, name, value in explicit:
+            values[(target, name)] = (value, True)
+
+        rows = []
+        for (target, name), (value, is_explicit) in values.items():
+            # Строки (сетка sweep.py, --param) приводятся к типу константы, как в apply_env
+            current = defaults.get(target, {}).get(name)
+            if isinstance(value, str) and current is not None:
+                try:
+                    value = parse_value(value, current)
+                except ValueError:
+                    pass
+            rows.append((target, name, _text(value), _number(value), int(is_explicit)))
+        return rows
+
+    # Запросы
+
+    def _condition(self, text):
+        name, op, value = parse_filter(text)
+        number = _number(value)
+        if name in RUN_COLUMNS:
+            numeric = number is not None and RUN_COLUMNS[name] in ('INTEGER', 'REAL')
+            return f'runs."{name}" {op} ?', [number if numeric else value]
+
+        target, _, param = name.rpartition('.')
+        column = 'number' if number is not None else 'value'
+        sql = (f"EXISTS (SELECT 1 FROM params p WHERE p.run_id = runs.run_id AND p.name = ?"
+               f"{' AND p.target = ?' if target else ''} AND p.{column} {op} ?)")
+        return sql, [param.upper()] + ([target] if target else []) + [number if number is not None else value]
+
+    def _key(self, name):
+        """Выражение для сортировки и группировки: столбец runs или значение параметра"""
+        if name in RUN_COLUMNS:
+            return f'runs."{name}"', []
+        # Параметр без программы - из первой по имени программы, где он есть
+        target, _, param = name.rpartition('.')
+        sql = (f"(SELECT COALESCE(p.number, p.value) FROM params p WHERE p.run_id = runs.run_id "
+               f"AND p.name = ?{' AND p.target = ?' if target else ''} ORDER BY p.target LIMIT 1)")
+        return sql, [param.upper()] + ([target] if target else [])
+
+    def _where(self, where):
+        clauses, args = [], []
+        for text in where:
+            sql, values = self._condition(text)
+            clauses.append(sql)
+            args.extend(values)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, where=(), sort=None, limit=None, columns=LIST_COLUMNS):
+        """Прогоны, удовлетворяющие всем фильтрам where (DataFrame)"""
+        import pandas as pd
+
+        unknown = [name for name in columns if name not in RUN_COLUMNS]
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы: {', '.join(unknown)}")
+        sql, args = self._where(where)
+        order = []
+        for key in sort or ['registered_at']:
+            expr, values = self._key(key.lstrip('-'))
+            order.append(expr + (" DESC" if key.startswith('-') else ""))
+            args.extend(values)
+        select = ", ".join(f'runs."{name}"' for name in columns)
+        sql = f"SELECT {select} FROM runs{sql} ORDER BY {', '.join(order)}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self.db, params=args)
+
+    def aggregate(self, by, metric='leakage_max_t', where=()):
+        """
+        Сводка по группам прогонов (GROUP BY в SQLite)
+
+        by - столбцы runs и/или параметры. Для каждой группы: число прогонов,
+        среднее/стандартное отклонение/минимум/максимум metric по прогонам
+        и время доступа, объединённое по всем раундам группы (из моментов
+        прогонов - исходные данные не читаются)
+        """
+        import pandas as pd
+
+        if metric not in RUN_COLUMNS or RUN_COLUMNS[metric] not in ('INTEGER', 'REAL'):
+            raise ValueError(f"Метрика должна быть числовым столбцом runs: {metric}")
+        groups, args = [], []
+        for name in by:
+            expr, values = self._key(name)
+            groups.append(f'{expr} AS "{name}"')
+            args.extend(values)
+        where_sql, where_args = self._where(where)
+        m = f'runs."{metric}"'
+        sql = (f"SELECT {''.join(g + ', ' for g in groups)}"
+               f"COUNT(*) AS runs, SUM(rounds) AS rounds, "
+               f"AVG({m}) AS mean, AVG({m} * {m}) AS mean_sq, MIN({m}) AS min, MAX({m}) AS max, "
+               f"SUM(rounds * avg_mean) AS avg_sum, "
+               f"SUM((rounds - 1) * avg_std * avg_std + rounds * avg_mean * avg_mean) AS avg_sq "
+               f"FROM runs{where_sql}")
+        if groups:
+            positions = ", ".join(str(i + 1) for i in range(len(groups)))
+            sql += f" GROUP BY {positions} ORDER BY {positions}"
+        table = pd.read_sql_query(sql, self.db, params=args + where_args)
+
+        table['std'] = np.sqrt(np.maximum(table.pop('mean_sq') - table['mean'] ** 2, 0))
+        rounds = table['rounds'].astype(float)
+        avg_sum, avg_sq = table.pop('avg_sum'), table.pop('avg_sq')
+        table['avg_time_mean'] = avg_sum / rounds
+        table['avg_time_std'] = np.sqrt(np.maximum(avg_sq - rounds * table['avg_time_mean'] ** 2, 0)
+                                        / (rounds - 1))
+        return table[list(by) + ['runs', 'rounds', 'mean', 'std', 'min', 'max',
+                                 'avg_time_mean', 'avg_time_std']]
+
+    def resolve(self, ids):
+        """Полные run_id по идентификаторам или их однозначным префиксам (порядок сохраняется)"""
+        resolved = []
+        for prefix in ids:
+            matches = [row[0] for row in self.db.execute(
+                "SELECT run_id FROM runs WHERE run_id = ? OR run_id LIKE ? ESCAPE '\\' ORDER BY run_id",
+                (prefix, prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'))]
+            if prefix in matches:
+                matches = [prefix]
+            if len(matches) != 1:
+                raise ValueError(f"Прогон {prefix!r}: " + (
+                    "не найден" if not matches else f"неоднозначно ({', '.join(matches[:5])})"))
+            resolved.append(matches[0])
+        return resolved
+
+    def runs(self, run_ids):
+        """Строки runs для run_ids (DataFrame в том же порядке, статистики - dict)"""
+        import pandas as pd
+
+        marks = ", ".join('?' * len(run_ids))
+        table = pd.read_sql_query(f"SELECT * FROM runs WHERE run_id IN ({marks})",
+                                  self.db, params=list(run_ids))
+        table['stats'] = table['stats'].map(json.loads)
+        return table.set_index('run_id').loc[list(run_ids)].reset_index()
+
+    def params(self, run_ids, explicit_only=False):
+        """Параметры прогонов (DataFrame: run_id, target, name, value, number, explicit)"""
+        import pandas as pd
+
+        marks = ", ".join('?' * len(run_ids))
+        sql = f"SELECT * FROM params WHERE run_id IN ({marks})"
+        if explicit_only:
+            sql += " AND explicit = 1"
+        return pd.read_sql_query(sql + " ORDER BY run_id, target, name", self.db, params=list(run_ids))
+
+    def set_scores(self, run_ids):
+        """Оценки по наборам (DataFrame: run_id, set, mean_ns, var_ns, max_class_t, ...)"""
+        import pandas as pd
+
+        marks = ", ".join('?' * len(run_ids))
+        return pd.read_sql_query(f'SELECT * FROM set_scores WHERE run_id IN ({marks}) ORDER BY run_id, "set"',
+                                 self.db, params=list(run_ids))
+
+    def column(self, run_id, name):
+        """Столбец CSV измерений прогона (numpy.memmap без копирования)"""
+        path = self.run_dir(run_id) / f"{name}.npy"
+        if not path.exists():
+            raise KeyError(f"{run_id}: нет столбца {name}")
+        return open_npy(path)[:, 0]
+
+    def remove(self, run_id):
+        with self.db:
+            self.db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        shutil.rmtree(self.run_dir(run_id), ignore_errors=True)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Построение графиков результатов эксперимента
+
+Модуль импортирует matplotlib (с неинтерактивным backend Agg) и поэтому
+загружается только при построении графиков: режим "только статистика"
+analyze_results.py его не импортирует. Каждый график строится
+независимо и может рендериться в отдельном процессе (render_figures)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from analysis.leakage import TVLA_THRESHOLD
+
+# Настройка matplotlib для поддержки кириллицы
+matplotlib.rc('font', family='DejaVu Sans', size=10)
+
+
+def plot_timing_over_rounds(analysis, output_path):
+    """График изменения времени доступа по раундам"""
+    points = analysis.points
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    # Основные данные (минимум и максимум каждой корзины - форма ряда сохраняется)
+    ax.plot(points['avg_x'], points['avg_y'],
+            label='Average access time', color='blue', alpha=0.7, linewidth=1)
+
+    # Полоса стандартного отклонения
+    ax.fill_between(points['x'],
+                     points['avg_mean'] - points['stdev_mean'],
+                     points['avg_mean'] + points['stdev_mean'],
+                     alpha=0.2, color='blue', label='Std deviation')
+
+    # Максимальные значения
+    ax.plot(points['x'], points['max_max'],
+            label='Max access time', color='red', alpha=0.4, linewidth=0.5)
+
+    ax.set_xlabel('Measurement Round')
+    ax.set_ylabel('Access Time (nanoseconds)')
+    ax.set_title('Prime+Probe Memory Access Timing Analysis')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+
+def _plot_histogram(ax, counts, edges, **kwargs):
+    """Гистограмма по заранее посчитанным интервалам"""
+    ax.hist(edges[:-1], bins=edges, weights=counts, **kwargs)
+
+
+def plot_timing_distribution(analysis, output_path):
+    """Гистограмма распределения времени доступа"""
+    stats = analysis.stats
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Распределение среднего времени
+    _plot_histogram(ax1, *analysis.histogram('avg'), color='blue', alpha=0.7, edgecolor='black')
+    ax1.axvline(stats['avg_mean'], color='red', linestyle='--',
+                label=f"Mean: {stats['avg_mean']:.2f} ns")
+    ax1.set_xlabel('Average Access Time (ns)')
+    ax1.set_ylabel('Frequency')
+    ax1.set_title('Distribution of Average Access Times')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    # Распределение максимального времени
+    _plot_histogram(ax2, *analysis.histogram('max'), color='red', alpha=0.7, edgecolor='black')
+    ax2.axvline(stats['max_mean'], color='darkred', linestyle='--',
+                label=f"Mean: {stats['max_mean']:.2f} ns")
+    ax2.set_xlabel('Maximum Access Time (ns)')
+    ax2.set_ylabel('Frequency')
+    ax2.set_title('Distribution of Maximum Access Times')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+
+def plot_suspicious_activity(analysis, output_path):
+    """График подозрительной активности (вытеснения из кеша)"""
+    points = analysis.points
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    # Подозрительные наборы по времени (максимум по корзине)
+    ax.bar(points['x'], points['suspicious_max'], width=0.8 * points['width'],
+           color='orange', alpha=0.6, label='Suspicious cache sets')
+
+    # Скользящее среднее для тренда
+    window = analysis.stats['rolling_window']
+    if analysis.stats['rounds'] >= window:
+        ax.plot(points['x'], points['rolling_mean'],
+                color='red', linewidth=2, label=f'Moving average ({window} rounds)')
+
+    ax.set_xlabel('Measurement Round')
+    ax.set_ylabel('Number of Suspicious Cache Sets')
+    ax.set_title('Cache Eviction Detection Over Time')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+
+def plot_combined_analysis(analysis, output_path):
+    """Комбинированный график для документа"""
+    points, stats = analysis.points, analysis.stats
+    fig = plt.figure(figsize=(14, 10))
+
+    # Сетка графиков
+    gs = fig.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
+
+    # 1. Временной ряд среднего времени
+    ax1 = fig.add_subplot(gs[0, :])
+    ax1.plot(points['avg_x'], points['avg_y'], color='blue', linewidth=1)
+    ax1.fill_between(points['x'],
+                      points['avg_mean'] - points['stdev_mean'],
+                      points['avg_mean'] + points['stdev_mean'],
+                      alpha=0.2, color='blue')
+    ax1.set_ylabel('Access Time (ns)')
+    ax1.set_title('(a) Average Memory Access Time Over Measurement Rounds')
+    ax1.grid(True, alpha=0.3)
+
+    # 2. Гистограмма среднего времени
+    ax2 = fig.add_subplot(gs[1, 0])
+    _plot_histogram(ax2, *analysis.histogram('avg_combined'),
+                    color='blue', alpha=0.7, edgecolor='black')
+    ax2.axvline(stats['avg_mean'], color='red', linestyle='--', linewidth=2)
+    ax2.set_xlabel('Average Time (ns)')
+    ax2.set_ylabel('Frequency')
+    ax2.set_title('(b) Distribution of Average Times')
+    ax2.grid(True, alpha=0.3)
+
+    # 3. Гистограмма максимального времени
+    ax3 = fig.add_subplot(gs[1, 1])
+    _plot_histogram(ax3, *analysis.histogram('max_combined'),
+                    color='red', alpha=0.7, edgecolor='black')
+    ax3.axvline(stats['max_mean'], color='darkred', linestyle='--', linewidth=2)
+    ax3.set_xlabel('Maximum Time (ns)')
+    ax3.set_ylabel('Frequency')
+    ax3.set_title('(c) Distribution of Maximum Times')
+    ax3.grid(True, alpha=0.3)
+
+    # 4. Подозрительная активность
+    ax4 = fig.add_subplot(gs[2, :])
+    ax4.bar(points['x'], points['suspicious_max'],
+            color='orange', alpha=0.6, width=points['width'])
+    if stats['rounds'] >= stats['rolling_window']:
+        ax4.plot(points['x'], points['rolling_mean'], color='red', linewidth=2)
+    ax4.set_xlabel('Measurement Round')
+    ax4.set_ylabel('Suspicious Sets Count')
+    ax4.set_title('(d) Cache Eviction Detection (Suspicious Activity)')
+    ax4.grid(True, alpha=0.3)
+
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+
+def plot_leakage_heatmap(class_t, output_path):
+    """Тепловая карта |t| (класс секрета против остальных) по наборам"""
+    present = np.flatnonzero(class_t.any(axis=1))
+    if not len(present):
+        return None
+
+    fig, ax = plt.subplots(figsize=(14, max(4, len(present) * 0.25)))
+    image = ax.imshow(class_t[present], aspect='auto', cmap='magma', interpolation='nearest')
+    ax.set_yticks(range(len(present)))
+    ax.set_yticklabels(present)
+    ax.set_xlabel('Cache Set')
+    ax.set_ylabel('Secret Value')
+    ax.set_title(f'Leakage Assessment: Welch |t| per Secret vs Rest (threshold {TVLA_THRESHOLD})')
+    fig.colorbar(image, ax=ax, label='|t|')
+
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+
+def plot_run_comparison(data, output_path):
+    """
+    Сравнение прогонов из каталога: распределения среднего времени
+    и максимальный |t| утечки по прогонам
+
+    data - словарь: labels, edges, counts (гистограмма на прогон), leakage_max_t
+    """
+    leakage = [np.nan if value is None else value for value in data['leakage_max_t']]
+    has_leakage = not np.all(np.isnan(leakage))
+    fig, axes = plt.subplots(1, 2 if has_leakage else 1, figsize=(16 if has_leakage else 10, 6),
+                             squeeze=False)
+
+    ax1 = axes[0, 0]
+    edges = data['edges']
+    widths = np.diff(edges)
+    for label, counts in zip(data['labels'], data['counts']):
+        total = counts.sum()
+        density = counts / (total * widths) if total else counts
+        ax1.stairs(density, edges, label=label, linewidth=1.5)
+    ax1.set_xlabel('Average Time (ns)')
+    ax1.set_ylabel('Density')
+    ax1.set_title('Distribution of Average Times per Run')
+    ax1.legend(fontsize=8)
+    ax1.grid(True, alpha=0.3)
+
+    if has_leakage:
+        ax2 = axes[0, 1]
+        positions = np.arange(len(leakage))
+        ax2.bar(positions, leakage, color='purple', alpha=0.7, edgecolor='black')
+        ax2.axhline(TVLA_THRESHOLD, color='red', linestyle='--', linewidth=2,
+                    label=f'TVLA threshold ({TVLA_THRESHOLD})')
+        ax2.set_xticks(positions)
+        ax2.set_xticklabels(data['labels'], rotation=30, ha='right', fontsize=8)
+        ax2.set_ylabel('Max |t| over sets')
+        ax2.set_title('Leakage Assessment per Run')
+        ax2.legend()
+        ax2.grid(True, alpha=0.3, axis='y')
+
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+
+# Графики: имя -> функция построения (данные - результат конвейера, матрица |t|
+# или гистограммы прогонов из каталога)
+PLOTS = {
+    'timing': plot_timing_over_rounds,
+    'distribution': plot_timing_distribution,
+    'suspicious': plot_suspicious_activity,
+    'combined': plot_combined_analysis,
+    'leakage': plot_leakage_heatmap,
+    'comparison': plot_run_comparison,
+}
+
+
+def render_figure(name, data, output_path):
+    """Строит один график; точка входа процесса пула. Возвращает путь или None"""
+    path = PLOTS[name](data, output_path)
+    return str(path) if path is not None else None
+
+
+def render_figures(tasks, jobs=1):
+    """
+    Строит графики tasks [(имя, данные, путь)], при jobs > 1 - в пуле процессов
+
+    Возвращает список (имя, путь или None) в порядке tasks
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        return [(name, render_figure(name, data, path)) for name, data, path in tasks]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        futures = [pool.submit(render_figure, *task) for task in tasks]
+        return [(task[0], future.result()) for task, future in zip(tasks, futures)]
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Оценка утечки по каждому cache set (TVLA-подобный анализ)
+
+Для матрицы раунд x набор и меток секрета по раундам (analysis.alignment)
+одновременно для всех наборов вычисляются:
+  - t-критерий Уэлча fixed-vs-random: раунды с выбранным секретом
+    против всех остальных раундов
+  - t-критерий Уэлча для каждого класса секрета против остальных
+    (максимум |t| по классам и класс, на котором он достигнут)
+  - взаимная информация между секретом и квантованным временем доступа
+
+Матрица обрабатывается блоками строк: в память попадает только текущий
+блок, а статистики накапливаются в сумматорах фиксированного размера
+(число, сумма и сумма квадратов по классу и набору, совместная гистограмма
+класс x набор x интервал времени). Сумматоры складываются, поэтому блоки
+можно обрабатывать параллельно в нескольких процессах.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sidechannel.npyfile import open_npy
+
+TVLA_THRESHOLD = 4.5  # общепринятый порог |t| для вывода об утечке
+DEFAULT_CHUNK_ROWS = 16384
+DEFAULT_NUM_CLASSES = 256  # секрет victim - байт
+DEFAULT_TIME_BINS = 16
+MIN_CLASS_ROUNDS = 2  # меньше раундов в классе - t-критерий не считается
+
+
+class LeakageAccumulator:
+    """Складываемые сумматоры для t-критериев и взаимной информации"""
+
+    def __init__(self, num_sets, num_classes, edges, shift):
+        self.num_sets = num_sets
+        self.num_classes = num_classes
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.shift = np.asarray(shift, dtype=np.float64)
+        bins = len(self.edges) + 1
+        self.count = np.zeros(num_classes, dtype=np.int64)
+        self.sum = np.zeros((num_classes, num_sets), dtype=np.float64)
+        self.sumsq = np.zeros((num_classes, num_sets), dtype=np.float64)
+        self.joint = np.zeros((num_classes, num_sets, bins), dtype=np.int64)
+        # Для целочисленных времён интервал берётся из таблицы, а не двоичным поиском
+        lut_size = int(self.edges[-1]) + 2 if len(self.edges) else 1
+        self._bin_lut = np.searchsorted(self.edges, np.arange(lut_size), side='right').astype(np.int32)
+        self._set_offsets = np.arange(num_sets, dtype=np.int32) * bins
+
+    @property
+    def bins(self):
+        return len(self.edges) + 1
+
+    def update(self, chunk, classes):
+        """Учитывает блок строк chunk (R, S) с метками классов classes (R,)"""
+        classes = np.asarray(classes, dtype=np.int64)
+        valid = (classes >= 0) & (classes < self.num_classes)
+        if not valid.all():
+            chunk, classes = chunk[valid], classes[valid]
+        if not len(classes):
+            return
+
+        raw = np.asarray(chunk)
+        # float32 вдвое уменьшает объём промежуточных массивов; суммы - в float64
+        values = raw.astype(np.float32) - self.shift.astype(np.float32)
+        self.count += np.bincount(classes, minlength=self.num_classes)
+
+        # Суммы по классам: строки группируются по классу, затем reduceat
+        order = np.argsort(classes, kind='stable')
+        sorted_classes = classes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_classes[1:] != sorted_classes[:-1]])
+        grouped = values[order]
+        present = sorted_classes[starts]
+        self.sum[present] += np.add.reduceat(grouped, starts, axis=0, dtype=np.float64)
+        grouped *= grouped
+        self.sumsq[present] += np.add.reduceat(grouped, starts, axis=0, dtype=np.float64)
+
+        if raw.dtype.kind in 'ui':
+            bin_idx = self._bin_lut[np.minimum(raw, len(self._bin_lut) - 1)]
+        else:
+            bin_idx = np.searchsorted(self.edges, raw, side='right').astype(np.int32)
+        flat = bin_idx + self._set_offsets
+        flat += (classes.astype(np.int32) * (self.num_sets * self.bins))[:, None]
+        self.joint += np.bincount(flat.ravel(), minlength=self.joint.size).reshape(self.joint.shape)
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        self.joint += other.joint
+        return self
+
+    def _moments(self, count, total, totalsq):
+        """Среднее (без сдвига) и выборочная дисперсия по набору"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            var = (totalsq - count * mean * mean) / (count - 1)
+        return mean + self.shift, np.maximum(var, 0.0)
+
+    def _welch(self, n_a, sum_a, sq_a, n_b, sum_b, sq_b):
+        mean_a, var_a = self._moments(n_a, sum_a, sq_a)
+        mean_b, var_b = self._moments(n_b, sum_b, sq_b)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = (mean_a - mean_b) / np.sqrt(var_a / n_a + var_b / n_b)
+        return np.nan_to_num(t, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def class_t_matrix(self):
+        """|t| каждого класса против остальных, массив (классы, наборы); 0 для редких классов"""
+        n_total = self.count.sum()
+        sum_total = self.sum.sum(axis=0)
+        sq_total = self.sumsq.sum(axis=0)
+        result = np.zeros((self.num_classes, self.num_sets))
+        for c in np.flatnonzero(self.count >= MIN_CLASS_ROUNDS):
+            n_rest = n_total - self.count[c]
+            if n_rest < MIN_CLASS_ROUNDS:
+                continue
+            result[c] = np.abs(self._welch(self.count[c], self.sum[c], self.sumsq[c],
+                                           n_rest, sum_total - self.sum[c], sq_total - self.sumsq[c]))
+        return result
+
+    def mutual_information(self):
+        """Взаимная информация секрет <-> интервал времени по каждому набору, бит"""
+        joint = self.joint.transpose(1, 0, 2).astype(np.float64)  # (наборы, классы, интервалы)
+        total = joint.sum(axis=(1, 2), keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            p = joint / total
+            p_class = p.sum(axis=2, keepdims=True)
+            p_bin = p.sum(axis=1, keepdims=True)
+            terms = p * np.log2(p / (p_class * p_bin))
+        return np.nansum(terms, axis=(1, 2))
+
+    def scores(self, fixed_class=None):
+        """
+        Таблица оценок утечки по наборам
+
+        fixed_class - секрет для fixed-vs-random; по умолчанию самый частый
+        """
+        if fixed_class is None:
+            fixed_class = int(np.argmax(self.count))
+        n_total = self.count.sum()
+        n_fixed = self.count[fixed_class]
+        fixed_t = self._welch(n_fixed, self.sum[fixed_class], self.sumsq[fixed_class],
+                              n_total - n_fixed, self.sum.sum(axis=0) - self.sum[fixed_class],
+                              self.sumsq.sum(axis=0) - self.sumsq[fixed_class])
+        class_t = self.class_t_matrix()
+        mean, _ = self._moments(n_total, self.sum.sum(axis=0), self.sumsq.sum(axis=0))
+
+        table = pd.DataFrame({
+            'set': np.arange(self.num_sets),
+            'mean_ns': mean,
+            'fixed_vs_random_t': fixed_t,
+            'max_class_t': class_t.max(axis=0),
+            'max_class': class_t.argmax(axis=0),
+            'mutual_information_bits': self.mutual_information(),
+        })
+        table['leaky'] = ((table['fixed_vs_random_t'].abs() > TVLA_THRESHOLD)
+                          | (table['max_class_t'] > TVLA_THRESHOLD))
+        table.attrs['fixed_class'] = fixed_class
+        table.attrs['rounds'] = int(n_total)
+        return table
+
+
+def accumulator_from_sample(sample, num_classes=DEFAULT_NUM_CLASSES, time_bins=DEFAULT_TIME_BINS):
+    """
+    Сумматор со сдвигом (медиана по набору) и общими границами интервалов,
+    выбранными по строкам sample (раунд x набор)
+    """
+    sample = np.asarray(sample, dtype=np.float64)
+    shift = np.median(sample, axis=0)
+    quantiles = np.linspace(0, 1, time_bins + 1)[1:-1]
+    edges = np.unique(np.quantile(sample, quantiles))
+    return LeakageAccumulator(sample.shape[1], num_classes, edges, shift)
+
+
+def _prepare(matrix, num_classes, time_bins, sample_rows):
+    """Сумматор по первым sample_rows строкам матрицы"""
+    return accumulator_from_sample(matrix[:sample_rows], num_classes, time_bins)
+
+
+def _accumulate_range(path, classes, start, stop, num_classes, edges, shift, chunk_rows):
+    """Обработка диапазона строк в отдельном процессе (матрица открывается заново)"""
+    matrix = open_npy(path)
+    acc = LeakageAccumulator(matrix.shape[1], num_classes, edges, shift)
+    for lo in range(start, stop, chunk_rows):
+        hi = min(lo + chunk_rows, stop)
+        acc.update(matrix[lo:hi], classes[lo - start:hi - start])
+    return acc
+
+
+def assess_leakage(matrix, classes, num_classes=DEFAULT_NUM_CLASSES, fixed_class=None,
+                   chunk_rows=DEFAULT_CHUNK_ROWS, time_bins=DEFAULT_TIME_BINS,
+                   workers=1, matrix_path=None):
+    """
+    Оценивает утечку по всем наборам
+
+    matrix      - матрица раунд x набор (обычно numpy.memmap)
+    classes     - метка класса (секрет) для каждой строки; -1 - неизвестно
+    workers > 1 - блоки обрабатываются в пуле процессов; требуется
+                  matrix_path, чтобы каждый процесс открыл матрицу сам
+    Возвращает (таблица оценок по наборам, матрица |t| класс x набор)
+    """
+    classes = np.asarray(classes)
+    rows = min(len(matrix), len(classes))
+    acc = _prepare(matrix, num_classes, time_bins, min(rows, chunk_rows))
+
+    if workers > 1 and matrix_path is not None and rows > chunk_rows:
+        span = -(-rows // workers)
+        span = -(-span // chunk_rows) * chunk_rows
+        ranges = [(lo, min(lo + span, rows)) for lo in range(0, rows, span)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_accumulate_range, str(matrix_path), classes[lo:hi], lo, hi,
+                                   num_classes, acc.edges, acc.shift, chunk_rows)
+                       for lo, hi in ranges]
+            for future in futures:
+                acc.merge(future.result())
+    else:
+        for lo in range(0, rows, chunk_rows):
+            hi = min(lo + chunk_rows, rows)
+            acc.update(matrix[lo:hi], classes[lo:hi])
+
+    return acc.scores(fixed_class), acc.class_t_matrix()
@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+"""
+Конвейер анализа с однократной загрузкой и дисковым кешем
+
+CSV читается блоками по CHUNK_ROWS строк в потоковые агрегаты
+(analysis.streaming): моменты, гистограммы с фиксированными интервалами
+и ряды, сжатые до max_points корзин min/max. Память не зависит от длины
+прогона; производные статистики считаются один раз и передаются
+в функции вывода и построения графиков.
+
+Кеш (по умолчанию .cache/analysis/) устроен в три слоя:
+  - state    - состояние агрегатов; ключ - SHA-256 содержимого файла.
+               Если файл только дописан (префикс совпадает с закешированным),
+               в состояние добавляются лишь новые строки
+  - derived  - производные статистики; ключ - хеш данных + параметры анализа
+  - figures  - ключ, с которым построен каждый график; график с актуальным
+               ключом не перерисовывается
+Повторный запуск на неизменных данных сводится к чтению небольших файлов.
+
+Медианы и перцентили берутся из лог-линейных гистограмм (относительная
+ошибка < 1/64). Опоздавшие раунды (порог late_round_ns известен до чтения)
+считаются точно; для порогов mean + k * std, которые известны только после
+прохода, хранятся точные минимум и максимум каждого интервала гистограммы
+avg_time_ns - приближённо учитывается лишь интервал, внутри которого лежит порог
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from analysis.streaming import (
+    Downsampler, Moments, histogram_count_above, histogram_percentile,
+    histogram_rebin, log_bin_extremes, log_histogram, rolling_mean,
+)
+from sidechannel.measurements import committed_length
+
+PIPELINE_VERSION = 4
+CACHE_DIR = Path(".cache") / "analysis"
+HASH_BLOCK = 1 << 20
+CHUNK_ROWS = 262_144
+
+DEFAULT_PARAMS = {
+    'rolling_window': 20,        # окно скользящего среднего подозрительных наборов
+    'max_points': 4096,          # корзин min/max в рядах для графиков
+    'hist_bins': 50,             # интервалы гистограмм timing_distribution
+    'combined_hist_bins': 40,    # интервалы гистограмм combined_analysis
+    'anomaly_sigma': 2.0,        # порог аномалий: mean + k * std
+    'summary_sigma': 1.0,        # порог повышенной активности в итогах
+    'high_activity_sets': 5,     # раунд с большим числом подозрительных наборов
+    'late_round_ns': 100_000,    # опоздание начала раунда, после которого он опоздавший
+}
+
+# Параметры, от которых зависит состояние агрегатов (остальные - только производные)
+INGEST_PARAMS = ('rolling_window', 'max_points', 'late_round_ns')
+
+# Гистограммы для графиков: имя -> (столбец, параметр с числом интервалов)
+HISTOGRAMS = {
+    'avg': ('avg_time_ns', 'hist_bins'),
+    'max': ('max_time_ns', 'hist_bins'),
+    'avg_combined': ('avg_time_ns', 'combined_hist_bins'),
+    'max_combined': ('max_time_ns', 'combined_hist_bins'),
+}
+
+# Столбцы с моментами и с лог-линейными гистограммами (если есть в CSV)
+MOMENT_COLUMNS = ('avg_time_ns', 'max_time_ns', 'suspicious_count', 'avg_corrected_ns', 'overrun_ns')
+HISTOGRAM_COLUMNS = ('avg_time_ns', 'max_time_ns', 'max_zscore', 'baseline_ns', 'snr', 'overrun_ns')
+# Столбцы, для которых хранятся экстремумы интервалов гистограммы (счёт выше порога)
+EXTREME_COLUMNS = ('avg_time_ns',)
+# Столбцы-признаки, по которым avg_time_ns делится на две группы
+SPLIT_COLUMNS = (('log_events', 'log'), ('gc_events', 'gc'))
+
+
+def _digest_json(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _hash_range(hasher, f, length):
+    """Дописывает в hasher ровно length байт из текущей позиции файла"""
+    remaining = length
+    while remaining > 0:
+        block = f.read(min(HASH_BLOCK, remaining))
+        if not block:
+            break
+        hasher.update(block)
+        remaining -= len(block)
+
+
+class _RangeReader:
+    """
+    Файлоподобный объект для pandas: prefix, затем байты [start, stop) файла
+
+    Прочитанные байты файла (но не prefix) дописываются в hasher
+    """
+
+    def __init__(self, f, start, stop, hasher, prefix=b''):
+        f.seek(start)
+        self.f = f
+        self.remaining = stop - start
+        self.hasher = hasher
+        self.prefix = prefix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.remaining + len(self.prefix)
+        out = self.prefix[:size]
+        self.prefix = self.prefix[len(out):]
+        want = min(size - len(out), self.remaining)
+        if want > 0:
+            block = self.f.read(want)
+            self.remaining -= len(block)
+            self.hasher.update(block)
+            out += block
+        return out
+
+
+class RunAggregates:
+    """Потоковые агрегаты одного CSV измерений"""
+
+    def __init__(self, columns, rolling_window, max_points, late_round_ns=DEFAULT_PARAMS['late_round_ns']):
+        self.columns = list(columns)
+        self.rolling_window = rolling_window
+        self.late_round_ns = late_round_ns
+        self.late_rounds = 0
+        self.moments = {c: Moments() for c in MOMENT_COLUMNS if c in self.columns}
+        self.histograms = {c: np.zeros(0, dtype=np.int64)
+                           for c in HISTOGRAM_COLUMNS if c in self.columns}
+        self.extremes = {c: log_bin_extremes([]) for c in EXTREME_COLUMNS if c in self.columns}
+        self.suspicious_hist = np.zeros(0, dtype=np.int64)
+        self.splits = {prefix: [0, 0.0, 0, 0.0]
+                       for column, prefix in SPLIT_COLUMNS if column in self.columns}
+        self.timestamp = [float('inf'), float('-inf')]
+        self.tail = []
+        self.series = Downsampler(max_points)
+
+    @property
+    def rows(self):
+        return self.series.rows
+
+    def update(self, chunk):
+        """Добавляет блок строк (DataFrame)"""
+        if not len(chunk):
+            return
+        avg = chunk['avg_time_ns'].to_numpy(np.float64)
+        for column, moments in self.moments.items():
+            moments.update(chunk[column].to_numpy(np.float64))
+        for column in self.histograms:
+            counts = log_histogram(chunk[column].to_numpy(np.float64))
+            if len(self.histograms[column]):
+                counts += self.histograms[column]
+            self.histograms[column] = counts
+        for column, (minimum, maximum) in self.extremes.items():
+            chunk_min, chunk_max = log_bin_extremes(chunk[column].to_numpy(np.float64))
+            self.extremes[column] = (np.minimum(minimum, chunk_min), np.maximum(maximum, chunk_max))
+        for column, prefix in SPLIT_COLUMNS:
+            if prefix in self.splits:
+                mask = chunk[column].to_numpy() > 0
+                split = self.splits[prefix]
+                split[0] += int(mask.sum())
+                split[1] += float(avg[mask].sum())
+                split[2] += int((~mask).sum())
+                split[3] += float(avg[~mask].sum())
+        if 'overrun_ns' in self.moments:
+            self.late_rounds += int((chunk['overrun_ns'].to_numpy(np.float64) > self.late_round_ns).sum())
+
+        suspicious = chunk['suspicious_count'].to_numpy(np.int64)
+        counts = np.bincount(np.maximum(suspicious, 0))
+        size = max(len(counts), len(self.suspicious_hist))
+        self.suspicious_hist = (np.pad(self.suspicious_hist, (0, size - len(self.suspicious_hist)))
+                                + np.pad(counts, (0, size - len(counts))))
+
+        timestamps = chunk['timestamp'].to_numpy(np.float64)
+        self.timestamp = [min(self.timestamp[0], float(timestamps.min())),
+                          max(self.timestamp[1], float(timestamps.max()))]
+
+        rolling, tail = rolling_mean(self.tail, suspicious, self.rolling_window)
+        self.tail = tail.tolist()
+        self.series.update(chunk['round'].to_numpy(np.int64), avg,
+                           chunk['stdev_time_ns'].to_numpy(np.float64),
+                           chunk['max_time_ns'].to_numpy(np.float64), suspicious, rolling)
+
+    def to_state(self):
+        """(JSON, массивы) для кеша"""
+        series_state, series_arrays = self.series.to_state()
+        state = {
+            'columns': self.columns,
+            'rolling_window': self.rolling_window,
+            'late_round_ns': self.late_round_ns,
+            'late_rounds': self.late_rounds,
+            'moments': {c: m.to_state() for c, m in self.moments.items()},
+            'splits': self.splits,
+            'timestamp': self.timestamp,
+            'tail': self.tail,
+            'series': series_state,
+        }
+        arrays = {f'series_{name}': values for name, values in series_arrays.items()}
+        arrays.update({f'hist_{c}': counts for c, counts in self.histograms.items()})
+        for c, (minimum, maximum) in self.extremes.items():
+            arrays[f'binmin_{c}'], arrays[f'binmax_{c}'] = minimum, maximum
+        arrays['suspicious_hist'] = self.suspicious_hist
+        return state, arrays
+
+    @classmethod
+    def from_state(cls, state, arrays):
+        agg = cls(state['columns'], state['rolling_window'], state['series']['max_points'],
+                  state['late_round_ns'])
+        agg.late_rounds = state['late_rounds']
+        agg.moments = {c: Moments.from_state(m) for c, m in state['moments'].items()}
+        agg.histograms = {c: arrays[f'hist_{c}'] for c in agg.histograms}
+        agg.extremes = {c: (arrays[f'binmin_{c}'], arrays[f'binmax_{c}']) for c in agg.extremes}
+        agg.suspicious_hist = arrays['suspicious_hist']
+        agg.splits = state['splits']
+        agg.timestamp = state['timestamp']
+        agg.tail = state['tail']
+        agg.series = Downsampler.from_state(state['series'], {
+            name[len('series_'):]: values for name, values in arrays.items()
+            if name.startswith('series_')})
+        return agg
+
+    def ingest(self, reader):
+        """Читает CSV из reader блоками по CHUNK_ROWS строк"""
+        import pandas as pd
+
+        for chunk in pd.read_csv(reader, chunksize=CHUNK_ROWS):
+            self.update(chunk)
+
+
+def read_chunks(path, hasher=None):
+    """
+    Блоки CSV измерений (DataFrame по CHUNK_ROWS строк) без кеша
+
+    Читается только префикс файла из целых строк (см. committed_length);
+    прочитанные байты дописываются в hasher, если он передан
+    """
+    import pandas as pd
+
+    length, _ = committed_length(path)
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0)
+        if length <= len(header):
+            _hash_range(hasher, f, length)
+            return
+        yield from pd.read_csv(_RangeReader(f, 0, length, hasher), chunksize=CHUNK_ROWS)
+
+
+class ResultCache:
+    """Каталог кеша одного источника данных"""
+
+    def __init__(self, cache_dir, source):
+        source_id = hashlib.sha256(str(Path(source).resolve()).encode('utf-8')).hexdigest()[:16]
+        self.path = Path(cache_dir) / source_id
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def load_json(self, name):
+        try:
+            with open(self.path / f"{name}.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def store_json(self, name, data):
+        tmp = self.path / f"{name}.json.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path / f"{name}.json")
+
+    def load_arrays(self, name, key):
+        """Массивы, сохранённые под name, если они записаны с тем же ключом"""
+        meta = self.load_json(name)
+        if meta is None or meta.get('key') != key:
+            return None, None
+        try:
+            with np.load(self.path / f"{name}.npz", allow_pickle=False) as data:
+                return {k: data[k] for k in data.files}, meta
+        except (FileNotFoundError, ValueError, OSError):
+            return None, None
+
+    def store_arrays(self, name, key, arrays, meta=None):
+        tmp = self.path / f"{name}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self.path / f"{name}.npz")
+        self.store_json(name, dict(meta or {}, key=key))
+
+
+def load_state(path, cache, params):
+    """
+    Обновляет агрегаты CSV с использованием кеша
+
+    Возвращает (aggregates, data_sha256, mode, complete): mode - 'cached'
+    (файл не изменился), 'appended' (обработаны только новые строки) или
+    'full'; complete - False, если attacker не завершился штатно
+    и прочитан только префикс файла из целых строк (по индексу <файл>.idx)
+    """
+    stat = os.stat(path)
+    ingest = {name: params[name] for name in INGEST_PARAMS}
+    meta = cache.load_json('state') or {}
+    if meta.get('version') != PIPELINE_VERSION or meta.get('ingest') != ingest:
+        meta = {}
+
+    # Быстрая проверка: размер и время изменения совпадают
+    if meta and meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        arrays, _ = cache.load_arrays('state', meta['key'])
+        if arrays is not None:
+            return (RunAggregates.from_state(meta['aggregates'], arrays),
+                    meta['sha256'], 'cached', meta['complete'])
+
+    length, complete = committed_length(path)
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0)
+
+        aggregates = None
+        cached_length = meta.get('length', 0)
+        if meta and 0 < cached_length <= length:
+            _hash_range(hasher, f, cached_length)
+            if hasher.copy().hexdigest() == meta['sha256']:
+                arrays, _ = cache.load_arrays('state', meta['key'])
+                if arrays is not None:
+                    aggregates = RunAggregates.from_state(meta['aggregates'], arrays)
+
+        if aggregates is None:
+            mode = 'full'
+            hasher = hashlib.sha256()
+            aggregates = RunAggregates(header.decode('utf-8').strip().split(','),
+                                       params['rolling_window'], params['max_points'],
+                                       params['late_round_ns'])
+            if length > len(header):
+                aggregates.ingest(_RangeReader(f, 0, length, hasher))
+            else:
+                f.seek(0)
+                _hash_range(hasher, f, length)
+        else:
+            mode = 'appended' if length > cached_length else 'cached'
+            if length > cached_length:
+                aggregates.ingest(_RangeReader(f, cached_length, length, hasher, prefix=header))
+
+    sha = hasher.hexdigest()
+    state, arrays = aggregates.to_state()
+    cache.store_arrays('state', sha, arrays)
+    cache.store_json('state', {
+        'version': PIPELINE_VERSION,
+        'ingest': ingest,
+        'key': sha,
+        'sha256': sha,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'length': length,
+        'complete': complete,
+        'aggregates': state,
+    })
+    return aggregates, sha, mode, complete
+
+
+def compute_stats(agg, params):
+    """
+    Все производные статистики, используемые выводом и графиками
+
+    Возвращает (stats, arrays): stats - словарь скаляров (JSON),
+    arrays - гистограммы и сжатые ряды для графиков (NumPy)
+    """
+    n = agg.rows
+    stats = {'rounds': n, 'rolling_window': agg.rolling_window}
+    arrays = {}
+    if n == 0:
+        return stats, arrays
+
+    avg, mx = agg.moments['avg_time_ns'], agg.moments['max_time_ns']
+    avg_hist, max_hist = agg.histograms['avg_time_ns'], agg.histograms['max_time_ns']
+    suspicious = agg.moments['suspicious_count']
+    stats.update({
+        'duration_s': agg.timestamp[1] - agg.timestamp[0],
+        'avg_mean': avg.mean,
+        'avg_median': histogram_percentile(avg_hist, 50, avg.minimum, avg.maximum),
+        'avg_std': avg.std,
+        'avg_min': avg.minimum,
+        'avg_max': avg.maximum,
+        'max_mean': mx.mean,
+        'max_median': histogram_percentile(max_hist, 50, mx.minimum, mx.maximum),
+        'max_min': mx.minimum,
+        'max_max': mx.maximum,
+        'suspicious_mean': suspicious.mean,
+        'suspicious_max': int(suspicious.maximum),
+        'high_activity_rounds': int(agg.suspicious_hist[params['high_activity_sets'] + 1:].sum()),
+    })
+
+    stats['anomaly_threshold'] = avg.mean + params['anomaly_sigma'] * avg.std
+    avg_extremes = agg.extremes['avg_time_ns']
+    stats['anomaly_rounds'] = histogram_count_above(avg_hist, stats['anomaly_threshold'], *avg_extremes)
+    stats['summary_threshold'] = avg.mean + params['summary_sigma'] * avg.std
+    stats['summary_high_rounds'] = histogram_count_above(avg_hist, stats['summary_threshold'], *avg_extremes)
+
+    def median(column):
+        counts = agg.histograms[column]
+        return histogram_percentile(counts, 50, -np.inf, np.inf)
+
+    if 'max_zscore' in agg.histograms:
+        stats['max_zscore_median'] = median('max_zscore')
+    if 'avg_corrected_ns' in agg.moments:
+        stats['baseline_median'] = median('baseline_ns')
+        stats['avg_corrected_mean'] = agg.moments['avg_corrected_ns'].mean
+        stats['snr_median'] = median('snr')
+    if 'overrun_ns' in agg.moments:
+        overrun, counts = agg.moments['overrun_ns'], agg.histograms['overrun_ns']
+        stats.update({
+            'overrun_median': histogram_percentile(counts, 50, overrun.minimum, overrun.maximum),
+            'overrun_p99': histogram_percentile(counts, 99, overrun.minimum, overrun.maximum),
+            'overrun_max': overrun.maximum,
+            'late_rounds': agg.late_rounds,
+        })
+    for prefix, (n_true, sum_true, n_false, sum_false) in agg.splits.items():
+        stats[f'{prefix}_rounds'] = n_true
+        stats[f'{prefix}_split_means'] = ((sum_true / n_true, sum_false / n_false)
+                                          if n_true and n_false else None)
+
+    for name, (column, bins_param) in HISTOGRAMS.items():
+        moments = agg.moments[column]
+        counts, edges = histogram_rebin(agg.histograms[column], moments.minimum,
+                                        moments.maximum, params[bins_param])
+        arrays[f'hist_{name}_counts'] = counts
+        arrays[f'hist_{name}_edges'] = edges
+    for name, values in agg.series.points().items():
+        arrays[f'points_{name}'] = np.asarray(values)
+    return stats, arrays
+
+
+class Analysis:
+    """Результат конвейера: статистики, гистограммы, сжатые ряды и ключи кеша"""
+
+    def __init__(self, source, columns, stats, arrays, data_key, key, cache, mode, complete):
+        self.source = source
+        self.complete = complete
+        self.columns = columns
+        self.stats = stats
+        self.arrays = arrays
+        self.data_key = data_key
+        self.key = key
+        self.cache = cache
+        self.mode = mode
+
+    def histogram(self, name):
+        """(counts, edges) предварительно посчитанной гистограммы"""
+        return self.arrays[f'hist_{name}_counts'], self.arrays[f'hist_{name}_edges']
+
+    @property
+    def points(self):
+        """Сжатые ряды по раундам (Downsampler.points)"""
+        return {name[len('points_'):]: values for name, values in self.arrays.items()
+                if name.startswith('points_')}
+
+    def figure_is_current(self, name, output_path, key=None):
+        """Построен ли график name с ключом key (по умолчанию - текущим) и существует ли файл"""
+        figures = self.cache.load_json('figures') or {}
+        return figures.get(name) == (key or self.key) and Path(output_path).exists()
+
+    def mark_figure(self, name, key=None):
+        figures = self.cache.load_json('figures') or {}
+        figures[name] = key or self.key
+        self.cache.store_json('figures', figures)
+
+
+def run(source, params=None, cache_dir=CACHE_DIR):
+    """Загружает данные и производные статистики, используя кеш"""
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    cache = ResultCache(cache_dir, source)
+    aggregates, data_key, mode, complete = load_state(source, cache, params)
+
+    key = _digest_json({'data': data_key, 'params': params, 'version': PIPELINE_VERSION})
+    arrays, meta = cache.load_arrays('derived', key)
+    if arrays is None:
+        stats, arrays = compute_stats(aggregates, params)
+        cache.store_arrays('derived', key, arrays, {'stats': stats})
+    else:
+        stats = meta['stats']
+
+    return Analysis(source, aggregates.columns, stats, arrays, data_key, key, cache, mode, complete)
+
+
+def fingerprint(paths, params=None):
+    """
+    Ключ кеша для результатов по двоичным файлам (матрица, события)
+
+    Хешируются размер, время изменения и первые/последние HASH_BLOCK байт
+    каждого файла - полное чтение многогигабайтной матрицы ради ключа
+    обошлось бы дороже самого анализа
+    """
+    hasher = hashlib.sha256(json.dumps(params or {}, sort_keys=True).encode('utf-8'))
+    for path in paths:
+        hasher.update(str(path).encode('utf-8'))
+        if not Path(path).exists():
+            continue
+        stat = os.stat(path)
+        hasher.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode('ascii'))
+        with open(path, 'rb') as f:
+            hasher.update(f.read(HASH_BLOCK))
+            if stat.st_size > HASH_BLOCK:
+                f.seek(max(HASH_BLOCK, stat.st_size - HASH_BLOCK))
+                hasher.update(f.read(HASH_BLOCK))
+    return hasher.hexdigest()
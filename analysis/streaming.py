@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковые агрегаты для анализа прогонов произвольной длины
+
+Данные CSV обрабатываются блоками строк; после каждого блока в памяти
+остаётся только состояние фиксированного размера:
+  - Moments      - число, среднее, M2 (Уэлфорд, слияние блоков по Чану), мин/макс
+  - лог-линейные гистограммы с фиксированными интервалами (как в HDR Histogram:
+    HIST_SUB интервалов на октаву, относительная ошибка < 1/HIST_SUB) -
+    медианы, перцентили и гистограммы для графиков; вместе с точными
+    экстремумами интервалов - число значений выше порога
+  - Downsampler  - ряды по раундам, сжатые до max_points корзин min/max:
+    когда корзины заканчиваются, соседние пары сливаются и ширина удваивается,
+    так что выбросы (минимумы и максимумы) сохраняются при любой длине прогона
+
+Все агрегаты сериализуются (to_state/from_state) для кеша конвейера
+и дополняются новыми блоками без повторного чтения старых строк
+"""
+
+import numpy as np
+
+# Лог-линейная гистограмма: октавы [2^HIST_MIN_EXP, 2^HIST_MAX_EXP), HIST_SUB интервалов в октаве
+HIST_SUB = 64
+HIST_MIN_EXP = -10
+HIST_MAX_EXP = 40
+HIST_BINS = (HIST_MAX_EXP - HIST_MIN_EXP) * HIST_SUB
+
+
+def log_bin(values):
+    """Индексы интервалов лог-линейной гистограммы (значения <= 2^HIST_MIN_EXP - в 0)"""
+    values = np.asarray(values, dtype=np.float64)
+    mantissa, exponent = np.frexp(values)  # values = mantissa * 2**exponent, mantissa в [0.5, 1)
+    index = ((exponent.astype(np.int64) - 1 - HIST_MIN_EXP) * HIST_SUB
+             + ((2 * mantissa - 1) * HIST_SUB).astype(np.int64))
+    index[~(values > 0)] = 0
+    return np.clip(index, 0, HIST_BINS - 1)
+
+
+def log_bin_edges():
+    """Нижние и верхние границы интервалов лог-линейной гистограммы"""
+    index = np.arange(HIST_BINS + 1)
+    edges = np.ldexp(1 + (index % HIST_SUB) / HIST_SUB, index // HIST_SUB + HIST_MIN_EXP)
+    return edges[:-1], edges[1:]
+
+
+def log_histogram(values):
+    return np.bincount(log_bin(values), minlength=HIST_BINS)
+
+
+def histogram_percentile(counts, q, lo, hi):
+    """
+    Перцентиль q по лог-линейной гистограмме
+
+    Внутри интервала - линейная интерполяция; результат ограничен
+    точными минимумом и максимумом lo, hi
+    """
+    total = counts.sum()
+    if total == 0:
+        return float('nan')
+    lower, upper = log_bin_edges()
+    cumulative = np.cumsum(counts)
+    target = q / 100.0 * total
+    i = min(int(np.searchsorted(cumulative, target, side='left')), HIST_BINS - 1)
+    before = cumulative[i - 1] if i else 0
+    fraction = (target - before) / counts[i] if counts[i] else 0.0
+    value = lower[i] + fraction * (upper[i] - lower[i])
+    return float(min(max(value, lo), hi))
+
+
+def log_bin_extremes(values):
+    """Точные минимум и максимум значений в каждом интервале (пустые - +inf / -inf)"""
+    values = np.asarray(values, dtype=np.float64)
+    index = log_bin(values)
+    minimum = np.full(HIST_BINS, np.inf)
+    maximum = np.full(HIST_BINS, -np.inf)
+    np.minimum.at(minimum, index, values)
+    np.maximum.at(maximum, index, values)
+    return minimum, maximum
+
+
+def histogram_count_above(counts, threshold, minimum, maximum):
+    """
+    Число значений больше threshold по гистограмме и экстремумам интервалов
+
+    minimum, maximum - точные экстремумы каждого интервала (log_bin_extremes).
+    Интервалы целиком выше или не выше порога считаются точно; только интервал,
+    внутри которого лежит порог (minimum <= threshold < maximum), учитывается
+    пропорционально - поэтому на квантованных данных (все значения интервала
+    равны) результат точный
+    """
+    above = counts[minimum > threshold].sum()
+    straddle = (minimum <= threshold) & (maximum > threshold)
+    fraction = (maximum[straddle] - threshold) / (maximum[straddle] - minimum[straddle])
+    return int(round(float(above) + float((counts[straddle] * fraction).sum())))
+
+
+def histogram_rebin(counts, lo, hi, bins):
+    """
+    Перестраивает лог-линейную гистограмму в bins равных интервалов на [lo, hi]
+
+    Возвращает (counts, edges) в формате np.histogram - для графиков
+    """
+    lower, upper = log_bin_edges()
+    present = counts > 0
+    centers = np.clip((lower[present] + upper[present]) / 2, lo, hi)
+    rebinned, edges = np.histogram(centers, bins=bins, range=(lo, hi) if hi > lo else None,
+                                   weights=counts[present])
+    return rebinned.astype(np.int64), edges
+
+
+class Moments:
+    """Число, среднее, M2, минимум и максимум столбца; блоки сливаются формулами Чана"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=float('inf'), maximum=float('-inf')):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def update(self, values):
+        n_b = len(values)
+        if n_b == 0:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    @property
+    def std(self):
+        """Выборочное стандартное отклонение (ddof=1, как pandas)"""
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def to_state(self):
+        return [self.count, self.mean, self.m2, self.minimum, self.maximum]
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+
+def _segment_extreme(values, rounds, starts, reduce):
+    """Экстремум reduce (np.minimum / np.maximum) по сегментам и раунд его первого вхождения"""
+    extreme = reduce.reduceat(values, starts)
+    lengths = np.diff(np.r_[starts, len(values)])
+    hits = np.flatnonzero(values == np.repeat(extreme, lengths))
+    segment = np.searchsorted(starts, hits, side='right') - 1
+    _, first = np.unique(segment, return_index=True)
+    return extreme, rounds[hits[first]]
+
+
+class Downsampler:
+    """
+    Ряды по раундам, сжатые до не более чем max_points корзин
+
+    В корзине хранятся: первый/последний раунд, число раундов, среднее,
+    минимум и максимум avg_time_ns (с раундами, где они достигнуты),
+    среднее stdev_time_ns, максимум max_time_ns и suspicious_count,
+    среднее скользящего среднего suspicious_count
+    """
+
+    FIELDS = {
+        # имя: (начальное значение, способ слияния)
+        'round_first': (np.iinfo(np.int64).max, 'min'),
+        'round_last': (-1, 'max'),
+        'count': (0, 'sum'),
+        'avg_sum': (0.0, 'sum'),
+        'avg_min': (np.inf, 'argmin'),
+        'avg_min_round': (-1, None),
+        'avg_max': (-np.inf, 'argmax'),
+        'avg_max_round': (-1, None),
+        'stdev_sum': (0.0, 'sum'),
+        'max_max': (-np.inf, 'max'),
+        'suspicious_max': (-np.inf, 'max'),
+        'rolling_sum': (0.0, 'sum'),
+        'rolling_count': (0, 'sum'),
+    }
+
+    def __init__(self, max_points, width=1, rows=0, arrays=None):
+        self.max_points = max_points - max_points % 2
+        self.width = width
+        self.rows = rows
+        if arrays is None:
+            arrays = {name: np.full(self.max_points, initial,
+                                    dtype=np.int64 if isinstance(initial, int) else np.float64)
+                      for name, (initial, _) in self.FIELDS.items()}
+        self.arrays = arrays
+
+    def _merge_pairs(self):
+        """Сливает соседние корзины попарно: ширина удваивается, занята половина"""
+        a = {name: values[0::2] for name, values in self.arrays.items()}
+        b = {name: values[1::2] for name, values in self.arrays.items()}
+        merged = {}
+        for name, (initial, how) in self.FIELDS.items():
+            if how == 'sum':
+                merged[name] = a[name] + b[name]
+            elif how == 'min':
+                merged[name] = np.minimum(a[name], b[name])
+            elif how == 'max':
+                merged[name] = np.maximum(a[name], b[name])
+            elif how in ('argmin', 'argmax'):
+                take_b = b[name] < a[name] if how == 'argmin' else b[name] > a[name]
+                merged[name] = np.where(take_b, b[name], a[name])
+                merged[name + '_round'] = np.where(take_b, b[name + '_round'], a[name + '_round'])
+        half = self.max_points // 2
+        for name, (initial, _) in self.FIELDS.items():
+            self.arrays[name][:half] = merged[name]
+            self.arrays[name][half:] = initial
+        self.width *= 2
+
+    def update(self, rounds, avg, stdev, maximum, suspicious, rolling):
+        """Добавляет блок раундов (rolling - скользящее среднее, NaN до заполнения окна)"""
+        m = len(rounds)
+        if m == 0:
+            return
+        while (self.rows + m - 1) // self.width >= self.max_points:
+            self._merge_pairs()
+
+        ids = np.arange(self.rows, self.rows + m) // self.width
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        buckets = ids[starts]
+        arrays = self.arrays
+        rounds = np.asarray(rounds, dtype=np.int64)
+        avg = np.asarray(avg, dtype=np.float64)
+        rolling = np.asarray(rolling, dtype=np.float64)
+        defined = ~np.isnan(rolling)
+
+        arrays['round_first'][buckets] = np.minimum(arrays['round_first'][buckets],
+                                                    np.minimum.reduceat(rounds, starts))
+        arrays['round_last'][buckets] = np.maximum(arrays['round_last'][buckets],
+                                                   np.maximum.reduceat(rounds, starts))
+        arrays['count'][buckets] += np.diff(np.r_[starts, m])
+        arrays['avg_sum'][buckets] += np.add.reduceat(avg, starts)
+        arrays['stdev_sum'][buckets] += np.add.reduceat(np.asarray(stdev, dtype=np.float64), starts)
+        arrays['max_max'][buckets] = np.maximum(
+            arrays['max_max'][buckets], np.maximum.reduceat(np.asarray(maximum, dtype=np.float64), starts))
+        arrays['suspicious_max'][buckets] = np.maximum(
+            arrays['suspicious_max'][buckets],
+            np.maximum.reduceat(np.asarray(suspicious, dtype=np.float64), starts))
+        arrays['rolling_sum'][buckets] += np.add.reduceat(np.where(defined, rolling, 0.0), starts)
+        arrays['rolling_count'][buckets] += np.add.reduceat(defined.astype(np.int64), starts)
+
+        for name, reduce, better in (('avg_min', np.minimum, np.less),
+                                     ('avg_max', np.maximum, np.greater)):
+            extreme, where = _segment_extreme(avg, rounds, starts, reduce)
+            take = better(extreme, arrays[name][buckets])
+            arrays[name][buckets[take]] = extreme[take]
+            arrays[name + '_round'][buckets[take]] = where[take]
+
+        self.rows += m
+
+    def points(self):
+        """
+        Точки для графиков
+
+        x - середина корзины; avg_x/avg_y - минимум и максимум avg_time_ns
+        каждой корзины в порядке раундов (форма ряда и выбросы сохраняются)
+        """
+        used = -(-self.rows // self.width)
+        a = {name: values[:used] for name, values in self.arrays.items()}
+        count = np.maximum(a['count'], 1)
+        rolling_count = a['rolling_count']
+
+        first_min = a['avg_min_round'] <= a['avg_max_round']
+        avg_x = np.column_stack([np.where(first_min, a['avg_min_round'], a['avg_max_round']),
+                                 np.where(first_min, a['avg_max_round'], a['avg_min_round'])])
+        avg_y = np.column_stack([np.where(first_min, a['avg_min'], a['avg_max']),
+                                 np.where(first_min, a['avg_max'], a['avg_min'])])
+        return {
+            'x': (a['round_first'] + a['round_last']) / 2,
+            'width': float(self.width),
+            'avg_x': avg_x.ravel(),
+            'avg_y': avg_y.ravel(),
+            'avg_mean': a['avg_sum'] / count,
+            'stdev_mean': a['stdev_sum'] / count,
+            'max_max': a['max_max'],
+            'suspicious_max': a['suspicious_max'],
+            'rolling_mean': np.where(rolling_count > 0,
+                                     a['rolling_sum'] / np.maximum(rolling_count, 1), np.nan),
+        }
+
+    def to_state(self):
+        return {'max_points': self.max_points, 'width': self.width, 'rows': self.rows}, self.arrays
+
+    @classmethod
+    def from_state(cls, state, arrays):
+        return cls(state['max_points'], state['width'], state['rows'], arrays)
+
+
+def rolling_mean(tail, values, window):
+    """
+    Скользящее среднее values с учётом хвоста предыдущего блока tail
+
+    Возвращает (rolling, new_tail): rolling[i] - NaN, пока окно не заполнено
+    """
+    joined = np.concatenate([np.asarray(tail, dtype=np.float64),
+                             np.asarray(values, dtype=np.float64)])
+    rolling = np.full(len(joined), np.nan)
+    if len(joined) >= window:
+        cumsum = np.cumsum(np.r_[0.0, joined])
+        rolling[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return rolling[len(tail):], joined[-(window - 1):] if window > 1 else joined[:0]
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических данных эксперимента с известной утечкой
+
+Создаёт те же файлы, что пишут attacker и victim (attacker_measurements.csv
+с индексом, attacker_sets.npy, attacker_timestamps.npy, victim_events.npy),
+и synthetic_truth.json с параметрами генерации и базовыми временами наборов -
+датасет с известным ответом для проверки analyze_results.py, оценки утечки
+и детекторов на любом числе раундов.
+
+Модель времени доступа к набору s в раунде r:
+    base[s] + шум + дрейф[r] + выброс раунда[r] + выбросы ячеек + утечка(секрет[r], s)
+  - base[s]   - base_ns + set_spread_ns * N(0, 1), своё для каждого набора
+  - шум       - noise_ns * стандартизованная величина распределения noise:
+                normal, lognormal (sigma = noise_shape) или gamma (форма noise_shape)
+  - дрейф     - линейный (drift_ns_per_hour) плюс случайное блуждание
+                (drift_walk_ns - стандартное отклонение шага за раунд)
+  - выбросы   - раунд целиком (round_outlier_rate) и отдельные ячейки
+                (outlier_rate), экспоненциальные со средним outlier_ns
+  - утечка    - на наборах leak_sets: match - +leak_ns на наборе
+                leak_sets[секрет % len(leak_sets)], hamming - +leak_ns * вес
+                Хэмминга секрета / 8 на всех наборах leak_sets
+Секреты victim - расписания sidechannel.workload (fixed, sequential, random),
+по одной итерации victim на раунд: обращение в окне раунда через
+access_offset_ns после его начала.
+
+Агрегаты CSV считаются по матрице раунда так же, как в attacker (среднее,
+стандартное отклонение по суммам в целых числах, мин/макс), z-оценка - по
+известным base[s] + дрейф и noise_ns вместо скользящих базовых линий.
+
+Генерация векторизована и идёт блоками по chunk_rounds раундов: каждый блок
+сразу дописывается в файлы, память не зависит от числа раундов. Если раундов
+больше noise_pool, шум наборов берётся строками из заранее созданного пула
+noise_pool x num_sets (случайная строка на раунд) - генерация случайных чисел
+для каждой ячейки стоит дороже всего остального; дрейф, выбросы и утечка
+добавляются к каждому раунду отдельно.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from sidechannel.events import EVENT_ACCESS, EVENT_COLUMNS, EVENT_SECRET
+from sidechannel.measurements import CSV_COLUMNS, MeasurementWriter
+from sidechannel.npyfile import NpyAppendWriter
+from sidechannel.workload import make_schedule
+
+MEASUREMENTS_FILE = "attacker_measurements.csv"
+SETS_MATRIX_FILE = "attacker_sets.npy"
+TIMESTAMPS_FILE = "attacker_timestamps.npy"
+EVENTS_FILE = "victim_events.npy"
+TRUTH_FILE = "synthetic_truth.json"
+
+NOISE_DISTRIBUTIONS = ("normal", "lognormal", "gamma")
+LEAK_MODELS = ("match", "hamming")
+SCHEDULES = ("fixed", "sequential", "random")  # расписания, постоянные на блоке из period итераций
+
+MONOTONIC_BASE_NS = 1_000_000_000_000  # Начало прогона по monotonic (границы раундов, события)
+PERF_BASE_NS = 5_000_000_000  # Начало расписания по perf_counter (scheduled_ns, actual_ns)
+WALL_BASE = 1_760_000_000.0  # Начало прогона по часам на стенке (timestamp)
+SECRET_EVENT_LEAD_NS = 1_000  # Смена секрета записывается раньше обращения
+
+DEFAULT_PARAMS = {
+    'num_sets': 256,
+    'round_rate_hz': 20.0,          # частота раундов attacker
+    'round_duration_ns': 2_000_000,  # prime -> wait -> probe
+    'round_jitter_ns': 5_000,       # среднее опоздание начала и разброс длительности раунда
+    'late_rate': 0.01,              # доля раундов с большим опозданием
+    'late_ns': 200_000,             # среднее большое опоздание
+    'base_ns': 75.0,                # среднее время доступа к набору
+    'set_spread_ns': 5.0,           # разброс базовых времён наборов
+    'noise': 'normal',              # распределение шума (NOISE_DISTRIBUTIONS)
+    'noise_ns': 8.0,                # стандартное отклонение шума
+    'noise_shape': 0.5,             # sigma для lognormal, форма для gamma
+    'outlier_rate': 0.0,            # доля ячеек раунд x набор с выбросом
+    'round_outlier_rate': 0.0,      # доля раундов, где выброс затрагивает все наборы
+    'outlier_ns': 700.0,            # среднее значение выброса
+    'drift_ns_per_hour': 0.0,       # линейный дрейф всех наборов
+    'drift_walk_ns': 0.0,           # шаг случайного блуждания за раунд
+    'leak_sets': [7, 100, 200],     # наборы с утечкой
+    'leak_ns': 30.0,                # величина утечки
+    'leak_model': 'match',          # модель утечки (LEAK_MODELS)
+    'secret_schedule': 'sequential',  # расписание секретов victim (SCHEDULES)
+    'secret_period': 100,           # смена секрета каждые N итераций
+    'access_offset_ns': 1_000_000,  # обращение victim от начала раунда
+    'victim_stride': 4096,          # victim.STRIDE - индекс обращения в событиях
+    'victim_array_size': 256 * 512,  # victim.ARRAY_SIZE
+    'z_threshold': 3.0,             # порог z-оценки подозрительного набора
+    'baseline_ns': 60,              # базовая линия probe (baseline_ns)
+    'baseline_noise_ns': 2.0,       # шум базовой линии (знаменатель snr)
+    'seed': 2025,
+    'noise_pool': 1 << 16,          # строк пула шума (0 - свой шум у каждого раунда)
+    'chunk_rounds': 1 << 14,        # раундов в блоке генерации и записи
+}
+
+# Знаков после запятой для столбцов CSV (остальные - целые)
+CSV_DECIMALS = {
+    'timestamp': 6, 'avg_time_ns': 4, 'stdev_time_ns': 4, 'max_zscore': 3,
+    'avg_corrected_ns': 4, 'snr': 3,
+}
+
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+
+
+def _format_column(values, decimals):
+    """
+    Десятичная запись чисел в матрицу байтов (n, ширина), выровненную вправо
+
+    values - числа, умноженные на 10^decimals и округлённые до целых;
+    неиспользуемые позиции - нулевые байты (вырезаются в format_csv)
+    """
+    values = np.asarray(values, dtype=np.int64)
+    negative = values < 0
+    remaining = np.abs(values)
+    digits = np.maximum(np.searchsorted(_POW10, remaining, side='right'), decimals + 1)
+    length = digits + (decimals > 0) + negative
+    width = int(length.max()) if len(values) else 1
+    out = np.zeros((len(values), width), dtype=np.uint8)
+    position = 0  # символов справа
+    for column in range(width - 1, -1, -1):
+        if decimals and position == decimals:
+            out[:, column] = ord('.')
+        else:
+            remaining, digit = np.divmod(remaining, 10)
+            used = position < digits + (decimals > 0)
+            out[used, column] = ord('0') + digit[used]
+        out[negative & (position == length - 1), column] = ord('-')
+        position += 1
+    return out
+
+
+def format_csv(columns):
+    """
+    Строки CSV (перевод строки \\r\\n, как у csv.writer) из столбцов
+
+    columns - последовательность (values, decimals); возвращает str
+    """
+    parts = []
+    rows = None
+    for values, decimals in columns:
+        if decimals:
+            values = np.rint(np.asarray(values, dtype=np.float64) * 10 ** decimals)
+        block = _format_column(values, decimals)
+        rows = len(block)
+        if parts:
+            parts.append(np.full((rows, 1), ord(','), dtype=np.uint8))
+        parts.append(block)
+    parts.append(np.tile(np.frombuffer(b"\r\n", dtype=np.uint8), (rows, 1)))
+    table = np.hstack(parts)
+    return table[table != 0].tobytes().decode('ascii')
+
+
+def standard_noise(rng, distribution, shape, size):
+    """Шум с нулевым средним и единичным стандартным отклонением (float32)"""
+    if distribution == "normal":
+        return rng.standard_normal(size, dtype=np.float32)
+    if distribution == "lognormal":
+        mean = np.exp(shape * shape / 2)
+        std = np.sqrt((np.exp(shape * shape) - 1) * np.exp(shape * shape))
+        values = np.exp(shape * rng.standard_normal(size, dtype=np.float32))
+        values -= mean
+        values /= std
+        return values
+    values = rng.standard_gamma(shape, size, dtype=np.float32)
+    values -= shape
+    values /= np.sqrt(shape)
+    return values
+
+
+def check_params(params):
+    """Проверяет параметры генерации; ValueError при ошибке"""
+    if params['noise'] not in NOISE_DISTRIBUTIONS:
+        raise ValueError(f"Неизвестное распределение шума: {params['noise']!r} "
+                         f"(допустимо: {', '.join(NOISE_DISTRIBUTIONS)})")
+    if params['leak_model'] not in LEAK_MODELS:
+        raise ValueError(f"Неизвестная модель утечки: {params['leak_model']!r} "
+                         f"(допустимо: {', '.join(LEAK_MODELS)})")
+    if params['secret_schedule'] not in SCHEDULES:
+        raise ValueError(f"Неподдерживаемое расписание секретов: {params['secret_schedule']!r} "
+                         f"(допустимо: {', '.join(SCHEDULES)})")
+    if params['num_sets'] < 2:
+        raise ValueError("Нужно не меньше двух наборов")
+    bad = [s for s in params['leak_sets'] if not 0 <= s < params['num_sets']]
+    if bad:
+        raise ValueError(f"Наборы утечки вне диапазона 0..{params['num_sets'] - 1}: {bad}")
+    for name in ('late_rate', 'outlier_rate', 'round_outlier_rate'):
+        if not 0 <= params[name] <= 1:
+            raise ValueError(f"{name} должен быть в [0, 1]: {params[name]}")
+    if params['noise'] != "normal" and params['noise_shape'] <= 0:
+        raise ValueError(f"noise_shape должен быть положительным: {params['noise_shape']}")
+    if not 0 <= params['access_offset_ns'] < params['round_duration_ns']:
+        raise ValueError("Обращение victim должно попадать в окно раунда: "
+                         "0 <= access_offset_ns < round_duration_ns")
+    if params['round_rate_hz'] <= 0 or params['chunk_rounds'] <= 0:
+        raise ValueError("round_rate_hz и chunk_rounds должны быть положительными")
+
+
+def generate(directory, rounds, params=None, matrix=True, events=True, progress=None):
+    """
+    Записывает синтетический прогон из rounds раундов в каталог directory
+
+    matrix, events - записывать ли матрицу раунд x набор с границами раундов
+    и события victim; progress(готово_раундов) вызывается после каждого блока.
+    Возвращает содержимое synthetic_truth.json
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    check_params(params)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    rng = np.random.default_rng(params['seed'])
+    num_sets = params['num_sets']
+    noise_ns = params['noise_ns']
+    base = np.rint(params['base_ns'] + params['set_spread_ns'] * rng.standard_normal(num_sets)).astype(np.int32)
+    np.maximum(base, 1, out=base)
+    leak_sets = np.asarray(params['leak_sets'], dtype=np.int64)
+    leak_ns = params['leak_ns'] if len(leak_sets) else 0
+    schedule = make_schedule(params['secret_schedule'], period=params['secret_period'], seed=params['seed'])
+    period = params['secret_period']
+    period_ns = round(1e9 / params['round_rate_hz'])
+    suspicious_excess = params['z_threshold'] * noise_ns
+
+    def cell_times(size):
+        noise = standard_noise(rng, params['noise'], params['noise_shape'], size)
+        noise *= noise_ns
+        noise += base
+        return np.rint(noise).astype(np.int32)
+
+    pool = cell_times((params['noise_pool'], num_sets)) \
+        if 0 < params['noise_pool'] < rounds else None
+
+    writer = MeasurementWriter(str(directory / MEASUREMENTS_FILE), batch_size=params['chunk_rounds'])
+    matrix_writer = NpyAppendWriter(str(directory / SETS_MATRIX_FILE), 'I', num_sets) if matrix else None
+    timestamps_writer = NpyAppendWriter(str(directory / TIMESTAMPS_FILE), 'q', 2) if matrix else None
+    events_writer = NpyAppendWriter(str(directory / EVENTS_FILE), 'q', len(EVENT_COLUMNS)) if events else None
+    walk = 0.0
+    previous_secret = None
+    secret_changes = 0
+    try:
+        for first in range(0, rounds, params['chunk_rounds']):
+            n = min(params['chunk_rounds'], rounds - first)
+            index = np.arange(first, first + n, dtype=np.int64)
+
+            # Расписание раундов: опоздания и границы по monotonic
+            overrun = rng.exponential(params['round_jitter_ns'], n)
+            late = rng.random(n) < params['late_rate']
+            overrun[late] += rng.exponential(params['late_ns'], int(late.sum()))
+            overrun = overrun.astype(np.int64)
+            scheduled = PERF_BASE_NS + index * period_ns
+            start_ns = MONOTONIC_BASE_NS + index * period_ns + overrun
+            end_ns = start_ns + params['round_duration_ns'] + rng.exponential(params['round_jitter_ns'], n).astype(np.int64)
+
+            # Сдвиг всех наборов раунда: дрейф и выброс раунда
+            drift = params['drift_ns_per_hour'] * (start_ns - MONOTONIC_BASE_NS) / 3.6e12
+            if params['drift_walk_ns']:
+                steps = np.cumsum(rng.normal(0.0, params['drift_walk_ns'], n))
+                drift += walk + steps
+                walk += steps[-1]
+            drift = np.rint(drift).astype(np.int32)
+            shift = drift.copy()
+            outlier_rounds = np.flatnonzero(rng.random(n) < params['round_outlier_rate'])
+            shift[outlier_rounds] += np.rint(rng.exponential(params['outlier_ns'], len(outlier_rounds))).astype(np.int32)
+
+            times = pool[rng.integers(0, len(pool), n)] if pool is not None else cell_times((n, num_sets))
+            times += shift[:, None]
+
+            # Секреты victim: расписание постоянно на блоке из period итераций
+            blocks = index // period
+            values = np.array([schedule(block * period) for block in range(blocks[0], blocks[-1] + 1)],
+                              dtype=np.int64)
+            secrets = values[blocks - blocks[0]]
+            if leak_ns:
+                if params['leak_model'] == "match":
+                    times[np.arange(n), leak_sets[secrets % len(leak_sets)]] += np.int32(round(leak_ns))
+                else:
+                    times[:, leak_sets] += np.rint(leak_ns * _POPCOUNT[secrets] / 8).astype(np.int32)[:, None]
+
+            cells = rng.binomial(n * num_sets, params['outlier_rate'])
+            if cells:
+                flat = times.reshape(-1)
+                flat[rng.integers(0, flat.size, cells)] += np.rint(
+                    rng.exponential(params['outlier_ns'], cells)).astype(np.int32)
+            np.maximum(times, 1, out=times)
+
+            # Агрегаты раунда - как в attacker (суммы в целых числах)
+            total = np.add.reduce(times, axis=1, dtype=np.int64)
+            squares = np.einsum('ij,ij->i', times, times, dtype=np.int64)
+            avg = total / num_sets
+            stdev = np.sqrt(np.maximum(0, num_sets * squares - total * total) / (num_sets * (num_sets - 1)))
+            excess = times - base  # превышение над base[s], дрейф вычитается по строкам
+            suspicious = np.count_nonzero(excess > (drift + suspicious_excess)[:, None], axis=1)
+            avg_corrected = avg - params['baseline_ns']
+            zeros = np.zeros(n, dtype=np.int64)
+            columns = {
+                'round': index,
+                'timestamp': WALL_BASE + (end_ns - MONOTONIC_BASE_NS) / 1e9,
+                'avg_time_ns': avg,
+                'max_time_ns': times.max(axis=1),
+                'min_time_ns': times.min(axis=1),
+                'stdev_time_ns': stdev,
+                'suspicious_count': suspicious,
+                'max_zscore': (excess.max(axis=1) - drift) / noise_ns,
+                'log_events': zeros,
+                'baseline_ns': np.full(n, params['baseline_ns'], dtype=np.int64),
+                'avg_corrected_ns': avg_corrected,
+                'snr': avg_corrected / params['baseline_noise_ns'],
+                'scheduled_ns': scheduled,
+                'actual_ns': scheduled + overrun,
+                'overrun_ns': overrun,
+                'gc_events': zeros,
+            }
+            writer.write_rows(format_csv([(columns[name], CSV_DECIMALS.get(name, 0)) for name in CSV_COLUMNS]), n)
+
+            if matrix_writer is not None:
+                matrix_writer.write_block(times.astype('<u4'))
+                timestamps_writer.write_block(np.stack([start_ns, end_ns], axis=1).astype('<i8'))
+
+            # События victim: смена секрета (если была) и обращение в окне раунда
+            changed = np.empty(n, dtype=bool)
+            changed[0] = previous_secret is None or secrets[0] != previous_secret
+            changed[1:] = secrets[1:] != secrets[:-1]
+            previous_secret = secrets[-1]
+            secret_changes += int(changed.sum())
+            if events_writer is not None:
+                access_ns = start_ns + params['access_offset_ns']
+                rows = np.empty((n + int(changed.sum()), len(EVENT_COLUMNS)), dtype='<i8')
+                access_rows = np.arange(n) + np.cumsum(changed)
+                secret_rows = access_rows[changed] - 1
+                rows[access_rows] = np.stack([
+                    access_ns, np.full(n, EVENT_ACCESS), index, secrets,
+                    secrets * params['victim_stride'] % params['victim_array_size']], axis=1)
+                rows[secret_rows] = np.stack([
+                    access_ns[changed] - SECRET_EVENT_LEAD_NS, np.full(len(secret_rows), EVENT_SECRET),
+                    index[changed], secrets[changed], np.full(len(secret_rows), -1)], axis=1)
+                events_writer.write_block(rows)
+
+            if progress is not None:
+                progress(first + n)
+    finally:
+        for output in (writer, matrix_writer, timestamps_writer, events_writer):
+            if output is not None:
+                output.close()
+
+    files = [MEASUREMENTS_FILE] + ([SETS_MATRIX_FILE, TIMESTAMPS_FILE] if matrix else []) + \
+        ([EVENTS_FILE] if events else [])
+    truth = {
+        'rounds': rounds,
+        'params': params,
+        'set_base_ns': base.tolist(),
+        'leak_sets': leak_sets.tolist(),
+        'secret_changes': secret_changes,
+        'noise_pool_rows': len(pool) if pool is not None else 0,
+        'files': files,
+        'elapsed_s': round(time.perf_counter() - started, 3),
+    }
+    with open(directory / TRUTH_FILE, 'w', encoding='utf-8') as f:
+        json.dump(truth, f, ensure_ascii=False, indent=2)
+    return truth
@@ -3,216 +3,351 @@
 """
 Скрипт анализа результатов side-channel эксперимента
 Строит графики на основе данных измерений attacker
+
+Использование:
+    python analyze_results.py                      # статистика и все графики
+    python analyze_results.py --stats-only         # только статистика (без matplotlib)
+    python analyze_results.py --figures timing combined --jobs 2
+    python analyze_results.py --compare same-core-1a2b cross-core-3c4d   # прогоны из каталога
+    python analyze_results.py --compare --where NUM_SETS=512 --sort=-leakage_max_t --limit 5
+
+pandas и matplotlib импортируются только там, где они нужны: в режиме
+--stats-only matplotlib не загружается вовсе, графики строятся модулем
+analysis.figures в пуле процессов с backend Agg
+
+В режиме --compare данные logs/ не читаются: прогоны берутся из каталога
+(analysis.catalog, регистрация - run_catalog.py), сравнение строится
+по сохранённым статистикам и столбцовым файлам прогонов
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
+import argparse
+import json
+import os
+import sys
 import numpy as np
 from pathlib import Path
 
-# Настройка matplotlib для поддержки кириллицы
-matplotlib.rc('font', family='DejaVu Sans', size=10)
+from analysis import pipeline
+from analysis.catalog import set_moments
+from sidechannel.npyfile import open_npy
+from sidechannel.profiling import load_profile, phase_total
 
 # Пути к файлам
 MEASUREMENTS_FILE = "logs/attacker_measurements.csv"
+SETS_MATRIX_FILE = "logs/attacker_sets.npy"
+TIMESTAMPS_FILE = "logs/attacker_timestamps.npy"
+BASELINES_FILE = "logs/attacker_set_baselines.json"
+EVENTS_FILE = "logs/victim_events.npy"
+PROFILE_FILES = {  # Гистограммы фаз раунда/итерации (sidechannel.profiling)
+    'attacker': "logs/attacker_profile.json",
+    'victim': "logs/victim_profile.json",
+}
 OUTPUT_DIR = Path("figures")
+LEAKAGE_WORKERS = 1  # Процессов для оценки утечки (>1 - параллельно по блокам строк)
+LATE_ROUND_NS = 100_000  # Раунд, начатый позже расписания на 100 мкс, считается опоздавшим
+CACHE_DIR = pipeline.CACHE_DIR  # Кеш разобранных данных, статистик и ключей графиков
+FIGURE_JOBS = os.cpu_count() or 1  # Процессов для построения графиков
+# Графики: имя для --figures -> файл (построение - analysis.figures)
+FIGURE_FILES = {
+    'timing': "prime_probe_timing.png",
+    'distribution': "timing_distribution.png",
+    'suspicious': "suspicious_activity.png",
+    'combined': "combined_analysis.png",
+    'leakage': "leakage_heatmap.png",
+}
+FIGURE_NAMES = tuple(FIGURE_FILES)
+COMPARISON_FILE = "run_comparison.csv"  # Сводка сравнения прогонов из каталога
+COMPARISON_FIGURE = "run_comparison.png"
+COMPARISON_BINS = 80  # Интервалов гистограмм сравнения
+COMPARISON_SIGMA = 4.0  # Диапазон гистограмм: среднее ± k * std по всем прогонам
 
 # Создаём директорию для графиков
 OUTPUT_DIR.mkdir(exist_ok=True)
 
 
 def load_data():
-    """Загружает данные измерений из CSV"""
+    """
+    Загружает данные измерений и производные статистики (через кеш)
+
+    Если attacker не завершился штатно, читается только префикс файла
+    из целых строк (по индексу <файл>.idx). При дописанном файле
+    разбираются только новые раунды
+    """
     print(f"Загрузка данных из {MEASUREMENTS_FILE}...")
-    df = pd.read_csv(MEASUREMENTS_FILE)
-    print(f"Загружено {len(df)} записей")
-    print(f"Колонки: {list(df.columns)}")
-    return df
-
-
-def plot_timing_over_rounds(df):
-    """График изменения времени доступа по раундам"""
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    # Основные данные
-    ax.plot(df['round'], df['avg_time_ns'],
-            label='Average access time', color='blue', alpha=0.7, linewidth=1)
-
-    # Полоса стандартного отклонения
-    ax.fill_between(df['round'],
-                     df['avg_time_ns'] - df['stdev_time_ns'],
-                     df['avg_time_ns'] + df['stdev_time_ns'],
-                     alpha=0.2, color='blue', label='Std deviation')
-
-    # Максимальные значения
-    ax.plot(df['round'], df['max_time_ns'],
-            label='Max access time', color='red', alpha=0.4, linewidth=0.5)
-
-    ax.set_xlabel('Measurement Round')
-    ax.set_ylabel('Access Time (nanoseconds)')
-    ax.set_title('Prime+Probe Memory Access Timing Analysis')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-
-    output_path = OUTPUT_DIR / "prime_probe_timing.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    print(f"График сохранён: {output_path}")
-    plt.close()
-
-
-def plot_timing_distribution(df):
-    """Гистограмма распределения времени доступа"""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
-
-    # Распределение среднего времени
-    ax1.hist(df['avg_time_ns'], bins=50, color='blue', alpha=0.7, edgecolor='black')
-    ax1.axvline(df['avg_time_ns'].mean(), color='red', linestyle='--',
-                label=f"Mean: {df['avg_time_ns'].mean():.2f} ns")
-    ax1.set_xlabel('Average Access Time (ns)')
-    ax1.set_ylabel('Frequency')
-    ax1.set_title('Distribution of Average Access Times')
-    ax1.legend()
-    ax1.grid(True, alpha=0.3)
-
-    # Распределение максимального времени
-    ax2.hist(df['max_time_ns'], bins=50, color='red', alpha=0.7, edgecolor='black')
-    ax2.axvline(df['max_time_ns'].mean(), color='darkred', linestyle='--',
-                label=f"Mean: {df['max_time_ns'].mean():.2f} ns")
-    ax2.set_xlabel('Maximum Access Time (ns)')
-    ax2.set_ylabel('Frequency')
-    ax2.set_title('Distribution of Maximum Access Times')
-    ax2.legend()
-    ax2.grid(True, alpha=0.3)
-
-    output_path = OUTPUT_DIR / "timing_distribution.png"
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    print(f"График сохранён: {output_path}")
-    plt.close()
-
-
-def plot_suspicious_activity(df):
-    """График подозрительной активности (вытеснения из кеша)"""
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    # Подозрительные наборы по времени
-    ax.bar(df['round'], df['suspicious_count'],
-           color='orange', alpha=0.6, label='Suspicious cache sets')
-
-    # Скользящее среднее для тренда
-    window = 20
-    if len(df) >= window:
-        rolling_mean = df['suspicious_count'].rolling(window=window).mean()
-        ax.plot(df['round'], rolling_mean,
-                color='red', linewidth=2, label=f'Moving average ({window} rounds)')
-
-    ax.set_xlabel('Measurement Round')
-    ax.set_ylabel('Number of Suspicious Cache Sets')
-    ax.set_title('Cache Eviction Detection Over Time')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-
-    output_path = OUTPUT_DIR / "suspicious_activity.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    print(f"График сохранён: {output_path}")
-    plt.close()
-
-
-def plot_combined_analysis(df):
-    """Комбинированный график для документа"""
-    fig = plt.figure(figsize=(14, 10))
-
-    # Сетка графиков
-    gs = fig.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
-
-    # 1. Временной ряд среднего времени
-    ax1 = fig.add_subplot(gs[0, :])
-    ax1.plot(df['round'], df['avg_time_ns'], color='blue', linewidth=1)
-    ax1.fill_between(df['round'],
-                      df['avg_time_ns'] - df['stdev_time_ns'],
-                      df['avg_time_ns'] + df['stdev_time_ns'],
-                      alpha=0.2, color='blue')
-    ax1.set_ylabel('Access Time (ns)')
-    ax1.set_title('(a) Average Memory Access Time Over Measurement Rounds')
-    ax1.grid(True, alpha=0.3)
-
-    # 2. Гистограмма среднего времени
-    ax2 = fig.add_subplot(gs[1, 0])
-    ax2.hist(df['avg_time_ns'], bins=40, color='blue', alpha=0.7, edgecolor='black')
-    ax2.axvline(df['avg_time_ns'].mean(), color='red', linestyle='--', linewidth=2)
-    ax2.set_xlabel('Average Time (ns)')
-    ax2.set_ylabel('Frequency')
-    ax2.set_title('(b) Distribution of Average Times')
-    ax2.grid(True, alpha=0.3)
-
-    # 3. Гистограмма максимального времени
-    ax3 = fig.add_subplot(gs[1, 1])
-    ax3.hist(df['max_time_ns'], bins=40, color='red', alpha=0.7, edgecolor='black')
-    ax3.axvline(df['max_time_ns'].mean(), color='darkred', linestyle='--', linewidth=2)
-    ax3.set_xlabel('Maximum Time (ns)')
-    ax3.set_ylabel('Frequency')
-    ax3.set_title('(c) Distribution of Maximum Times')
-    ax3.grid(True, alpha=0.3)
-
-    # 4. Подозрительная активность
-    ax4 = fig.add_subplot(gs[2, :])
-    ax4.bar(df['round'], df['suspicious_count'],
-            color='orange', alpha=0.6, width=1.0)
-    window = 20
-    if len(df) >= window:
-        rolling_mean = df['suspicious_count'].rolling(window=window).mean()
-        ax4.plot(df['round'], rolling_mean, color='red', linewidth=2)
-    ax4.set_xlabel('Measurement Round')
-    ax4.set_ylabel('Suspicious Sets Count')
-    ax4.set_title('(d) Cache Eviction Detection (Suspicious Activity)')
-    ax4.grid(True, alpha=0.3)
-
-    output_path = OUTPUT_DIR / "combined_analysis.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    print(f"Комбинированный график сохранён: {output_path}")
-    plt.close()
-
-
-def print_statistics(df):
+    analysis = pipeline.run(MEASUREMENTS_FILE, {'late_round_ns': LATE_ROUND_NS},
+                            cache_dir=CACHE_DIR)
+    if not analysis.complete:
+        print(f"ВНИМАНИЕ: файл {MEASUREMENTS_FILE} записан не полностью, "
+              f"читается только префикс из целых строк")
+    mode = {'cached': 'из кеша', 'appended': 'из кеша + новые раунды', 'full': 'полный разбор'}
+    print(f"Загружено {analysis.stats['rounds']} записей ({mode[analysis.mode]})")
+    print(f"Колонки: {analysis.columns}")
+    return analysis
+
+
+def load_set_matrix():
+    """
+    Открывает матрицу раунд x набор без копирования в память (mmap)
+
+    Возвращает (matrix, timestamps) или (None, None), если attacker
+    не сохранял времена по наборам
+    """
+    if not Path(SETS_MATRIX_FILE).exists():
+        return None, None
+
+    matrix = open_npy(SETS_MATRIX_FILE)
+    timestamps = open_npy(TIMESTAMPS_FILE) if Path(TIMESTAMPS_FILE).exists() else None
+    # Файлы дописываются независимо - при обрыве берём общую часть
+    if timestamps is not None:
+        rows = min(len(matrix), len(timestamps))
+        matrix, timestamps = matrix[:rows], timestamps[:rows]
+
+    print(f"Матрица времён по наборам: {matrix.shape[0]} раундов x {matrix.shape[1]} наборов")
+    return matrix, timestamps
+
+
+def load_set_baselines():
+    """Загружает базовые линии по наборам, накопленные attacker (или None)"""
+    if not Path(BASELINES_FILE).exists():
+        return None
+    with open(BASELINES_FILE, 'r', encoding='utf-8') as f:
+        baselines = json.load(f)
+    print(f"Базовые линии по наборам: {baselines['count']} раундов")
+    return baselines
+
+
+def load_round_labels(timestamps):
+    """
+    Сопоставляет события victim с раундами attacker по времени
+
+    Возвращает DataFrame меток ground truth по раундам или None,
+    если нет границ раундов или событий victim
+    """
+    from analysis.alignment import align_rounds, load_victim_events
+
+    events = load_victim_events(EVENTS_FILE)
+    if timestamps is None or events is None or not len(events):
+        return None
+    labels = align_rounds(timestamps, events)
+    print(f"События victim: {len(events)}, сопоставлены с {len(labels)} раундами")
+    return labels
+
+
+def load_phase_profiles():
+    """Гистограммы фаз attacker и victim: {источник: (данные JSON, {фаза: PhaseHistogram})}"""
+    profiles = {}
+    for source, path in PROFILE_FILES.items():
+        profile = load_profile(path)
+        if profile is not None:
+            profiles[source] = profile
+    return profiles
+
+
+def print_phase_profiles(profiles):
+    """Выводит длительности фаз и долю накладных расходов инструментирования"""
+    for source, (data, histograms) in profiles.items():
+        overlapping = data.get('overlapping', ())
+        measured = phase_total(histograms, overlapping)
+        print(f"\nФазы {source} ({PROFILE_FILES[source]}), мкс:")
+        print(f"  {'фаза':>12} {'замеров':>8} {'среднее':>9} {'p50':>9} {'p99':>9} {'p99.9':>9} "
+              f"{'макс':>9} {'доля':>6}")
+        for phase, histogram in histograms.items():
+            if not histogram.count:
+                continue
+            print(f"  {phase:>12} {histogram.count:>8} {histogram.mean / 1000:>9.1f} "
+                  f"{histogram.percentile(50) / 1000:>9.1f} {histogram.percentile(99) / 1000:>9.1f} "
+                  f"{histogram.percentile(99.9) / 1000:>9.1f} {histogram.max / 1000:>9.1f} "
+                  f"{'-' if phase in overlapping else f'{100 * histogram.total / measured:5.1f}%':>6}")
+        samples = sum(histogram.count for histogram in histograms.values())
+        overhead = data['instrumentation_overhead_ns'] * samples
+        print(f"  Накладные расходы замеров: {data['instrumentation_overhead_ns']:.0f} нс x {samples} = "
+              f"{overhead / 1e6:.2f} мс ({100 * overhead / measured:.3f}% измеренного времени)")
+        if any(histograms[phase].count for phase in overlapping if phase in histograms):
+            print(f"  Не входят в доли (время уже учтено в других фазах или паузах): "
+                  f"{', '.join(overlapping)}")
+
+
+def set_mean_variance(matrix, baselines=None):
+    """
+    Среднее и дисперсия времени доступа по наборам
+
+    Матрица читается блоками строк (set_moments), без копии целиком.
+    Если есть базовые линии attacker, покрывающие первые count раундов,
+    пересчитываются только последующие строки матрицы, а результат
+    объединяется с базовыми линиями (формулы Чана для параллельного Уэлфорда)
+    """
+    if (baselines is None or baselines['num_sets'] != matrix.shape[1]
+            or baselines['count'] > len(matrix) or baselines['count'] < 2):
+        return set_moments(matrix)
+
+    n_a = baselines['count']
+    mean_a = np.asarray(baselines['mean'], dtype=np.float64)
+    m2_a = np.asarray(baselines['variance'], dtype=np.float64) * (n_a - 1)
+
+    rest = matrix[n_a:]
+    n_b = len(rest)
+    if n_b == 0:
+        return mean_a, m2_a / (n_a - 1)
+
+    mean_b, var_b = set_moments(rest)
+    m2_b = var_b * (n_b - 1) if n_b > 1 else np.zeros_like(mean_b)
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+    return mean, m2 / (n - 1)
+
+
+def leakage_cache_key():
+    """Ключ кеша оценки утечки: входные файлы и параметры оценки"""
+    from analysis.leakage import TVLA_THRESHOLD
+
+    return pipeline.fingerprint([SETS_MATRIX_FILE, TIMESTAMPS_FILE, EVENTS_FILE],
+                                {'threshold': TVLA_THRESHOLD})
+
+
+def run_leakage_assessment(matrix, labels, analysis=None, top=10):
+    """
+    Оценка утечки по наборам: таблица в CSV и сводка в консоль
+
+    При переданном analysis результат берётся из кеша, если матрица,
+    границы раундов и события victim не изменились
+    """
+    import pandas as pd
+    from analysis.leakage import assess_leakage, TVLA_THRESHOLD
+
+    key = leakage_cache_key()
+    cached, meta = (analysis.cache.load_arrays('leakage', key)
+                    if analysis is not None else (None, None))
+    if cached is not None:
+        class_t = cached.pop('class_t')
+        scores = pd.DataFrame(cached)
+        scores.attrs.update(meta['attrs'])
+    else:
+        scores, class_t = assess_leakage(matrix, labels['secret'].to_numpy(),
+                                         workers=LEAKAGE_WORKERS, matrix_path=SETS_MATRIX_FILE)
+        if analysis is not None:
+            arrays = {name: scores[name].to_numpy() for name in scores.columns}
+            analysis.cache.store_arrays('leakage', key, dict(arrays, class_t=class_t),
+                                        {'attrs': dict(scores.attrs)})
+
+    scores_path = OUTPUT_DIR / "leakage_scores.csv"
+    scores.to_csv(scores_path, index=False)
+
+    print(f"\nОценка утечки по наборам (TVLA, порог |t| > {TVLA_THRESHOLD}):")
+    print(f"  Раундов с известным секретом: {scores.attrs['rounds']}, "
+          f"fixed-класс: {scores.attrs['fixed_class']}")
+    print(f"  Наборов с утечкой: {scores['leaky'].sum()} из {len(scores)}")
+    print(f"  Наиболее информативные наборы:")
+    for row in scores.nlargest(top, 'max_class_t').itertuples():
+        print(f"    set {row.set:4d}: max |t| = {row.max_class_t:.2f} (секрет {row.max_class}), "
+              f"fixed-vs-random t = {row.fixed_vs_random_t:.2f}, "
+              f"MI = {row.mutual_information_bits:.4f} бит")
+    print(f"Таблица оценок сохранена: {scores_path}")
+    return scores, class_t
+
+
+def print_statistics(analysis):
     """Выводит статистику по данным"""
+    stats = analysis.stats
+    rounds = stats['rounds']
+
     print("\n" + "="*70)
     print("СТАТИСТИКА ИЗМЕРЕНИЙ")
     print("="*70)
 
     print(f"\nОбщие данные:")
-    print(f"  Всего раундов измерений: {len(df)}")
-    print(f"  Продолжительность (по временным меткам): {df['timestamp'].max() - df['timestamp'].min():.2f} сек")
+    print(f"  Всего раундов измерений: {rounds}")
+    print(f"  Продолжительность (по временным меткам): {stats['duration_s']:.2f} сек")
 
     print(f"\nВремя доступа к памяти:")
-    print(f"  Среднее (avg): {df['avg_time_ns'].mean():.2f} нс")
-    print(f"  Медиана (avg): {df['avg_time_ns'].median():.2f} нс")
-    print(f"  Стд. отклонение (avg): {df['avg_time_ns'].std():.2f} нс")
-    print(f"  Мин/Макс (avg): {df['avg_time_ns'].min():.2f} / {df['avg_time_ns'].max():.2f} нс")
-
-    print(f"\n  Среднее (max): {df['max_time_ns'].mean():.2f} нс")
-    print(f"  Медиана (max): {df['max_time_ns'].median():.2f} нс")
-    print(f"  Мин/Макс (max): {df['max_time_ns'].min():.2f} / {df['max_time_ns'].max():.2f} нс")
-
-    # Определяем аномалии (выбросы)
-    threshold_avg = df['avg_time_ns'].mean() + 2 * df['avg_time_ns'].std()
-    anomalies = df[df['avg_time_ns'] > threshold_avg]
-
+    print(f"  Среднее (avg): {stats['avg_mean']:.2f} нс")
+    print(f"  Медиана (avg): {stats['avg_median']:.2f} нс")
+    print(f"  Стд. отклонение (avg): {stats['avg_std']:.2f} нс")
+    print(f"  Мин/Макс (avg): {stats['avg_min']:.2f} / {stats['avg_max']:.2f} нс")
+
+    print(f"\n  Среднее (max): {stats['max_mean']:.2f} нс")
+    print(f"  Медиана (max): {stats['max_median']:.2f} нс")
+    print(f"  Мин/Макс (max): {stats['max_min']:.2f} / {stats['max_max']:.2f} нс")
+
+    # Время за вычетом накладных расходов таймера (калибровка attacker)
+    if 'avg_corrected_mean' in stats:
+        print(f"\n  Базовая линия таймера (медиана): {stats['baseline_median']:.2f} нс")
+        print(f"  Среднее за вычетом базовой линии: {stats['avg_corrected_mean']:.2f} нс")
+        print(f"  Отношение сигнал/шум (медиана по раундам): {stats['snr_median']:.2f}")
+
+    # Аномалии (выбросы): порог mean + 2*std посчитан конвейером
+    anomalies = stats['anomaly_rounds']
     print(f"\nОбнаружение side-channel эффектов:")
-    print(f"  Порог для аномалий: {threshold_avg:.2f} нс")
-    print(f"  Раундов с аномальным временем: {len(anomalies)} ({100*len(anomalies)/len(df):.1f}%)")
+    print(f"  Порог для аномалий: {stats['anomaly_threshold']:.2f} нс")
+    print(f"  Раундов с аномальным временем: {anomalies} ({100*anomalies/rounds:.1f}%)")
 
     print(f"\nПодозрительная активность кеша:")
-    print(f"  Среднее число подозрительных наборов: {df['suspicious_count'].mean():.2f}")
-    print(f"  Максимум подозрительных наборов: {df['suspicious_count'].max()}")
-    print(f"  Раундов с высокой активностью (>5): {len(df[df['suspicious_count'] > 5])}")
+    print(f"  Среднее число подозрительных наборов: {stats['suspicious_mean']:.2f}")
+    print(f"  Максимум подозрительных наборов: {stats['suspicious_max']}")
+    print(f"  Раундов с высокой активностью (>5): {stats['high_activity_rounds']}")
+    if 'max_zscore_median' in stats:
+        print(f"  Медиана максимального z-score набора в раунде: {stats['max_zscore_median']:.2f}")
+
+    # Соблюдение расписания раундов (планировщик attacker)
+    if 'overrun_median' in stats:
+        late = stats['late_rounds']
+        print(f"\nСоблюдение расписания раундов:")
+        print(f"  Опоздание начала (медиана / p99 / макс): "
+              f"{stats['overrun_median'] / 1000:.1f} / {stats['overrun_p99'] / 1000:.1f} / "
+              f"{stats['overrun_max'] / 1000:.1f} мкс")
+        print(f"  Опоздавших раундов (> {LATE_ROUND_NS / 1000:.0f} мкс): {late} ({100*late/rounds:.1f}%)")
+
+    # Раунды, во время которых работал логгер attacker, могут быть зашумлены
+    if 'log_rounds' in stats:
+        noisy = stats['log_rounds']
+        print(f"\nПересечение с логированием и GC:")
+        print(f"  Раундов с событиями логирования: {noisy} ({100*noisy/rounds:.1f}%)")
+        if stats['log_split_means']:
+            print(f"  Среднее время (с логированием / без): "
+                  f"{stats['log_split_means'][0]:.2f} / {stats['log_split_means'][1]:.2f} нс")
+
+    if 'gc_rounds' in stats:
+        gc_rounds = stats['gc_rounds']
+        print(f"  Раундов со сборкой мусора: {gc_rounds} ({100*gc_rounds/rounds:.1f}%)")
+        if stats['gc_split_means']:
+            print(f"  Среднее время (со сборкой / без): "
+                  f"{stats['gc_split_means'][0]:.2f} / {stats['gc_split_means'][1]:.2f} нс")
 
     print("\n" + "="*70)
 
 
-def create_experiment_summary():
+def print_set_statistics(matrix, baselines=None, top=10):
+    """Выводит статистику времени доступа по отдельным cache sets"""
+    set_means, set_vars = set_mean_variance(matrix, baselines)
+    set_stds = np.sqrt(set_vars)
+    order = np.argsort(set_means)[::-1][:top]
+
+    print(f"\nВремя доступа по наборам ({matrix.shape[1]} наборов):")
+    print(f"  Среднее по наборам: {set_means.mean():.2f} нс "
+          f"(разброс средних: {set_means.std():.2f} нс)")
+    print(f"  Наборы с наибольшим средним временем:")
+    for set_idx in order:
+        print(f"    set {set_idx:4d}: {set_means[set_idx]:.2f} ± {set_stds[set_idx]:.2f} нс")
+
+
+def print_label_statistics(labels):
+    """Выводит сводку меток ground truth, полученных из событий victim"""
+    from analysis.alignment import summarize_labels
+
+    summary = summarize_labels(labels)
+    print(f"\nGround truth (события victim):")
+    print(f"  Раундов с известным секретом: {summary['labelled_rounds']} из {summary['rounds']}")
+    print(f"  Раундов с обращениями victim в окне: {summary['active_rounds']}")
+    print(f"  Раундов со сменой секрета: {summary['secret_changes']}")
+    print(f"  Различных секретов: {summary['distinct_secrets']}")
+    print(f"  Обращений victim на раунд (среднее): {summary['mean_accesses']:.2f}")
+
+
+def create_experiment_summary(analysis):
     """Создаёт текстовый файл с итогами эксперимента"""
-    df = pd.read_csv(MEASUREMENTS_FILE)
+    stats = analysis.stats
+    rounds = stats['rounds']
 
     summary_path = OUTPUT_DIR / "experiment_summary.txt"
 
@@ -231,19 +366,18 @@ def create_experiment_summary():
 
         f.write("Результаты измерений:\n")
         f.write("-" * 70 + "\n")
-        f.write(f"Всего раундов: {len(df)}\n")
-        f.write(f"Среднее время доступа: {df['avg_time_ns'].mean():.2f} нс\n")
-        f.write(f"Стандартное отклонение: {df['avg_time_ns'].std():.2f} нс\n")
-        f.write(f"Диапазон: {df['avg_time_ns'].min():.2f} - {df['avg_time_ns'].max():.2f} нс\n")
+        f.write(f"Всего раундов: {rounds}\n")
+        f.write(f"Среднее время доступа: {stats['avg_mean']:.2f} нс\n")
+        f.write(f"Стандартное отклонение: {stats['avg_std']:.2f} нс\n")
+        f.write(f"Диапазон: {stats['avg_min']:.2f} - {stats['avg_max']:.2f} нс\n")
         f.write("\n")
 
-        threshold = df['avg_time_ns'].mean() + df['avg_time_ns'].std()
-        high_activity = len(df[df['avg_time_ns'] > threshold])
+        high_activity = stats['summary_high_rounds']
 
         f.write("Обнаружение side-channel:\n")
         f.write("-" * 70 + "\n")
-        f.write(f"Раундов с повышенным временем доступа: {high_activity} ({100*high_activity/len(df):.1f}%)\n")
-        f.write(f"Среднее число подозрительных cache sets: {df['suspicious_count'].mean():.2f}\n")
+        f.write(f"Раундов с повышенным временем доступа: {high_activity} ({100*high_activity/rounds:.1f}%)\n")
+        f.write(f"Среднее число подозрительных cache sets: {stats['suspicious_mean']:.2f}\n")
         f.write("\n")
 
         f.write("Выводы:\n")
@@ -257,31 +391,195 @@ def create_experiment_summary():
     print(f"Итоги эксперимента сохранены: {summary_path}")
 
 
-def main():
+def render_figures(analysis, names, leakage=None, jobs=1):
+    """
+    Строит выбранные графики, ключ которых изменился с прошлого запуска
+
+    Рендеринг выполняется в пуле из jobs процессов (analysis.figures)
+    """
+    tasks, keys = [], {}
+    for name in names:
+        if name == 'leakage':
+            if leakage is None:
+                continue
+            key, data = leakage_cache_key(), leakage[1]
+        else:
+            key, data = analysis.key, analysis
+        filename = FIGURE_FILES[name]
+        output_path = OUTPUT_DIR / filename
+        if analysis.figure_is_current(filename, output_path, key):
+            print(f"График не изменился: {output_path}")
+            continue
+        tasks.append((name, data, output_path))
+        keys[name] = key
+
+    if not tasks:
+        return
+
+    from analysis import figures
+    for name, path in figures.render_figures(tasks, jobs):
+        if path is not None:
+            print(f"График сохранён: {path}")
+            analysis.mark_figure(FIGURE_FILES[name], keys[name])
+
+
+def select_runs(catalog, args):
+    """run_id для сравнения: явно перечисленные или отобранные фильтрами --where"""
+    if args.compare:
+        return catalog.resolve(args.compare)
+    return list(catalog.query(args.where, args.sort, args.limit)['run_id'])
+
+
+def comparison_histograms(catalog, runs):
+    """Гистограммы avg_time_ns прогонов на общих интервалах (столбцы читаются блоками через mmap)"""
+    lo = (runs['avg_mean'] - COMPARISON_SIGMA * runs['avg_std']).min()
+    hi = (runs['avg_mean'] + COMPARISON_SIGMA * runs['avg_std']).max()
+    edges = np.linspace(lo, hi, COMPARISON_BINS + 1)
+    histograms = []
+    for run_id in runs['run_id']:
+        column = catalog.column(run_id, 'avg_time_ns')
+        counts = np.zeros(COMPARISON_BINS, dtype=np.int64)
+        for start in range(0, len(column), pipeline.CHUNK_ROWS):
+            counts += np.histogram(column[start:start + pipeline.CHUNK_ROWS], bins=edges)[0]
+        histograms.append(counts)
+    return edges, histograms
+
+
+def compare_runs(catalog, run_ids, stats_only=False):
+    """
+    Сравнение прогонов из каталога: сводная таблица, различающиеся параметры,
+    t-критерий Уэлча среднего времени относительно первого прогона
+    (по сохранённым моментам) и общие с первым прогоном наборы с утечкой
+    """
+    import pandas as pd
+
+    runs = catalog.runs(run_ids)
+    base = runs.iloc[0]
+    runs['welch_t'] = ((runs['avg_mean'] - base['avg_mean'])
+                       / np.sqrt(runs['avg_std'] ** 2 / runs['rounds']
+                                 + base['avg_std'] ** 2 / base['rounds']))
+    scores = catalog.set_scores(run_ids)
+    leaky = {run_id: set(group.loc[group['leaky'] == 1, 'set'])
+             for run_id, group in scores.groupby('run_id')}
+    runs['common_leaky'] = [len(leaky.get(run_id, set()) & leaky.get(base['run_id'], set()))
+                            if run_id in leaky else None for run_id in runs['run_id']]
+
+    params = catalog.params(run_ids)
+    params['key'] = params['target'] + '.' + params['name']
+    values = params.pivot(index='run_id', columns='key', values='value').reindex(run_ids).fillna('-')
+    differing = [key for key in values.columns if values[key].nunique() > 1]
+
+    print(f"\nПрогонов: {len(runs)} (каталог {catalog.path}), база сравнения - {base['run_id']}")
+    print(f"  {'прогон':>24} {'размещение':>11} {'раундов':>9} {'avg, нс':>9} {'std':>7} "
+          f"{'t (база)':>9} {'утечка':>7} {'max |t|':>8} {'общих':>6}")
+    for row in runs.itertuples():
+        leakage = (f"{row.leaky_sets:>7.0f} {row.leakage_max_t:>8.2f} {row.common_leaky:>6.0f}"
+                   if pd.notna(row.leaky_sets) else f"{'-':>7} {'-':>8} {'-':>6}")
+        t = f"{row.welch_t:>9.2f}" if row.Index else f"{'-':>9}"
+        print(f"  {row.run_id:>24} {row.placement if pd.notna(row.placement) else '-':>11} {row.rounds:>9} {row.avg_mean:>9.2f} "
+              f"{row.avg_std:>7.2f} {t} {leakage}")
+
+    if differing:
+        print(f"\nРазличающиеся параметры:")
+        for key in differing:
+            print(f"  {key}: " + ", ".join(f"{run_id}={values.at[run_id, key]}" for run_id in run_ids))
+    else:
+        print(f"\nПараметры всех прогонов совпадают")
+
+    table = runs.drop(columns='stats').join(values[differing], on='run_id')
+    table_path = OUTPUT_DIR / COMPARISON_FILE
+    table.to_csv(table_path, index=False)
+    print(f"\nТаблица сравнения сохранена: {table_path}")
+
+    if not stats_only:
+        from analysis import figures
+
+        edges, histograms = comparison_histograms(catalog, runs)
+        data = {'labels': [row.label or row.run_id for row in runs.itertuples()],
+                'edges': edges, 'counts': histograms,
+                'leakage_max_t': list(runs['leakage_max_t'])}
+        for _, path in figures.render_figures([('comparison', data, OUTPUT_DIR / COMPARISON_FIGURE)]):
+            print(f"График сохранён: {path}")
+    return table
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Анализ результатов side-channel эксперимента")
+    parser.add_argument('--stats-only', action='store_true',
+                        help="только статистика: графики не строятся, matplotlib не импортируется")
+    parser.add_argument('--figures', nargs='+', choices=FIGURE_NAMES, default=list(FIGURE_NAMES),
+                        metavar='NAME', help=f"какие графики строить: {', '.join(FIGURE_NAMES)}")
+    parser.add_argument('--jobs', type=int, default=FIGURE_JOBS,
+                        help="процессов для построения графиков (по умолчанию - число CPU)")
+    compare = parser.add_argument_group("сравнение прогонов из каталога (run_catalog.py)")
+    compare.add_argument('--compare', nargs='*', metavar='RUN',
+                         help="run_id или префиксы; без значений - прогоны, отобранные --where")
+    compare.add_argument('--catalog', default=None, help="файл каталога (по умолчанию catalog/catalog.sqlite)")
+    compare.add_argument('--where', nargs='+', default=[], metavar='FILTER',
+                         help="фильтры ИМЯ<оп>ЗНАЧЕНИЕ, например NUM_SETS=512 placement=same-core")
+    compare.add_argument('--sort', action='append', metavar='KEY',
+                         help="порядок прогонов, повторяется; по убыванию - --sort=-ключ")
+    compare.add_argument('--limit', type=int, help="не более N прогонов")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Главная функция"""
+    args = parse_args(argv)
+
+    if args.compare is not None:
+        from analysis.catalog import DEFAULT_PATH, Catalog
+
+        print("="*70)
+        print("СРАВНЕНИЕ ПРОГОНОВ ИЗ КАТАЛОГА")
+        print("="*70)
+        with Catalog(args.catalog or DEFAULT_PATH) as catalog:
+            try:
+                run_ids = select_runs(catalog, args)
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                sys.exit(2)
+            if not run_ids:
+                print("Нет прогонов, удовлетворяющих условиям")
+                sys.exit(1)
+            compare_runs(catalog, run_ids, args.stats_only)
+        return
+
     print("="*70)
     print("АНАЛИЗ РЕЗУЛЬТАТОВ SIDE-CHANNEL ЭКСПЕРИМЕНТА")
     print("="*70)
 
-    # Загружаем данные
-    df = load_data()
+    # Загружаем данные (однократно; статистики считаются конвейером)
+    analysis = load_data()
+
+    matrix, timestamps = load_set_matrix()
+    baselines = load_set_baselines()
+    labels = load_round_labels(timestamps)
+    profiles = load_phase_profiles()
 
     # Выводим статистику
-    print_statistics(df)
+    print_statistics(analysis)
+    if matrix is not None and len(matrix):
+        print_set_statistics(matrix, baselines)
+    leakage = None
+    if labels is not None:
+        print_label_statistics(labels)
+        if matrix is not None and len(matrix):
+            leakage = run_leakage_assessment(matrix, labels, analysis)
+    if profiles:
+        print_phase_profiles(profiles)
 
     # Строим графики
-    print("\nПостроение графиков...")
-    plot_timing_over_rounds(df)
-    plot_timing_distribution(df)
-    plot_suspicious_activity(df)
-    plot_combined_analysis(df)
+    if not args.stats_only:
+        print("\nПостроение графиков...")
+        render_figures(analysis, args.figures, leakage, args.jobs)
 
     # Создаём итоги
-    create_experiment_summary()
+    create_experiment_summary(analysis)
 
     print("\n" + "="*70)
     print("АНАЛИЗ ЗАВЕРШЁН")
-    print(f"Все графики сохранены в директории: {OUTPUT_DIR}/")
+    print(f"Результаты сохранены в директории: {OUTPUT_DIR}/")
     print("="*70)
 
 
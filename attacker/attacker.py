@@ -5,11 +5,27 @@
 Измеряет время доступа к памяти для обнаружения активности victim через кеш
 """
 
+import atexit
+import gc
+import math
+import operator
 import time
 import sys
-import csv
-from datetime import datetime
-import statistics
+import signal
+from array import array
+
+from sidechannel.buffers import allocate_buffer, FILL_PATTERN
+from sidechannel.config import apply_env
+from sidechannel.events import EventWriter
+from sidechannel.logger import BackgroundLogger
+from sidechannel.measurements import MeasurementWriter, iter_column
+from sidechannel.npyfile import NpyAppendWriter
+from sidechannel.profiling import PhaseProfiler, WindowProfiler, timer_ns
+from sidechannel.publisher import RoundPublisher
+from sidechannel.roundstore import RoundStore, GCMonitor
+from sidechannel.scheduler import RoundScheduler, wait_until, DEFAULT_SPIN_NS
+from sidechannel.stats import RunningStats, SetBaselines
+from sidechannel.timing import Distribution, empty_timer_overhead, signal_to_noise
 
 # Параметры эксперимента
 ARRAY_SIZE = 256 * 4096  # 1MB массив для probe
@@ -18,7 +34,54 @@ NUM_SETS = 256  # Количество наборов для мониторин
 MEASUREMENTS_PER_ROUND = 100
 TOTAL_ROUNDS = 600  # 600 раундов ~= 60 секунд при 0.1 сек на раунд
 LOG_FILE = "/logs/attacker_activity.log"
+LOG_ECHO = True  # Дублировать лог в stdout
 MEASUREMENTS_FILE = "/logs/attacker_measurements.csv"
+SETS_MATRIX_FILE = "/logs/attacker_sets.npy"  # Матрица раунд x набор (uint32, нс)
+TIMESTAMPS_FILE = "/logs/attacker_timestamps.npy"  # Начало/конец раунда (monotonic, нс)
+BASELINES_FILE = "/logs/attacker_set_baselines.json"  # Базовые линии по наборам
+USE_MMAP = False  # Выделять probe-массив через анонимный mmap
+WRITE_BATCH_SIZE = 100  # Раундов в кольцевом буфере и в одной пачке записи
+DISABLE_GC = False  # Отключать циклический GC на время раундов (сборка - между пачками)
+FSYNC_INTERVAL = 5.0  # Секунд между fsync файла измерений
+PROBE_MODE = "single"  # single - обращение на таймер, batch - пачка на набор, sweep - проход целиком
+PROBE_BATCH = 16  # Обращений к разным линиям набора в режиме batch
+CALIBRATION_ROUNDS = 50  # Проходов probe по закешированному адресу при калибровке
+CALIBRATION_INTERVAL = 1000  # Повторная калибровка каждые N раундов (0 - только при старте)
+ROUND_RATE_HZ = 20.0  # Целевая частота раундов (0 - без ограничения)
+PRIME_PROBE_WAIT_NS = 1_000_000  # Ожидание между prime и probe (1 мс)
+SPIN_THRESHOLD_NS = DEFAULT_SPIN_NS  # Остаток ожидания, выжидаемый активным опросом
+Z_THRESHOLD = 3.0  # Набор подозрителен, если z-score относительно его истории выше порога
+EWMA_ALPHA = 0.05  # Вес нового раунда в экспоненциальной базовой линии набора
+BASELINE_WARMUP_ROUNDS = 20  # Раундов до перехода на z-score (до этого - порог по раунду)
+PUBLISH_SOCKET = None  # UNIX-сокет live_monitor.py, например "/logs/attacker_rounds.sock" (None - не публиковать)
+STARTUP_DELAY = 5.0  # Секунд ожидания запуска victim
+CACHE_BACKEND = "hardware"  # hardware - реальный кеш, sim - симулятор sidechannel.cachesim (нужен numpy)
+SIM_HIERARCHY = "L1:32K:8:1,L2:256K:4:4,LLC:8M:16:12"  # Уровни симулятора: имя:размер:ассоциативность:задержка_нс
+SIM_POLICY = "lru"  # Политика вытеснения симулятора: lru, plru, random
+SIM_MEMORY_LATENCY_NS = 80  # Задержка промаха на всех уровнях симулятора
+SIM_SEED = 2025  # Seed политики random
+# Модель victim для симулятора (параметры как в victim.py); время модели идёт только в фазе Wait
+SIM_VICTIM_ARRAY_SIZE = 256 * 512
+SIM_VICTIM_STRIDE = 4096
+SIM_VICTIM_INTERVAL_NS = 10_000_000
+SIM_VICTIM_SECRET_PERIOD = 100
+SIM_VICTIM_TRACE = ""  # Трасса victim (victim_trace.npy) вместо модели: обращения воспроизводятся по кругу
+SIM_EVENTS_FILE = "/logs/simulated_victim_events.npy"  # События модели victim (формат victim_events.npy)
+PROFILE_PHASES = True  # Гистограммы длительностей фаз раунда (sidechannel.profiling)
+PROFILE_FILE = "/logs/attacker_profile.json"
+PROFILE_WINDOW_ROUNDS = 100  # Раундов в окне профилирования (окно открывает SIGUSR1 или PROFILE_WINDOW_START)
+PROFILE_WINDOW_START = -1  # Первый раунд окна профилирования (-1 - только по SIGUSR1)
+PROFILE_WINDOW_MODE = "cprofile"  # cprofile или sample (выборка стека)
+PROFILE_WINDOW_PREFIX = "/logs/attacker_window"  # Файлы окна: <префикс>_<первый>-<последний>.prof/.txt/.folded
+
+ROUND_PHASES = ("prime", "wait", "probe", "stats")
+LOOP_PHASES = ("schedule", "bookkeeping", "logging", "flush", "calibrate")
+
+PROBE_MODES = ("single", "batch", "sweep")
+CACHE_BACKENDS = ("hardware", "sim")
+
+# Переопределения констант из окружения (SC_<ИМЯ>, SC_LOG_DIR - каталог логов)
+ENV_OVERRIDES = apply_env(globals())
 
 
 class PrimeProbeSidechannel:
@@ -26,132 +89,314 @@ class PrimeProbeSidechannel:
     Класс для реализации упрощённого Prime+Probe side-channel
     """
 
-    def __init__(self, array_size, num_sets):
+    def __init__(self, array_size, num_sets, use_mmap=USE_MMAP,
+                 probe_mode=PROBE_MODE, probe_batch=PROBE_BATCH,
+                 wait_ns=PRIME_PROBE_WAIT_NS, spin_ns=SPIN_THRESHOLD_NS,
+                 store_capacity=WRITE_BATCH_SIZE, z_threshold=Z_THRESHOLD,
+                 ewma_alpha=EWMA_ALPHA, warmup_rounds=BASELINE_WARMUP_ROUNDS,
+                 cache=None, victim_model=None, profiler=None):
+        """
+        cache        - sidechannel.cachesim.CacheHierarchy: prime и probe обращаются
+                       к симулятору вместо памяти, времена - смоделированные задержки
+        victim_model - модель обращений victim в общей с attacker иерархии cache,
+                       выполняется в фазе Wait (например, cachesim.SecretAccessModel)
+        profiler     - PhaseProfiler: длительности фаз раунда (ROUND_PHASES)
+        """
+        if probe_mode not in PROBE_MODES:
+            raise ValueError(f"Неизвестный режим probe: {probe_mode!r}")
+
         self.array_size = array_size
         self.num_sets = num_sets
         self.stride = array_size // num_sets
-
-        # Создаём массив для probe
-        self.probe_array = bytearray(array_size)
-
-        # Инициализируем массив
-        for i in range(array_size):
-            self.probe_array[i] = i % 256
-
-        log(f"Инициализирован массив размером {array_size} байт")
+        self.probe_mode = probe_mode
+        self.wait_ns = wait_ns
+        self.spin_ns = spin_ns
+        # В режиме batch обращаемся к нескольким линиям внутри набора
+        lines_per_set = max(1, self.stride // CACHE_LINE_SIZE)
+        self.probe_batch = min(probe_batch, lines_per_set) if probe_mode == "batch" else 1
+        self.offsets = [set_idx * self.stride for set_idx in range(num_sets)]
+        self.batch_lines = [line * CACHE_LINE_SIZE for line in range(self.probe_batch)]
+        self.cache = cache
+        self.victim_model = victim_model
+        self.profiler = profiler
+        self._phases = [profiler.histogram(phase) for phase in ROUND_PHASES] if profiler is not None else None
+        if cache is not None:
+            self._probe = self._probe_simulated
+            self._prime_addresses = self._simulated_addresses(self.offsets)
+            self.probe_array = None
+        else:
+            self._probe = {
+                "single": self._probe_single,
+                "batch": self._probe_batch,
+                "sweep": self._probe_sweep,
+            }[probe_mode]
+
+            # Создаём и инициализируем массив для probe (паттерн i % 256)
+            self.probe_array = allocate_buffer(array_size, fill=FILL_PATTERN, use_mmap=use_mmap)
+
+        # Раунды пишутся на месте в заранее выделенный кольцевой буфер
+        self.store = RoundStore(store_capacity, num_sets)
+        # Потоковые базовые линии по каждому набору
+        self.baselines = SetBaselines(num_sets, alpha=ewma_alpha, warmup=warmup_rounds)
+        self.z_threshold = z_threshold
+        self._scratch = memoryview(array('Q', bytes(8 * num_sets)))
+
+        if cache is not None:
+            log(f"Симулятор кеша: {cache.describe()}")
+            log(f"Модель victim: {type(victim_model).__name__ if victim_model is not None else 'нет'}")
+        log(f"Инициализирован массив размером {array_size} байт"
+            f"{' (mmap)' if use_mmap else ''}{' (симулятор)' if cache is not None else ''}")
         log(f"Количество наборов для мониторинга: {num_sets}")
         log(f"Шаг между наборами: {self.stride} байт")
+        log(f"Режим probe: {probe_mode}"
+            f"{f' ({self.probe_batch} обращений на набор)' if probe_mode == 'batch' else ''}")
+
+        self.baseline = None
+        self.calibrate()
 
     def prime_cache(self):
         """
         Prime фаза: заполняем кеш нашими данными
         Обращаемся ко всем мониторируемым адресам
         """
-        for set_idx in range(self.num_sets):
-            offset = set_idx * self.stride
-            # Обращаемся к адресу, чтобы загрузить его в кеш
-            _ = self.probe_array[offset]
-
-    def probe_cache(self):
+        if self.cache is not None:
+            self.cache.access(self._prime_addresses)
+            return
+        buf = self.probe_array
+        lines = self.batch_lines
+        for offset in self.offsets:
+            # Обращаемся к адресам, чтобы загрузить их в кеш
+            for line in lines:
+                _ = buf[offset + line]
+
+    def probe_cache(self, out=None):
         """
         Probe фаза: измеряем время доступа к тем же адресам
         Если victim обращался к похожим адресам, наши данные вытеснены из кеша
         и время доступа будет больше
+
+        Времена записываются в out (memoryview на array('Q') длиной num_sets);
+        по умолчанию - во внутренний рабочий буфер. Возвращает out.
         """
-        measurements = []
+        if out is None:
+            out = self._scratch
+        self._probe(self.offsets, out)
+        return out
+
+    def _probe_single(self, offsets, out):
+        """Один интервал таймера вокруг одного обращения к набору"""
+        buf = self.probe_array
+        timer = time.perf_counter_ns
 
         for set_idx in range(self.num_sets):
-            offset = set_idx * self.stride
+            offset = offsets[set_idx]
 
             # Измеряем время доступа к памяти с высокой точностью
-            start = time.perf_counter_ns()
-            _ = self.probe_array[offset]
-            end = time.perf_counter_ns()
+            start = timer()
+            _ = buf[offset]
+            end = timer()
+
+            out[set_idx] = end - start
 
-            access_time = end - start
-            measurements.append((set_idx, access_time))
+    def _probe_batch(self, offsets, out):
+        """Один интервал таймера на пачку обращений к линиям набора; время на одно обращение"""
+        buf = self.probe_array
+        timer = time.perf_counter_ns
+        lines = self.batch_lines
+        batch = self.probe_batch
+
+        for set_idx in range(self.num_sets):
+            offset = offsets[set_idx]
+            start = timer()
+            for line in lines:
+                _ = buf[offset + line]
+            end = timer()
+
+            out[set_idx] = (end - start) // batch
+
+    def _probe_sweep(self, offsets, out):
+        """Один вызов таймера на набор: время набора - разность соседних отметок прохода"""
+        buf = self.probe_array
+        timer = time.perf_counter_ns
+
+        previous = timer()
+        for set_idx in range(self.num_sets):
+            _ = buf[offsets[set_idx]]
+            now = timer()
+            out[set_idx] = now - previous
+            previous = now
 
-        return measurements
+    def _simulated_addresses(self, offsets):
+        """Адреса симулятора для линий batch_lines каждого набора (по наборам подряд)"""
+        from sidechannel.cachesim import ATTACKER_BASE
+        return [ATTACKER_BASE + offset + line for offset in offsets for line in self.batch_lines]
+
+    def _probe_simulated(self, offsets, out):
+        """Задержки симулятора; в режиме batch - среднее по линиям набора"""
+        import numpy as np
+
+        latency = self.cache.access(self._simulated_addresses(offsets)).astype(np.uint64)
+        times = np.frombuffer(out, dtype=np.uint64)
+        times[:] = latency.reshape(self.num_sets, len(self.batch_lines)).sum(axis=1) // len(self.batch_lines)
+
+    def calibrate(self, rounds=CALIBRATION_ROUNDS):
+        """
+        Измеряет базовую линию - время probe заведомо закешированного адреса
+
+        Тот же код probe выполняется по адресу 0 для всех наборов, поэтому
+        результат включает накладные расходы таймера и интерпретатора
+        выбранного режима, но не промахи кеша.
+
+        С симулятором кеша калибровка не выполняется: задержки модели не
+        содержат накладных расходов таймера, а пробные обращения изменили бы
+        состояние замещения кеша посреди прогона. Базовая линия - нулевая
+        (без шума), время раунда остаётся задержкой модели
+        """
+        if self.cache is not None:
+            if self.baseline is None:
+                self.baseline = Distribution([0])
+                first = self.cache.levels[0]
+                log(f"Калибровка не требуется (симулятор): базовая линия 0 нс, "
+                    f"попадание в {first.name} - {first.latency_ns} нс")
+            return self.baseline
+
+        hot_offsets = [0] * self.num_sets
+        out = self._scratch
+        self._probe(hot_offsets, out)  # прогрев
+
+        samples = []
+        for _ in range(rounds):
+            self._probe(hot_offsets, out)
+            samples.extend(out)
+
+        self.baseline = Distribution(samples)
+        timer = empty_timer_overhead()
+        log(f"Калибровка: пустой таймер {timer.median} нс (шум {timer.noise:.1f}), "
+            f"базовая линия probe {self.baseline.median} нс (шум {self.baseline.noise:.1f}, "
+            f"p90 {self.baseline.p90})")
+        return self.baseline
 
     def run_measurement_round(self, round_num):
         """
         Выполняет один раунд измерений: Prime -> Wait -> Probe
+
+        Результат пишется в слот кольцевого буфера self.store без создания
+        промежуточных объектов; возвращает номер слота
         """
+        store = self.store
+        slot = store.slot(round_num)
+        times = store.set_times(slot)
+        start_ns = time.monotonic_ns()
+        phases = self._phases
+        if phases is not None:
+            t_prime = timer_ns()
+
         # Фаза 1: Prime - заполняем кеш
         self.prime_cache()
+        if phases is not None:
+            t_wait = timer_ns()
 
         # Фаза 2: Wait - даём время victim'у поработать
         # В реальной атаке здесь может быть более сложная синхронизация
-        time.sleep(0.001)  # 1ms
+        if self.cache is not None:
+            # В симуляторе victim - модель, её обращения за wait_ns модельного времени
+            if self.victim_model is not None:
+                self.cache.access(self.victim_model.run(self.wait_ns))
+        elif self.wait_ns:
+            wait_until(time.perf_counter_ns() + self.wait_ns, self.spin_ns)
+        if phases is not None:
+            t_probe = timer_ns()
 
         # Фаза 3: Probe - измеряем время доступа
-        measurements = self.probe_cache()
-
-        # Вычисляем статистику
-        times = [m[1] for m in measurements]
-        avg_time = statistics.mean(times)
-        max_time = max(times)
-        min_time = min(times)
-        stdev_time = statistics.stdev(times) if len(times) > 1 else 0
-
-        # Определяем "подозрительные" наборы (с большим временем доступа)
-        threshold = avg_time + stdev_time
-        suspicious_sets = [m[0] for m in measurements if m[1] > threshold]
-
-        return {
-            'round': round_num,
-            'timestamp': time.time(),
-            'avg_time_ns': avg_time,
-            'max_time_ns': max_time,
-            'min_time_ns': min_time,
-            'stdev_time_ns': stdev_time,
-            'suspicious_count': len(suspicious_sets),
-            'measurements': measurements
-        }
+        self._probe(self.offsets, times)
+        end_ns = time.monotonic_ns()
+        if phases is not None:
+            t_stats = timer_ns()
+
+        # Вычисляем статистику в целых числах (сумма и сумма квадратов)
+        n = self.num_sets
+        total = sum(times)
+        avg_time = total / n
+        if n > 1:
+            squares = sum(map(operator.mul, times, times))
+            stdev_time = math.sqrt(max(0, n * squares - total * total) / (n * (n - 1)))
+        else:
+            stdev_time = 0.0
+
+        # Определяем "подозрительные" наборы (с большим временем доступа):
+        # по z-score относительно истории каждого набора, а пока история
+        # не накоплена - по порогу среднее + стд. отклонение текущего раунда
+        baselines = self.baselines
+        if baselines.ready:
+            suspicious_count = baselines.update(times, self.z_threshold)
+        else:
+            threshold = avg_time + stdev_time
+            suspicious_count = sum(map(threshold.__lt__, times))
+            baselines.update(times, self.z_threshold)
+
+        # Время за вычетом накладных расходов таймера и интерпретатора
+        baseline = self.baseline
+        avg_corrected = avg_time - baseline.median
+
+        store.round[slot] = round_num
+        store.timestamp[slot] = time.time()
+        store.start_ns[slot] = start_ns
+        store.end_ns[slot] = end_ns
+        store.avg_time_ns[slot] = avg_time
+        store.max_time_ns[slot] = max(times)
+        store.min_time_ns[slot] = min(times)
+        store.stdev_time_ns[slot] = stdev_time
+        store.suspicious_count[slot] = suspicious_count
+        store.max_zscore[slot] = baselines.max_z
+        store.baseline_ns[slot] = baseline.median
+        store.avg_corrected_ns[slot] = avg_corrected
+        store.snr[slot] = signal_to_noise(avg_corrected, baseline)
+
+        if phases is not None:
+            prime, wait, probe, stats = phases
+            prime.record(t_wait - t_prime)
+            wait.record(t_probe - t_wait)
+            probe.record(t_stats - t_probe)
+            stats.record(timer_ns() - t_stats)
+        return slot
+
+
+_logger = None
+
+
+def get_logger():
+    """Возвращает фоновый логгер (создаётся при первом обращении)"""
+    global _logger
+    if _logger is None:
+        _logger = BackgroundLogger(LOG_FILE, "ATTACKER", echo=LOG_ECHO)
+        atexit.register(_logger.close)
+    return _logger
 
 
 def log(message):
-    """Логирование с временной меткой"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    log_message = f"[{timestamp}] ATTACKER: {message}"
-    print(log_message, flush=True)
+    """Логирование с временной меткой (запись выполняет фоновый поток)"""
+    get_logger().log(message)
 
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_message + "\n")
-    except Exception as e:
-        print(f"Ошибка записи в лог: {e}", flush=True)
 
+def save_measurements(store, count, writer, matrix_writer, timestamps_writer):
+    """
+    Сбрасывает первые count слотов буфера раундов в файлы измерений:
+    агрегаты - в CSV, времена по наборам и границы раундов - в .npy
+    """
+    for slot in range(count):
+        writer.append_values(store.row(slot, writer.columns))
+    matrix_writer.extend(store.times_uint32(count))
 
-def save_measurements(results):
-    """Сохраняет результаты измерений в CSV файл"""
-    try:
-        with open(MEASUREMENTS_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-
-            # Заголовок
-            writer.writerow([
-                'round', 'timestamp', 'avg_time_ns', 'max_time_ns',
-                'min_time_ns', 'stdev_time_ns', 'suspicious_count'
-            ])
-
-            # Данные
-            for result in results:
-                writer.writerow([
-                    result['round'],
-                    result['timestamp'],
-                    result['avg_time_ns'],
-                    result['max_time_ns'],
-                    result['min_time_ns'],
-                    result['stdev_time_ns'],
-                    result['suspicious_count']
-                ])
-
-        log(f"Результаты измерений сохранены в {MEASUREMENTS_FILE}")
-        log(f"Всего записано раундов: {len(results)}")
-
-    except Exception as e:
-        log(f"Ошибка сохранения измерений: {e}")
+    bounds = array('q')
+    for slot in range(count):
+        bounds.append(store.start_ns[slot])
+        bounds.append(store.end_ns[slot])
+    timestamps_writer.extend(bounds)
+
+
+def _terminate(signum, frame):
+    """SIGTERM (docker stop) обрабатывается как прерывание, чтобы дописать данные"""
+    raise KeyboardInterrupt
 
 
 def main():
@@ -160,63 +405,215 @@ def main():
     log("ATTACKER: Старт программы Prime+Probe side-channel атаки")
     log("=" * 70)
 
-    # Небольшая задержка, чтобы victim успел запуститься
-    log("Ожидание запуска victim (5 секунд)...")
-    time.sleep(5)
+    if ENV_OVERRIDES:
+        log("Параметры из окружения: " + ", ".join(f"{k}={v}" for k, v in ENV_OVERRIDES.items()))
+
+    if CACHE_BACKEND not in CACHE_BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд кеша: {CACHE_BACKEND!r}")
+
+    cache = victim_model = sim_events = None
+    if CACHE_BACKEND == "sim":
+        # victim моделируется в том же процессе, ждать его запуска не нужно
+        from sidechannel.cachesim import parse_hierarchy, SecretAccessModel
+
+        cache = parse_hierarchy(SIM_HIERARCHY, policy=SIM_POLICY,
+                                line_size=CACHE_LINE_SIZE,
+                                memory_latency_ns=SIM_MEMORY_LATENCY_NS, seed=SIM_SEED)
+        sim_events = EventWriter(SIM_EVENTS_FILE)
+        if SIM_VICTIM_TRACE:
+            from sidechannel.cachesim import VICTIM_BASE
+            from sidechannel.trace import load_trace, TraceVictimModel
+
+            trace = load_trace(SIM_VICTIM_TRACE)
+            log(f"Трасса victim {SIM_VICTIM_TRACE}: {len(trace)} итераций, {trace.accesses} обращений")
+            victim_model = TraceVictimModel(trace, VICTIM_BASE, events=sim_events, loop=True)
+        else:
+            victim_model = SecretAccessModel(SIM_VICTIM_ARRAY_SIZE, SIM_VICTIM_STRIDE,
+                                             SIM_VICTIM_INTERVAL_NS, SIM_VICTIM_SECRET_PERIOD,
+                                             line_size=CACHE_LINE_SIZE, events=sim_events)
+    else:
+        # Небольшая задержка, чтобы victim успел запуститься
+        log(f"Ожидание запуска victim ({STARTUP_DELAY:g} секунд)...")
+        time.sleep(STARTUP_DELAY)
+
+    # Гистограммы фаз раунда и профилирование окна раундов по запросу
+    profiler = PhaseProfiler("attacker", ROUND_PHASES + LOOP_PHASES) if PROFILE_PHASES else None
+    window = WindowProfiler(PROFILE_WINDOW_PREFIX, PROFILE_WINDOW_ROUNDS, PROFILE_WINDOW_MODE,
+                            PROFILE_WINDOW_START, log=log)
+    window.install()
 
     # Создаём объект для side-channel атаки
-    sidechannel = PrimeProbeSidechannel(ARRAY_SIZE, NUM_SETS)
+    sidechannel = PrimeProbeSidechannel(ARRAY_SIZE, NUM_SETS, use_mmap=USE_MMAP,
+                                        probe_mode=PROBE_MODE, probe_batch=PROBE_BATCH,
+                                        wait_ns=PRIME_PROBE_WAIT_NS, spin_ns=SPIN_THRESHOLD_NS,
+                                        store_capacity=WRITE_BATCH_SIZE, z_threshold=Z_THRESHOLD,
+                                        ewma_alpha=EWMA_ALPHA, warmup_rounds=BASELINE_WARMUP_ROUNDS,
+                                        cache=cache, victim_model=victim_model, profiler=profiler)
+    if profiler is not None:
+        log(f"Профилирование фаз раунда: накладные расходы замера {profiler.overhead_ns:.0f} нс")
+        schedule_phase, bookkeeping_phase, logging_phase, flush_phase, calibrate_phase = (
+            profiler.histogram(phase) for phase in LOOP_PHASES)
+    log(f"Окно профилирования ({PROFILE_WINDOW_MODE}, {PROFILE_WINDOW_ROUNDS} раундов): "
+        f"{f'с раунда {PROFILE_WINDOW_START}, ' if PROFILE_WINDOW_START >= 0 else ''}по SIGUSR1")
 
     log(f"Начало сбора измерений ({TOTAL_ROUNDS} раундов)")
 
-    results = []
+    # Раунды сразу пишутся на диск; в памяти - только статистика по avg_time
+    signal.signal(signal.SIGTERM, _terminate)
+    writer = MeasurementWriter(MEASUREMENTS_FILE, batch_size=WRITE_BATCH_SIZE,
+                               fsync_interval=FSYNC_INTERVAL)
+    matrix_writer = NpyAppendWriter(SETS_MATRIX_FILE, 'I', NUM_SETS)
+    timestamps_writer = NpyAppendWriter(TIMESTAMPS_FILE, 'q', 2)
+    avg_stats = RunningStats()
+    snr_stats = RunningStats()
+    overrun_stats = RunningStats()
+    scheduler = RoundScheduler(ROUND_RATE_HZ, SPIN_THRESHOLD_NS)
+    log(f"Частота раундов: {f'{ROUND_RATE_HZ} Гц' if ROUND_RATE_HZ else 'без ограничения'}, "
+        f"ожидание prime -> probe: {PRIME_PROBE_WAIT_NS / 1e6:.3f} мс")
+
+    logger = get_logger()
+    store = sidechannel.store
+    gc_monitor = GCMonitor()
+    gc_monitor.install()
+    if DISABLE_GC:
+        gc.disable()
+        log("Циклический GC отключён на время раундов")
+
+    publisher = RoundPublisher(PUBLISH_SOCKET) if PUBLISH_SOCKET else None
+    if publisher is not None:
+        log(f"Публикация раундов в {PUBLISH_SOCKET}")
+
+    pending = 0  # заполненных слотов буфера, ещё не сброшенных на диск
     start_time = time.time()
 
     try:
         for round_num in range(TOTAL_ROUNDS):
-            result = sidechannel.run_measurement_round(round_num)
-            results.append(result)
+            if CALIBRATION_INTERVAL and round_num and round_num % CALIBRATION_INTERVAL == 0:
+                mark = timer_ns()
+                sidechannel.calibrate()
+                if profiler is not None:
+                    calibrate_phase.record(timer_ns() - mark)
+
+            window.before(round_num)
+            mark = timer_ns()
+            scheduled_ns, actual_ns = scheduler.wait_next()
+            if profiler is not None:
+                schedule_phase.record(timer_ns() - mark)
+
+            # События логирования и сборки мусора, пересекающиеся с раундом,
+            # отмечают шумные раунды
+            log_mark = logger.activity()
+            gc_mark = gc_monitor.events
+            slot = sidechannel.run_measurement_round(round_num)
+            mark = timer_ns()
+            store.log_events[slot] = logger.activity() - log_mark
+            store.gc_events[slot] = gc_monitor.events - gc_mark
+            store.scheduled_ns[slot] = scheduled_ns
+            store.actual_ns[slot] = actual_ns
+            store.overrun_ns[slot] = actual_ns - scheduled_ns
+            pending = slot + 1
+
+            # Неблокирующая отправка: при медленном потребителе раунд отбрасывается
+            if publisher is not None:
+                publisher.publish(store, slot)
+
+            overrun_stats.add(actual_ns - scheduled_ns)
+            avg_stats.add(store.avg_time_ns[slot])
+            snr_stats.add(store.snr[slot])
+            if profiler is not None:
+                bookkeeping_phase.record(timer_ns() - mark)
 
             # Логируем каждый 50-й раунд
             if round_num % 50 == 0:
+                mark = timer_ns()
                 log(f"[Раунд {round_num}/{TOTAL_ROUNDS}] "
-                    f"Среднее время: {result['avg_time_ns']:.0f} нс, "
-                    f"Макс: {result['max_time_ns']:.0f} нс, "
-                    f"Подозрительных наборов: {result['suspicious_count']}")
-
-            # Небольшая задержка между раундами
-            time.sleep(0.05)
+                    f"Среднее время: {store.avg_time_ns[slot]:.0f} нс, "
+                    f"Макс: {store.max_time_ns[slot]:.0f} нс, "
+                    f"Подозрительных наборов: {store.suspicious_count[slot]}")
+                if profiler is not None:
+                    logging_phase.record(timer_ns() - mark)
+
+            # Буфер заполнен - сбрасываем его между раундами
+            if pending == store.capacity:
+                mark = timer_ns()
+                # Слоты считаются сброшенными до записи: прерывание посреди
+                # сброса не должно привести к повторной записи их в finally
+                flushed, pending = pending, 0
+                save_measurements(store, flushed, writer, matrix_writer, timestamps_writer)
+                if DISABLE_GC:
+                    gc.collect(0)
+                if profiler is not None:
+                    flush_phase.record(timer_ns() - mark)
+            window.after(round_num)
 
     except KeyboardInterrupt:
         log("Получен сигнал прерывания")
 
+    finally:
+        save_measurements(store, pending, writer, matrix_writer, timestamps_writer)
+        writer.close()
+        matrix_writer.close()
+        timestamps_writer.close()
+        gc_monitor.uninstall()
+        gc.enable()
+        sidechannel.baselines.save(BASELINES_FILE)
+        if publisher is not None:
+            publisher.close()
+        if sim_events is not None:
+            sim_events.close()
+        window.finish()
+        if profiler is not None:
+            profiler.save(PROFILE_FILE)
+
     elapsed = time.time() - start_time
 
     log("=" * 70)
-    log(f"Сбор данных завершён. Выполнено раундов: {len(results)}")
+    log(f"Сбор данных завершён. Выполнено раундов: {avg_stats.count}")
     log(f"Время работы: {elapsed:.2f} сек")
+    if elapsed > 0:
+        log(f"Фактическая частота раундов: {avg_stats.count / elapsed:.1f} Гц, "
+            f"пропущено слотов расписания: {scheduler.skipped}")
+    if overrun_stats.count:
+        log(f"Опоздание начала раунда: среднее {overrun_stats.mean / 1000:.1f} мкс, "
+            f"максимум {overrun_stats.max / 1000:.1f} мкс")
+    log(f"Срабатываний сборщика мусора: {gc_monitor.events}")
+    if publisher is not None:
+        log(f"Опубликовано раундов: {publisher.sent}, отброшено: {publisher.dropped}")
+    if cache is not None:
+        log("Симулятор кеша: " + ", ".join(f"{name} {counts['hits']} попаданий / {counts['misses']} промахов"
+                                           for name, counts in cache.stats().items()))
+        log(f"События модели victim сохранены в {SIM_EVENTS_FILE} ({sim_events.rows_written} записей)")
     log("=" * 70)
 
-    # Сохраняем результаты
-    save_measurements(results)
+    log(f"Результаты измерений сохранены в {MEASUREMENTS_FILE}")
+    log(f"Всего записано раундов: {writer.rounds_written}")
+    log(f"Времена доступа по наборам сохранены в {SETS_MATRIX_FILE} "
+        f"({matrix_writer.rows_written} x {NUM_SETS})")
+    log(f"Базовые линии по наборам сохранены в {BASELINES_FILE}")
+    if profiler is not None:
+        log(f"Гистограммы фаз раунда сохранены в {PROFILE_FILE}:")
+        for line in profiler.summary():
+            log(f"  {line}")
 
     # Вычисляем общую статистику
-    if results:
-        avg_times = [r['avg_time_ns'] for r in results]
-        overall_avg = statistics.mean(avg_times)
-        overall_stdev = statistics.stdev(avg_times) if len(avg_times) > 1 else 0
+    if avg_stats.count:
+        overall_avg = avg_stats.mean
+        overall_stdev = avg_stats.stdev
 
         log("ИТОГОВАЯ СТАТИСТИКА:")
         log(f"  Среднее время доступа: {overall_avg:.2f} нс")
         log(f"  Стандартное отклонение: {overall_stdev:.2f} нс")
-        log(f"  Минимум: {min(avg_times):.2f} нс")
-        log(f"  Максимум: {max(avg_times):.2f} нс")
+        log(f"  Минимум: {avg_stats.min:.2f} нс")
+        log(f"  Максимум: {avg_stats.max:.2f} нс")
+        log(f"  Режим probe: {sidechannel.probe_mode}, базовая линия: "
+            f"{sidechannel.baseline.median} нс, среднее SNR: {snr_stats.mean:.2f}")
 
-        # Подсчитываем раунды с высокой активностью
+        # Подсчитываем раунды с высокой активностью (второй проход по файлу)
         threshold = overall_avg + overall_stdev
-        high_activity_rounds = sum(1 for t in avg_times if t > threshold)
+        high_activity_rounds = sum(1 for t in iter_column(MEASUREMENTS_FILE, 'avg_time_ns')
+                                   if t > threshold)
         log(f"  Раундов с повышенной активностью: {high_activity_rounds} "
-            f"({100.0 * high_activity_rounds / len(results):.1f}%)")
+            f"({100.0 * high_activity_rounds / avg_stats.count:.1f}%)")
 
     log("=" * 70)
     log("ATTACKER: Завершение работы")
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки стенда side-channel эксперимента
+
+Запуск из корня репозитория: python -m benchmarks.<имя_модуля>
+"""
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# attacker.py и victim.py - самостоятельные скрипты, а не пакеты,
+# поэтому их каталоги добавляются в путь импорта явно
+for _subdir in ("attacker", "victim"):
+    _path = str(REPO_ROOT / _subdir)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк пропускной способности симулятора кеша (sidechannel.cachesim)
+
+Для каждой политики вытеснения прогоняет через иерархию по умолчанию
+пачки адресов трёх видов:
+  - random   - случайные адреса в 64 МиБ (почти всё - промахи)
+  - sequence - последовательный проход по 16 МиБ с шагом линии
+  - attacker - prime/probe attacker: 256 адресов с шагом 4096 байт
+               (все в одном наборе L1 - худший случай для векторизации)
+и выводит число обращений в секунду и долю попаданий в L1.
+
+Запуск: python -m benchmarks.bench_cachesim [--accesses 1000000] [--batch 65536]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from sidechannel import cachesim
+
+DEFAULT_ACCESSES = 1_000_000
+DEFAULT_BATCH = 65_536
+
+
+def streams(count):
+    rng = np.random.default_rng(2025)
+    attacker = cachesim.ATTACKER_BASE + np.arange(256, dtype=np.int64) * 4096
+    return {
+        'random': rng.integers(0, 64 << 20, size=count),
+        'sequence': (np.arange(count, dtype=np.int64) * cachesim.LINE_SIZE) % (16 << 20),
+        'attacker': np.resize(attacker, count),
+    }
+
+
+def measure(policy, addresses, batch):
+    """Обращений в секунду и доля попаданий в L1 при подаче пачками по batch"""
+    hierarchy = cachesim.parse_hierarchy(policy=policy)
+    start = time.perf_counter()
+    for position in range(0, len(addresses), batch):
+        hierarchy.access(addresses[position:position + batch])
+    elapsed = time.perf_counter() - start
+    l1 = hierarchy.levels[0]
+    return len(addresses) / elapsed, l1.hits / max(1, l1.hits + l1.misses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accesses', type=int, default=DEFAULT_ACCESSES,
+                        help='обращений в каждом прогоне')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='обращений в пачке')
+    args = parser.parse_args()
+
+    print(f"Иерархия: {cachesim.DEFAULT_HIERARCHY}, обращений: {args.accesses}, пачка: {args.batch}")
+    header = f"{'Политика':>8} {'Поток':>9} {'обращений/с':>12} {'попаданий L1':>13}"
+    print(header)
+    print("-" * len(header))
+    for policy in cachesim.POLICIES:
+        for name, addresses in streams(args.accesses).items():
+            rate, l1_hit_rate = measure(policy, addresses, args.batch)
+            print(f"{policy:>8} {name:>9} {rate:>12,.0f} {l1_hit_rate:>13.1%}")
+
+
+if __name__ == "__main__":
+    main()
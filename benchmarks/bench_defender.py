@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк защитного монитора (defender): накладные расходы и обнаружение attacker
+
+victim, defender и attacker запускаются как локальные процессы на одном
+CPU (как в docker-compose.yml), каждый запуск - в своём каталоге логов.
+Сценарии:
+  victim          - victim без монитора (базовая частота итераций)
+  clean           - victim с монитором, attacker нет (ложные тревоги)
+  attack-<N>hz    - attacker с частотой раундов N (0 - без ограничения)
+                    запускается через --attack-start секунд после victim,
+                    когда калибровка монитора уже закончена, и работает
+                    --attack-seconds секунд
+
+Для каждого сценария выводятся:
+  - накладные расходы монитора: процессорное время процесса defender
+    (rusage) к его времени работы - с запуском интерпретатора и
+    калибровкой, а также средний cpu_percent по оценкам (установившийся режим)
+  - частота итераций victim и число опозданий (victim_rate.csv)
+  - доля запусков с обнаружением: тревога после первого раунда attacker
+    и не позже окончания атаки + окна оценки
+  - задержка обнаружения: от начала первого раунда attacker
+    (attacker_timestamps.npy) до тревоги (defender_alerts.jsonl)
+  - ложные тревоги: до первого раунда attacker или без attacker
+
+Запуск: python -m benchmarks.bench_defender [--runs 3] [--attacker-rates 20 0]
+"""
+
+import argparse
+import csv
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sidechannel.npyfile import read_array
+from sweep import PROGRAMS, REPO_ROOT, program_env
+
+DEFENDER = REPO_ROOT / "defender" / "defender.py"
+DEFAULT_RUNS = 3
+DEFAULT_DURATION = 20.0
+DEFAULT_ATTACK_START = 8.0
+DEFAULT_ATTACK_SECONDS = 8.0
+DEFAULT_ATTACKER_RATES = [20.0, 0.0]
+STOP_TIMEOUT = 30.0  # Секунд на завершение процессов после окончания victim
+ALARM_GRACE_NS = 3_000_000_000  # Тревога после окончания атаки ещё засчитывается (окно оценки)
+
+
+def launch(program, params, log_dir, cpus):
+    """Процесс программы стенда, привязанный к cpus, с логами в log_dir"""
+    return subprocess.Popen([sys.executable, str(program)], env=program_env(params, log_dir),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            preexec_fn=lambda: os.sched_setaffinity(0, cpus))
+
+
+def reap(process, timeout=STOP_TIMEOUT):
+    """Ожидает завершения процесса; возвращает процессорное время (rusage), сек"""
+    deadline = time.monotonic() + timeout
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return usage.ru_utime + usage.ru_stime
+        if time.monotonic() > deadline:
+            process.send_signal(signal.SIGTERM)
+            deadline = time.monotonic() + timeout
+        time.sleep(0.05)
+
+
+def victim_rate(log_dir):
+    """(итераций в секунду, опозданий) по victim_rate.csv"""
+    with open(log_dir / "victim_rate.csv", newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    duration = sum(float(row['duration_s']) for row in rows if row['worker'] == '0')
+    achieved = sum(int(row['achieved']) for row in rows)
+    return achieved / max(duration, 1e-9), sum(int(row['late']) for row in rows)
+
+
+def load_alerts(log_dir):
+    """Моменты начала тревог (monotonic_ns) из defender_alerts.jsonl"""
+    with open(log_dir / "defender_alerts.jsonl", encoding='utf-8') as f:
+        return [alert['timestamp_ns'] for alert in map(json.loads, f) if alert['event'] == 'start']
+
+
+def defender_cpu_fraction(log_dir):
+    """Средняя доля CPU монитора по оценкам (установившийся режим) или None"""
+    with open(log_dir / "defender_windows.csv", newline='', encoding='utf-8') as f:
+        values = [float(row['cpu_percent']) / 100 for row in csv.DictReader(f)]
+    return statistics.fmean(values) if values else None
+
+
+def run_once(scenario, rate, args, log_dir, cpus):
+    """Один запуск сценария; возвращает dict с метриками"""
+    victim = launch(PROGRAMS['victim'], {'DURATION_SECONDS': args.duration}, log_dir, cpus)
+    started = time.monotonic()
+    defender = launch(DEFENDER, {}, log_dir, cpus) if scenario != "victim" else None
+    attacker = None
+    if rate is not None:
+        time.sleep(args.attack_start)
+        attacker = launch(PROGRAMS['attacker'], {'STARTUP_DELAY': 0, 'ROUND_RATE_HZ': rate,
+                                                 'TOTAL_ROUNDS': 10 ** 9}, log_dir, cpus)
+        time.sleep(args.attack_seconds)
+        attacker.send_signal(signal.SIGTERM)
+        reap(attacker)
+
+    reap(victim, args.duration + STOP_TIMEOUT)
+    result = {}
+    result['victim_rate'], result['victim_late'] = victim_rate(log_dir)
+    if defender is None:
+        return result
+    cpu = reap(defender)
+    result['defender_cpu'] = cpu / (time.monotonic() - started)
+    result['defender_steady_cpu'] = defender_cpu_fraction(log_dir)
+
+    alarms = load_alerts(log_dir)
+    if attacker is None:
+        result['false_alarms'] = len(alarms)
+        return result
+    timestamps, width = read_array(log_dir / "attacker_timestamps.npy")
+    attack_start, attack_end = timestamps[0], timestamps[len(timestamps) - width + 1]
+    result['false_alarms'] = sum(alarm < attack_start for alarm in alarms)
+    hits = [alarm for alarm in alarms if attack_start <= alarm <= attack_end + ALARM_GRACE_NS]
+    result['detected'] = bool(hits)
+    if hits:
+        result['latency_s'] = (hits[0] - attack_start) / 1e9
+    return result
+
+
+def _mean(results, key):
+    values = [result[key] for result in results if result.get(key) is not None]
+    return statistics.fmean(values) if values else None
+
+
+def _fmt(value, spec):
+    text = "-" if value is None else format(value, spec)
+    return text.rjust(int(spec.split('.')[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='запусков на сценарий')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='длительность victim, сек')
+    parser.add_argument('--attack-start', type=float, default=DEFAULT_ATTACK_START,
+                        help='запуск attacker через N секунд после victim')
+    parser.add_argument('--attack-seconds', type=float, default=DEFAULT_ATTACK_SECONDS,
+                        help='длительность атаки, сек')
+    parser.add_argument('--attacker-rates', type=float, nargs='+', default=DEFAULT_ATTACKER_RATES,
+                        help='частоты раундов attacker для сценариев атаки (0 - без ограничения)')
+    parser.add_argument('--cpu', type=int, default=min(os.sched_getaffinity(0)),
+                        help='CPU для всех процессов')
+    args = parser.parse_args()
+    if args.attack_start + args.attack_seconds >= args.duration:
+        parser.error("атака должна закончиться до окончания работы victim")
+
+    scenarios = [("victim", None), ("clean", None)] + \
+        [(f"attack-{rate:g}hz", rate) for rate in args.attacker_rates]
+    print(f"CPU {args.cpu}, запусков на сценарий: {args.runs}, victim {args.duration:g} с, "
+          f"атака {args.attack_start:g}-{args.attack_start + args.attack_seconds:g} с")
+    header = (f"{'Сценарий':>14} {'CPU монитора':>13} {'устан.':>7} {'итераций/с':>11} {'опозданий':>10} "
+              f"{'обнаружено':>11} {'задержка, с':>12} {'ложных':>7}")
+    print(header)
+    print("-" * len(header))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scenario, rate in scenarios:
+            results = []
+            for run in range(args.runs):
+                log_dir = Path(tmp) / f"{scenario}-{run}"
+                log_dir.mkdir()
+                results.append(run_once(scenario, rate, args, log_dir, {args.cpu}))
+            detected = [result['detected'] for result in results if 'detected' in result]
+            false_alarms = [result['false_alarms'] for result in results if 'false_alarms' in result]
+            print(f"{scenario:>14} {_fmt(_mean(results, 'defender_cpu'), '13.2%')} "
+                  f"{_fmt(_mean(results, 'defender_steady_cpu'), '7.2%')} "
+                  f"{_mean(results, 'victim_rate'):>11.1f} {_mean(results, 'victim_late'):>10.1f} "
+                  f"{f'{sum(detected)}/{len(detected)}' if detected else '-':>11} "
+                  f"{_fmt(_mean(results, 'latency_s'), '12.2f')} "
+                  f"{sum(false_alarms) if false_alarms else '-':>7}")
+
+
+if __name__ == "__main__":
+    main()
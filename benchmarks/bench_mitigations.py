@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк защит victim: цена (итераций в секунду) против снижения утечки
+
+Для каждого режима SecretProcessor (victim.MITIGATIONS):
+  - производительность: итерации process_secret без пауз со сменой
+    секрета каждые SECRET_PERIOD итераций, как в victim.py; накладные
+    расходы - относительно режима none; для fixed_slot дополнительно
+    важна частота итераций, изменивших блок секрета
+  - утечка: записанная трасса обращений воспроизводится (TraceVictimModel)
+    против attacker с симулятором кеша; по матрице раунд x набор и
+    секрету victim на конец раунда считаются TVLA (наборы с |t| > 4.5,
+    максимум |t|) и взаимная информация секрет <-> время по наборам
+    (интервалы времени - уровни задержек симулятора)
+
+Итерации трассы воспроизводятся на равномерной сетке времени - одна на
+каждые два раунда: иначе неравномерная скорость прогона без пауз
+(прогрев, сборка мусора) коррелирует с последовательно сменяющимся
+секретом и выглядит как утечка даже в режиме constant_time.
+
+Иерархия симулятора по умолчанию - прямо отображаемый LLC, в котором
+блок victim вытесняет ровно один набор attacker; при иерархии attacker
+по умолчанию (16-way LLC) утечки нет ни в одном режиме.
+
+Запуск: python -m benchmarks.bench_mitigations [--iterations 3000] [--hierarchy LLC:1M:1:10]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import attacker
+import victim
+from analysis.leakage import TVLA_THRESHOLD, DEFAULT_NUM_CLASSES, LeakageAccumulator
+from sidechannel.cachesim import VICTIM_BASE, parse_hierarchy
+from sidechannel.trace import TraceVictimModel, TraceWriter, load_trace
+from sidechannel.workload import SequentialSchedule
+
+DEFAULT_ITERATIONS = 3000
+DEFAULT_HIERARCHY = "LLC:1M:1:10"
+SECRET_PERIOD = 100
+REPLAY_INTERVAL_NS = 1_000_000  # Шаг равномерной сетки итераций при воспроизведении
+
+secret_at = SequentialSchedule(period=SECRET_PERIOD)  # Расписание секретов victim по умолчанию
+
+
+def run_victim(mitigation, iterations, trace=None):
+    """Итерации без пауз; возвращает (итераций/с, изменений блока секрета/с)"""
+    processor = victim.SecretProcessor(victim.ARRAY_SIZE, victim.STRIDE, trace=trace,
+                                       mitigation=mitigation)
+    start = time.perf_counter()
+    for iteration in range(iterations):
+        processor.process_secret(secret_at(iteration))
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, processor.secret_updates / elapsed
+
+
+def measure_leakage(trace_path, hierarchy_spec, rounds):
+    """Утечка при воспроизведении трассы против attacker с симулятором"""
+    trace = load_trace(trace_path)
+    trace.timestamp_ns = np.arange(len(trace), dtype=np.int64) * REPLAY_INTERVAL_NS
+    model = TraceVictimModel(trace, VICTIM_BASE)
+    hierarchy = parse_hierarchy(hierarchy_spec)
+    sidechannel = attacker.PrimeProbeSidechannel(attacker.ARRAY_SIZE, attacker.NUM_SETS,
+                                                 wait_ns=REPLAY_INTERVAL_NS // 2, cache=hierarchy,
+                                                 victim_model=model)
+    matrix = np.empty((rounds, attacker.NUM_SETS), dtype=np.uint32)
+    labels = np.empty(rounds, dtype=np.int64)
+    for round_num in range(rounds):
+        slot = sidechannel.run_measurement_round(round_num)
+        matrix[round_num] = np.frombuffer(sidechannel.store.set_times(slot), dtype=np.uint64)
+        labels[round_num] = -1 if model.secret is None else model.secret
+
+    # Симулятор выдаёт только задержки уровней - по интервалу на уровень
+    latencies = sorted({level.latency_ns for level in hierarchy.levels} | {hierarchy.memory_latency_ns})
+    accumulator = LeakageAccumulator(attacker.NUM_SETS, DEFAULT_NUM_CLASSES, latencies,
+                                     np.zeros(attacker.NUM_SETS))
+    accumulator.update(matrix, labels)
+    scores = accumulator.scores()
+    return {
+        'leaky_sets': int(scores['leaky'].sum()),
+        'max_t': float(scores[['fixed_vs_random_t', 'max_class_t']].abs().max().max()),
+        'max_mi': float(scores['mutual_information_bits'].max()),
+        'total_mi': float(scores['mutual_information_bits'].sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS,
+                        help='итераций victim на режим (раундов attacker при оценке утечки - вдвое больше)')
+    parser.add_argument('--hierarchy', default=DEFAULT_HIERARCHY,
+                        help='уровни симулятора кеша для оценки утечки')
+    parser.add_argument('--modes', nargs='+', default=list(victim.MITIGATIONS),
+                        choices=victim.MITIGATIONS, help='режимы защиты')
+    args = parser.parse_args()
+
+    # Логи attacker/victim в бенчмарке не нужны; вывод потока-писателя
+    # в stdout смешался бы с таблицей результатов
+    attacker.LOG_FILE = victim.LOG_FILE = os.devnull
+    attacker.LOG_ECHO = victim.LOG_ECHO = False
+
+    print(f"Итераций: {args.iterations}, симулятор: {args.hierarchy}, порог TVLA |t| > {TVLA_THRESHOLD}")
+    header = (f"{'Режим':>13} {'итераций/с':>11} {'расходы':>8} {'изменений/с':>12} "
+              f"{'наборов с утечкой':>18} {'max |t|':>8} {'max MI, бит':>12} {'сумма MI':>9}")
+    print(header)
+    print("-" * len(header))
+
+    baseline_rate = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for mitigation in args.modes:
+            rate, updates = run_victim(mitigation, args.iterations)
+            if baseline_rate is None and mitigation == "none":
+                baseline_rate = rate
+            overhead = f"{baseline_rate / rate - 1:+.0%}" if baseline_rate else "-"
+
+            trace_path = Path(tmp) / f"{mitigation}.npy"
+            with TraceWriter(trace_path) as trace:
+                run_victim(mitigation, args.iterations, trace=trace)
+            leakage = measure_leakage(trace_path, args.hierarchy, 2 * args.iterations)
+
+            print(f"{mitigation:>13} {rate:>11,.0f} {overhead:>8} {updates:>12,.0f} "
+                  f"{leakage['leaky_sets']:>18} {leakage['max_t']:>8.1f} "
+                  f"{leakage['max_mi']:>12.3f} {leakage['total_mi']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
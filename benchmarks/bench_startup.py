@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк времени запуска: от создания буферов до завершения первого раунда
+
+Для каждого размера буфера измеряет:
+  - время выделения и заполнения буфера attacker (PrimeProbeSidechannel)
+  - время выделения буфера victim (SecretProcessor)
+  - время до завершения первого раунда Prime -> Wait -> Probe
+  - среднее время доступа в первом раунде (page fault'ы завышают его)
+
+Запуск: python -m benchmarks.bench_startup [--sizes-mib 1 4 16 64] [--legacy]
+"""
+
+import argparse
+import os
+import time
+
+import attacker
+import victim
+
+DEFAULT_SIZES_MIB = [1, 4, 16, 64]
+LEGACY_MAX_MIB = 4  # побайтовая инициализация на больших размерах слишком медленная
+
+
+def legacy_fill(size):
+    """Исходная побайтовая инициализация массива attacker - для сравнения"""
+    buf = bytearray(size)
+    for i in range(size):
+        buf[i] = i % 256
+    return buf
+
+
+def measure(size, use_mmap):
+    """Один замер для заданного размера буфера и способа выделения"""
+    t0 = time.perf_counter()
+    sidechannel = attacker.PrimeProbeSidechannel(size, attacker.NUM_SETS, use_mmap=use_mmap)
+    t1 = time.perf_counter()
+    slot = sidechannel.run_measurement_round(0)
+    t2 = time.perf_counter()
+    victim.SecretProcessor(size, victim.STRIDE, use_mmap=use_mmap)
+    t3 = time.perf_counter()
+
+    return {
+        'attacker_alloc_ms': (t1 - t0) * 1000,
+        'first_round_ms': (t2 - t0) * 1000,
+        'victim_alloc_ms': (t3 - t2) * 1000,
+        'first_round_avg_ns': sidechannel.store.avg_time_ns[slot],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mib', type=int, nargs='+', default=DEFAULT_SIZES_MIB,
+                        help='размеры буфера в МиБ')
+    parser.add_argument('--legacy', action='store_true',
+                        help='дополнительно замерить исходную побайтовую инициализацию')
+    args = parser.parse_args()
+
+    # Логи attacker/victim в бенчмарке не нужны; вывод потока-писателя
+    # в stdout смешался бы с таблицей результатов
+    attacker.LOG_FILE = victim.LOG_FILE = os.devnull
+    attacker.LOG_ECHO = victim.LOG_ECHO = False
+
+    header = (f"{'Размер':>8} {'Режим':>9} {'attacker, мс':>13} {'victim, мс':>11} "
+              f"{'1-й раунд, мс':>14} {'avg 1-го раунда, нс':>20}")
+    print(header)
+    print("-" * len(header))
+
+    for size_mib in args.sizes_mib:
+        size = size_mib * 1024 * 1024
+        for use_mmap in (False, True):
+            result = measure(size, use_mmap)
+            print(f"{size_mib:>5} МиБ {'mmap' if use_mmap else 'bytearray':>9} "
+                  f"{result['attacker_alloc_ms']:>13.2f} {result['victim_alloc_ms']:>11.2f} "
+                  f"{result['first_round_ms']:>14.2f} {result['first_round_avg_ns']:>20.1f}")
+
+        if args.legacy and size_mib <= LEGACY_MAX_MIB:
+            t0 = time.perf_counter()
+            legacy_fill(size)
+            print(f"{size_mib:>5} МиБ {'legacy':>9} {(time.perf_counter() - t0) * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
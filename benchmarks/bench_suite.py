@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Набор бенчмарков горячих путей стенда и масштабирования анализа
+
+Микробенчмарки (время одного вызова, нс; минимум и медиана по повторам):
+  prime_cache              - PrimeProbeSidechannel.prime_cache
+  probe_cache.<режим>      - probe_cache в режимах single, batch, sweep
+  run_measurement_round    - раунд целиком без ожидания (wait_ns=0):
+                             prime, probe, статистика раунда, базовые линии
+                             и гистограммы фаз (если PROFILE_PHASES)
+  process_secret.<защита>  - SecretProcessor.process_secret в каждом режиме
+  log                      - attacker.log() (постановка в очередь BackgroundLogger)
+  log_write                - сообщение от log() до записи в файл потоком логгера
+  save_measurements        - сброс пачки из WRITE_BATCH_SIZE раундов
+                             (CSV + матрица по наборам + границы раундов)
+Число вызовов в повторе подбирается как в timeit (повтор не короче
+--min-time), циклический GC не отключается - как в attacker по умолчанию.
+
+Макробенчмарки (секунды и пиковая память процесса, МиБ):
+analyze_results.py запускается отдельным процессом на синтетических
+данных с заданным числом раундов (analysis.synthetic: CSV с индексом и
+события victim, матрица раунд x набор и границы раундов - до
+--matrix-max-rounds раундов):
+  analyze.stats_cold.<N>    - --stats-only с пустым кешем (полный разбор)
+  analyze.stats_cached.<N>  - повторный --stats-only (данные из кеша)
+  analyze.figures.<N>       - построение графиков по закешированным данным
+                              (до --figures-max-rounds раундов)
+
+Результаты сохраняются в JSON (--output) вместе с описанием окружения.
+С --baseline результаты сравниваются с сохранённым ранее файлом:
+замедление больше --threshold считается регрессией, и программа
+завершается с кодом 1. Сравниваются минимумы (микро) и время (макро);
+базовый файл имеет смысл только для той же машины.
+
+Запуск: python -m benchmarks.bench_suite [--suite micro macro] [--sizes 1000 100000]
+        [--baseline .cache/bench/baseline.json] [--save-baseline .cache/bench/baseline.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import attacker
+import victim
+from sidechannel.logger import DEFAULT_QUEUE_SIZE, BackgroundLogger
+from sidechannel.measurements import MeasurementWriter
+from sidechannel.npyfile import NpyAppendWriter
+from sidechannel.profiling import PhaseProfiler
+from sweep import REPO_ROOT
+
+RESULTS_VERSION = 1
+SUITES = ("micro", "macro")
+DEFAULT_OUTPUT = ".cache/bench/latest.json"
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+DEFAULT_MATRIX_MAX_ROUNDS = 10 ** 5  # 256 наборов x 4 байта: 10^5 раундов ~ 100 МБ
+DEFAULT_FIGURES_MAX_ROUNDS = 10 ** 5
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.1  # Секунд на один повтор микробенчмарка
+DEFAULT_THRESHOLD = 0.2  # Допустимое замедление относительно базового файла
+LOG_MESSAGES = 2000  # Сообщений для замера потока записи логгера
+SECRET = itertools.cycle(range(256))
+
+
+# --- Микробенчмарки ---
+
+def measure(func, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME, max_number=None, between=None):
+    """
+    Время одного вызова func, нс: {'min', 'median', 'number', 'repeat'}
+
+    number вызовов в повторе удваивается, пока повтор не займёт min_time
+    (не больше max_number); between() вызывается перед каждым повтором
+    """
+    def timed(number):
+        if between is not None:
+            between()
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        return time.perf_counter_ns() - start
+
+    number = 1
+    while timed(number) < min_time * 1e9 and (max_number is None or number < max_number):
+        number *= 2
+    if max_number is not None:
+        number = min(number, max_number)
+    times = [timed(number) / number for _ in range(repeat)]
+    return {'unit': 'ns', 'min': min(times), 'median': statistics.median(times),
+            'number': number, 'repeat': repeat}
+
+
+def quiet_loggers(log_dir):
+    """Логгеры attacker и victim без вывода в stdout (запись в log_dir)"""
+    for module, source in ((attacker, "ATTACKER"), (victim, "VICTIM")):
+        if module._logger is not None:
+            module._logger.close()
+        module._logger = BackgroundLogger(str(log_dir / f"{module.__name__}.log"), source, echo=False)
+
+
+def micro_benchmarks(args, work_dir):
+    """Микробенчмарки горячих путей attacker и victim; возвращает {имя: результат}"""
+    results = {}
+
+    def run(name, func, **kwargs):
+        results[name] = measure(func, args.repeat, args.min_time, **kwargs)
+        print(f"{name:>30} {results[name]['min']:>12.0f} {results[name]['median']:>12.0f} "
+              f"{results[name]['number']:>9}")
+
+    header = f"{'Бенчмарк':>30} {'мин., нс':>12} {'медиана, нс':>12} {'вызовов':>9}"
+    print(header)
+    print("-" * len(header))
+    quiet_loggers(work_dir)
+
+    profiler = PhaseProfiler("attacker", attacker.ROUND_PHASES) if attacker.PROFILE_PHASES else None
+    sidechannel = attacker.PrimeProbeSidechannel(attacker.ARRAY_SIZE, attacker.NUM_SETS, wait_ns=0,
+                                                 profiler=profiler)
+    run("prime_cache", sidechannel.prime_cache)
+    for mode in attacker.PROBE_MODES:
+        probe = sidechannel if mode == sidechannel.probe_mode else \
+            attacker.PrimeProbeSidechannel(attacker.ARRAY_SIZE, attacker.NUM_SETS, probe_mode=mode, wait_ns=0)
+        run(f"probe_cache.{mode}", probe.probe_cache)
+    rounds = itertools.count()
+    run("run_measurement_round", lambda: sidechannel.run_measurement_round(next(rounds)))
+
+    for mitigation in victim.MITIGATIONS:
+        processor = victim.SecretProcessor(victim.ARRAY_SIZE, victim.STRIDE, mitigation=mitigation)
+        run(f"process_secret.{mitigation}", lambda: processor.process_secret(next(SECRET)))
+
+    # Очередь логгера не должна переполняться: иначе замеряется отбрасывание
+    logger = attacker.get_logger()
+    message = "Раунд 1000: среднее 312.5 нс, подозрительных наборов 7"
+
+    def drain():
+        while logger._queue.qsize():
+            time.sleep(0.001)
+
+    run("log", lambda: attacker.log(message), max_number=DEFAULT_QUEUE_SIZE // 2, between=drain)
+    writer_logger = BackgroundLogger(str(work_dir / "log_write.log"), "ATTACKER", echo=False)
+    start = time.perf_counter_ns()
+    for _ in range(LOG_MESSAGES):
+        writer_logger.log(message)
+    writer_logger.close()
+    elapsed = (time.perf_counter_ns() - start) / LOG_MESSAGES
+    results['log_write'] = {'unit': 'ns', 'min': elapsed, 'median': elapsed, 'number': LOG_MESSAGES, 'repeat': 1}
+    print(f"{'log_write':>30} {elapsed:>12.0f} {elapsed:>12.0f} {LOG_MESSAGES:>9}")
+
+    store = sidechannel.store
+    for round_num in range(store.capacity):
+        sidechannel.run_measurement_round(round_num)
+    writer = MeasurementWriter(str(work_dir / "measurements.csv"), batch_size=store.capacity)
+    matrix_writer = NpyAppendWriter(str(work_dir / "sets.npy"), 'I', attacker.NUM_SETS)
+    timestamps_writer = NpyAppendWriter(str(work_dir / "timestamps.npy"), 'q', 2)
+    run("save_measurements",
+        lambda: attacker.save_measurements(store, store.capacity, writer, matrix_writer, timestamps_writer))
+    for output in (writer, matrix_writer, timestamps_writer):
+        output.close()
+    results['save_measurements']['rounds_per_call'] = store.capacity
+
+    for module in (attacker, victim):
+        module._logger.close()
+        module._logger = None
+    return results
+
+
+# --- Макробенчмарки ---
+
+def generate_dataset(directory, rounds, with_matrix):
+    """
+    Синтетический прогон на rounds раундов в directory/logs (analysis.synthetic)
+
+    Прогон с теми же параметрами, оставшийся в --data-dir, создаётся заново
+    только при изменении числа раундов или наличия матрицы
+    """
+    from analysis.synthetic import SETS_MATRIX_FILE, TRUTH_FILE, generate
+
+    logs = directory / "logs"
+    try:
+        with open(logs / TRUTH_FILE, 'r', encoding='utf-8') as f:
+            truth = json.load(f)
+        if truth['rounds'] == rounds and (SETS_MATRIX_FILE in truth['files']) == with_matrix:
+            return
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(logs, ignore_errors=True)
+    generate(logs, rounds, matrix=with_matrix)
+
+
+def run_analysis(directory, argv):
+    """analyze_results.py в каталоге directory: (секунд, пиковая память МиБ)"""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), MPLBACKEND="Agg")
+    with open(directory / "analyze_stderr.txt", 'w+', encoding='utf-8') as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, str(REPO_ROOT / "analyze_results.py"), *argv],
+                                   cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        if os.waitstatus_to_exitcode(status):
+            stderr.seek(0)
+            raise RuntimeError(f"analyze_results.py {' '.join(argv)} завершился с ошибкой:\n{stderr.read()}")
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def macro_benchmarks(args, data_dir):
+    """analyze_results.py на синтетических данных разного размера; возвращает {имя: результат}"""
+    results = {}
+    header = f"{'Раундов':>10} {'генерация, с':>13} {'разбор, с':>10} {'кеш, с':>8} {'графики, с':>11} {'память, МиБ':>12}"
+    print(header)
+    print("-" * len(header))
+    for rounds in args.sizes:
+        directory = data_dir / str(rounds)
+        start = time.perf_counter()
+        generate_dataset(directory, rounds, rounds <= args.matrix_max_rounds)
+        generated = time.perf_counter() - start
+
+        shutil.rmtree(directory / ".cache", ignore_errors=True)
+        shutil.rmtree(directory / "figures", ignore_errors=True)
+        stages = [("stats_cold", ["--stats-only"]), ("stats_cached", ["--stats-only"])]
+        if rounds <= args.figures_max_rounds:
+            stages.append(("figures", ["--jobs", str(args.jobs)]))
+        row = {}
+        for stage, argv in stages:
+            seconds, peak = run_analysis(directory, argv)
+            row[stage] = seconds
+            results[f"analyze.{stage}.{rounds}"] = {'unit': 's', 'value': seconds, 'peak_rss_mib': round(peak, 1),
+                                                    'rounds': rounds}
+        peak = max(results[f"analyze.{stage}.{rounds}"]['peak_rss_mib'] for stage, _ in stages)
+        figures = row.get('figures')
+        print(f"{rounds:>10} {generated:>13.2f} {row['stats_cold']:>10.2f} {row['stats_cached']:>8.2f} "
+              f"{'-' if figures is None else f'{figures:.2f}':>11} {peak:>12.1f}")
+    return results
+
+
+# --- Результаты и сравнение ---
+
+def environment():
+    """Описание машины и версий для файла результатов"""
+    versions = {}
+    for name in ("numpy", "pandas", "matplotlib"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'affinity': len(os.sched_getaffinity(0)),
+        **versions,
+    }
+
+
+def primary(result):
+    """Сравниваемая величина: минимум для микро, время для макро"""
+    return result['min'] if 'min' in result else result['value']
+
+
+def compare(results, baseline, threshold):
+    """Печатает сравнение с базовым файлом; возвращает имена регрессий"""
+    regressions = []
+    header = f"{'Бенчмарк':>30} {'база':>12} {'сейчас':>12} {'изменение':>10}  статус"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:>30} {'-':>12} {primary(result):>12.4g} {'-':>10}  новый")
+            continue
+        change = primary(result) / primary(base) - 1
+        status = "ok"
+        if change > threshold:
+            status = "РЕГРЕССИЯ"
+            regressions.append(name)
+        elif change < -threshold:
+            status = "быстрее"
+        print(f"{name:>30} {primary(base):>12.4g} {primary(result):>12.4g} {change:>+10.1%}  {status}")
+    return regressions
+
+
+def save_json(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', nargs='+', choices=SUITES, default=list(SUITES),
+                        help='наборы бенчмарков')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='повторов микробенчмарка')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+                        help='минимальная длительность повтора микробенчмарка, сек')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='раундов в синтетических данных для analyze_results.py (до 10^7)')
+    parser.add_argument('--matrix-max-rounds', type=int, default=DEFAULT_MATRIX_MAX_ROUNDS,
+                        help='матрица раунд x набор создаётся для данных не больше N раундов')
+    parser.add_argument('--figures-max-rounds', type=int, default=DEFAULT_FIGURES_MAX_ROUNDS,
+                        help='графики строятся для данных не больше N раундов')
+    parser.add_argument('--jobs', type=int, default=1, help='процессов для построения графиков')
+    parser.add_argument('--data-dir', type=Path,
+                        help='каталог синтетических данных (сохраняется между запусками; '
+                             'по умолчанию - временный)')
+    parser.add_argument('--output', type=Path, default=Path(DEFAULT_OUTPUT), help='файл результатов JSON')
+    parser.add_argument('--baseline', type=Path, help='сравнить с сохранённым файлом результатов')
+    parser.add_argument('--save-baseline', type=Path, help='сохранить результаты как базовый файл')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='допустимое замедление относительно базового файла (доля)')
+    args = parser.parse_args()
+    if args.baseline is not None and not args.baseline.exists():
+        parser.error(f"базовый файл не найден: {args.baseline}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "micro" in args.suite:
+            print("Микробенчмарки (время одного вызова)")
+            work_dir = Path(tmp) / "micro"
+            work_dir.mkdir()
+            results.update(micro_benchmarks(args, work_dir))
+        if "macro" in args.suite:
+            print("\nanalyze_results.py на синтетических данных")
+            data_dir = args.data_dir or Path(tmp) / "macro"
+            data_dir.mkdir(parents=True, exist_ok=True)
+            results.update(macro_benchmarks(args, data_dir))
+
+    report = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'config': {'suite': args.suite, 'repeat': args.repeat, 'min_time': args.min_time,
+                   'sizes': args.sizes, 'matrix_max_rounds': args.matrix_max_rounds,
+                   'figures_max_rounds': args.figures_max_rounds, 'jobs': args.jobs},
+        'results': results,
+    }
+    save_json(args.output, report)
+    print(f"\nРезультаты сохранены в {args.output}")
+    if args.save_baseline is not None:
+        save_json(args.save_baseline, report)
+        print(f"Базовый файл сохранён в {args.save_baseline}")
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['environment'] != report['environment']:
+            print("\nВНИМАНИЕ: базовый файл записан в другом окружении")
+        print(f"\nСравнение с {args.baseline} (порог {args.threshold:.0%})")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)} ({', '.join(regressions)})")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main()
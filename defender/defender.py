@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Программа defender - защитный монитор соседства для victim
+Выполняется рядом с victim на том же CPU, с ограниченными накладными
+расходами отслеживает конкуренцию за кеш и CPU (sidechannel.defense)
+и сообщает о периодической активности соседа вроде Prime+Probe attacker
+"""
+
+import atexit
+import json
+import signal
+import time
+
+from sidechannel.config import apply_env
+from sidechannel.defense import WINDOW_COLUMNS, CoResidencyDetector, find_processes
+from sidechannel.logger import BackgroundLogger
+from sidechannel.measurements import MeasurementWriter
+
+DURATION_SECONDS = 0.0  # Продолжительность мониторинга (0 - пока работает victim)
+TARGET_PROCESS = "victim.py"  # Процессы victim: аргумент командной строки оканчивается на это имя
+TARGET_WAIT_SECONDS = 30.0  # Ожидание запуска victim
+TARGET_SETTLE_SECONDS = 1.0  # Пауза после запуска victim (создание рабочих процессов)
+TICK_RATE_HZ = 200.0  # Частота тиков монитора (регулятор бюджета может снизить)
+BUDGET = 0.01  # Бюджет накладных расходов монитора, доля CPU
+PROC_EVERY = 5  # Чтение /proc каждые N тиков
+WINDOW_SECONDS = 2.0  # Окно оценки признаков
+EVALUATE_SECONDS = 0.5  # Интервал оценки
+CALIBRATION_SECONDS = 3.0  # Калибровка базовой линии (attacker ещё не должен работать)
+CANARY_LINES = 128  # Линий canary-буфера
+Z_ALARM = 5.0  # Порог z-оценки долей медленных тиков canary/lag
+RATIO_ALARM = 3.0  # Порог отношения ожидания victim / задержек PSI к базовым
+PERIODICITY_ALARM = 0.3  # Порог автокорреляции событий для периодичной активности
+CONFIRM = 2  # Оценок подряд с периодичностью до тревоги (и без аномалии до её снятия)
+SUSTAIN = 4  # Оценок подряд с аномалией sched/psi без периодичности до тревоги
+LOG_FILE = "/logs/defender_activity.log"
+LOG_ECHO = True  # Дублировать лог в stdout
+WINDOWS_FILE = "/logs/defender_windows.csv"  # Признаки по оценкам ("" - не записывать)
+ALERTS_FILE = "/logs/defender_alerts.jsonl"  # Начало и окончание тревог (JSON Lines)
+
+# Переопределения констант из окружения (SC_<ИМЯ>, SC_LOG_DIR - каталог логов)
+ENV_OVERRIDES = apply_env(globals())
+
+_logger = None
+
+
+def get_logger():
+    """Возвращает фоновый логгер (создаётся при первом обращении)"""
+    global _logger
+    if _logger is None:
+        _logger = BackgroundLogger(LOG_FILE, "DEFENDER", echo=LOG_ECHO)
+        atexit.register(_logger.close)
+    return _logger
+
+
+def log(message):
+    """Логирование с временной меткой (запись выполняет фоновый поток)"""
+    get_logger().log(message)
+
+
+def _terminate(signum, frame):
+    """SIGTERM (docker stop) обрабатывается как прерывание, чтобы дописать отчёты"""
+    raise KeyboardInterrupt
+
+
+def wait_for_target():
+    """PID процессов victim (пустой список, если victim не запустился)"""
+    deadline = time.monotonic() + TARGET_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        if find_processes(TARGET_PROCESS):
+            time.sleep(TARGET_SETTLE_SECONDS)
+            return find_processes(TARGET_PROCESS)
+        time.sleep(0.1)
+    return []
+
+
+class AlertLog:
+    """Запись тревог в JSON Lines (по строке на событие, сразу на диск)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.alerts = []
+        self._file = open(path, 'w', encoding='utf-8') if path else None
+
+    def __call__(self, alert):
+        self.alerts.append(alert)
+        if self._file is not None:
+            self._file.write(json.dumps(alert, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def main():
+    """Главная функция"""
+    log("=" * 70)
+    log("DEFENDER: Старт монитора соседства")
+    log("=" * 70)
+
+    if ENV_OVERRIDES:
+        log("Параметры из окружения: " + ", ".join(f"{k}={v}" for k, v in ENV_OVERRIDES.items()))
+
+    signal.signal(signal.SIGTERM, _terminate)
+    pids = wait_for_target()
+    if not pids:
+        log(f"Процесс {TARGET_PROCESS} не найден за {TARGET_WAIT_SECONDS:g} с - мониторинг "
+            f"только по canary, опозданиям тиков и PSI")
+    else:
+        log(f"Процессы victim: {', '.join(map(str, pids))}")
+
+    windows = MeasurementWriter(WINDOWS_FILE, columns=WINDOW_COLUMNS, batch_size=10) if WINDOWS_FILE else None
+    alerts = AlertLog(ALERTS_FILE)
+    detector = CoResidencyDetector(
+        pids, TICK_RATE_HZ, PROC_EVERY, WINDOW_SECONDS, EVALUATE_SECONDS, CALIBRATION_SECONDS,
+        BUDGET, CANARY_LINES, z_alarm=Z_ALARM, ratio_alarm=RATIO_ALARM,
+        periodicity_alarm=PERIODICITY_ALARM, confirm=CONFIRM, sustain=SUSTAIN,
+        on_window=windows.append if windows is not None else None, on_alert=alerts, log=log)
+    log(f"Мониторинг: {TICK_RATE_HZ:g} тиков/с, бюджет {100 * BUDGET:g}% CPU, окно {WINDOW_SECONDS:g} с, "
+        f"калибровка {CALIBRATION_SECONDS:g} с"
+        f"{f', длительность {DURATION_SECONDS:g} с' if DURATION_SECONDS else ''}")
+
+    start_wall, start_cpu = time.monotonic(), time.process_time()
+    try:
+        detector.run(DURATION_SECONDS or None)
+    except KeyboardInterrupt:
+        log("Мониторинг прерван")
+    finally:
+        detector.close()
+        alerts.close()
+        if windows is not None:
+            windows.close()
+    elapsed = time.monotonic() - start_wall
+    cpu = time.process_time() - start_cpu
+
+    if windows is not None:
+        log(f"Признаки по оценкам сохранены в {WINDOWS_FILE} ({windows.rounds_written} записей)")
+    latencies = [alert['latency_s'] for alert in alerts.alerts if alert['event'] == 'start']
+    log("=" * 70)
+    log(f"DEFENDER: Завершение работы. Тиков: {detector.ticks} за {elapsed:.1f} с "
+        f"({detector.ticks / max(elapsed, 1e-9):.0f}/с), накладные расходы {100 * cpu / max(elapsed, 1e-9):.2f}% CPU "
+        f"(бюджет {100 * BUDGET:g}%)")
+    log(f"Тревог: {len(latencies)}"
+        f"{f', задержка обнаружения {min(latencies):.2f}-{max(latencies):.2f} с' if latencies else ''}")
+    log("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Генерация синтетического прогона с известной утечкой
+
+Записывает файлы в форматах attacker и victim (analysis.synthetic):
+attacker_measurements.csv с индексом, attacker_sets.npy, attacker_timestamps.npy,
+victim_events.npy и synthetic_truth.json (параметры, базовые времена наборов,
+наборы с утечкой). analyze_results.py читает logs/ относительно текущего
+каталога, поэтому по умолчанию данные пишутся в synthetic/logs.
+
+Использование:
+    python generate_dataset.py --rounds 100000
+    python generate_dataset.py --rounds 10000000 --no-matrix --output /data/big/logs
+    python generate_dataset.py --noise lognormal --noise-shape 0.8 --outlier-rate 0.01 \\
+        --leak-sets 3 17 --leak-ns 10 --leak-model hamming --drift-ns-per-hour 20
+    cd synthetic && python ../analyze_results.py --stats-only
+
+Каждый параметр analysis.synthetic.DEFAULT_PARAMS задаётся одноимённым
+ключом (--noise-ns, --secret-period, ...)
+"""
+
+import argparse
+import sys
+import time
+
+from analysis.synthetic import DEFAULT_PARAMS, LEAK_MODELS, NOISE_DISTRIBUTIONS, SCHEDULES, generate
+
+OUTPUT_DIR = "synthetic/logs"
+DEFAULT_ROUNDS = 100_000
+CHOICES = {'noise': NOISE_DISTRIBUTIONS, 'leak_model': LEAK_MODELS, 'secret_schedule': SCHEDULES}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help="число раундов")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="каталог для файлов прогона")
+    parser.add_argument('--no-matrix', action='store_true',
+                        help="без матрицы раунд x набор и границ раундов (num_sets x 4 байта на раунд)")
+    parser.add_argument('--no-events', action='store_true', help="без событий victim")
+    params = parser.add_argument_group("параметры модели (analysis.synthetic.DEFAULT_PARAMS)")
+    for name, default in DEFAULT_PARAMS.items():
+        option = "--" + name.replace('_', '-')
+        if isinstance(default, list):
+            params.add_argument(option, type=int, nargs='*', default=default, help=f"по умолчанию: {default}")
+        else:
+            params.add_argument(option, type=type(default), default=default, choices=CHOICES.get(name),
+                                help=f"по умолчанию: {default}")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Главная функция"""
+    args = parse_args(argv)
+    params = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+    start = time.perf_counter()
+
+    def progress(done):
+        elapsed = time.perf_counter() - start
+        print(f"\r  {done}/{args.rounds} раундов, {done / max(elapsed, 1e-9):,.0f} раундов/с",
+              end="", flush=True)
+
+    print(f"Генерация {args.rounds} раундов в {args.output}...")
+    try:
+        truth = generate(args.output, args.rounds, params, matrix=not args.no_matrix,
+                         events=not args.no_events, progress=progress)
+    except ValueError as e:
+        print(f"\nОшибка: {e}")
+        sys.exit(2)
+    print()
+    print(f"Готово за {truth['elapsed_s']:.1f} с: {', '.join(truth['files'])}")
+    print(f"Наборы с утечкой: {truth['leak_sets']} ({params['leak_model']}, {params['leak_ns']:g} нс), "
+          f"смен секрета: {truth['secret_changes']}")
+    if truth['noise_pool_rows']:
+        print(f"Шум наборов - из пула {truth['noise_pool_rows']} строк")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live-анализатор side-channel эксперимента
+
+Принимает раунды, которые attacker публикует в UNIX-сокет
+(PUBLISH_SOCKET в attacker.py, формат - sidechannel.publisher), и раз
+в секунду выводит:
+  - скользящую статистику по последним --window раундам
+  - текстовую тепловую карту подозрительных наборов: доля раундов окна,
+    в которых время набора выше его медианы на --z робастных сигм (MAD)
+  - индикаторы утечки (если доступны события victim): t-критерии Уэлча
+    и взаимная информация по наборам, накопленные с начала приёма
+  - потери: раунды, отброшенные attacker (очередь сокета заполнена),
+    и пропуски номеров раундов
+
+Использование:
+    python live_monitor.py --socket logs/attacker_rounds.sock --events logs/victim_events.npy
+
+Сокет создаётся анализатором; attacker, запущенный раньше, просто
+отбрасывает раунды, пока получателя нет.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from sidechannel.publisher import decode_round
+
+SOCKET_PATH = "logs/attacker_rounds.sock"
+EVENTS_FILE = "logs/victim_events.npy"
+WINDOW_ROUNDS = 500  # Раундов в скользящем окне
+REFRESH_INTERVAL = 1.0  # Секунд между обновлениями экрана
+Z_THRESHOLD = 3.0  # Порог робастного z-score для тепловой карты
+LEAKAGE_WARMUP_ROUNDS = 200  # Раундов для выбора интервалов времени перед накоплением утечки
+MAX_PENDING_ROUNDS = 20_000  # Раундов, ожидающих меток victim (старые отбрасываются)
+RECEIVE_BUFFER = 4 << 20  # Размер очереди сокета, байт
+HEATMAP_COLUMNS = 32
+HEATMAP_SHADES = " .:-=+*#%@"
+
+
+class LiveState:
+    """Скользящее окно раундов и накопленные индикаторы"""
+
+    def __init__(self, window, z_threshold, events_path=None):
+        self.window = window
+        self.z_threshold = z_threshold
+        self.events_path = events_path
+        self.num_sets = None
+        self.received = 0
+        self.invalid = 0
+        self.gaps = 0
+        self.attacker_dropped = 0
+        self.last_round = None
+        self.started = time.monotonic()
+        self._rate_mark = (self.started, 0)
+
+        # Кольцевые массивы окна (создаются по первому раунду)
+        self.times = None
+        self.avg = np.zeros(window)
+        self.suspicious = np.zeros(window)
+        self.max_zscore = np.zeros(window)
+        self.filled = 0
+        self.position = 0
+
+        # Раунды, ожидающие меток victim: границы и времена по наборам
+        self.pending_bounds = []
+        self.pending_times = []
+        self.pending_dropped = 0
+        self.leakage = None
+        self.labelled = 0
+
+    def add(self, datagram):
+        """Учитывает одну датаграмму раунда"""
+        try:
+            fields, body = decode_round(datagram)
+        except ValueError:
+            self.invalid += 1
+            return
+        if self.num_sets is None:
+            self.num_sets = fields['num_sets']
+            self.times = np.zeros((self.window, self.num_sets), dtype=np.float32)
+        elif fields['num_sets'] != self.num_sets:
+            self.invalid += 1
+            return
+
+        set_times = np.frombuffer(body, dtype=np.uint64)
+        i = self.position
+        self.times[i] = set_times
+        self.avg[i] = fields['avg_time_ns']
+        self.suspicious[i] = fields['suspicious_count']
+        self.max_zscore[i] = fields['max_zscore']
+        self.position = (i + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+
+        if self.last_round is not None and fields['round'] > self.last_round + 1:
+            self.gaps += fields['round'] - self.last_round - 1
+        self.last_round = fields['round']
+        self.attacker_dropped = fields['dropped']
+        self.received += 1
+
+        if self.events_path is not None:
+            self.pending_bounds.append((fields['start_ns'], fields['end_ns']))
+            self.pending_times.append(set_times.copy())
+            if len(self.pending_bounds) > MAX_PENDING_ROUNDS:
+                del self.pending_bounds[0], self.pending_times[0]
+                self.pending_dropped += 1
+
+    def rate(self):
+        """Раундов в секунду с прошлого вызова"""
+        now = time.monotonic()
+        mark_time, mark_count = self._rate_mark
+        self._rate_mark = (now, self.received)
+        return (self.received - mark_count) / (now - mark_time) if now > mark_time else 0.0
+
+    def heat(self):
+        """Доля раундов окна, в которых набор выше медианы на z робастных сигм"""
+        window = self.times[:self.filled]
+        median = np.median(window, axis=0)
+        noise = 1.4826 * np.median(np.abs(window - median), axis=0)
+        noise = np.maximum(noise, 1.0)
+        return ((window - median) / noise > self.z_threshold).mean(axis=0)
+
+    def update_leakage(self):
+        """Метит ожидающие раунды по событиям victim и добавляет их в сумматор утечки"""
+        if not self.pending_bounds or not Path(self.events_path).exists():
+            return
+        from analysis.alignment import align_rounds, load_victim_events
+        from analysis.leakage import accumulator_from_sample
+
+        events = load_victim_events(self.events_path)
+        if events is None or not len(events):
+            return
+        # Раунд метится, когда victim записал события не раньше его конца
+        last_event_ns = int(events[:, 0].max())
+        bounds = np.asarray(self.pending_bounds, dtype=np.int64)
+        ready = int(np.searchsorted(bounds[:, 1], last_event_ns, side='right'))
+        if self.leakage is None and ready < LEAKAGE_WARMUP_ROUNDS:
+            return
+        if not ready:
+            return
+
+        matrix = np.vstack(self.pending_times[:ready])
+        labels = align_rounds(bounds[:ready], events)
+        del self.pending_bounds[:ready], self.pending_times[:ready]
+
+        if self.leakage is None:
+            self.leakage = accumulator_from_sample(matrix)
+        self.leakage.update(matrix, labels['secret'].to_numpy())
+        self.labelled += ready
+
+    def render(self, rate):
+        """Текст экрана"""
+        lines = [f"Live-анализ: {time.strftime('%H:%M:%S')}, "
+                 f"работает {time.monotonic() - self.started:.0f} с"]
+        lines.append(f"Принято раундов: {self.received} ({rate:.1f}/с), "
+                     f"отброшено attacker: {self.attacker_dropped}, "
+                     f"пропусков номеров: {self.gaps}, некорректных датаграмм: {self.invalid}")
+        if not self.filled:
+            lines.append("Ожидание раундов...")
+            return "\n".join(lines)
+
+        avg = self.avg[:self.filled]
+        lines.append(f"\nОкно {self.filled} раундов:")
+        lines.append(f"  Среднее время: {avg.mean():.2f} ± {avg.std():.2f} нс "
+                     f"(медиана {np.median(avg):.2f} нс)")
+        lines.append(f"  Подозрительных наборов на раунд: {self.suspicious[:self.filled].mean():.2f}, "
+                     f"медиана max z-score: {np.median(self.max_zscore[:self.filled]):.2f}")
+
+        heat = self.heat()
+        top = heat.max()
+        lines.append(f"\nТепловая карта наборов (доля раундов с z > {self.z_threshold:g}, "
+                     f"максимум {top:.2f}):")
+        levels = np.zeros(len(heat), dtype=np.int64) if top <= 0 else \
+            np.minimum((heat / top * (len(HEATMAP_SHADES) - 1)).round().astype(np.int64),
+                       len(HEATMAP_SHADES) - 1)
+        for row in range(0, len(heat), HEATMAP_COLUMNS):
+            shades = "".join(HEATMAP_SHADES[level] for level in levels[row:row + HEATMAP_COLUMNS])
+            lines.append(f"  {row:4d} |{shades}|")
+        hottest = np.argsort(heat)[::-1][:5]
+        lines.append("  Самые активные: " + ", ".join(f"set {s} ({heat[s]:.2f})" for s in hottest))
+
+        if self.events_path is not None:
+            lines.append("")
+            lines.extend(self.render_leakage())
+        return "\n".join(lines)
+
+    def render_leakage(self):
+        from analysis.leakage import TVLA_THRESHOLD
+
+        if self.leakage is None:
+            return [f"Утечка: ожидание меток victim ({len(self.pending_bounds)} раундов в очереди)"]
+        scores = self.leakage.scores()
+        lines = [f"Утечка (TVLA, |t| > {TVLA_THRESHOLD}): размечено {self.labelled} раундов, "
+                 f"наборов с утечкой: {int(scores['leaky'].sum())} из {len(scores)}, "
+                 f"в очереди {len(self.pending_bounds)}"
+                 + (f", отброшено без меток {self.pending_dropped}" if self.pending_dropped else "")]
+        for row in scores.nlargest(5, 'max_class_t').itertuples():
+            lines.append(f"  set {row.set:4d}: max |t| = {row.max_class_t:.2f} (секрет {row.max_class}), "
+                         f"MI = {row.mutual_information_bits:.4f} бит")
+        return lines
+
+
+class RoundProtocol(asyncio.DatagramProtocol):
+    """Передаёт принятые датаграммы в LiveState"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def datagram_received(self, data, addr):
+        self.state.add(data)
+
+
+def open_socket(path):
+    """Создаёт и привязывает UNIX-сокет приёма (старый файл сокета удаляется)"""
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+    sock.bind(path)
+    # attacker в контейнере может работать от другого пользователя
+    os.chmod(path, 0o666)
+    sock.setblocking(False)
+    return sock
+
+
+async def monitor(args):
+    loop = asyncio.get_running_loop()
+    state = LiveState(args.window, args.z, args.events)
+    sock = open_socket(args.socket)
+    transport, _ = await loop.create_datagram_endpoint(lambda: RoundProtocol(state), sock=sock)
+    interactive = sys.stdout.isatty()
+    print(f"Приём раундов: {args.socket}")
+    try:
+        while args.duration is None or time.monotonic() - state.started < args.duration:
+            await asyncio.sleep(args.refresh)
+            if args.events is not None:
+                state.update_leakage()
+            screen = state.render(state.rate())
+            # В терминале экран перерисовывается на месте, иначе - блоки подряд
+            print(("\x1b[H\x1b[2J" if interactive else "\n") + screen, flush=True)
+    finally:
+        transport.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return state
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Live-анализ раундов attacker")
+    parser.add_argument('--socket', default=SOCKET_PATH, help="UNIX-сокет приёма раундов")
+    parser.add_argument('--events', default=EVENTS_FILE,
+                        help="события victim для индикаторов утечки ('' - не использовать)")
+    parser.add_argument('--window', type=int, default=WINDOW_ROUNDS, help="раундов в скользящем окне")
+    parser.add_argument('--refresh', type=float, default=REFRESH_INTERVAL, help="секунд между обновлениями")
+    parser.add_argument('--z', type=float, default=Z_THRESHOLD, help="порог z-score тепловой карты")
+    parser.add_argument('--duration', type=float, default=None, help="остановиться через N секунд")
+    args = parser.parse_args(argv)
+    args.events = args.events or None
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(monitor(args))
+    except KeyboardInterrupt:
+        print("\nОстановлено")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Каталог прогонов: регистрация, запросы и сводки (analysis.catalog)
+
+Индекс - SQLite (catalog/catalog.sqlite), столбцы CSV измерений каждого
+прогона - в catalog/runs/<run_id>/*.npy; исходные logs/ после регистрации
+можно перезаписывать следующим запуском.
+
+Использование:
+    python run_catalog.py register logs --label baseline -p attacker.NUM_SETS=512
+    python run_catalog.py register sweeps/study1          # все успешные запуски серии
+    python run_catalog.py list --where NUM_SETS=512 placement=same-core --sort=-leakage_max_t
+    python run_catalog.py aggregate --by placement attacker.PROBE_MODE --metric leaky_sets
+    python run_catalog.py show same-core-1a2b
+    python run_catalog.py remove same-core-1a2b
+    python analyze_results.py --compare same-core-1a2b cross-core-3c4d
+
+Фильтры --where - ИМЯ<оп>ЗНАЧЕНИЕ (оп: =, !=, <, <=, >, >=): столбец каталога
+(placement, rounds, leaky_sets, leakage_max_t, host, ...) или параметр
+(NUM_SETS - в любой программе, victim.STRIDE - только в victim).
+Параметры, не заданные явно, имеют значения по умолчанию из исходников.
+"""
+
+import argparse
+import sys
+
+from analysis.catalog import DEFAULT_PATH, LIST_COLUMNS, RUN_COLUMNS, Catalog, find_runs, parse_assignment
+
+
+def print_table(table):
+    if not len(table):
+        print("Нет прогонов, удовлетворяющих условиям")
+        return
+    print(table.to_string(index=False, float_format=lambda value: f"{value:.3f}", na_rep='-'))
+
+
+def command_register(catalog, args):
+    status = 0
+    for path in args.paths:
+        runs = find_runs(path)
+        if not runs:
+            print(f"{path}: нет прогонов (attacker_measurements.csv или runs/*/run.json)")
+            status = 1
+        for directory in runs:
+            try:
+                row = catalog.register(directory, run_id=args.run_id if len(runs) == 1 else None,
+                                       label=args.label, placement=args.placement, params=args.param,
+                                       leakage=not args.no_leakage, workers=args.workers)
+            except (OSError, ValueError) as e:
+                print(f"{directory}: ошибка регистрации: {e}")
+                status = 1
+                continue
+            leakage = (f", наборов с утечкой: {row['leaky_sets']} (max |t| = {row['leakage_max_t']:.2f})"
+                       if row.get('leaky_sets') is not None else "")
+            print(f"[{row['run_id']}] зарегистрирован: {row['rounds']} раундов{leakage}")
+    return status
+
+
+def command_list(catalog, args):
+    print_table(catalog.query(args.where, args.sort, args.limit, args.columns))
+    return 0
+
+
+def command_aggregate(catalog, args):
+    print(f"Метрика: {args.metric}; avg_time - время доступа, объединённое по раундам группы")
+    print_table(catalog.aggregate(args.by, args.metric, args.where))
+    return 0
+
+
+def command_show(catalog, args):
+    for run_id in catalog.resolve(args.runs):
+        run = catalog.runs([run_id]).iloc[0]
+        print(f"Прогон {run_id}")
+        for name in RUN_COLUMNS:
+            if name not in ('run_id', 'stats') and run[name] is not None and run[name] == run[name]:
+                print(f"  {name:>16}: {run[name]}")
+        params = catalog.params([run_id], explicit_only=not args.all_params)
+        print(f"  Параметры ({'все' if args.all_params else 'заданные явно'}):")
+        for row in params.itertuples():
+            print(f"    {row.target}.{row.name} = {row.value}")
+        scores = catalog.set_scores([run_id]).dropna(subset=['max_class_t'])
+        if len(scores):
+            print(f"  Наиболее информативные наборы:")
+            for row in scores.nlargest(args.top, 'max_class_t').itertuples():
+                print(f"    set {row.set:4d}: max |t| = {row.max_class_t:.2f}, "
+                      f"fixed-vs-random t = {row.fixed_vs_random_t:.2f}, MI = {row.mi_bits:.4f} бит")
+    return 0
+
+
+def command_remove(catalog, args):
+    for run_id in catalog.resolve(args.runs):
+        catalog.remove(run_id)
+        print(f"[{run_id}] удалён из каталога")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', default=DEFAULT_PATH, help=f"файл каталога (по умолчанию {DEFAULT_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    register = commands.add_parser('register', help="зарегистрировать прогоны")
+    register.add_argument('paths', nargs='+',
+                          help="каталог логов, каталог запуска sweep.py или набор данных sweep.py")
+    register.add_argument('--run-id', help="идентификатор (по умолчанию - из run.json или хеша данных)")
+    register.add_argument('--label', help="произвольная метка прогона")
+    register.add_argument('--placement', help="размещение victim/attacker, если его нет в run.json")
+    register.add_argument('-p', '--param', type=parse_assignment, action='append', default=[],
+                          help="параметр, с которым выполнен прогон: attacker.ИМЯ=значение")
+    register.add_argument('--no-leakage', action='store_true', help="без оценки утечки по наборам")
+    register.add_argument('--workers', type=int, default=1, help="процессов для оценки утечки")
+    register.set_defaults(handler=command_register)
+
+    listing = commands.add_parser('list', help="прогоны по фильтрам")
+    listing.add_argument('--where', nargs='+', default=[], metavar='FILTER', help="фильтры ИМЯ<оп>ЗНАЧЕНИЕ")
+    listing.add_argument('--sort', action='append', metavar='KEY',
+                         help="ключ сортировки, повторяется; по убыванию - --sort=-ключ")
+    listing.add_argument('--limit', type=int, help="не более N прогонов")
+    listing.add_argument('--columns', nargs='+', default=list(LIST_COLUMNS), choices=list(RUN_COLUMNS),
+                         metavar='COLUMN', help="выводимые столбцы")
+    listing.set_defaults(handler=command_list)
+
+    aggregate = commands.add_parser('aggregate', help="сводка по группам прогонов")
+    aggregate.add_argument('--by', nargs='*', default=[], metavar='KEY', help="столбцы и параметры группировки")
+    aggregate.add_argument('--metric', default='leakage_max_t', help="числовой столбец каталога")
+    aggregate.add_argument('--where', nargs='+', default=[], metavar='FILTER', help="фильтры ИМЯ<оп>ЗНАЧЕНИЕ")
+    aggregate.set_defaults(handler=command_aggregate)
+
+    show = commands.add_parser('show', help="подробности прогонов")
+    show.add_argument('runs', nargs='+', help="run_id или однозначный префикс")
+    show.add_argument('--all-params', action='store_true', help="включая значения по умолчанию")
+    show.add_argument('--top', type=int, default=5, help="наборов с наибольшим |t|")
+    show.set_defaults(handler=command_show)
+
+    remove = commands.add_parser('remove', help="удалить прогоны из каталога")
+    remove.add_argument('runs', nargs='+', help="run_id или однозначный префикс")
+    remove.set_defaults(handler=command_remove)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Главная функция"""
+    args = parse_args(argv)
+    with Catalog(args.catalog) as catalog:
+        try:
+            status = args.handler(catalog, args)
+        except ValueError as e:
+            print(f"Ошибка: {e}")
+            status = 2
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
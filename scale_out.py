@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+N пар victim/attacker одновременно в docker-compose и сбор их результатов
+
+compose - генерирует docker-compose.yml с N парами (сервисы victim-00,
+  attacker-00, ...). Каждая пара пишет в свой каталог <output>/runs/<run_id>/
+  (volume /logs), поэтому одноимённые файлы victim/attacker разных пар
+  не пересекаются. Пары размещаются по физическим ядрам так же, как
+  в sweep.py (sidechannel.affinity: same-core, sibling, cross-core,
+  cross-socket), cpuset контейнеров - логические CPU выделенных ядер;
+  несколько размещений чередуются по парам. Без --oversubscribe пар не
+  больше, чем помещается на непересекающихся ядрах; с ним ядра раздаются
+  по кругу повторно и пары делят ядра - так моделируется конкуренция на хосте.
+  Описание пар и хоста - <output>/scale.json.
+
+collect - после завершения `docker compose up` сводит результаты всех пар
+  в набор данных формата sweep.py: run.json каждой пары, index.csv (пара -
+  строка с размещением, CPU, пропускной способностью attacker и victim
+  и сводкой измерений), rounds.csv (все раунды со столбцом run_id -
+  <размещение>-n<пар>-<номер>-<серия>). С --catalog пары регистрируются
+  в каталоге прогонов (параметры harness.PAIRS, harness.INSTANCE, harness.SHARING).
+
+Использование:
+    python scale_out.py compose --pairs 8 --placements same-core cross-core -p attacker.TOTAL_ROUNDS=1200
+    docker compose -f scale/latest/docker-compose.yml up --build
+    python scale_out.py collect --catalog
+    python run_catalog.py aggregate --by PAIRS placement --metric rounds_per_s
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from sidechannel.affinity import PLACEMENTS, CoreAllocator, assign_cpus, check_placement, cpu_topology, host_info
+from sidechannel.config import ENV_PREFIX
+from sidechannel.measurements import committed_length
+from sidechannel.workload import summarize_rate
+from sweep import (
+    MEASUREMENTS_NAME, PROGRAMS, RATE_NAME, REPO_ROOT, Run, parse_param, register_runs,
+    summarize, write_index, write_rounds,
+)
+
+OUTPUT_DIR = Path("scale") / "latest"
+MANIFEST_NAME = "scale.json"
+COMPOSE_NAME = "docker-compose.yml"
+IMAGES = {target: f"sidechannel-{target}" for target in ('victim', 'attacker', 'defender')}
+NETWORK = "sidechannel_net"
+# Ограничения ресурсов и логирование контейнеров - как в docker-compose.yml
+RESOURCES = {'limits': {'cpus': '1.0', 'memory': '512M'},
+             'reservations': {'cpus': '0.5', 'memory': '256M'}}
+LOGGING = {'driver': 'json-file', 'options': {'max-size': '10m', 'max-file': '3'}}
+
+
+def parse_cpus(text):
+    """'0-7,16-23' -> {0, ..., 7, 16, ..., 23}"""
+    cpus = set()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        try:
+            cpus.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"ожидался список CPU вида 0-7,16-23: {text}") from None
+    return cpus
+
+
+def _scalar(value):
+    if isinstance(value, (bool, int, float)):
+        return json.dumps(value)
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def to_yaml(value, indent=0):
+    """
+    Строки YAML для словарей, списков скаляров и скаляров
+
+    Строки записываются в двойных кавычках (JSON), поэтому значения
+    вроде "no" или "0" не меняют тип при разборе docker compose
+    """
+    pad = "  " * indent
+    lines = []
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                lines.append(f"{pad}{key}:")
+                lines.extend(to_yaml(item, indent + 1))
+            else:
+                lines.append(f"{pad}{key}: {'{}' if isinstance(item, dict) else _scalar(item)}")
+    else:
+        for item in value:
+            lines.append(f"{pad}- {_scalar(item)}")
+    return lines
+
+
+def allocate(pairs, placements, topology, oversubscribe):
+    """
+    Размещения и CPU пар: список (placement, victim_cpus, attacker_cpus)
+
+    Ядра выдаются CoreAllocator как в sweep.py; когда свободных не осталось,
+    при oversubscribe раздача начинается заново с первого ядра
+    """
+    for placement in placements:
+        reason = check_placement(placement, topology)
+        if reason:
+            raise ValueError(f"размещение {placement} невозможно: {reason}")
+
+    allocator = CoreAllocator(topology)
+    result = []
+    for index in range(pairs):
+        placement = placements[index % len(placements)]
+        cores = allocator.acquire(placement)
+        if cores is None:
+            if not oversubscribe:
+                raise ValueError(f"пар без общих ядер помещается на {len(topology)} физических ядрах: "
+                                 f"{index}; больше пар - с --oversubscribe")
+            allocator = CoreAllocator(topology)
+            cores = allocator.acquire(placement)
+        victim_cpus, attacker_cpus = assign_cpus(placement, cores)
+        result.append((placement, sorted(victim_cpus), sorted(attacker_cpus)))
+    return result
+
+
+def sharing(allocation):
+    """Для каждой пары - число пар (включая её), CPU которых пересекаются с её CPU"""
+    cpus = [set(victim) | set(attacker) for _, victim, attacker in allocation]
+    return [sum(1 for other in cpus if mine & other) for mine in cpus]
+
+
+def service(target, image, context, volume, cpus, environment, depends_on=()):
+    spec = {
+        'build': {'context': context, 'dockerfile': f"{target}/Dockerfile"},
+        'image': image,
+        'volumes': [volume],
+        'deploy': {'resources': RESOURCES},
+        'cpuset': ",".join(map(str, cpus)),
+        'environment': environment,
+        'networks': [NETWORK],
+        'restart': "no",
+        'logging': LOGGING,
+    }
+    if depends_on:
+        spec['depends_on'] = list(depends_on)
+    return spec
+
+
+def build_compose(instances, output_dir, defender=False):
+    """Словарь docker-compose для пар instances (описания из scale.json)"""
+    context = os.path.relpath(REPO_ROOT, output_dir)
+    services = {}
+    for number, instance in enumerate(instances):
+        suffix = f"{number:02d}"
+        volume = f"./runs/{instance['run_id']}:/logs"
+        env = {target: {ENV_PREFIX + name: str(value)
+                        for name, value in instance['config'][target].items()}
+               for target in PROGRAMS}
+        victim = f"victim-{suffix}"
+        services[victim] = service('victim', IMAGES['victim'], context, volume,
+                                   instance['cpus']['victim'], env['victim'])
+        services[f"attacker-{suffix}"] = service('attacker', IMAGES['attacker'], context, volume,
+                                                 instance['cpus']['attacker'], env['attacker'],
+                                                 depends_on=[victim])
+        if defender:
+            spec = service('defender', IMAGES['defender'], context, volume,
+                           instance['cpus']['victim'], {}, depends_on=[victim])
+            spec['pid'] = f"service:{victim}"
+            services[f"defender-{suffix}"] = spec
+    return {'services': services, 'networks': {NETWORK: {'driver': 'bridge'}}}
+
+
+def command_compose(args):
+    params = {target: {} for target in PROGRAMS}
+    for target, name, values in args.param:
+        if len(values) != 1:
+            print(f"Ошибка: {target}.{name}: у всех пар одно значение параметра (сетка - sweep.py)")
+            return 2
+        params[target][name] = values[0]
+
+    topology = cpu_topology(args.cpus)
+    try:
+        allocation = allocate(args.pairs, args.placements, topology, args.oversubscribe)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 2
+
+    created = time.strftime('%Y-%m-%dT%H:%M:%S')
+    series = hashlib.sha1(json.dumps([created, params, allocation]).encode('utf-8')).hexdigest()[:6]
+    shared = sharing(allocation)
+    instances = []
+    for number, (placement, victim_cpus, attacker_cpus) in enumerate(allocation):
+        config = dict(params, placement=placement, repeat=0, pairs=args.pairs,
+                      instance=number, sharing=shared[number])
+        run_id = f"{placement}-n{args.pairs}-{number:02d}-{series}"
+        instances.append({'run_id': run_id, 'config': config,
+                          'cpus': {'victim': victim_cpus, 'attacker': attacker_cpus}})
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    for instance in instances:
+        # Каталоги создаются заранее: иначе Docker создаст их от root
+        (args.output / "runs" / instance['run_id']).mkdir(parents=True, exist_ok=True)
+    compose_path = args.output / COMPOSE_NAME
+    compose = build_compose(instances, args.output, args.defender)
+    header = [f"# Сгенерировано scale_out.py {created}: {args.pairs} пар, "
+              f"размещения {', '.join(args.placements)}"]
+    compose_path.write_text("\n".join(header + to_yaml(compose)) + "\n", encoding='utf-8')
+
+    manifest = {'created': created, 'series': series, 'pairs': args.pairs,
+                'placements': args.placements, 'oversubscribe': args.oversubscribe,
+                'host': host_info(), 'compose_file': COMPOSE_NAME, 'instances': instances}
+    (args.output / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, ensure_ascii=False),
+                                            encoding='utf-8')
+
+    print(f"Пар: {args.pairs} на {len(topology)} физических ядрах, серия {series}")
+    for instance, count in zip(instances, shared):
+        cpus = instance['cpus']
+        note = f" (CPU общие с {count - 1} парами)" if count > 1 else ""
+        print(f"  [{instance['run_id']}] victim CPU {cpus['victim']}, attacker CPU {cpus['attacker']}{note}")
+    print(f"docker-compose: {compose_path}")
+    print(f"Запуск: docker compose -f {compose_path} up --build")
+    print(f"Сбор результатов: python scale_out.py collect --output {args.output}")
+    return 0
+
+
+def collect(output_dir):
+    """Run для каждой пары из scale.json с результатом по файлам её каталога"""
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    runs = []
+    for instance in manifest['instances']:
+        run = Run(instance['run_id'], instance['config'], output_dir)
+        run.cpus = {target: set(cpus) for target, cpus in instance['cpus'].items()}
+        measurements = run.path / MEASUREMENTS_NAME
+        if not measurements.exists():
+            run.result = {'status': 'failed', 'reason': "нет файла измерений attacker"}
+        else:
+            _, complete = committed_length(measurements)
+            run.result = {'status': 'ok' if complete else 'incomplete',
+                          'reason': '' if complete else "attacker не завершился штатно"}
+            run.result.update(summarize(measurements))
+            run.result.update(summarize_rate(run.path / RATE_NAME))
+        run.save()
+        runs.append(run)
+    return manifest, runs
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def print_scaling(manifest, runs):
+    """Пропускная способность и сигнал по размещениям: сумма и среднее на пару"""
+    def cell(value, width, digits=1):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    print(f"\nПар: {manifest['pairs']}, серия {manifest['series']}")
+    print(f"  {'размещение':>12} {'пар':>4} {'ok':>4} {'раундов/с':>10} {'на пару':>8} "
+          f"{'victim оп/с':>12} {'avg, нс':>8} {'std, нс':>8} {'подозр.':>8}")
+    groups = {}
+    for run in runs:
+        groups.setdefault(run.config['placement'], []).append(run)
+    if len(groups) > 1:
+        groups['все'] = runs
+    for placement, group in groups.items():
+        ok = [run.result for run in group if run.result['status'] == 'ok']
+        rates = [result.get('rounds_per_s') for result in ok]
+        total = sum(rate for rate in rates if rate is not None) if ok else None
+        print(f"  {placement:>12} {len(group):>4} {len(ok):>4} {cell(total, 10)} {cell(_mean(rates), 8)} "
+              f"{cell(_mean([result.get('victim_rate') for result in ok]), 12)} "
+              f"{cell(_mean([result.get('avg_time_mean') for result in ok]), 8, 2)} "
+              f"{cell(_mean([result.get('avg_time_stdev') for result in ok]), 8, 2)} "
+              f"{cell(_mean([result.get('suspicious_mean') for result in ok]), 8, 2)}")
+
+
+def command_collect(args):
+    if not (args.output / MANIFEST_NAME).exists():
+        print(f"Ошибка: {args.output / MANIFEST_NAME} не найден (сначала scale_out.py compose)")
+        return 2
+    manifest, runs = collect(args.output)
+    for run in runs:
+        if run.result['status'] != 'ok':
+            print(f"[{run.run_id}] {run.result['status']}: {run.result['reason']}")
+    index_path = write_index(runs, args.output)
+    rounds_path = write_rounds(runs, args.output)
+    print_scaling(manifest, runs)
+    print(f"\nИндекс пар: {index_path}")
+    print(f"Раунды всех пар: {rounds_path}")
+    if args.catalog is not None:
+        register_runs(runs, args.catalog)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compose = commands.add_parser('compose', help="сгенерировать docker-compose с N парами")
+    compose.add_argument('--pairs', type=int, required=True, help="число пар victim/attacker")
+    compose.add_argument('--placements', nargs='+', choices=PLACEMENTS, default=['same-core'],
+                         help="размещения (чередуются по парам)")
+    compose.add_argument('--cpus', type=parse_cpus, default=None,
+                         help="логические CPU для пар, например 0-7,16-23 (по умолчанию - все доступные)")
+    compose.add_argument('--oversubscribe', action='store_true',
+                         help="раздавать ядра повторно, если пар больше, чем свободных ядер")
+    compose.add_argument('-p', '--param', type=parse_param, action='append', default=[],
+                         help="параметр всех пар: attacker.ИМЯ=значение или victim.ИМЯ=значение")
+    compose.add_argument('--defender', action='store_true', help="монитор соседства для каждой пары")
+    compose.add_argument('--output', type=Path, default=OUTPUT_DIR, help="каталог набора данных")
+    compose.set_defaults(handler=command_compose)
+
+    collect_parser = commands.add_parser('collect', help="свести результаты пар в один набор данных")
+    collect_parser.add_argument('--output', type=Path, default=OUTPUT_DIR, help="каталог набора данных")
+    collect_parser.add_argument('--catalog', nargs='?', const='', default=None,
+                                help="зарегистрировать пары в каталоге (без значения - catalog/catalog.sqlite)")
+    collect_parser.set_defaults(handler=command_collect)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Главная функция"""
+    args = parse_args(argv)
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Общие модули стенда side-channel эксперимента
+
+Пакет используется и victim, и attacker (копируется в оба контейнера),
+поэтому зависит только от стандартной библиотеки Python
+"""
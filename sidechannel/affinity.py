@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Топология CPU и размещение пары victim/attacker по ядрам
+
+Размещения (PLACEMENTS):
+  same-core  - оба процесса на одном логическом CPU (общие L1/L2, разделение времени)
+  sibling    - на двух SMT-потоках одного физического ядра (общие L1/L2, параллельно)
+  cross-core - на разных физических ядрах одного сокета (общий только LLC)
+  cross-socket - на ядрах разных сокетов (общих кешей нет, только память)
+
+Пара занимает физические ядра целиком (все их SMT-потоки), чтобы
+параллельно запущенные пары не мешали друг другу.
+"""
+
+import os
+import platform
+from pathlib import Path
+
+PLACEMENTS = ("same-core", "sibling", "cross-core", "cross-socket")
+SYSFS_CPU = Path("/sys/devices/system/cpu")
+CPUINFO = Path("/proc/cpuinfo")
+
+
+class PhysicalCore:
+    """Физическое ядро: сокет, номер ядра и доступные логические CPU"""
+
+    def __init__(self, package, core_id, cpus):
+        self.package = package
+        self.core_id = core_id
+        self.cpus = sorted(cpus)
+
+    def __repr__(self):
+        return f"PhysicalCore(package={self.package}, core={self.core_id}, cpus={self.cpus})"
+
+
+def _read_int(path, default=0):
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return default
+
+
+def cpu_topology(allowed=None):
+    """
+    Физические ядра с логическими CPU из allowed (по умолчанию - sched_getaffinity)
+
+    Если sysfs недоступен, каждый CPU считается отдельным ядром
+    """
+    allowed = sorted(os.sched_getaffinity(0) if allowed is None else allowed)
+    cores = {}
+    for cpu in allowed:
+        topology = SYSFS_CPU / f"cpu{cpu}" / "topology"
+        package = _read_int(topology / "physical_package_id")
+        core_id = _read_int(topology / "core_id", default=cpu)
+        cores.setdefault((package, core_id), []).append(cpu)
+    return [PhysicalCore(package, core_id, cpus)
+            for (package, core_id), cpus in sorted(cores.items(), key=lambda item: item[1][0])]
+
+
+def host_info():
+    """Описание машины для записи вместе с результатами прогона"""
+    cpu_model = platform.processor()
+    try:
+        for line in CPUINFO.read_text().splitlines():
+            if line.startswith("model name"):
+                cpu_model = line.partition(":")[2].strip()
+                break
+    except OSError:
+        pass
+    return {
+        'host': platform.node(),
+        'cpu_model': cpu_model,
+        'cpu_count': os.cpu_count(),
+        'physical_cores': len(cpu_topology(range(os.cpu_count() or 1))),
+        'kernel': platform.release(),
+        'python': platform.python_version(),
+    }
+
+
+def cores_needed(placement):
+    """Сколько физических ядер занимает пара при размещении placement"""
+    if placement not in PLACEMENTS:
+        raise ValueError(f"Неизвестное размещение: {placement} (допустимо: {', '.join(PLACEMENTS)})")
+    return 2 if placement in ("cross-core", "cross-socket") else 1
+
+
+def check_placement(placement, topology):
+    """Причина, по которой размещение невозможно на этой машине, или None"""
+    needed = cores_needed(placement)
+    if placement == "sibling" and not any(len(core.cpus) >= 2 for core in topology):
+        return "нет ядер с SMT (Hyper-Threading)"
+    if placement == "cross-core":
+        packages = {}
+        for core in topology:
+            packages[core.package] = packages.get(core.package, 0) + 1
+        if max(packages.values(), default=0) < needed:
+            return "нет двух физических ядер в одном сокете"
+    if placement == "cross-socket" and len({core.package for core in topology}) < 2:
+        return "нет второго сокета"
+    if len(topology) < needed:
+        return f"нужно физических ядер: {needed}, доступно: {len(topology)}"
+    return None
+
+
+def assign_cpus(placement, cores):
+    """
+    Логические CPU (victim, attacker) для размещения на выделенных ядрах cores
+
+    cores - список PhysicalCore длины cores_needed(placement)
+    """
+    if placement == "same-core":
+        cpu = cores[0].cpus[0]
+        return {cpu}, {cpu}
+    if placement == "sibling":
+        return {cores[0].cpus[0]}, {cores[0].cpus[1]}
+    return {cores[0].cpus[0]}, {cores[1].cpus[0]}
+
+
+class CoreAllocator:
+    """Выдаёт непересекающиеся наборы физических ядер параллельным запускам"""
+
+    def __init__(self, topology):
+        self.free = list(topology)
+
+    def acquire(self, placement):
+        """Ядра под размещение или None, если свободных подходящих сейчас нет"""
+        needed = cores_needed(placement)
+        candidates = [core for core in self.free
+                      if placement != "sibling" or len(core.cpus) >= 2]
+        if placement in ("cross-core", "cross-socket"):
+            by_package = {}
+            for core in candidates:
+                by_package.setdefault(core.package, []).append(core)
+            if placement == "cross-core":
+                candidates = next((group for group in by_package.values() if len(group) >= needed), [])
+            else:
+                # По первому свободному ядру двух сокетов
+                candidates = [group[0] for group in by_package.values()]
+        if len(candidates) < needed:
+            return None
+        chosen = candidates[:needed]
+        for core in chosen:
+            self.free.remove(core)
+        return chosen
+
+    def release(self, cores):
+        self.free.extend(cores)
+        self.free.sort(key=lambda core: core.cpus[0])
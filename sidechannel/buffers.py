@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Выделение и инициализация буферов памяти для victim и attacker
+
+Буферы заполняются целиком за одну операцию на уровне C (без побайтового
+цикла на Python), поэтому время запуска почти не зависит от размера массива.
+Опционально буфер выделяется через анонимный mmap с предварительным
+отображением страниц, чтобы page fault'ы при первом обращении не попадали
+в измерения первого раунда.
+"""
+
+import mmap
+import random
+
+PAGE_SIZE = mmap.PAGESIZE
+
+# Допустимые способы заполнения буфера
+FILL_ZERO = "zero"
+FILL_PATTERN = "pattern"  # i % 256 - как в исходной реализации attacker
+FILL_RANDOM = "random"    # детерминированные псевдослучайные байты
+FILL_MODES = (FILL_ZERO, FILL_PATTERN, FILL_RANDOM)
+
+_PATTERN_BLOCK = bytes(range(256))
+
+
+def pattern_bytes(size):
+    """Возвращает size байт с паттерном i % 256"""
+    repeats, tail = divmod(size, len(_PATTERN_BLOCK))
+    return _PATTERN_BLOCK * repeats + _PATTERN_BLOCK[:tail]
+
+
+def random_bytes(size, seed=None):
+    """Возвращает size псевдослучайных байт; при заданном seed - воспроизводимо"""
+    return random.Random(seed).randbytes(size)
+
+
+def fill_bytes(size, fill=FILL_PATTERN, seed=None):
+    """Формирует содержимое буфера выбранным способом"""
+    if fill == FILL_ZERO:
+        return None
+    if fill == FILL_PATTERN:
+        return pattern_bytes(size)
+    if fill == FILL_RANDOM:
+        return random_bytes(size, seed)
+    raise ValueError(f"Неизвестный способ заполнения буфера: {fill!r}")
+
+
+def prefault(buf):
+    """
+    Принудительно отображает все страницы буфера в память
+
+    Записывает по одному байту на страницу (значение не меняется),
+    чтобы ядро выделило физические страницы заранее
+    """
+    view = memoryview(buf)
+    try:
+        view[::PAGE_SIZE] = bytes(view[::PAGE_SIZE])
+    finally:
+        view.release()
+
+
+def _anonymous_mmap(size):
+    flags = mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS
+    # MAP_POPULATE есть только в Linux и Python 3.10+
+    flags |= getattr(mmap, "MAP_POPULATE", 0)
+    return mmap.mmap(-1, size, flags=flags)
+
+
+def allocate_buffer(size, fill=FILL_PATTERN, seed=None, use_mmap=False, populate=True):
+    """
+    Выделяет буфер размером size байт
+
+    Параметры:
+        fill     - способ заполнения (zero / pattern / random)
+        seed     - seed для заполнения random
+        use_mmap - выделить анонимный mmap вместо bytearray
+        populate - заранее отобразить все страницы буфера
+
+    Возвращает объект с протоколом буфера, поддерживающий индексацию
+    и срезы (bytearray или mmap.mmap)
+    """
+    if size <= 0:
+        raise ValueError(f"Размер буфера должен быть положительным: {size}")
+
+    content = fill_bytes(size, fill, seed)
+
+    if use_mmap:
+        buf = _anonymous_mmap(size)
+        if content is not None:
+            buf[:] = content
+    else:
+        buf = bytearray(content) if content is not None else bytearray(size)
+
+    # Заполнение содержимым уже затрагивает все страницы;
+    # для нулевого буфера страницы нужно отобразить явно
+    if populate and content is None:
+        prefault(buf)
+
+    return buf
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Программный симулятор многоуровневого set-associative кеша
+
+Детерминированная замена реального кеша для воспроизводимых экспериментов
+без шума: attacker (PrimeProbeSidechannel с CACHE_BACKEND = "sim") и модель
+victim (SecretAccessModel) обращаются к общей иерархии CacheHierarchy
+пачками адресов и получают смоделированные задержки попаданий и промахов.
+
+Каждый уровень - CacheLevel с заданными размером, ассоциативностью,
+размером линии и политикой вытеснения (lru, plru - tree-PLRU, random).
+Иерархия неинклюзивная: следующий уровень видит только промахи
+предыдущего, промах заполняет линию на всех уровнях, которые её не
+содержали; обратной инвалидации и записи нет.
+
+Пачка обрабатывается векторно: обращения к разным наборам независимы,
+поэтому пачка разбивается на волны - k-е обращение к каждому набору
+обрабатывается за один проход numpy по всем наборам. Порядок обращений
+внутри набора сохраняется, результат совпадает с последовательной
+обработкой.
+
+Модуль требует numpy (в отличие от остального пакета sidechannel), поэтому
+attacker импортирует его только при CACHE_BACKEND = "sim".
+"""
+
+import numpy as np
+
+POLICIES = ("lru", "plru", "random")
+LINE_SIZE = 64
+MEMORY_LATENCY_NS = 80  # Задержка обращения, промахнувшегося на всех уровнях
+# Уровни по умолчанию: имя:размер:ассоциативность:задержка_нс
+DEFAULT_HIERARCHY = "L1:32K:8:1,L2:256K:4:4,LLC:8M:16:12"
+
+# Базовые адреса буферов моделей (выровнены по большой степени двойки,
+# чтобы смещение внутри буфера однозначно задавало набор)
+ATTACKER_BASE = 0x1000_0000
+VICTIM_BASE = 0x4000_0000
+
+_INVALID = -1
+_any = np.logical_or.reduce
+SCALAR_WAVE = 4  # Волны не шире этого обрабатываются поэлементно
+_SIZE_SUFFIXES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def parse_size(text):
+    """Размер в байтах из строки вида 32K, 8M или 4096"""
+    text = text.strip().upper()
+    if text and text[-1] in _SIZE_SUFFIXES:
+        return int(text[:-1]) * _SIZE_SUFFIXES[text[-1]]
+    return int(text)
+
+
+def _stable_order(keys):
+    """Устойчивая сортировка; 16-битные ключи numpy сортирует поразрядно"""
+    if len(keys) and keys.max() < 1 << 16:
+        keys = keys.astype(np.uint16)
+    return np.argsort(keys, kind='stable')
+
+
+def _waves(sets):
+    """
+    Разбивает пачку на волны с попарно различными наборами
+
+    Возвращает (order, sizes): индексы обращений, упорядоченные по номеру
+    обращения внутри своего набора, и размеры волн. В каждой волне наборы
+    уникальны, порядок обращений внутри набора сохраняется.
+    """
+    n = len(sets)
+    order = _stable_order(sets)
+    ordered = sets[order]
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    np.not_equal(ordered[1:], ordered[:-1], out=boundary[1:])
+    starts = np.flatnonzero(boundary)
+    rank = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n)))
+    return order[_stable_order(rank)], np.bincount(rank)
+
+
+class CacheLevel:
+    """Один уровень set-associative кеша"""
+
+    def __init__(self, name, size, ways, line_size=LINE_SIZE, policy="lru",
+                 latency_ns=1, seed=0):
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика вытеснения: {policy!r}")
+        if size % (ways * line_size):
+            raise ValueError(f"{name}: размер {size} не кратен ways * line_size")
+        if policy == "plru" and ways & (ways - 1):
+            raise ValueError(f"{name}: tree-PLRU требует ассоциативность - степень двойки")
+
+        self.name = name
+        self.size = size
+        self.ways = ways
+        self.line_size = line_size
+        self.policy = policy
+        self.latency_ns = latency_ns
+        self.num_sets = size // (ways * line_size)
+        self.seed = seed
+        self.hits = 0
+        self.misses = 0
+        self.flush()
+
+    def flush(self):
+        """Очищает уровень (все линии недействительны, состояние политики сброшено)"""
+        self.tags = np.full((self.num_sets, self.ways), _INVALID, dtype=np.int64)
+        self._clock = 0
+        if self.policy == "lru":
+            # Отметка последнего обращения; недействительные линии - самые старые
+            self.stamps = np.full((self.num_sets, self.ways), -1, dtype=np.int64)
+        elif self.policy == "plru":
+            # Биты дерева: 0 - вытеснять слева, 1 - справа
+            self.tree = np.zeros((self.num_sets, max(1, self.ways - 1)), dtype=np.int8)
+            self._depth = self.ways.bit_length() - 1
+        else:
+            self.rng = np.random.default_rng(self.seed)
+
+    def access(self, lines):
+        """
+        Обращения к номерам линий (адрес // line_size) в порядке пачки
+
+        Промах загружает линию, вытесняя жертву по политике. Возвращает
+        массив bool: True - попадание.
+        """
+        lines = np.asarray(lines, dtype=np.int64)
+        hits = np.zeros(len(lines), dtype=bool)
+        if not len(lines):
+            return hits
+        order, sizes = _waves(lines % self.num_sets)
+        lines = lines[order]
+        sets = lines % self.num_sets
+        tags = lines // self.num_sets
+
+        # Волны - непрерывные срезы упорядоченной пачки
+        ordered_hits = np.empty(len(lines), dtype=bool)
+        sizes = sizes.tolist()
+        if min(sizes) <= SCALAR_WAVE:
+            set_list, tag_list = sets.tolist(), tags.tolist()
+        position = 0
+        for wave, size in enumerate(sizes):
+            end = position + size
+            if size <= SCALAR_WAVE:
+                # Узкие волны (обращения в основном к одним наборам) дешевле без numpy
+                for i in range(position, end):
+                    ordered_hits[i] = self._access_one(set_list[i], tag_list[i], self._clock + wave)
+            else:
+                ordered_hits[position:end] = self._access_wave(sets[position:end], tags[position:end],
+                                                               self._clock + wave)
+            position = end
+        hits[order] = ordered_hits
+
+        self._clock += len(sizes)
+        hit_count = int(np.count_nonzero(hits))
+        self.hits += hit_count
+        self.misses += len(lines) - hit_count
+        return hits
+
+    def _access_wave(self, sets, tags, stamp):
+        """Обращения к попарно различным наборам; stamp - номер волны для LRU"""
+        rows = self.tags[sets]
+        match = rows == tags[:, None]
+        hit = _any(match, axis=1)
+        if self.policy == "lru":
+            # Недействительные линии имеют отметку -1 и вытесняются первыми
+            fill = self.stamps[sets].argmin(axis=1)
+        else:
+            invalid = rows == _INVALID
+            fill = np.where(_any(invalid, axis=1), invalid.argmax(axis=1), self._victim(sets))
+        way = np.where(hit, match.argmax(axis=1), fill)
+        # При попадании записывается тот же тег
+        self.tags[sets, way] = tags
+        self._touch(sets, way, stamp)
+        return hit
+
+    def _access_one(self, set_idx, tag, stamp):
+        """Одно обращение: та же логика, что в _access_wave, на скалярах"""
+        row = self.tags[set_idx]
+        ways = row.tolist()
+        hit = tag in ways
+        if self.policy == "lru":
+            stamps = self.stamps[set_idx]
+            if hit:
+                way = ways.index(tag)
+            else:
+                ages = stamps.tolist()
+                way = ages.index(min(ages))
+            stamps[way] = stamp
+        elif hit:
+            way = ways.index(tag)
+        elif _INVALID in ways:
+            way = ways.index(_INVALID)
+        elif self.policy == "random":
+            way = int(self.rng.integers(0, self.ways))
+        else:
+            tree = self.tree[set_idx]
+            node = 0
+            for _ in range(self._depth):
+                node = 2 * node + 1 + int(tree[node])
+            way = node - (self.ways - 1)
+        if not hit:
+            row[way] = tag
+
+        if self.policy == "plru":
+            tree = self.tree[set_idx]
+            node = 0
+            for level in range(self._depth - 1, -1, -1):
+                bit = (way >> level) & 1
+                tree[node] = 1 - bit
+                node = 2 * node + 1 + bit
+        return hit
+
+    def _victim(self, sets):
+        """Линия для вытеснения в каждом из наборов (plru, random)"""
+        if self.policy == "plru":
+            node = np.zeros(len(sets), dtype=np.int64)
+            for _ in range(self._depth):
+                node = 2 * node + 1 + self.tree[sets, node]
+            return node - (self.ways - 1)
+        return self.rng.integers(0, self.ways, size=len(sets))
+
+    def _touch(self, sets, way, stamp):
+        """Обновляет состояние политики после обращения к линиям way"""
+        if self.policy == "lru":
+            # Номер волны растёт от обращения к обращению внутри набора
+            self.stamps[sets, way] = stamp
+        elif self.policy == "plru":
+            # Биты на пути к линии указывают в противоположную сторону
+            node = np.zeros(len(sets), dtype=np.int64)
+            for level in range(self._depth - 1, -1, -1):
+                bit = (way >> level) & 1
+                self.tree[sets, node] = 1 - bit
+                node = 2 * node + 1 + bit
+
+    def __repr__(self):
+        return (f"CacheLevel({self.name}, {self.size // 1024} KiB, {self.ways}-way, "
+                f"{self.num_sets} sets, {self.policy}, {self.latency_ns} ns)")
+
+
+class CacheHierarchy:
+    """Неинклюзивная иерархия уровней кеша с задержками попаданий"""
+
+    def __init__(self, levels, memory_latency_ns=MEMORY_LATENCY_NS):
+        if not levels:
+            raise ValueError("Иерархия кеша без уровней")
+        line_sizes = {level.line_size for level in levels}
+        if len(line_sizes) != 1:
+            raise ValueError("Уровни иерархии должны иметь одинаковый размер линии")
+        self.levels = list(levels)
+        self.line_size = line_sizes.pop()
+        self.memory_latency_ns = memory_latency_ns
+        self.accesses = 0
+
+    def access(self, addresses, hit_levels=False):
+        """
+        Обращения к байтовым адресам в порядке пачки
+
+        Возвращает задержки (uint32, нс); при hit_levels=True - ещё и номер
+        уровня, обслужившего обращение (len(levels) - память)
+        """
+        lines = np.asarray(addresses, dtype=np.int64) // self.line_size
+        latency = np.full(len(lines), self.memory_latency_ns, dtype=np.uint32)
+        served = np.full(len(lines), len(self.levels), dtype=np.int8)
+        pending = np.arange(len(lines))
+        for number, level in enumerate(self.levels):
+            if not len(pending):
+                break
+            hits = level.access(lines[pending])
+            latency[pending[hits]] = level.latency_ns
+            served[pending[hits]] = number
+            pending = pending[~hits]
+
+        self.accesses += len(lines)
+        return (latency, served) if hit_levels else latency
+
+    def flush(self):
+        for level in self.levels:
+            level.flush()
+
+    def stats(self):
+        """Попадания и промахи по уровням"""
+        return {level.name: {'hits': level.hits, 'misses': level.misses}
+                for level in self.levels}
+
+    def describe(self):
+        return ", ".join(f"{level.name} {level.size // 1024} KiB {level.ways}-way "
+                         f"{level.latency_ns} нс" for level in self.levels) + \
+            f", память {self.memory_latency_ns} нс ({self.levels[0].policy})"
+
+
+def parse_hierarchy(spec=DEFAULT_HIERARCHY, policy="lru", line_size=LINE_SIZE,
+                    memory_latency_ns=MEMORY_LATENCY_NS, seed=0):
+    """
+    Иерархия из строки уровней "имя:размер:ассоциативность:задержка_нс,..."
+
+    Например "L1:32K:8:1,L2:256K:4:4,LLC:8M:16:12". Уровни с политикой
+    random получают разные seed, производные от seed.
+    """
+    levels = []
+    for number, item in enumerate(filter(None, (part.strip() for part in spec.split(',')))):
+        try:
+            name, size, ways, latency = item.split(':')
+            levels.append(CacheLevel(name, parse_size(size), int(ways), line_size=line_size,
+                                     policy=policy, latency_ns=int(latency), seed=seed + number))
+        except ValueError as exc:
+            raise ValueError(f"Некорректный уровень кеша {item!r}: {exc}") from None
+    return CacheHierarchy(levels, memory_latency_ns)
+
+
+class SecretAccessModel:
+    """
+    Модель обращений victim (SecretProcessor.process_secret) для симулятора
+
+    Итерации victim идут с шагом interval_ns модельного времени; каждые
+    secret_period итераций секрет меняется так же, как в victim.py. Итерация
+    обращается ко всем линиям блока stride байт, начало которого зависит
+    от секрета. Модельное время идёт только в run().
+    """
+
+    def __init__(self, array_size, stride, interval_ns, secret_period, base=VICTIM_BASE,
+                 secret=42, secret_step=13, line_size=LINE_SIZE, events=None):
+        self.array_size = array_size
+        self.stride = stride
+        self.interval_ns = interval_ns
+        self.secret_period = secret_period
+        self.base = base
+        self.secret = secret
+        self.secret_step = secret_step
+        self.events = events
+        self._offsets = np.arange(0, stride, line_size, dtype=np.int64)
+        self.iteration = 0
+        self.clock_ns = 0
+        self._next_ns = 0
+
+    def index(self, secret):
+        """Начало блока, к которому обращается итерация с данным секретом"""
+        return (secret * self.stride) % self.array_size
+
+    def run(self, duration_ns):
+        """
+        Итерации, попадающие в следующие duration_ns модельного времени
+
+        Возвращает их адреса одной пачкой (в порядке обращений); смены
+        секрета и обращения пишутся в events (EventWriter), если он задан
+        """
+        chunks = []
+        end_ns = self.clock_ns + duration_ns
+        while self._next_ns < end_ns:
+            if self.iteration % self.secret_period == 0:
+                self.secret = (self.secret + self.secret_step) % 256
+                if self.events is not None:
+                    self.events.secret_changed(self.iteration, self.secret)
+            index = self.index(self.secret)
+            chunks.append(self.base + (index + self._offsets) % self.array_size)
+            if self.events is not None:
+                self.events.accessed(self.iteration, self.secret, index)
+            self.iteration += 1
+            self._next_ns += self.interval_ns
+        self.clock_ns = end_ns
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
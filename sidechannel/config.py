@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Переопределение констант victim/attacker через переменные окружения
+
+Параметры эксперимента заданы константами модулей (ARRAY_SIZE, NUM_SETS,
+STRIDE, TOTAL_ROUNDS, интервалы ожидания...). apply_env заменяет их
+значениями переменных SC_<ИМЯ>, приводя строку к типу исходного значения,
+поэтому один и тот же код запускается и в контейнерах (docker-compose),
+и локально (sweep.py) без правки исходников.
+
+SC_LOG_DIR переносит все пути, начинающиеся с DEFAULT_LOG_DIR, в другой
+каталог - так несколько пар victim/attacker пишут результаты раздельно.
+"""
+
+import os
+
+ENV_PREFIX = "SC_"
+DEFAULT_LOG_DIR = "/logs"
+LOG_DIR_VARIABLE = ENV_PREFIX + "LOG_DIR"
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+
+
+def parse_value(text, current):
+    """Приводит строку text к типу текущего значения константы"""
+    if isinstance(current, bool):
+        lowered = text.strip().lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+        raise ValueError(f"Ожидалось логическое значение, получено {text!r}")
+    if isinstance(current, int):
+        return int(text.replace("_", ""), 0)
+    if isinstance(current, float):
+        return float(text)
+    if current is None and text.strip().lower() in ("", "none"):
+        return None
+    return text
+
+
+def apply_env(namespace, environ=None, prefix=ENV_PREFIX):
+    """
+    Переопределяет константы в namespace (обычно globals() модуля)
+
+    Учитываются имена в верхнем регистре со значениями bool/int/float/str/None;
+    переменные окружения, которым не соответствует константа, игнорируются
+    (окружение общее для victim и attacker). Возвращает словарь применённых
+    значений; ValueError - если значение не приводится к типу константы
+    """
+    environ = os.environ if environ is None else environ
+    applied = {}
+
+    log_dir = environ.get(LOG_DIR_VARIABLE)
+    if log_dir:
+        for name, value in list(namespace.items()):
+            if name.isupper() and isinstance(value, str) and value.startswith(DEFAULT_LOG_DIR + "/"):
+                namespace[name] = os.path.join(log_dir, value[len(DEFAULT_LOG_DIR) + 1:])
+                applied[name] = namespace[name]
+
+    for name, value in list(namespace.items()):
+        if not name.isupper() or not isinstance(value, (bool, int, float, str, type(None))):
+            continue
+        text = environ.get(prefix + name)
+        if text is None:
+            continue
+        try:
+            namespace[name] = parse_value(text, value)
+        except ValueError as e:
+            raise ValueError(f"{prefix + name}: {e}") from None
+        applied[name] = namespace[name]
+    return applied
@@ -0,0 +1,535 @@
+# -*- coding: utf-8 -*-
+"""
+Обнаружение соседа по кешу/ядру со стороны victim (защитный монитор)
+
+Монитор выполняется рядом с victim (отдельным процессом на том же CPU)
+и с частотой tick_rate_hz снимает признаки:
+  - canary   - время обхода собственного небольшого буфера (canary_lines
+               линий): если между тиками чужой код вытеснил буфер из кеша,
+               обход медленнее базовой линии
+  - lag      - опоздание пробуждения монитора относительно дедлайна:
+               пока на CPU выполняется другой процесс, монитор ждёт
+  - sched    - время процессов victim в очереди на выполнение
+               (/proc/<pid>/schedstat, сумма по процессу и его рабочим
+               процессам) каждые proc_every тиков
+  - psi      - задержки из-за нехватки CPU (/proc/pressure/cpu, some)
+               каждые proc_every тиков
+В отчёт дополнительно пишется число троттлингов cgroup victim (cpu.stat).
+Первые calibration_s секунд - калибровка (атаки ещё нет; если регулятор
+бюджета меняет частоту тиков, калибровка начинается заново): пороги
+«медленного» canary и опоздания, базовые доли таких тиков, базовые доли
+ожидания victim и задержек PSI.
+
+Каждые evaluate_s секунд по последним window_s секундам считаются
+z-оценки превышения долей медленных тиков над базовыми, отношения
+ожидания victim и задержек PSI к базовым и периодичность - максимум
+автокорреляции числа событий аномальных признаков в интервалах bin_ms на
+задержках от min_period_ms до max_period_ms (Prime+Probe attacker с
+ограничением частоты работает раундами с постоянным периодом). Тревога -
+аномалия с периодичностью в confirm оценках подряд либо аномалия без
+периодичности в sustain оценках подряд - только по sched/psi (attacker
+без ограничения частоты занимает CPU непрерывно; непериодичные всплески
+canary/lag бывают и без соседа, например при вытеснении виртуальной
+машины гипервизором). Задержка обнаружения - от первого события окна,
+с которого началась серия аномальных оценок, до тревоги (оценка сверху:
+в окне могут быть и случайные события до начала атаки).
+
+На одном CPU с планировщиком CFS проснувшийся монитор вытесняет attacker
+сразу, поэтому опоздания тиков почти не растут; основной признак
+конкуренции за CPU в этом случае - ожидание victim и PSI.
+
+Бюджет накладных расходов (budget, доля CPU) соблюдается регулятором:
+раз в секунду монитор сравнивает собственное процессорное время с
+прошедшим и при превышении снижает частоту тиков.
+"""
+
+import collections
+import math
+import os
+import statistics
+import time
+from pathlib import Path
+
+from sidechannel.buffers import allocate_buffer
+from sidechannel.scheduler import wait_until
+
+DEFAULT_TICK_RATE_HZ = 200.0
+MIN_TICK_RATE_HZ = 50.0  # Ниже регулятор бюджета частоту не снижает
+DEFAULT_BUDGET = 0.01  # Доля CPU на монитор (1%)
+BUDGET_INTERVAL_NS = 1_000_000_000
+
+SLOW_K = 4.0  # Медленный тик: больше медианы калибровки на SLOW_K шумов (MAD)
+MIN_SLOW_MARGIN_NS = 500  # Минимальный запас порога canary над медианой
+LAG_QUANTILE = 0.9  # Порог опоздания тика - квантиль опозданий при калибровке
+MIN_LAG_THRESHOLD_NS = 50_000  # Минимальный порог опоздания тика
+MIN_BASE_FRACTION = 0.01  # Нижняя граница базовой доли медленных тиков для z-оценки
+MIN_WAIT_RATE = 0.001  # Нижняя граница базового времени ожидания victim (доля секунды)
+MIN_PRESSURE_RATE = 0.005  # Нижняя граница базовой доли задержек PSI
+WAIT_ACTIVE_NS = 100_000  # Ожидание victim (задержка PSI) за интервал proc, отмечаемое как событие
+
+WINDOW_COLUMNS = [
+    'timestamp_ns', 'samples', 'rate_hz', 'cpu_percent',
+    'canary_median_ns', 'canary_slow_fraction', 'canary_z', 'lag_slow_fraction', 'lag_z',
+    'wait_ratio', 'psi_ratio', 'cgroup_throttled', 'periodicity', 'period_ms',
+    'anomaly', 'alarm'
+]
+
+timer_ns = time.perf_counter_ns
+PROC = Path("/proc")
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read(fd):
+    return os.pread(fd, 4096, 0)
+
+
+def find_processes(name, exclude=None):
+    """PID процессов, один из аргументов которых оканчивается на name, по возрастанию"""
+    exclude = {os.getpid()} if exclude is None else exclude
+    pids = []
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit() or int(entry.name) in exclude:
+            continue
+        try:
+            args = (entry / "cmdline").read_bytes().decode('utf-8', 'replace').split("\0")
+        except OSError:
+            continue
+        if any(arg.endswith(name) for arg in args):
+            pids.append(int(entry.name))
+    return sorted(pids)
+
+
+class ProcessSched:
+    """
+    Счётчики планировщика процессов pids: (время на CPU, время в очереди, квантов), нс
+
+    Значения суммируются по процессам (victim с WORKER_MODE=process
+    выполняет итерации в дочерних процессах)
+    """
+
+    def __init__(self, pids):
+        self.pids = list(pids)
+        self._fds = [os.open(PROC / str(pid) / "schedstat", os.O_RDONLY) for pid in self.pids]
+
+    def read(self):
+        run_ns = wait_ns = slices = 0
+        for fd in self._fds:
+            run, wait, count = _read(fd).split()[:3]
+            run_ns += int(run)
+            wait_ns += int(wait)
+            slices += int(count)
+        return run_ns, wait_ns, slices
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+
+
+class CgroupCPU:
+    """
+    Процессорное время и троттлинг cgroup процесса
+
+    cgroup v2 - cpu.stat (usage_usec, nr_throttled); v1 - cpuacct.usage
+    и cpu/cpu.stat (nr_throttled). read() -> (использовано нс, троттлингов)
+    """
+
+    def __init__(self, usage_path, stat_path, usage_key=None):
+        self._usage = os.open(usage_path, os.O_RDONLY)
+        self._stat = os.open(stat_path, os.O_RDONLY) if stat_path != usage_path else self._usage
+        self._usage_key = usage_key
+        self.path = usage_path
+
+    @classmethod
+    def for_pid(cls, pid):
+        """cgroup процесса pid или None, если cgroupfs недоступна"""
+        try:
+            lines = (PROC / str(pid) / "cgroup").read_text().splitlines()
+        except OSError:
+            return None
+        paths = {}
+        for line in lines:
+            _, controllers, path = line.split(":", 2)
+            for controller in controllers.split(","):
+                paths[controller] = path.lstrip("/")
+        candidates = []
+        if "" in paths and (CGROUP_ROOT / "cgroup.controllers").exists():
+            directory = CGROUP_ROOT / paths[""]
+            candidates.append((directory / "cpu.stat", directory / "cpu.stat", "usage_usec"))
+        if "cpuacct" in paths:
+            for name in ("cpu,cpuacct", "cpuacct"):
+                usage = CGROUP_ROOT / name / paths["cpuacct"] / "cpuacct.usage"
+                stat = CGROUP_ROOT / (name if name == "cpu,cpuacct" else "cpu") / paths.get("cpu", "") / "cpu.stat"
+                candidates.append((usage, stat, None))
+        for usage, stat, key in candidates:
+            try:
+                return cls(usage, stat, key)
+            except OSError:
+                continue
+        return None
+
+    def read(self):
+        fields = dict(line.split() for line in _read(self._stat).decode().splitlines() if " " in line)
+        if self._usage_key is not None:
+            usage = int(fields.get(self._usage_key, 0)) * 1000
+        else:
+            usage = int(_read(self._usage))
+        return usage, int(fields.get("nr_throttled", 0))
+
+    def close(self):
+        os.close(self._usage)
+        if self._stat != self._usage:
+            os.close(self._stat)
+
+
+class PressureCPU:
+    """Суммарное время задержек из-за нехватки CPU (PSI some total), нс"""
+
+    def __init__(self, path=PROC / "pressure" / "cpu"):
+        self._fd = os.open(path, os.O_RDONLY)
+
+    @classmethod
+    def open(cls):
+        try:
+            return cls()
+        except OSError:
+            return None
+
+    def read(self):
+        some = _read(self._fd).split(b"\n", 1)[0]
+        return int(some.rsplit(b"total=", 1)[1]) * 1000
+
+    def close(self):
+        os.close(self._fd)
+
+
+class CanaryProbe:
+    """
+    Обход canary-буфера: время чтения по байту из каждой линии, нс
+
+    Обход - срез с шагом stride (цикл на C): время определяется задержками
+    памяти, а не интерпретатором, и сам замер дешевле
+    """
+
+    def __init__(self, lines=128, stride=64):
+        self.buffer = allocate_buffer(lines * stride)
+        self.stride = stride
+
+    def measure(self):
+        start = timer_ns()
+        self.buffer[::self.stride]
+        return timer_ns() - start
+
+
+def periodicity(values, min_lag, max_lag):
+    """
+    Максимум нормированной автокорреляции values на задержках [min_lag, max_lag]
+
+    Пик ищется после первого локального минимума автокорреляции: на малых
+    задержках она высока у любого ряда с пачками длиннее интервала и
+    периодичности не означает. Возвращает (коэффициент, задержка);
+    (0.0, 0) - если ряд постоянный или пика нет
+    """
+    n = len(values)
+    if n < 2 * min_lag or min_lag < 1:
+        return 0.0, 0
+    mean = sum(values) / n
+    centered = [value - mean for value in values]
+    energy = sum(value * value for value in centered)
+    if energy <= 0:
+        return 0.0, 0
+    best, best_lag = 0.0, 0
+    previous, falling = 1.0, True
+    for lag in range(1, min(max_lag, n // 2) + 1):
+        r = sum(a * b for a, b in zip(centered, centered[lag:])) / energy
+        falling = falling and r < previous
+        if not falling and lag >= min_lag and r > best:
+            best, best_lag = r, lag
+        previous = r
+    return best, best_lag
+
+
+def _z_score(fraction, base, count):
+    """z-оценка превышения доли fraction над базовой base по count наблюдениям"""
+    p = max(base, MIN_BASE_FRACTION)
+    return (fraction - p) / math.sqrt(p * (1 - p) / max(1, count))
+
+
+class CoResidencyDetector:
+    """
+    Монитор соседства с attacker (см. описание модуля)
+
+    on_window(row)  - вызывается после каждой оценки (dict с WINDOW_COLUMNS)
+    on_alert(alert) - вызывается при начале и окончании тревоги (dict)
+    """
+
+    def __init__(self, pids=(), tick_rate_hz=DEFAULT_TICK_RATE_HZ, proc_every=5, window_s=2.0,
+                 evaluate_s=0.5, calibration_s=3.0, budget=DEFAULT_BUDGET, canary_lines=128,
+                 canary_stride=64, z_alarm=5.0, ratio_alarm=3.0, periodicity_alarm=0.3,
+                 confirm=2, sustain=4, bin_ms=10, min_period_ms=20, max_period_ms=500,
+                 on_window=None, on_alert=None, log=print):
+        self.pids = list(pids)
+        self.target_rate = tick_rate_hz
+        self.rate = tick_rate_hz
+        self.proc_every = max(1, proc_every)
+        self.window_ns = int(window_s * 1e9)
+        self.evaluate_ns = int(evaluate_s * 1e9)
+        self.calibration_ns = int(calibration_s * 1e9)
+        self.budget = budget
+        self.z_alarm = z_alarm
+        self.ratio_alarm = ratio_alarm
+        self.periodicity_alarm = periodicity_alarm
+        self.confirm = max(1, confirm)
+        self.sustain = max(self.confirm, sustain)
+        self.bin_ns = int(bin_ms * 1e6)
+        self.min_lag = max(1, round(min_period_ms / bin_ms))
+        self.max_lag = max(self.min_lag, round(max_period_ms / bin_ms))
+        self.on_window = on_window
+        self.on_alert = on_alert
+        self.log = log
+
+        self.canary = CanaryProbe(canary_lines, canary_stride)
+        self.sched = ProcessSched(self.pids) if self.pids else None
+        self.cgroup = CgroupCPU.for_pid(self.pids[0]) if self.pids else None
+        self.pressure = PressureCPU.open()
+
+        # Тики окна: (время, canary нс, опоздание нс);
+        # интервалы proc: (время, ожидание victim нс), (время, задержки PSI нс)
+        self._ticks = collections.deque()
+        self._waits = collections.deque()
+        self._stalls = collections.deque()
+        self.baseline = None
+        self.cpu_fraction = 0.0
+        self.ticks = 0
+        self.evaluations = 0
+        self.alarms = []  # время начала каждой тревоги (monotonic_ns)
+        self._anomalous = 0  # аномальных оценок подряд
+        self._periodic = 0  # из них подряд с периодичностью
+        self._contended = 0  # из них подряд с аномалией sched/psi
+        self._normal = 0  # оценок без аномалии подряд
+        self._alarm = False
+        self._onset_ns = None
+        self._throttled = None
+        # Метки времени отчётов - в шкале monotonic_ns (как события victim и раунды attacker)
+        self._monotonic_offset = time.monotonic_ns() - timer_ns()
+
+    def close(self):
+        for source in (self.sched, self.cgroup, self.pressure):
+            if source is not None:
+                source.close()
+
+    def run(self, duration_s=None, stop=None):
+        """
+        Тики до истечения duration_s, установки stop (threading.Event)
+        или завершения процесса victim; возвращает число тиков
+        """
+        start = timer_ns()
+        end = start + int(duration_s * 1e9) if duration_s else None
+        calibration_end = start + self.calibration_ns
+        next_eval = calibration_end + self.evaluate_ns
+        next_budget = start + BUDGET_INTERVAL_NS
+        cpu_mark, wall_mark = time.process_time_ns(), start
+        deadline = start
+        previous_wait = previous_stall = None
+        try:
+            while (end is None or deadline < end) and not (stop is not None and stop.is_set()):
+                deadline += int(1e9 / self.rate)
+                now = wait_until(deadline, 0)
+                lag = now - deadline
+                if lag > 1e9 / self.rate:
+                    deadline = now  # Не наверстываем пропущенные тики пачкой
+                self._ticks.append((now, self.canary.measure(), lag))
+                self.ticks += 1
+
+                if self.ticks % self.proc_every == 0:
+                    if self.sched is not None:
+                        _, wait_ns, _ = self.sched.read()
+                        if previous_wait is not None:
+                            self._waits.append((now, wait_ns - previous_wait))
+                        previous_wait = wait_ns
+                    if self.pressure is not None:
+                        stall_ns = self.pressure.read()
+                        if previous_stall is not None:
+                            self._stalls.append((now, stall_ns - previous_stall))
+                        previous_stall = stall_ns
+
+                if self.baseline is None and now >= calibration_end:
+                    self._calibrate(now)
+                elif self.baseline is not None and now >= next_eval:
+                    self._evaluate(now)
+                    next_eval = now + self.evaluate_ns
+
+                if now >= next_budget:
+                    cpu = time.process_time_ns()
+                    changed = self._govern((cpu - cpu_mark) / max(1, now - wall_mark))
+                    cpu_mark, wall_mark = cpu, now
+                    next_budget = now + BUDGET_INTERVAL_NS
+                    if changed and self.baseline is None:
+                        # Распределения тиков зависят от частоты - калибровка заново
+                        for samples in (self._ticks, self._waits, self._stalls):
+                            samples.clear()
+                        calibration_end = now + self.calibration_ns
+                        next_eval = calibration_end + self.evaluate_ns
+        except (ProcessLookupError, FileNotFoundError):
+            self.log("Процесс victim завершился - мониторинг остановлен")
+        finally:
+            if self._alarm:
+                self._finish_alarm(timer_ns())
+        return self.ticks
+
+    def _govern(self, fraction):
+        """
+        Регулятор бюджета: снижает частоту тиков при превышении бюджета CPU
+        и повышает до заданной при большом запасе; True - частота изменилась
+        """
+        self.cpu_fraction = fraction
+        rate = self.rate
+        if fraction > self.budget:
+            rate = max(MIN_TICK_RATE_HZ, self.rate * 0.8 * self.budget / fraction)
+            if rate < self.rate:
+                self.log(f"Накладные расходы {100 * fraction:.2f}% CPU выше бюджета "
+                         f"{100 * self.budget:g}% - частота тиков {self.rate:.0f} -> {rate:.0f} Гц")
+        elif fraction < 0.5 * self.budget and self.rate < self.target_rate:
+            rate = min(self.target_rate, self.rate * 1.25)
+        changed, self.rate = rate != self.rate, rate
+        return changed
+
+    def _trim(self, now):
+        """Отбрасывает данные старше окна"""
+        start = now - self.window_ns
+        for samples in (self._ticks, self._waits, self._stalls):
+            while samples and samples[0][0] < start:
+                samples.popleft()
+
+    @staticmethod
+    def _rate(intervals, span):
+        return sum(value for _, value in intervals) / max(1, span)
+
+    def _calibrate(self, now):
+        canary = [value for _, value, _ in self._ticks]
+        lags = sorted(lag for _, _, lag in self._ticks)
+        median = statistics.median(canary)
+        noise = 1.4826 * statistics.median(abs(value - median) for value in canary)
+        canary_threshold = median + max(MIN_SLOW_MARGIN_NS, SLOW_K * noise)
+        lag_threshold = max(MIN_LAG_THRESHOLD_NS, lags[min(len(lags) - 1, int(LAG_QUANTILE * len(lags)))])
+        span = now - self._ticks[0][0]
+        self.baseline = {
+            'canary_median_ns': median,
+            'canary_threshold_ns': canary_threshold,
+            'lag_threshold_ns': lag_threshold,
+            'canary_slow_fraction': sum(value > canary_threshold for value in canary) / len(canary),
+            'lag_slow_fraction': sum(lag > lag_threshold for lag in lags) / len(lags),
+            'wait_rate': self._rate(self._waits, span),
+            'psi_rate': self._rate(self._stalls, span),
+        }
+        self.log(f"Калибровка монитора: {len(canary)} тиков, canary медиана {median:.0f} нс, "
+                 f"порог {canary_threshold:.0f} нс, порог опоздания {lag_threshold / 1000:.0f} мкс, "
+                 f"ожидание victim {100 * self.baseline['wait_rate']:.2f}% времени, "
+                 f"задержки PSI {100 * self.baseline['psi_rate']:.2f}%")
+        self._trim(now)
+
+    def _evaluate(self, now):
+        self._trim(now)
+        ticks = self._ticks
+        if not ticks:
+            return
+        base = self.baseline
+        count = len(ticks)
+        canary_threshold, lag_threshold = base['canary_threshold_ns'], base['lag_threshold_ns']
+        first = ticks[0][0]
+        span = max(1, now - first)
+
+        canary_fraction = sum(canary > canary_threshold for _, canary, _ in ticks) / count
+        lag_fraction = sum(lag > lag_threshold for _, _, lag in ticks) / count
+        canary_z = _z_score(canary_fraction, base['canary_slow_fraction'], count)
+        lag_z = _z_score(lag_fraction, base['lag_slow_fraction'], count)
+        wait_ratio = self._rate(self._waits, span) / max(MIN_WAIT_RATE, base['wait_rate']) \
+            if self.sched is not None else 0.0
+        psi_ratio = self._rate(self._stalls, span) / max(MIN_PRESSURE_RATE, base['psi_rate']) \
+            if self.pressure is not None else 0.0
+        channels = {
+            'canary': canary_z > self.z_alarm,
+            'lag': lag_z > self.z_alarm,
+            'sched': wait_ratio > self.ratio_alarm,
+            'psi': psi_ratio > self.ratio_alarm,
+        }
+        anomaly = any(channels.values())
+
+        # Периодичность - по числу событий аномальных признаков в интервалах bin_ns
+        # (события остальных признаков - фоновый шум базовой линии)
+        score, lag_bins, onset = 0.0, 0, None
+        if anomaly:
+            events = []
+            if channels['canary'] or channels['lag']:
+                events.extend(moment for moment, canary, lag in ticks
+                              if (channels['canary'] and canary > canary_threshold)
+                              or (channels['lag'] and lag > lag_threshold))
+            for name, intervals in (('sched', self._waits), ('psi', self._stalls)):
+                if channels[name]:
+                    events.extend(moment for moment, value in intervals if value > WAIT_ACTIVE_NS)
+            if events:
+                onset = min(events)
+                bins = [0] * (span // self.bin_ns + 1)
+                for moment in events:
+                    bins[max(0, moment - first) // self.bin_ns] += 1
+                score, lag_bins = periodicity(bins, self.min_lag, self.max_lag)
+        periodic = anomaly and score >= self.periodicity_alarm
+
+        throttled = 0
+        if self.cgroup is not None:
+            _, total = self.cgroup.read()
+            throttled = total - self._throttled if self._throttled is not None else 0
+            self._throttled = total
+
+        self.evaluations += 1
+        if anomaly:
+            if self._anomalous == 0:
+                self._onset_ns = onset if onset is not None else now
+            self._anomalous += 1
+            self._periodic = self._periodic + 1 if periodic else 0
+            self._contended = self._contended + 1 if channels['sched'] or channels['psi'] else 0
+            self._normal = 0
+        else:
+            self._anomalous = self._periodic = self._contended = 0
+            self._normal += 1
+        triggered = self._periodic >= self.confirm or self._contended >= self.sustain
+
+        row = {
+            'timestamp_ns': now + self._monotonic_offset, 'samples': count, 'rate_hz': round(self.rate, 1),
+            'cpu_percent': round(100 * self.cpu_fraction, 3),
+            'canary_median_ns': statistics.median(canary for _, canary, _ in ticks),
+            'canary_slow_fraction': round(canary_fraction, 4), 'canary_z': round(canary_z, 2),
+            'lag_slow_fraction': round(lag_fraction, 4), 'lag_z': round(lag_z, 2),
+            'wait_ratio': round(wait_ratio, 2), 'psi_ratio': round(psi_ratio, 2),
+            'cgroup_throttled': throttled, 'periodicity': round(score, 3),
+            'period_ms': lag_bins * self.bin_ns / 1e6,
+            'anomaly': int(anomaly), 'alarm': int(self._alarm or triggered),
+        }
+        if not self._alarm and triggered:
+            self._start_alarm(now, row, [name for name, hit in channels.items() if hit], periodic)
+        elif self._alarm and self._normal >= self.confirm:
+            self._finish_alarm(now)
+        if self.on_window is not None:
+            self.on_window(row)
+
+    def _start_alarm(self, now, row, reasons, periodic):
+        self._alarm = True
+        self.alarms.append(now + self._monotonic_offset)
+        latency = (now - self._onset_ns) / 1e9
+        cadence = (f"периодическая, период {row['period_ms']:.0f} мс "
+                   f"(автокорреляция {row['periodicity']:.2f})" if periodic else "непрерывная")
+        self.log(f"ТРЕВОГА: конкуренция за CPU/кеш - {cadence}, признаки: {', '.join(reasons)}; "
+                 f"задержка обнаружения {latency:.2f} с")
+        if self.on_alert is not None:
+            self.on_alert({'event': 'start', 'timestamp_ns': now + self._monotonic_offset,
+                           'onset_ns': self._onset_ns + self._monotonic_offset,
+                           'latency_s': round(latency, 3), 'reasons': reasons, 'periodic': periodic,
+                           **{key: row[key] for key in ('period_ms', 'periodicity', 'canary_z',
+                                                        'lag_z', 'wait_ratio', 'psi_ratio')}})
+
+    def _finish_alarm(self, now):
+        self._alarm = False
+        duration = (now - self._onset_ns) / 1e9 if self._onset_ns is not None else 0.0
+        self.log(f"Тревога снята (длительность {duration:.1f} с)")
+        if self.on_alert is not None:
+            self.on_alert({'event': 'end', 'timestamp_ns': now + self._monotonic_offset,
+                           'duration_s': round(duration, 3)})
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Структурированные события victim с метками времени
+
+События пишутся в .npy (int64, по строке на событие) со столбцами
+EVENT_COLUMNS. Метки времени снимаются часами CLOCK_MONOTONIC
+(time.monotonic_ns) - теми же, что и границы раундов attacker
+(attacker_timestamps.npy). Контейнеры на одном хосте разделяют эти часы,
+поэтому события victim и раунды attacker можно сопоставлять напрямую.
+"""
+
+import time
+
+from sidechannel.npyfile import NpyAppendWriter
+
+EVENT_COLUMNS = ('timestamp_ns', 'kind', 'iteration', 'secret', 'index')
+
+# Типы событий
+EVENT_SECRET = 0  # смена секретного значения
+EVENT_ACCESS = 1  # обработка секрета: обращения к блоку с началом index
+
+clock_ns = time.monotonic_ns
+
+
+class EventWriter(NpyAppendWriter):
+    """Потоковая запись событий victim"""
+
+    def __init__(self, path, batch_rows=1024):
+        super().__init__(path, 'q', len(EVENT_COLUMNS), batch_rows=batch_rows)
+
+    def secret_changed(self, iteration, secret, timestamp_ns=None):
+        self.append((clock_ns() if timestamp_ns is None else timestamp_ns,
+                     EVENT_SECRET, iteration, secret, -1))
+
+    def accessed(self, iteration, secret, index, timestamp_ns=None):
+        self.append((clock_ns() if timestamp_ns is None else timestamp_ns,
+                     EVENT_ACCESS, iteration, secret, index))
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Фоновое логирование, не мешающее измерениям времени
+
+Вызов log() только кладёт сообщение в ограниченную очередь (без
+форматирования и системных вызовов). Отдельный поток-писатель забирает
+сообщения пачками, форматирует их и пишет одним вызовом в долгоживущий
+файловый дескриптор и в stdout. При переполнении очереди сообщения
+отбрасываются и подсчитываются.
+
+Метки времени снимаются монотонными часами и переводятся во время
+на стенке относительно точки запуска логгера, поэтому перевод системных
+часов не ломает порядок записей.
+
+activity() - счётчик событий логирования (поставленных в очередь сообщений
+и выполненных потоком записей); разность значений до и после раунда
+показывает, сколько событий логирования пересеклось с измерениями.
+"""
+
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_QUEUE_SIZE = 4096
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.25  # секунд
+
+_STOP = object()
+
+
+class BackgroundLogger:
+    """Логгер с очередью и отдельным потоком записи"""
+
+    def __init__(self, path, source, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 echo=True):
+        self.path = path
+        self.source = source
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.echo = echo
+
+        self.dropped = 0   # отброшено из-за переполнения очереди
+        self.messages = 0  # поставлено в очередь (поток вызывающего)
+        self.writes = 0    # пачек записано (поток-писатель)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._base_wall = time.time()
+        self._base_mono = time.monotonic_ns()
+        self._thread = threading.Thread(target=self._run, name=f"{source}-logger", daemon=True)
+        self._thread.start()
+        self._closed = False
+
+    def log(self, message):
+        """Ставит сообщение в очередь; никогда не блокируется"""
+        self.messages += 1
+        try:
+            self._queue.put_nowait((time.monotonic_ns(), message))
+        except queue.Full:
+            self.dropped += 1
+
+    def activity(self):
+        """Монотонный счётчик событий логирования в обоих потоках"""
+        return self.messages + self.writes
+
+    def close(self):
+        """Дописывает очередь и останавливает поток записи"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.dropped:
+            self.log(f"Отброшено сообщений лога из-за переполнения очереди: {self.dropped}")
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _format(self, mono_ns, message):
+        wall = self._base_wall + (mono_ns - self._base_mono) / 1e9
+        timestamp = datetime.fromtimestamp(wall).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        return f"[{timestamp}] {self.source}: {message}\n"
+
+    def _run(self):
+        try:
+            log_file = open(self.path, "a", encoding="utf-8")
+        except Exception as e:
+            print(f"Ошибка записи в лог: {e}", flush=True)
+            log_file = None
+
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(self._format(*item))
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if not batch:
+                continue
+            text = "".join(batch)
+            if self.echo:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            if log_file is not None:
+                try:
+                    log_file.write(text)
+                    log_file.flush()
+                except Exception as e:
+                    print(f"Ошибка записи в лог: {e}", flush=True)
+            self.writes += 1
+
+        if log_file is not None:
+            log_file.close()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковая запись результатов измерений в CSV
+
+Раунды дописываются в файл пачками по мере измерений, поэтому память
+не растёт с числом раундов, а при аварийном завершении теряется не более
+одной незаписанной пачки. Рядом с CSV ведётся индекс (<файл>.idx, JSON Lines):
+после каждой пачки в него добавляется запись с числом раундов и длиной
+файла, а при штатном закрытии - завершающая запись (footer) с complete=true.
+По индексу анализ определяет, какая часть частично записанного файла
+гарантированно состоит из целых строк.
+"""
+
+import csv
+import json
+import os
+import time
+
+CSV_COLUMNS = [
+    'round', 'timestamp', 'avg_time_ns', 'max_time_ns',
+    'min_time_ns', 'stdev_time_ns', 'suspicious_count', 'max_zscore', 'log_events',
+    'baseline_ns', 'avg_corrected_ns', 'snr',
+    'scheduled_ns', 'actual_ns', 'overrun_ns', 'gc_events'
+]
+INDEX_SUFFIX = ".idx"
+TAIL_BLOCK = 1 << 16
+
+DEFAULT_BATCH_SIZE = 100  # раундов в одной пачке записи
+DEFAULT_FSYNC_INTERVAL = 5.0  # секунд между fsync
+
+
+def index_path(path):
+    """Путь к файлу индекса для CSV с измерениями"""
+    return f"{path}{INDEX_SUFFIX}"
+
+
+class MeasurementWriter:
+    """
+    Инкрементальная запись раундов в CSV с периодическим fsync
+
+    Использование:
+        with MeasurementWriter(path) as writer:
+            for result in ...:
+                writer.append(result)
+    """
+
+    def __init__(self, path, columns=CSV_COLUMNS, batch_size=DEFAULT_BATCH_SIZE,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.path = path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.rounds_written = 0
+
+        self._batch = []
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._index = open(index_path(path), 'w', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self.flush(sync=True)
+
+    def append(self, result):
+        """Добавляет результат раунда (dict с ключами columns) в текущую пачку"""
+        self.append_values([result[column] for column in self.columns])
+
+    def append_values(self, row):
+        """Добавляет строку значений в порядке columns в текущую пачку"""
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_rows(self, text, rows):
+        """Дописывает rows готовых строк CSV (text оканчивается переводом строки) одной пачкой"""
+        self.flush()
+        self._file.write(text)
+        self.rounds_written += rows
+        self.flush()
+
+    def flush(self, sync=False):
+        """Записывает накопленную пачку и обновляет индекс"""
+        if self._batch:
+            self._writer.writerows(self._batch)
+            self.rounds_written += len(self._batch)
+            self._batch.clear()
+        self._file.flush()
+
+        now = time.monotonic()
+        synced = sync or now - self._last_fsync >= self.fsync_interval
+        if synced:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+        self._write_index({'rounds': self.rounds_written,
+                           'offset': self._file.tell(),
+                           'synced': synced}, sync=synced)
+
+    def close(self):
+        """Дописывает остаток, footer индекса и закрывает файлы"""
+        if self._closed:
+            return
+        self.flush(sync=True)
+        self._write_index({'rounds': self.rounds_written,
+                           'offset': self._file.tell(),
+                           'synced': True,
+                           'complete': True}, sync=True)
+        self._file.close()
+        self._index.close()
+        self._closed = True
+
+    def _write_index(self, record, sync=False):
+        self._index.write(json.dumps(record) + "\n")
+        self._index.flush()
+        if sync:
+            os.fsync(self._index.fileno())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_index(path):
+    """
+    Читает индекс CSV с измерениями
+
+    Возвращает последнюю целую запись индекса (dict) или None,
+    если индекса нет (например, файл записан старой версией attacker)
+    """
+    try:
+        with open(index_path(path), 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+
+    # Последняя строка может быть оборвана при аварийном завершении
+    for line in reversed(lines):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue
+    return None
+
+
+def committed_length(path):
+    """
+    Определяет, сколько байт CSV можно безопасно прочитать
+
+    Возвращает (length, complete): length - длина префикса файла из целых
+    строк, complete - был ли файл штатно закрыт. Данные, записанные после
+    последней записи индекса, учитываются до последнего перевода строки.
+    Файл без индекса (записанный до его появления) считается целым.
+    """
+    size = os.path.getsize(path)
+    record = read_index(path)
+    if record is None:
+        return size, True
+    if record.get('complete') and record['offset'] == size:
+        return size, True
+
+    committed = record['offset']
+    if size <= committed:
+        return size, False
+
+    # Хвост после последней пачки: отбрасываем оборванную строку.
+    # Перевод строки ищется с конца файла блоками - хвост может быть
+    # большим, и читать его в память целиком нельзя
+    with open(path, 'rb') as f:
+        end = size
+        while end > committed:
+            start = max(committed, end - TAIL_BLOCK)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1, False
+            end = start
+    return committed, False
+
+
+def iter_column(path, column, length=None):
+    """
+    Построчно читает один столбец CSV как float, не загружая файл целиком
+
+    Читается только безопасный префикс файла (см. committed_length).
+    Все поля CSV с измерениями числовые и не экранируются, поэтому
+    строки разбираются простым split.
+    """
+    if length is None:
+        length, _ = committed_length(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        consumed = len(header)
+        idx = header.decode('utf-8').strip().split(',').index(column)
+        for line in f:
+            consumed += len(line)
+            if consumed > length:
+                break
+            yield float(line.split(b',')[idx])
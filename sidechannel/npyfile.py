@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковая запись двумерных массивов в формате .npy без NumPy
+
+Контейнеры victim/attacker не содержат NumPy, поэтому файл пишется
+вручную: заголовок формата NPY 1.0 фиксированной длины и строки
+фиксированной ширины, дописываемые в конец файла. Число строк
+в заголовке обновляется после каждой пачки, а при чтении берётся
+из размера файла - так недописанный файл тоже открывается.
+
+Чтение (open_npy) выполняется на стороне анализа через numpy.memmap
+без копирования данных в память; read_array читает небольшие файлы
+в контейнере (например, расписание секретов victim) средствами stdlib.
+"""
+
+import ast
+import os
+import struct
+import sys
+from array import array
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+HEADER_SIZE = 128  # магия + длина + словарь заголовка, кратно 64
+
+# Коды типов array -> описание dtype NumPy (little-endian)
+DTYPES = {
+    'B': '|u1',
+    'H': '<u2',
+    'I': '<u4',
+    'i': '<i4',
+    'Q': '<u8',
+    'q': '<i8',
+    'd': '<f8',
+}
+DEFAULT_BATCH_ROWS = 256
+
+
+def _header(descr, rows, width):
+    body = repr({'descr': descr, 'fortran_order': False, 'shape': (rows, width)})
+    body = body.encode('latin1')
+    padding = HEADER_SIZE - len(NPY_MAGIC) - 2 - len(body) - 1
+    if padding < 0:
+        raise ValueError("Заголовок .npy не помещается в зарезервированный размер")
+    return NPY_MAGIC + struct.pack('<H', HEADER_SIZE - len(NPY_MAGIC) - 2) + body + b" " * padding + b"\n"
+
+
+class NpyAppendWriter:
+    """
+    Дописывает строки фиксированной ширины в .npy файл
+
+    typecode - код типа модуля array (см. DTYPES), width - число столбцов
+    """
+
+    def __init__(self, path, typecode, width, batch_rows=DEFAULT_BATCH_ROWS):
+        if typecode not in DTYPES:
+            raise ValueError(f"Неподдерживаемый тип элементов: {typecode!r}")
+        self.path = path
+        self.typecode = typecode
+        self.descr = DTYPES[typecode]
+        self.width = width
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+
+        self._buffer = array(typecode)
+        self._pending_rows = 0
+        self._swap = sys.byteorder != 'little' and array(typecode).itemsize > 1
+        self._file = open(path, 'wb')
+        self._file.write(_header(self.descr, 0, width))
+        self._file.flush()
+        self._closed = False
+
+    def append(self, row):
+        """Добавляет одну строку (последовательность из width чисел)"""
+        if len(row) != self.width:
+            raise ValueError(f"Ожидалось {self.width} значений, получено {len(row)}")
+        self._buffer.extend(row)
+        self._pending_rows += 1
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def extend(self, values):
+        """Добавляет несколько строк сразу: values - array того же типа, len кратна width"""
+        rows, remainder = divmod(len(values), self.width)
+        if remainder:
+            raise ValueError(f"Число значений {len(values)} не кратно ширине строки {self.width}")
+        self._buffer.extend(values)
+        self._pending_rows += rows
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def write_block(self, block):
+        """
+        Дописывает строки из объекта с буферным протоколом (например, массив
+        NumPy (rows, width) с dtype файла) сразу в файл, минуя буфер пачки.
+        Байты записываются как есть - порядок little-endian обеспечивает вызывающий
+        """
+        data = memoryview(block).cast('B')
+        rows, remainder = divmod(data.nbytes, array(self.typecode).itemsize * self.width)
+        if remainder:
+            raise ValueError(f"Размер блока {data.nbytes} байт не кратен размеру строки")
+        self.flush()
+        self._file.write(data)
+        self._pending_rows = rows
+        self.flush()
+
+    def flush(self, sync=False):
+        """Записывает накопленные строки и обновляет число строк в заголовке"""
+        if self._pending_rows:
+            if self._swap:
+                self._buffer.byteswap()
+            self._buffer.tofile(self._file)
+            self.rows_written += self._pending_rows
+            self._buffer = array(self.typecode)
+            self._pending_rows = 0
+
+            self._file.seek(0)
+            self._file.write(_header(self.descr, self.rows_written, self.width))
+            self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush(sync=True)
+        self._file.close()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_header(path):
+    """Возвращает (descr, width, data_offset) для .npy файла"""
+    with open(path, 'rb') as f:
+        prefix = f.read(len(NPY_MAGIC) + 2)
+        if prefix[:6] != NPY_MAGIC[:6]:
+            raise ValueError(f"{path}: не является .npy файлом")
+        major = prefix[6]
+        if major == 1:
+            (header_len,) = struct.unpack('<H', prefix[8:10])
+            offset = 10
+        else:
+            (header_len,) = struct.unpack('<I', prefix[8:10] + f.read(2))
+            offset = 12
+        header = ast.literal_eval(f.read(header_len).decode('latin1'))
+
+    shape = header['shape']
+    width = shape[1] if len(shape) > 1 else 1
+    return header['descr'], width, offset + header_len
+
+
+def read_array(path):
+    """
+    Читает .npy файл, записанный NpyAppendWriter, без NumPy
+
+    Возвращает (values, width): values - плоский array по строкам,
+    оборванная последняя строка отбрасывается
+    """
+    descr, width, offset = read_header(path)
+    typecode = next((code for code, known in DTYPES.items() if known == descr), None)
+    if typecode is None:
+        raise ValueError(f"{path}: неподдерживаемый тип элементов {descr!r}")
+    values = array(typecode)
+    row_size = values.itemsize * width
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    values.frombytes(data[:len(data) // row_size * row_size])
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values.byteswap()
+    return values, width
+
+
+def open_npy(path):
+    """
+    Открывает .npy файл, записанный NpyAppendWriter, через numpy.memmap
+
+    Число строк определяется по размеру файла, поэтому недописанный
+    файл тоже читается; оборванная последняя строка отбрасывается.
+    Требует NumPy (используется на стороне анализа).
+    """
+    import numpy as np
+
+    descr, width, offset = read_header(path)
+    dtype = np.dtype(descr)
+    rows = (os.path.getsize(path) - offset) // (dtype.itemsize * width)
+    if rows == 0:
+        return np.empty((0, width), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(rows, width))
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Профилирование фаз раунда attacker и итерации victim
+
+PhaseHistogram - гистограмма длительностей в стиле HDR Histogram:
+значения до 2 * SUB_BUCKETS нс хранятся точно, дальше каждая степень
+двойки делится на SUB_BUCKETS равных интервалов (относительная ошибка
+не больше 1 / SUB_BUCKETS ~ 3%). Память фиксирована (BUCKETS счётчиков
+на фазу) и не зависит от числа раундов, запись - несколько целочисленных
+операций без выделения объектов.
+
+PhaseProfiler - набор гистограмм по фазам; при создании оценивает
+собственные накладные расходы (замер таймером + запись в гистограмму),
+чтобы было видно, насколько инструментирование возмущает измерения.
+Результат сохраняется в JSON рядом с измерениями и читается
+analyze_results.py.
+
+WindowProfiler - профилирование окна из нескольких раундов по запросу
+(номер первого раунда или сигнал SIGUSR1): cProfile (файл .prof и
+текстовая сводка) либо выборка стека основного потока с заданным
+интервалом (.folded - формат flamegraph.pl / speedscope). Поток выборки
+получает GIL не чаще sys.getswitchinterval(), поэтому в участках без
+освобождения GIL выборка реже заданной.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_BITS = 40  # Значения до 2^40 нс (~18 минут), большие - в последнем интервале
+_EXACT = 2 * SUB_BUCKETS
+BUCKETS = _EXACT + (MAX_VALUE_BITS - SUB_BUCKET_BITS - 1) * SUB_BUCKETS
+PERCENTILES = (50, 90, 99, 99.9)
+
+WINDOW_MODES = ("cprofile", "sample")
+DEFAULT_SAMPLE_INTERVAL = 0.001  # Интервал выборки стека, сек
+STATS_LINES = 30  # Функций в текстовой сводке cProfile
+
+timer_ns = time.perf_counter_ns
+
+
+def bucket_index(value):
+    """Номер интервала гистограммы для значения value (нс)"""
+    if value < _EXACT:
+        return max(0, value)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return min(BUCKETS - 1, _EXACT + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS)
+
+
+def bucket_bounds(index):
+    """Границы [low, high] интервала гистограммы"""
+    if index < _EXACT:
+        return index, index
+    shift, position = divmod(index - _EXACT, SUB_BUCKETS)
+    low = (SUB_BUCKETS + position) << (shift + 1)
+    return low, low + (1 << (shift + 1)) - 1
+
+
+class PhaseHistogram:
+    """Гистограмма длительностей фазы (нс) с фиксированной памятью"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        if value < _EXACT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS - 1
+            index = _EXACT + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+            if index >= BUCKETS:
+                index = BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Значение q-го процентиля (середина интервала, в пределах [min, max])"""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min(self.max, max(self.min, (low + high) // 2))
+        return self.max
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        for bound, pick in (('min', min), ('max', max)):
+            values = [value for value in (getattr(self, bound), getattr(other, bound)) if value is not None]
+            setattr(self, bound, pick(values) if values else None)
+
+    def to_dict(self):
+        """Сводка и ненулевые интервалы [low, high, count]"""
+        return {
+            'count': self.count,
+            'total_ns': self.total,
+            'min_ns': self.min,
+            'max_ns': self.max,
+            'mean_ns': round(self.mean, 1),
+            **{f"p{q:g}_ns": self.percentile(q) for q in PERCENTILES},
+            'buckets': [[*bucket_bounds(index), count] for index, count in enumerate(self.counts) if count],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for low, _, count in data['buckets']:
+            histogram.counts[bucket_index(low)] += count
+        histogram.count = data['count']
+        histogram.total = data['total_ns']
+        histogram.min = data['min_ns']
+        histogram.max = data['max_ns']
+        return histogram
+
+
+def instrumentation_overhead(samples=2000):
+    """Накладные расходы одного замера фазы: вызов таймера и запись в гистограмму, нс"""
+    histogram = PhaseHistogram()
+    best = None
+    for _ in range(5):
+        start = previous = timer_ns()
+        for _ in range(samples):
+            now = timer_ns()
+            histogram.record(now - previous)
+            previous = now
+        elapsed = (timer_ns() - start) / samples
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def phase_total(histograms, overlapping=()):
+    """Суммарное время фаз без перекрывающихся (знаменатель долей; не меньше 1)"""
+    return sum(histogram.total for phase, histogram in histograms.items()
+               if phase not in overlapping) or 1
+
+
+class PhaseProfiler:
+    """
+    Гистограммы длительностей фаз
+
+    overlapping - фазы, время которых уже входит в остальные или в паузы
+    между ними (например, опоздание начала итерации): они выводятся, но
+    не учитываются в доле времени фаз.
+
+    Использование:
+        profiler = PhaseProfiler("attacker", ("prime", "probe"))
+        prime = profiler.histogram("prime")
+        start = timer_ns(); ...; prime.record(timer_ns() - start)
+        profiler.save(path)
+    """
+
+    def __init__(self, source, phases=(), overlapping=()):
+        self.source = source
+        self.histograms = {}
+        self.overlapping = tuple(overlapping)
+        for phase in tuple(phases) + self.overlapping:
+            self.histogram(phase)
+        self.overhead_ns = instrumentation_overhead()
+
+    def histogram(self, phase, overlapping=False):
+        """Гистограмма фазы (создаётся при первом обращении); overlapping - см. класс"""
+        if overlapping and phase not in self.overlapping:
+            self.overlapping += (phase,)
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = PhaseHistogram()
+        return histogram
+
+    def record(self, phase, value):
+        self.histogram(phase).record(value)
+
+    @property
+    def samples(self):
+        return sum(histogram.count for histogram in self.histograms.values())
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'unit': 'ns',
+            'sub_bucket_bits': SUB_BUCKET_BITS,
+            'instrumentation_overhead_ns': round(self.overhead_ns, 1),
+            'overlapping': list(self.overlapping),
+            'phases': {phase: histogram.to_dict() for phase, histogram in self.histograms.items()},
+        }
+
+    def save(self, path):
+        """Сохраняет гистограммы в JSON (атомарно, через временный файл)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """Строки сводки по фазам для лога"""
+        total = phase_total(self.histograms, self.overlapping)
+        lines = []
+        for phase, histogram in self.histograms.items():
+            if histogram.count:
+                share = ("вне долей времени" if phase in self.overlapping
+                         else f"{100 * histogram.total / total:.1f}% времени")
+                lines.append(f"{phase}: {histogram.count} замеров, среднее {histogram.mean / 1000:.1f} мкс, "
+                             f"p50 {histogram.percentile(50) / 1000:.1f} мкс, "
+                             f"p99 {histogram.percentile(99) / 1000:.1f} мкс, {share}")
+        lines.append(f"накладные расходы замеров: {self.overhead_ns:.0f} нс x {self.samples} "
+                     f"= {self.overhead_ns * self.samples / 1e6:.1f} мс")
+        return lines
+
+
+def load_profile(path):
+    """Читает JSON профиля; возвращает (данные, {фаза: PhaseHistogram}) или None, если файла нет"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    return data, {phase: PhaseHistogram.from_dict(values) for phase, values in data['phases'].items()}
+
+
+class WindowProfiler:
+    """
+    Профилирование окна из rounds раундов (итераций) по запросу
+
+    Окно открывается в before(n), если n == start или был запрос
+    (request(), в том числе по сигналу - install()), и закрывается
+    в after(n) после rounds раундов. Файлы: <prefix>_<первый>-<последний>
+    .prof и .txt (cProfile) или .folded (выборка стека).
+    """
+
+    def __init__(self, prefix, rounds=100, mode="cprofile", start=-1,
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL, log=None):
+        if mode not in WINDOW_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode!r} "
+                             f"(допустимо: {', '.join(WINDOW_MODES)})")
+        self.prefix = prefix
+        self.rounds = max(1, rounds)
+        self.mode = mode
+        self.start = start
+        self.sample_interval = sample_interval
+        self.log = log
+        self.windows = []  # сохранённые файлы
+        self._requested = False
+        self._first = None
+        self._profile = None
+        self._sampler = None
+
+    @property
+    def active(self):
+        return self._first is not None
+
+    def request(self, signum=None, frame=None):
+        """Запрос окна со следующего раунда (можно использовать как обработчик сигнала)"""
+        self._requested = True
+
+    def install(self, signum=signal.SIGUSR1):
+        signal.signal(signum, self.request)
+
+    def before(self, number):
+        if self._first is not None or not (self._requested or number == self.start):
+            return
+        self._requested = False
+        self._first = number
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+
+    def after(self, number):
+        if self._first is not None and number - self._first + 1 >= self.rounds:
+            self.finish(number)
+
+    def finish(self, last=None):
+        """Закрывает окно (если открыто) и сохраняет результат; возвращает путь"""
+        if self._first is None:
+            return None
+        name = f"{self.prefix}_{self._first}-{last if last is not None else 'end'}"
+        if self._profile is not None:
+            self._profile.disable()
+            path = f"{name}.prof"
+            self._profile.dump_stats(path)
+            text = io.StringIO()
+            pstats.Stats(self._profile, stream=text).sort_stats('cumulative').print_stats(STATS_LINES)
+            with open(f"{name}.txt", 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+            self._profile = None
+        else:
+            self._sampler.stop()
+            path = f"{name}.folded"
+            self._sampler.save(path)
+            self._sampler = None
+        self._first = None
+        self.windows.append(path)
+        if self.log is not None:
+            self.log(f"Профиль окна сохранён в {path}")
+        return path
+
+
+class StackSampler(threading.Thread):
+    """Выборка стека потока thread_id раз в interval секунд (счётчики свёрнутых стеков)"""
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Публикация раундов attacker в реальном времени
+
+Каждый раунд (агрегаты и вектор времён по наборам) отправляется одной
+датаграммой в UNIX-сокет live-анализатора (live_monitor.py). Сокет
+неблокирующий: если анализатор не запущен или не успевает читать
+и очередь сокета заполнена, датаграмма отбрасывается и учитывается
+в счётчике dropped - цикл измерений никогда не ждёт потребителя.
+Очередь датаграмм UNIX-сокета ограничена sysctl net.unix.max_dgram_qlen
+(по умолчанию 10), поэтому потребитель должен читать без задержек.
+
+Формат датаграммы: заголовок ROUND_HEADER (MAGIC, версия, число наборов,
+число отброшенных к моменту отправки раундов, поля PUBLISHED_FIELDS)
+и времена по наборам - num_sets значений uint64 в порядке байт хоста.
+"""
+
+import socket
+import struct
+
+from sidechannel.roundstore import ROUND_FIELDS
+
+MAGIC = b'SCRD'
+VERSION = 1
+
+# Поля раунда в датаграмме (типы - как в RoundStore)
+PUBLISHED_FIELDS = (
+    'round', 'start_ns', 'end_ns', 'avg_time_ns', 'max_time_ns', 'min_time_ns',
+    'stdev_time_ns', 'suspicious_count', 'max_zscore', 'snr', 'overrun_ns',
+    'log_events', 'gc_events',
+)
+_TYPECODES = dict(ROUND_FIELDS)
+ROUND_HEADER = struct.Struct('=4sHIQ' + ''.join(_TYPECODES[f] for f in PUBLISHED_FIELDS))
+SET_TIME_SIZE = 8
+
+
+class RoundPublisher:
+    """Неблокирующая отправка раундов в UNIX-сокет (датаграммы)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.sent = 0
+        self.dropped = 0
+        self._header = bytearray(ROUND_HEADER.size)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def publish(self, store, slot):
+        """
+        Отправляет раунд из слота RoundStore
+
+        Возвращает True, если датаграмма принята ядром; иначе раунд
+        отброшен (нет получателя или его очередь заполнена)
+        """
+        ROUND_HEADER.pack_into(self._header, 0, MAGIC, VERSION, store.num_sets, self.dropped,
+                               *store.row(slot, PUBLISHED_FIELDS))
+        try:
+            self._sock.sendmsg([self._header, store.set_times(slot)], (), 0, self.path)
+        except OSError:
+            # BlockingIOError - очередь получателя заполнена,
+            # FileNotFoundError / ConnectionRefusedError - получатель не запущен
+            self.dropped += 1
+            return False
+        self.sent += 1
+        return True
+
+    def close(self):
+        self._sock.close()
+
+
+def decode_round(datagram):
+    """
+    Разбирает датаграмму раунда
+
+    Возвращает (fields, set_times): fields - словарь полей PUBLISHED_FIELDS
+    и служебных num_sets, dropped; set_times - memoryview байт времён
+    по наборам (num_sets значений uint64). ValueError - чужая датаграмма
+    """
+    if len(datagram) < ROUND_HEADER.size:
+        raise ValueError("Слишком короткая датаграмма")
+    magic, version, num_sets, dropped, *values = ROUND_HEADER.unpack_from(datagram)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Неизвестный формат датаграммы: {magic!r} v{version}")
+    body = memoryview(datagram)[ROUND_HEADER.size:]
+    if len(body) != num_sets * SET_TIME_SIZE:
+        raise ValueError(f"Ожидалось {num_sets} времён по наборам, получено {len(body)} байт")
+
+    fields = dict(zip(PUBLISHED_FIELDS, values))
+    fields['num_sets'] = num_sets
+    fields['dropped'] = dropped
+    return fields, body
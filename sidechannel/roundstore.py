@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Кольцевой буфер раундов на типизированных массивах
+
+Все данные раунда (времена по наборам и агрегаты) хранятся в заранее
+выделенных array фиксированного размера; раунд пишет в свой слот на месте,
+не создавая словарей, списков и кортежей. Так цикл измерений не порождает
+объектов, отслеживаемых сборщиком мусора, и паузы GC не попадают
+в измерения. Заполненный буфер целиком сбрасывается на диск между раундами.
+
+Дополнительно модуль позволяет отключить циклический GC на время раундов
+и считать срабатывания GC (gc.callbacks), чтобы их влияние было видно
+в данных.
+"""
+
+import gc
+from array import array
+
+# Агрегаты раунда: имя столбца -> код типа array
+ROUND_FIELDS = (
+    ('round', 'q'),
+    ('timestamp', 'd'),
+    ('start_ns', 'q'),
+    ('end_ns', 'q'),
+    ('avg_time_ns', 'd'),
+    ('max_time_ns', 'Q'),
+    ('min_time_ns', 'Q'),
+    ('stdev_time_ns', 'd'),
+    ('suspicious_count', 'q'),
+    ('max_zscore', 'd'),
+    ('log_events', 'q'),
+    ('baseline_ns', 'd'),
+    ('avg_corrected_ns', 'd'),
+    ('snr', 'd'),
+    ('scheduled_ns', 'q'),
+    ('actual_ns', 'q'),
+    ('overrun_ns', 'q'),
+    ('gc_events', 'q'),
+)
+UINT32_MAX = 2 ** 32 - 1
+
+
+class RoundStore:
+    """
+    Буфер на capacity раундов по num_sets наборов
+
+    Агрегаты доступны как атрибуты-массивы: store.avg_time_ns[slot].
+    Времена по наборам - плоский array('Q'), срез слота - set_times(slot).
+    """
+
+    def __init__(self, capacity, num_sets, fields=ROUND_FIELDS):
+        if capacity <= 0:
+            raise ValueError(f"Ёмкость буфера раундов должна быть положительной: {capacity}")
+        self.capacity = capacity
+        self.num_sets = num_sets
+        self.fields = tuple(name for name, _ in fields)
+        self.times = array('Q', bytes(8 * capacity * num_sets))
+        self._times_view = memoryview(self.times)
+        # Срезы memoryview создаются один раз, чтобы не выделять их в каждом раунде
+        self._slot_views = [self._times_view[slot * num_sets:(slot + 1) * num_sets]
+                            for slot in range(capacity)]
+        for name, typecode in fields:
+            setattr(self, name, array(typecode, bytes(array(typecode).itemsize * capacity)))
+
+    def slot(self, round_num):
+        """Слот кольцевого буфера для номера раунда"""
+        return round_num % self.capacity
+
+    def set_times(self, slot):
+        """memoryview на времена доступа по наборам в слоте (без копирования)"""
+        return self._slot_views[slot]
+
+    def row(self, slot, columns):
+        """Значения агрегатов слота в порядке columns"""
+        return [getattr(self, name)[slot] for name in columns]
+
+    def as_dict(self, slot):
+        """Агрегаты слота в виде словаря (для логирования и отладки)"""
+        return dict(zip(self.fields, self.row(slot, self.fields)))
+
+    def times_uint32(self, count):
+        """Времена первых count слотов как array('I') с насыщением до UINT32_MAX"""
+        view = self._times_view[:count * self.num_sets]
+        try:
+            return array('I', view)
+        except OverflowError:
+            return array('I', [t if t < UINT32_MAX else UINT32_MAX for t in view])
+
+
+class GCMonitor:
+    """
+    Счётчик срабатываний сборщика мусора
+
+    events - число запусков сборки с момента install(); разность значений
+    до и после раунда - число сборок, пришедшихся на раунд
+    """
+
+    def __init__(self):
+        self.events = 0
+        self._installed = False
+
+    def _callback(self, phase, info):
+        if phase == "start":
+            self.events += 1
+
+    def install(self):
+        if not self._installed:
+            gc.callbacks.append(self._callback)
+            self._installed = True
+
+    def uninstall(self):
+        if self._installed:
+            gc.callbacks.remove(self._callback)
+            self._installed = False
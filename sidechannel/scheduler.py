@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Планирование по абсолютным дедлайнам perf_counter_ns
+
+time.sleep() просыпается с опозданием на величину, зависящую от
+планировщика ОС, а цепочка относительных задержек накапливает ошибку.
+Здесь ожидание гибридное: до дедлайна минус spin_ns поток спит, остаток
+выжидается активным опросом таймера. Дедлайны отсчитываются от начала
+расписания, поэтому опоздание одного раунда не сдвигает следующие.
+"""
+
+import time
+
+DEFAULT_SPIN_NS = 200_000  # последние 200 мкс ожидания - активный опрос
+
+
+def wait_until(deadline_ns, spin_ns=DEFAULT_SPIN_NS):
+    """Ждёт наступления deadline_ns (шкала perf_counter_ns); возвращает фактическое время"""
+    timer = time.perf_counter_ns
+    remaining = deadline_ns - timer()
+    if remaining > spin_ns:
+        time.sleep((remaining - spin_ns) / 1e9)
+    now = timer()
+    while now < deadline_ns:
+        now = timer()
+    return now
+
+
+class RoundScheduler:
+    """
+    Расписание раундов с заданной частотой
+
+    rate_hz = None или 0 - без ограничения частоты (раунды подряд).
+    Если раунд опоздал больше чем на период, пропущенные слоты
+    не наверстываются пачкой, а учитываются в skipped.
+    """
+
+    def __init__(self, rate_hz=None, spin_ns=DEFAULT_SPIN_NS):
+        self.period_ns = int(1e9 / rate_hz) if rate_hz else 0
+        self.spin_ns = spin_ns
+        self.skipped = 0
+        self._next_ns = None
+
+    def wait_next(self):
+        """
+        Ждёт начала следующего раунда
+
+        Возвращает (scheduled_ns, actual_ns): запланированное и фактическое
+        время начала; actual_ns - scheduled_ns - опоздание раунда
+        """
+        now = time.perf_counter_ns()
+        if not self.period_ns:
+            return now, now
+
+        if self._next_ns is None:
+            self._next_ns = now
+        scheduled = self._next_ns
+        actual = wait_until(scheduled, self.spin_ns)
+
+        missed = (actual - scheduled) // self.period_ns
+        self.skipped += missed
+        self._next_ns = scheduled + (missed + 1) * self.period_ns
+        return scheduled, actual
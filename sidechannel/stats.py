@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковая статистика без хранения истории значений
+"""
+
+import json
+import math
+import os
+from array import array
+
+
+class RunningStats:
+    """Среднее, дисперсия (алгоритм Уэлфорда), минимум и максимум за O(1) на значение"""
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def variance(self):
+        """Выборочная дисперсия (как statistics.variance)"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+
+DEFAULT_EWMA_ALPHA = 0.05  # вес нового значения в экспоненциальном среднем
+DEFAULT_WARMUP_ROUNDS = 20  # раундов накопления истории до оценки z-score
+DEFAULT_Z_THRESHOLD = 3.0
+MIN_STDEV_NS = 1.0  # нижняя граница шума, чтобы z-score не уходил в бесконечность
+
+
+class SetBaselines:
+    """
+    Адаптивные базовые линии по каждому cache set
+
+    Для каждого набора за O(1) на значение поддерживаются:
+      - среднее и дисперсия за всю историю (Уэлфорд)
+      - экспоненциально взвешенные среднее и дисперсия (EWMA) - базовая
+        линия, по которой считается z-score нового значения
+    История значений не хранится.
+    """
+
+    def __init__(self, num_sets, alpha=DEFAULT_EWMA_ALPHA, warmup=DEFAULT_WARMUP_ROUNDS):
+        zeros = array('d', bytes(8 * num_sets))
+        self.num_sets = num_sets
+        self.alpha = alpha
+        self.warmup = warmup
+        self.count = 0
+        self.mean = array('d', zeros)
+        self.m2 = array('d', zeros)
+        self.ewma = array('d', zeros)
+        self.ewvar = array('d', zeros)
+        self.max_z = 0.0
+
+    @property
+    def ready(self):
+        """Достаточно ли истории для оценки по z-score"""
+        return self.count >= self.warmup
+
+    def update(self, times, z_threshold=DEFAULT_Z_THRESHOLD):
+        """
+        Добавляет времена одного раунда (по одному на набор)
+
+        Возвращает число наборов, z-score которых относительно их собственной
+        истории (до учёта текущего значения) превышает z_threshold; пока
+        история не накоплена - 0. Максимальный z-score раунда - в self.max_z.
+        """
+        alpha = self.alpha
+        mean, m2, ewma, ewvar = self.mean, self.m2, self.ewma, self.ewvar
+        ready = self.count >= self.warmup
+        self.count += 1
+        count = self.count
+        flagged = 0
+        max_z = 0.0
+
+        for i in range(self.num_sets):
+            x = times[i]
+
+            if ready:
+                z = (x - ewma[i]) / max(MIN_STDEV_NS, math.sqrt(ewvar[i]))
+                if z > z_threshold:
+                    flagged += 1
+                if z > max_z:
+                    max_z = z
+
+            # Уэлфорд
+            delta = x - mean[i]
+            mean[i] += delta / count
+            m2[i] += delta * (x - mean[i])
+
+            # Экспоненциально взвешенные среднее и дисперсия
+            if count == 1:
+                ewma[i] = x
+            else:
+                diff = x - ewma[i]
+                increment = alpha * diff
+                ewma[i] += increment
+                ewvar[i] = (1 - alpha) * (ewvar[i] + diff * increment)
+
+        self.max_z = max_z
+        return flagged
+
+    def variance(self):
+        """Выборочные дисперсии по наборам за всю историю"""
+        if self.count < 2:
+            return [0.0] * self.num_sets
+        return [m2 / (self.count - 1) for m2 in self.m2]
+
+    def to_dict(self):
+        """Состояние в виде словаря для экспорта в JSON"""
+        return {
+            'num_sets': self.num_sets,
+            'count': self.count,
+            'alpha': self.alpha,
+            'mean': list(self.mean),
+            'variance': self.variance(),
+            'ewma': list(self.ewma),
+            'ewvar': list(self.ewvar),
+        }
+
+    def save(self, path):
+        """Сохраняет базовые линии в JSON (атомарно, через временный файл)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Калибровка накладных расходов таймера
+
+Интервал perf_counter_ns() вокруг одного обращения к bytearray включает
+вызов таймера и диспетчеризацию интерпретатора, которые на порядок
+превышают задержку памяти. Калибровка измеряет распределение этих
+накладных расходов (пустой интервал таймера и обращение к заведомо
+закешированному адресу), чтобы вычитать их из измерений и оценивать
+отношение сигнал/шум.
+"""
+
+import statistics
+import time
+
+# Коэффициент перевода MAD в оценку стандартного отклонения (нормальное распределение)
+MAD_TO_SIGMA = 1.4826
+
+
+class Distribution:
+    """Краткое описание выборки задержек (нс)"""
+
+    __slots__ = ('count', 'min', 'median', 'p90', 'mean', 'noise')
+
+    def __init__(self, samples):
+        if not samples:
+            raise ValueError("Пустая выборка для калибровки")
+        ordered = sorted(samples)
+        self.count = len(ordered)
+        self.min = ordered[0]
+        self.median = statistics.median(ordered)
+        self.p90 = ordered[min(self.count - 1, int(self.count * 0.9))]
+        self.mean = statistics.fmean(ordered)
+        # Робастная оценка шума: на выбросы от прерываний MAD не реагирует
+        mad = statistics.median(abs(x - self.median) for x in ordered)
+        self.noise = MAD_TO_SIGMA * mad
+
+    def __repr__(self):
+        return (f"Distribution(count={self.count}, min={self.min}, median={self.median}, "
+                f"p90={self.p90}, noise={self.noise:.1f})")
+
+
+def empty_timer_overhead(samples=10000):
+    """Распределение интервала между двумя соседними вызовами perf_counter_ns()"""
+    timer = time.perf_counter_ns
+    deltas = []
+    for _ in range(samples):
+        start = timer()
+        end = timer()
+        deltas.append(end - start)
+    return Distribution(deltas)
+
+
+def signal_to_noise(corrected_ns, baseline):
+    """Отношение сигнал/шум: превышение над базовой линией в единицах её шума"""
+    if baseline.noise <= 0:
+        # Шум ниже разрешения таймера - берём шаг квантования таймера
+        noise = max(1, time.get_clock_info('perf_counter').resolution * 1e9)
+    else:
+        noise = baseline.noise
+    return corrected_ns / noise
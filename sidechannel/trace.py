@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Трасса обращений victim к памяти: запись и воспроизведение
+
+Каждая обработка секрета (SecretProcessor.process_secret) записывается
+целиком: метка времени, номер итерации, секрет и все адреса обращений.
+Трасса - .npy файл (int32, по TRACE_WIDTH столбцов), который пишется
+потоково через NpyAppendWriter и открывается через numpy.memmap.
+
+Записи (первый столбец - вид):
+  RECORD_SYNC      (SYNC, ts_hi, ts_lo, iteration) - абсолютные метка
+                   времени (monotonic, нс) и номер итерации
+  RECORD_ITERATION (ITERATION, dt_ns, d_iteration, secret) - начало
+                   итерации; время и номер - приращения к предыдущим
+  RECORD_RUN       (RUN, start, count, step) - count обращений к смещениям
+                   start, start + step, ... буфера victim
+
+Приращения помещаются в int32, поэтому строка занимает 16 байт, а
+итерация victim (64 обращения одним блоком) - две строки. SYNC пишется
+в начале, каждые SYNC_INTERVAL строк и когда приращение не помещается
+в int32, поэтому трассу можно декодировать с любой точки синхронизации.
+Накладные расходы записи - O(1) на итерацию независимо от числа
+обращений, запись на диск - пачками.
+
+Запись (TraceWriter) обходится stdlib; чтение и воспроизведение
+(load_trace, replay, TraceVictimModel) требуют numpy.
+"""
+
+import time
+
+from sidechannel.npyfile import NpyAppendWriter, open_npy
+
+TRACE_WIDTH = 4
+RECORD_SYNC = 0
+RECORD_ITERATION = 1
+RECORD_RUN = 2
+
+SYNC_INTERVAL = 4096  # Строк между точками синхронизации
+DEFAULT_BATCH_ROWS = 1024
+REPLAY_BATCH = 65_536  # Обращений в одной пачке воспроизведения
+
+_INT32_MIN = -(1 << 31)
+_INT32_MAX = (1 << 31) - 1
+
+clock_ns = time.monotonic_ns
+
+
+def _signed32(value):
+    """Младшие 32 бита как int32"""
+    value &= 0xFFFFFFFF
+    return value - (1 << 32) if value > _INT32_MAX else value
+
+
+def block_runs(index, length, array_size, step=64):
+    """
+    Отрезки обращений к блоку length байт с началом index в кольцевом буфере
+
+    Обход блока с шагом step по модулю array_size (как в process_secret)
+    даёт не больше двух непрерывных отрезков (start, count, step)
+    """
+    count = -(-length // step)
+    first = min(count, -(-(array_size - index) // step))
+    runs = [(index, first, step)]
+    if first < count:
+        runs.append(((index + first * step) % array_size, count - first, step))
+    return runs
+
+
+class TraceWriter(NpyAppendWriter):
+    """Потоковая запись трассы обращений"""
+
+    def __init__(self, path, sync_interval=SYNC_INTERVAL, batch_rows=DEFAULT_BATCH_ROWS):
+        super().__init__(path, 'i', TRACE_WIDTH, batch_rows=batch_rows)
+        self.sync_interval = sync_interval
+        self.iterations = 0
+        self.accesses = 0
+        self._rows = 0
+        self._last_sync = None
+        self._last_ns = 0
+        self._last_iteration = 0
+
+    def _sync(self, timestamp_ns, iteration):
+        self.append((RECORD_SYNC, timestamp_ns >> 32, _signed32(timestamp_ns), iteration))
+        self._rows += 1
+        self._last_sync = self._rows
+        self._last_ns = timestamp_ns
+        self._last_iteration = iteration
+
+    def record(self, iteration, secret, runs, timestamp_ns=None):
+        """
+        Записывает итерацию: runs - отрезки (start, count, step) смещений
+        в буфере victim в порядке обращений (см. block_runs)
+        """
+        if timestamp_ns is None:
+            timestamp_ns = clock_ns()
+        dt = timestamp_ns - self._last_ns
+        step = iteration - self._last_iteration
+        if (self._last_sync is None or self._rows - self._last_sync >= self.sync_interval
+                or not _INT32_MIN <= dt <= _INT32_MAX or not _INT32_MIN <= step <= _INT32_MAX):
+            self._sync(timestamp_ns, iteration)
+            dt = step = 0
+
+        # Итерация и её отрезки - одной пачкой строк
+        values = [RECORD_ITERATION, dt, step, secret]
+        for start, count, run_step in runs:
+            values += (RECORD_RUN, start, count, run_step)
+            self.accesses += count
+        self.extend(values)
+        self._rows += 1 + len(runs)
+        self._last_ns = timestamp_ns
+        self._last_iteration = iteration
+        self.iterations += 1
+
+
+class Trace:
+    """
+    Декодированная трасса (numpy)
+
+    Итерации: timestamp_ns, iteration, secret, first (номер первого
+    обращения итерации) и count (число обращений); обращения - offsets
+    (смещения в буфере victim в порядке выполнения)
+    """
+
+    def __init__(self, timestamp_ns, iteration, secret, first, count, offsets):
+        self.timestamp_ns = timestamp_ns
+        self.iteration = iteration
+        self.secret = secret
+        self.first = first
+        self.count = count
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.iteration)
+
+    @property
+    def accesses(self):
+        return len(self.offsets)
+
+    def access_iterations(self):
+        """Номер итерации (позиция в трассе) для каждого обращения"""
+        import numpy as np
+
+        return np.repeat(np.arange(len(self.count)), self.count)
+
+
+def load_trace(path):
+    """
+    Читает и декодирует трассу векторно (numpy, без циклов по строкам)
+
+    Строки до первой точки синхронизации (начало оборванной трассы)
+    и отрезки без итерации отбрасываются
+    """
+    import numpy as np
+
+    rows = np.asarray(open_npy(path), dtype=np.int64)
+    kind = rows[:, 0]
+    sync = np.flatnonzero(kind == RECORD_SYNC)
+    if not len(sync):
+        empty = np.empty(0, dtype=np.int64)
+        return Trace(empty, empty, empty, empty, empty, empty)
+    rows = rows[sync[0]:]
+    kind = rows[:, 0]
+
+    # Метки времени и номера итераций: суммы приращений от последней точки синхронизации
+    header = np.flatnonzero(kind != RECORD_RUN)
+    is_sync = kind[header] == RECORD_SYNC
+    absolute_ns = (rows[header, 1] << 32) | (rows[header, 2] & 0xFFFFFFFF)
+    ns_values = np.where(is_sync, absolute_ns, rows[header, 1])
+    iteration_values = np.where(is_sync, rows[header, 3], rows[header, 2])
+    segment = np.cumsum(is_sync) - 1
+
+    def resumed(values):
+        total = np.cumsum(values)
+        starts = np.flatnonzero(is_sync)
+        return total - (total[starts] - values[starts])[segment]
+
+    timestamps = resumed(ns_values)
+    iterations = resumed(iteration_values)
+    is_iteration = ~is_sync
+    iteration_rows = header[is_iteration]
+
+    # Отрезки: владелец - последняя итерация перед отрезком
+    runs = np.flatnonzero(kind == RECORD_RUN)
+    owner = np.searchsorted(iteration_rows, runs, side='right') - 1
+    runs, owner = runs[owner >= 0], owner[owner >= 0]
+    start, count, step = rows[runs, 1], rows[runs, 2], rows[runs, 3]
+
+    # Развёртка отрезков в смещения: start + step * (номер внутри отрезка)
+    run_first = np.cumsum(count) - count
+    within = np.arange(int(count.sum())) - np.repeat(run_first, count)
+    offsets = np.repeat(start, count) + np.repeat(step, count) * within
+
+    per_iteration = np.bincount(owner, weights=count, minlength=len(iteration_rows)).astype(np.int64)
+    return Trace(timestamps[is_iteration], iterations[is_iteration], rows[iteration_rows, 3],
+                 np.cumsum(per_iteration) - per_iteration, per_iteration, offsets)
+
+
+def replay(trace, access, base=0, batch=REPLAY_BATCH, start=0, stop=None):
+    """
+    Воспроизводит обращения итераций [start, stop) трассы с максимальной скоростью
+
+    access - бэкенд: функция, принимающая пачку адресов (numpy int64),
+    например CacheHierarchy.access симулятора или touch_buffer(buf).
+    Адрес = base + смещение. Возвращает число воспроизведённых обращений.
+    """
+    stop = len(trace) if stop is None else min(stop, len(trace))
+    if start >= stop:
+        return 0
+    first = int(trace.first[start])
+    last = int(trace.first[stop - 1] + trace.count[stop - 1])
+    for position in range(first, last, batch):
+        access(base + trace.offsets[position:min(position + batch, last)])
+    return last - first
+
+
+def touch_buffer(buffer):
+    """Бэкенд реальной памяти: чтение байта buffer по каждому адресу пачки"""
+    def access(addresses):
+        for address in addresses.tolist():
+            _ = buffer[address]
+    return access
+
+
+class TraceVictimModel:
+    """
+    Модель victim для симулятора attacker, воспроизводящая записанную трассу
+
+    Совместима с cachesim.SecretAccessModel: run(duration_ns) возвращает
+    адреса итераций, попавших в следующие duration_ns времени трассы
+    (отсчёт от первой итерации). Смены секрета и обращения пишутся
+    в events (EventWriter) с текущим временем, если он задан.
+    Повтор (loop) требует трассы ненулевой длительности - иначе время
+    трассы не продвигается и run не завершается.
+    """
+
+    def __init__(self, trace, base, events=None, loop=False):
+        if not len(trace):
+            raise ValueError("Пустая трасса")
+        if loop and trace.timestamp_ns[-1] == trace.timestamp_ns[0]:
+            raise ValueError("Трасса нулевой длительности не может воспроизводиться по кругу")
+        self.trace = trace
+        self.base = base
+        self.events = events
+        self.loop = loop
+        self.clock_ns = 0
+        self.position = 0
+        self._moments = trace.timestamp_ns - trace.timestamp_ns[0]
+        self._span = int(self._moments[-1])
+        self._period = 0  # смещение времени при повторе трассы
+        self._secret = None
+        self.secret = None  # секрет последней воспроизведённой итерации
+
+    def run(self, duration_ns):
+        import numpy as np
+
+        trace = self.trace
+        end_ns = self.clock_ns + duration_ns
+        chunks = []
+        while True:
+            stop = int(np.searchsorted(self._moments, end_ns - self._period, side='left'))
+            if stop > self.position:
+                self._emit(self.position, stop)
+                self.secret = int(trace.secret[stop - 1])
+                chunks.append(trace.offsets[trace.first[self.position]:
+                                            trace.first[stop - 1] + trace.count[stop - 1]])
+                self.position = stop
+            if self.position < len(trace) or not self.loop:
+                break
+            # Трасса закончилась - повтор с начала через средний интервал итераций
+            self._period += self._span + self._span // max(1, len(trace) - 1)
+            self.position = 0
+        self.clock_ns = end_ns
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return self.base + np.concatenate(chunks)
+
+    def _emit(self, start, stop):
+        if self.events is None:
+            return
+        trace = self.trace
+        for i in range(start, stop):
+            iteration, secret = int(trace.iteration[i]), int(trace.secret[i])
+            if secret != self._secret:
+                self.events.secret_changed(iteration, secret)
+                self._secret = secret
+            offset = int(trace.offsets[trace.first[i]]) if trace.count[i] else -1
+            self.events.accessed(iteration, secret, offset)
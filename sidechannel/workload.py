@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузка victim с заданной частотой операций
+
+Pacer задаёт моменты начала операций (смещения от старта расписания):
+  - rate       - средняя частота операций в секунду на поток (0 - без пауз)
+  - duty_cycle - доля активной части цикла длительностью period секунд;
+                 все операции цикла (rate * period) выполняются в активной
+                 части с частотой rate / duty_cycle, остаток цикла - простой
+  - burst      - операций подряд без пауз в одной пачке; пачки следуют
+                 с интервалом burst / частота
+Моменты вычисляются от начала расписания по номеру операции (дедлайны
+scheduler.wait_until), поэтому опоздание не накапливается. Опоздавшие
+операции выполняются подряд, пока поток не догонит расписание, - средняя
+частота сохраняется, а число опозданий учитывается.
+
+Расписания секретов (SCHEDULES) - функции номера итерации:
+  fixed      - одно значение
+  sequential - initial + step при каждой смене, смена каждые period итераций
+  random     - случайное значение (seed) на каждые period итераций
+  file       - значения по итерациям из файла: victim_events.npy,
+               victim_trace.npy или текст (числа через пробел/запятую)
+Расписания не зависят от состояния, поэтому все потоки нагрузки
+обрабатывают одну и ту же последовательность секретов.
+
+WorkloadEngine запускает workers потоков нагрузки (threading или
+multiprocessing - процессы нагружают кеш параллельно, не деля GIL),
+каждый со своей частотой rate. Поток 0 выполняется в вызывающем потоке.
+Фоновый поток раз в report_interval секунд пишет в CSV (MeasurementWriter,
+RATE_COLUMNS) запрошенное и достигнутое число операций каждого потока.
+"""
+
+import math
+import multiprocessing
+import re
+import threading
+import time
+
+from sidechannel.events import EVENT_ACCESS, EVENT_COLUMNS
+from sidechannel.measurements import iter_column
+from sidechannel.npyfile import read_array
+from sidechannel.scheduler import DEFAULT_SPIN_NS, wait_until
+from sidechannel.trace import RECORD_ITERATION, TRACE_WIDTH
+
+SCHEDULES = ("fixed", "sequential", "random", "file")
+WORKER_MODES = ("thread", "process")
+
+RATE_COLUMNS = [
+    'interval', 'start_s', 'duration_s', 'worker',
+    'requested', 'achieved', 'requested_rate', 'achieved_rate', 'late'
+]
+
+LATE_THRESHOLD_NS = 1_000_000  # Опоздание операции, после которого она считается опоздавшей
+START_DELAY_NS = 50_000_000  # Общий старт потоков нагрузки - после запуска всех процессов
+DEFAULT_REPORT_INTERVAL = 1.0
+LAG_PHASE = "lag"  # Фаза профиля: опоздание начала операции (входит в паузы между операциями)
+
+timer_ns = time.perf_counter_ns
+
+
+class Pacer:
+    """Моменты начала операций нагрузки (см. описание модуля)"""
+
+    def __init__(self, rate, duty_cycle=1.0, period=1.0, burst=1):
+        if rate < 0:
+            raise ValueError(f"Частота нагрузки не может быть отрицательной: {rate}")
+        if not 0 < duty_cycle <= 1:
+            raise ValueError(f"Доля активной части цикла должна быть в (0, 1]: {duty_cycle}")
+        if period <= 0:
+            raise ValueError(f"Длительность цикла должна быть положительной: {period}")
+        if burst < 1:
+            raise ValueError(f"Размер пачки должен быть не меньше 1: {burst}")
+        self.rate = rate
+        self.duty_cycle = duty_cycle
+        self.burst = int(burst)
+        self.period_ns = int(period * 1e9)
+
+        self.per_cycle = None  # операций в цикле (None - без циклов)
+        self.group_ns = 0.0
+        if rate and duty_cycle < 1:
+            self.per_cycle = max(self.burst, round(rate * period))
+            groups = -(-self.per_cycle // self.burst)
+            self.group_ns = duty_cycle * self.period_ns / groups
+        elif rate:
+            self.group_ns = self.burst * 1e9 / rate
+
+    @property
+    def unlimited(self):
+        return not self.rate
+
+    @property
+    def requested_rate(self):
+        """Средняя частота операций (с учётом округления операций цикла)"""
+        if self.per_cycle is not None:
+            return self.per_cycle * 1e9 / self.period_ns
+        return self.rate
+
+    def offset_ns(self, operation):
+        """Смещение начала операции от старта расписания, нс"""
+        if self.unlimited:
+            return 0
+        if self.per_cycle is None:
+            return int(operation // self.burst * self.group_ns)
+        cycle, position = divmod(operation, self.per_cycle)
+        return cycle * self.period_ns + int(position // self.burst * self.group_ns)
+
+    def due(self, elapsed_ns):
+        """Число операций, начало которых запланировано раньше elapsed_ns"""
+        if self.unlimited or elapsed_ns <= 0:
+            return 0
+        if self.per_cycle is None:
+            return math.ceil(elapsed_ns / self.group_ns) * self.burst
+        cycle, rest = divmod(elapsed_ns, self.period_ns)
+        groups = math.ceil(rest / self.group_ns)
+        return cycle * self.per_cycle + min(self.per_cycle, groups * self.burst)
+
+    def describe(self):
+        if self.unlimited:
+            return "без ограничения частоты"
+        text = f"{self.requested_rate:g} оп/с"
+        if self.per_cycle is not None:
+            text += f", активная доля {self.duty_cycle:g} цикла {self.period_ns / 1e9:g} с"
+        if self.burst > 1:
+            text += f", пачки по {self.burst}"
+        return text
+
+
+class FixedSchedule:
+    """Один и тот же секрет на всех итерациях"""
+
+    def __init__(self, value=42):
+        self.value = value % 256
+
+    def __call__(self, iteration):
+        return self.value
+
+
+class SequentialSchedule:
+    """Секрет увеличивается на step каждые period итераций (начиная с итерации 0)"""
+
+    def __init__(self, initial=42, step=13, period=100):
+        self.initial = initial
+        self.step = step
+        self.period = period
+
+    def __call__(self, iteration):
+        return (self.initial + self.step * (1 + iteration // self.period)) % 256
+
+
+class RandomSchedule:
+    """Случайный секрет на каждые period итераций, воспроизводимый по seed"""
+
+    def __init__(self, seed=2025, period=100):
+        self.seed = seed
+        self.period = period
+
+    def __call__(self, iteration):
+        # Значение зависит только от (seed, номер смены) - одинаково во всех потоках
+        return _mix(self.seed, iteration // self.period) % 256
+
+
+class ReplaySchedule:
+    """Секреты по итерациям из записанной последовательности (по кругу)"""
+
+    def __init__(self, secrets):
+        if not secrets:
+            raise ValueError("Пустая последовательность секретов")
+        self.secrets = list(secrets)
+
+    def __call__(self, iteration):
+        return self.secrets[iteration % len(self.secrets)]
+
+
+def _mix(seed, value):
+    """Перемешивание 64-битного целого (splitmix64)"""
+    x = (seed * 0x9E3779B97F4A7C15 + value + 1) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+def load_secrets(path):
+    """
+    Последовательность секретов по итерациям из файла
+
+    .npy - события victim (секреты событий обращения) или трасса
+    обращений (секреты итераций); иначе - текст с числами через пробелы,
+    запятые или переводы строк (# - комментарий до конца строки)
+    """
+    if str(path).endswith(".npy"):
+        values, width = read_array(path)
+        if width == len(EVENT_COLUMNS):
+            kind, secret = EVENT_COLUMNS.index('kind'), EVENT_COLUMNS.index('secret')
+            return [row_secret for row_kind, row_secret in zip(values[kind::width], values[secret::width])
+                    if row_kind == EVENT_ACCESS]
+        if width == TRACE_WIDTH:
+            return [row_secret for row_kind, row_secret in zip(values[0::width], values[3::width])
+                    if row_kind == RECORD_ITERATION]
+        raise ValueError(f"{path}: не похоже на события или трассу victim ({width} столбцов)")
+
+    with open(path, 'r', encoding='utf-8') as f:
+        text = re.sub(r"#.*", "", f.read())
+    return [int(token, 0) % 256 for token in re.split(r"[\s,;]+", text) if token]
+
+
+def make_schedule(name, period=100, initial=42, step=13, seed=2025, path=""):
+    """Расписание секретов по имени (SCHEDULES)"""
+    if name == "fixed":
+        return FixedSchedule(initial)
+    if name == "sequential":
+        return SequentialSchedule(initial, step, period)
+    if name == "random":
+        return RandomSchedule(seed, period)
+    if name == "file":
+        if not path:
+            raise ValueError("Для расписания file нужен путь к файлу секретов")
+        return ReplaySchedule(load_secrets(path))
+    raise ValueError(f"Неизвестное расписание секретов: {name!r} (допустимо: {', '.join(SCHEDULES)})")
+
+
+def _run_worker(worker, step, pacer, schedule, start_ns, stop_ns, counters, stop, spin_ns, lag=None):
+    """
+    Цикл потока нагрузки: step(iteration, secret) по расписанию pacer
+
+    counters[2 * worker] - выполнено операций, counters[2 * worker + 1] - опозданий;
+    lag - гистограмма опозданий начала операций (profiling.PhaseHistogram)
+    """
+    done = late = 0
+    while not stop.is_set():
+        if pacer.unlimited:
+            if timer_ns() >= stop_ns:
+                break
+        else:
+            deadline = start_ns + pacer.offset_ns(done)
+            if deadline >= stop_ns:
+                break
+            delay = wait_until(deadline, spin_ns) - deadline
+            if lag is not None:
+                lag.record(delay)
+            if delay > LATE_THRESHOLD_NS:
+                late += 1
+                counters[2 * worker + 1] = late
+        step(done, schedule(done))
+        done += 1
+        counters[2 * worker] = done
+    return done
+
+
+def _worker_main(factory, worker, *args):
+    """Точка входа дополнительного потока/процесса нагрузки"""
+    try:
+        _run_worker(worker, factory(worker), *args)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C получает вся группа процессов - остановкой управляет поток 0
+
+
+class WorkloadEngine:
+    """
+    Нагрузка из workers потоков с общим расписанием операций и секретов
+
+    Использование:
+        engine = WorkloadEngine(Pacer(100), SequentialSchedule(), rate_writer=writer)
+        iterations = engine.run(step, duration_s, worker_factory)
+    """
+
+    def __init__(self, pacer, schedule, workers=1, worker_mode="thread", rate_writer=None,
+                 report_interval=DEFAULT_REPORT_INTERVAL, spin_ns=DEFAULT_SPIN_NS, profiler=None):
+        """
+        profiler - PhaseProfiler: опоздания начала операций потока 0 (фаза lag);
+        опоздание уже входит во время между операциями, поэтому фаза
+        не учитывается в доле времени остальных фаз
+        """
+        if workers < 1:
+            raise ValueError(f"Число потоков нагрузки должно быть не меньше 1: {workers}")
+        if worker_mode not in WORKER_MODES:
+            raise ValueError(f"Неизвестный режим потоков нагрузки: {worker_mode!r} "
+                             f"(допустимо: {', '.join(WORKER_MODES)})")
+        self.pacer = pacer
+        self.schedule = schedule
+        self.workers = workers
+        self.worker_mode = worker_mode
+        self.rate_writer = rate_writer
+        self.report_interval_ns = int(report_interval * 1e9)
+        self.spin_ns = spin_ns
+        self.lag = profiler.histogram(LAG_PHASE, overlapping=True) if profiler is not None else None
+        self.completed = [0] * workers  # операций каждого потока после run()
+        self.late = [0] * workers
+        self.elapsed = 0.0
+
+    def run(self, step, duration_s, worker_factory=None):
+        """
+        Выполняет нагрузку duration_s секунд; возвращает число операций потока 0
+
+        step(iteration, secret) - операция потока 0; worker_factory(worker)
+        создаёт операцию дополнительного потока (вызывается в нём самом,
+        для процессов - после fork). KeyboardInterrupt останавливает все потоки.
+        """
+        if self.workers > 1 and worker_factory is None:
+            raise ValueError("Для нескольких потоков нагрузки нужна worker_factory")
+        if self.worker_mode == "process":
+            context = multiprocessing.get_context("fork")
+            counters = context.Array('q', 2 * self.workers, lock=False)
+            stop = context.Event()
+            spawn = context.Process
+        else:
+            counters = [0] * (2 * self.workers)
+            stop = threading.Event()
+            spawn = threading.Thread
+
+        start_ns = timer_ns() + (START_DELAY_NS if self.workers > 1 else 0)
+        stop_ns = start_ns + int(duration_s * 1e9)
+        args = (self.pacer, self.schedule, start_ns, stop_ns, counters, stop, self.spin_ns)
+        extra = [spawn(target=_worker_main, args=(worker_factory, worker) + args,
+                       name=f"workload-{worker}", daemon=True)
+                 for worker in range(1, self.workers)]
+        for worker in extra:
+            worker.start()
+
+        monitor = None
+        finished = threading.Event()
+        if self.rate_writer is not None:
+            monitor = threading.Thread(target=self._report, args=(start_ns, stop_ns, counters, finished),
+                                       name="workload-rate", daemon=True)
+            monitor.start()
+
+        try:
+            _run_worker(0, step, *args, lag=self.lag)
+            wait_until(stop_ns, self.spin_ns)  # после последней операции - простой до конца
+        finally:
+            stop.set()
+            for worker in extra:
+                worker.join()
+            finished.set()
+            if monitor is not None:
+                monitor.join()
+            self.elapsed = (min(timer_ns(), stop_ns) - start_ns) / 1e9
+            self.completed = [counters[2 * worker] for worker in range(self.workers)]
+            self.late = [counters[2 * worker + 1] for worker in range(self.workers)]
+        return self.completed[0]
+
+    def _report(self, start_ns, stop_ns, counters, stop):
+        """Строки RATE_COLUMNS за каждый интервал; последний - до остановки всех потоков"""
+        previous = [0] * self.workers
+        previous_late = [0] * self.workers
+        interval = 0
+        begin_ns = start_ns
+        while True:
+            end_ns = min(begin_ns + self.report_interval_ns, stop_ns)
+            while not stop.is_set() and timer_ns() < end_ns:
+                stop.wait(min(0.1, max(0.0, (end_ns - timer_ns()) / 1e9)))
+            if stop.is_set():
+                end_ns = min(timer_ns(), end_ns)
+            if end_ns > begin_ns:
+                duration = (end_ns - begin_ns) / 1e9
+                requested = self.pacer.due(end_ns - start_ns) - self.pacer.due(begin_ns - start_ns)
+                for worker in range(self.workers):
+                    done, late = counters[2 * worker], counters[2 * worker + 1]
+                    achieved = done - previous[worker]
+                    self.rate_writer.append_values([
+                        interval, round((begin_ns - start_ns) / 1e9, 6), round(duration, 6), worker,
+                        "" if self.pacer.unlimited else requested, achieved,
+                        "" if self.pacer.unlimited else round(requested / duration, 3),
+                        round(achieved / duration, 3), late - previous_late[worker],
+                    ])
+                    previous[worker], previous_late[worker] = done, late
+                interval += 1
+            if stop.is_set() or end_ns >= stop_ns:
+                return
+            begin_ns = end_ns
+
+
+def summarize_rate(path):
+    """
+    Итог CSV частоты нагрузки (RATE_COLUMNS): операций всех потоков,
+    их суммарная частота за время работы и число опоздавших операций.
+    Пустой словарь, если файла нет или в нём нет ни одного интервала
+    """
+    try:
+        ends = [start + duration for start, duration in
+                zip(iter_column(path, 'start_s'), iter_column(path, 'duration_s'))]
+    except FileNotFoundError:
+        return {}
+    if not ends or max(ends) <= 0:
+        return {}
+    achieved = sum(iter_column(path, 'achieved'))
+    return {'victim_ops': int(achieved), 'victim_rate': round(achieved / max(ends), 3),
+            'victim_late': int(sum(iter_column(path, 'late')))}
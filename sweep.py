@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Серия экспериментов по сетке параметров
+
+Для каждой комбинации параметров и размещения (same-core, sibling,
+cross-core, cross-socket - см. sidechannel.affinity) запускается пара victim/attacker
+как локальные процессы, привязанные к CPU через os.sched_setaffinity.
+Параметры передаются переменными окружения SC_<ИМЯ> (sidechannel.config),
+результаты каждого запуска пишутся в свой каталог (SC_LOG_DIR).
+Независимые конфигурации выполняются параллельно на непересекающихся
+физических ядрах.
+
+Результат - единый индексированный набор данных в --output:
+  index.csv           - строка на запуск: параметры, CPU, статус, сводка
+  rounds.csv          - все раунды всех запусков со столбцом run_id
+  runs/<run_id>/      - файлы запуска (CSV, .npy, логи, run.json)
+С --catalog успешные запуски регистрируются в каталоге прогонов
+(analysis.catalog, run_catalog.py) с параметрами и сводными статистиками.
+
+Использование:
+    python sweep.py --grid grid.json --output sweeps/study1
+    python sweep.py -p attacker.PROBE_MODE=single,sweep -p victim.STRIDE=64,4096 \\
+                    --placements same-core cross-core --repeat 3
+
+Формат grid.json:
+    {"attacker": {"TOTAL_ROUNDS": [300], "PROBE_MODE": ["single", "sweep"]},
+     "victim": {"STRIDE": [64, 4096]},
+     "placement": ["same-core", "cross-core"],
+     "repeat": 2}
+Запуск с уже завершённым run.json пропускается - прерванную серию
+можно продолжить той же командой.
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sidechannel.affinity import (
+    PLACEMENTS, CoreAllocator, assign_cpus, check_placement, cpu_topology, host_info,
+)
+from sidechannel.config import ENV_PREFIX, LOG_DIR_VARIABLE
+from sidechannel.measurements import CSV_COLUMNS, committed_length, iter_column
+from sidechannel.stats import RunningStats
+from sidechannel.workload import summarize_rate
+
+REPO_ROOT = Path(__file__).resolve().parent
+PROGRAMS = {
+    'victim': REPO_ROOT / "victim" / "victim.py",
+    'attacker': REPO_ROOT / "attacker" / "attacker.py",
+}
+OUTPUT_DIR = Path("sweeps") / "latest"
+RUN_TIMEOUT = 600.0  # Секунд на запуск, после чего пара принудительно завершается
+STARTUP_DELAY = 1.0  # Ожидание attacker перед первым раундом (victim уже запущен)
+STOP_GRACE = 5.0  # Секунд на штатное завершение victim после SIGTERM
+POLL_INTERVAL = 0.2
+MEASUREMENTS_NAME = "attacker_measurements.csv"  # Имя CSV в каталоге логов запуска
+RATE_NAME = "victim_rate.csv"  # Частота нагрузки victim по интервалам
+SUMMARY_COLUMNS = ('elapsed_s', 'rounds', 'rounds_per_s', 'avg_time_mean', 'avg_time_stdev',
+                   'suspicious_mean', 'victim_rate', 'victim_late')
+INDEX_COLUMNS = ('run_id', 'status', 'reason', 'placement', 'repeat', 'victim_cpus', 'attacker_cpus',
+                 *SUMMARY_COLUMNS, 'path')
+# Ключи конфигурации запуска, не являющиеся параметрами программ
+CONFIG_KEYS = ('placement', 'repeat')
+
+
+def expand_grid(grid, placements, repeat):
+    """Список конфигураций {'attacker': {...}, 'victim': {...}, 'placement', 'repeat'}"""
+    axes = [(target, name, values) for target in PROGRAMS
+            for name, values in sorted(grid.get(target, {}).items())]
+    configs = []
+    for combo in itertools.product(*(values for _, _, values in axes)):
+        params = {target: {} for target in PROGRAMS}
+        for (target, name, _), value in zip(axes, combo):
+            params[target][name] = value
+        for placement in placements:
+            for rep in range(repeat):
+                configs.append(dict(params, placement=placement, repeat=rep))
+    return configs
+
+
+def run_id(config):
+    """Идентификатор запуска - хеш конфигурации (не зависит от состава сетки)"""
+    digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return f"{config['placement']}-{digest}"
+
+
+def program_env(params, log_dir):
+    """Окружение процесса: SC_* переопределения и путь к пакету sidechannel"""
+    env = dict(os.environ)
+    env.update({ENV_PREFIX + name: str(value) for name, value in params.items()})
+    env[LOG_DIR_VARIABLE] = str(log_dir)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get('PYTHONPATH')]))
+    return env
+
+
+def _pinned(cpus):
+    """preexec_fn: привязка дочернего процесса к CPU до запуска интерпретатора"""
+    return lambda: os.sched_setaffinity(0, cpus)
+
+
+class Run:
+    """Один запуск пары victim/attacker"""
+
+    def __init__(self, run_id, config, output_dir):
+        self.run_id = run_id
+        self.config = config
+        self.path = output_dir / "runs" / run_id
+        self.cores = None
+        self.cpus = {}
+        self.processes = {}
+        self.started = None
+        self.result = {'status': 'pending', 'reason': ''}
+
+    @property
+    def record_path(self):
+        return self.path / "run.json"
+
+    def load_finished(self):
+        """Результат завершённого ранее запуска с той же конфигурацией"""
+        try:
+            record = json.loads(self.record_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        if record.get('config') != self.config or record.get('status') != 'ok':
+            return False
+        self.result = record
+        return True
+
+    def start(self, cores, timeout, startup_delay):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.cores = cores
+        victim_cpus, attacker_cpus = assign_cpus(self.config['placement'], cores)
+        self.cpus = {'victim': victim_cpus, 'attacker': attacker_cpus}
+        params = {
+            'victim': dict({'DURATION_SECONDS': timeout}, **self.config['victim']),
+            'attacker': dict({'STARTUP_DELAY': startup_delay}, **self.config['attacker']),
+        }
+        self.started = time.monotonic()
+        for target in PROGRAMS:
+            with open(self.path / f"{target}.out", 'wb') as out:
+                self.processes[target] = subprocess.Popen(
+                    [sys.executable, '-u', str(PROGRAMS[target])],
+                    cwd=self.path, env=program_env(params[target], self.path),
+                    stdout=out, stderr=subprocess.STDOUT,
+                    preexec_fn=_pinned(self.cpus[target]))
+
+    def poll(self, timeout):
+        """True, если запуск завершён (attacker вышел или истёк таймаут)"""
+        attacker = self.processes['attacker']
+        timed_out = time.monotonic() - self.started > timeout
+        if attacker.poll() is None and not timed_out:
+            return False
+
+        if timed_out and attacker.poll() is None:
+            attacker.send_signal(signal.SIGTERM)
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(STOP_GRACE)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        code = attacker.returncode
+        if timed_out:
+            self.result = {'status': 'timeout', 'reason': f"превышен таймаут {timeout:g} с"}
+        elif code != 0:
+            self.result = {'status': 'failed', 'reason': f"attacker завершился с кодом {code}"}
+        else:
+            self.result = {'status': 'ok', 'reason': ''}
+        self.result['elapsed_s'] = round(time.monotonic() - self.started, 3)
+        self.result.update(summarize(self.path / MEASUREMENTS_NAME))
+        self.result.update(summarize_rate(self.path / RATE_NAME))
+        self.save()
+        return True
+
+    def skip(self, reason):
+        self.result = {'status': 'skipped', 'reason': reason}
+
+    def save(self):
+        record = dict(self.result, config=self.config, host=host_info(),
+                      cpus={target: sorted(cpus) for target, cpus in self.cpus.items()})
+        tmp = self.record_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(record, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.record_path)
+
+    def index_row(self, output_dir):
+        cpus = self.result.get('cpus') or {t: sorted(c) for t, c in self.cpus.items()}
+        row = {
+            'run_id': self.run_id,
+            'status': self.result['status'],
+            'reason': self.result.get('reason', ''),
+            'placement': self.config['placement'],
+            'repeat': self.config['repeat'],
+            'victim_cpus': " ".join(map(str, cpus.get('victim', []))),
+            'attacker_cpus': " ".join(map(str, cpus.get('attacker', []))),
+            'path': os.path.relpath(self.path, output_dir),
+        }
+        for name in SUMMARY_COLUMNS:
+            row[name] = self.result.get(name, '')
+        for target in PROGRAMS:
+            for name, value in self.config[target].items():
+                row[f"{target}.{name}"] = value
+        # Прочие метки конфигурации (например, pairs и instance у scale_out.py)
+        for name, value in self.config.items():
+            if name not in PROGRAMS and name not in CONFIG_KEYS:
+                row[name] = value
+        return row
+
+
+def summarize(measurements):
+    """Краткая сводка запуска по CSV измерений (без загрузки в память)"""
+    if not measurements.exists():
+        return {'rounds': 0}
+    avg = RunningStats()
+    for value in iter_column(measurements, 'avg_time_ns'):
+        avg.add(value)
+    suspicious = RunningStats()
+    for value in iter_column(measurements, 'suspicious_count'):
+        suspicious.add(value)
+    if not avg.count:
+        return {'rounds': 0}
+    first = last = None
+    for value in iter_column(measurements, 'timestamp'):
+        first = value if first is None else first
+        last = value
+    summary = {'rounds': avg.count, 'avg_time_mean': round(avg.mean, 3),
+               'avg_time_stdev': round(avg.stdev, 3), 'suspicious_mean': round(suspicious.mean, 3)}
+    if last > first:
+        # Пропускная способность attacker: раундов в секунду между первым и последним раундом
+        summary['rounds_per_s'] = round((avg.count - 1) / (last - first), 3)
+    return summary
+
+
+def write_index(runs, output_dir):
+    """index.csv: строка на запуск (столбцы параметров - объединение по сетке)"""
+    rows = [run.index_row(output_dir) for run in runs]
+    params = sorted({key for row in rows for key in row if key not in INDEX_COLUMNS})
+    path = output_dir / "index.csv"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(INDEX_COLUMNS) + params)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def write_rounds(runs, output_dir):
+    """rounds.csv: раунды всех успешных запусков со столбцом run_id (построчно)"""
+    path = output_dir / "rounds.csv"
+    columns = None
+    with open(path, 'wb') as out:
+        for run in runs:
+            source = run.path / MEASUREMENTS_NAME
+            if run.result['status'] != 'ok' or not source.exists():
+                continue
+            length, _ = committed_length(source)
+            with open(source, 'rb') as f:
+                header = f.readline()
+                if columns is None:
+                    columns = header
+                    out.write(b"run_id," + header)
+                elif header != columns:
+                    print(f"ВНИМАНИЕ: {source}: другой набор столбцов, запуск не включён в rounds.csv")
+                    continue
+                prefix = run.run_id.encode('ascii') + b","
+                remaining = length - len(header)
+                for line in f:
+                    if remaining <= 0:
+                        break
+                    remaining -= len(line)
+                    out.write(prefix + line)
+        if columns is None:
+            out.write(("run_id," + ",".join(CSV_COLUMNS) + "\n").encode('ascii'))
+    return path
+
+
+def register_runs(runs, catalog_path):
+    """Регистрирует успешные запуски в каталоге прогонов (нужны NumPy/pandas)"""
+    from analysis.catalog import DEFAULT_PATH, Catalog
+
+    with Catalog(catalog_path or DEFAULT_PATH) as catalog:
+        for run in runs:
+            if run.result['status'] != 'ok' or not (run.path / MEASUREMENTS_NAME).exists():
+                continue
+            try:
+                catalog.register(run.path)
+            except (OSError, ValueError) as e:
+                print(f"[{run.run_id}] не зарегистрирован в каталоге: {e}")
+                continue
+            print(f"[{run.run_id}] зарегистрирован в каталоге {catalog.path}")
+
+
+def run_sweep(configs, output_dir, jobs, timeout, startup_delay):
+    """Выполняет все конфигурации; возвращает список Run в порядке конфигураций"""
+    topology = cpu_topology()
+    allocator = CoreAllocator(topology)
+    runs = [Run(run_id(config), config, output_dir) for config in configs]
+
+    queue = []
+    for run in runs:
+        reason = check_placement(run.config['placement'], topology)
+        if reason:
+            run.skip(reason)
+        elif run.load_finished():
+            print(f"[{run.run_id}] уже выполнен, пропуск")
+        else:
+            queue.append(run)
+
+    print(f"Физических ядер: {len(topology)}, конфигураций: {len(runs)}, к запуску: {len(queue)}")
+    running = []
+    while queue or running:
+        # Запускаем всё, для чего есть свободные ядра
+        for run in list(queue):
+            if len(running) >= jobs:
+                break
+            cores = allocator.acquire(run.config['placement'])
+            if cores is None:
+                continue
+            queue.remove(run)
+            run.start(cores, timeout, startup_delay)
+            running.append(run)
+            print(f"[{run.run_id}] старт: {run.config['placement']}, "
+                  f"victim CPU {sorted(run.cpus['victim'])}, attacker CPU {sorted(run.cpus['attacker'])}")
+
+        time.sleep(POLL_INTERVAL)
+        for run in list(running):
+            if run.poll(timeout):
+                running.remove(run)
+                allocator.release(run.cores)
+                print(f"[{run.run_id}] {run.result['status']}: {run.result.get('rounds', 0)} раундов, "
+                      f"{run.result['elapsed_s']:.1f} с {run.result['reason']}")
+    return runs
+
+
+def parse_param(text):
+    """'attacker.NAME=v1,v2' -> (target, name, [v1, v2])"""
+    key, _, values = text.partition('=')
+    target, _, name = key.partition('.')
+    if target not in PROGRAMS or not name or not values:
+        raise argparse.ArgumentTypeError(f"ожидалось victim.ИМЯ=v1,v2 или attacker.ИМЯ=v1,v2: {text}")
+    return target, name, values.split(',')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Серия экспериментов victim/attacker по сетке параметров",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__)
+    parser.add_argument('--grid', type=Path, help="JSON с сеткой параметров")
+    parser.add_argument('-p', '--param', type=parse_param, action='append', default=[],
+                        help="ось сетки: attacker.ИМЯ=v1,v2 или victim.ИМЯ=v1,v2")
+    parser.add_argument('--placements', nargs='+', choices=PLACEMENTS, default=None,
+                        help="размещения (по умолчанию - из --grid или same-core)")
+    parser.add_argument('--repeat', type=int, default=None, help="повторов каждой конфигурации")
+    parser.add_argument('--output', type=Path, default=OUTPUT_DIR, help="каталог набора данных")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="максимум параллельных пар (ограничено также числом ядер)")
+    parser.add_argument('--timeout', type=float, default=RUN_TIMEOUT, help="секунд на запуск")
+    parser.add_argument('--startup-delay', type=float, default=STARTUP_DELAY,
+                        help="ожидание attacker перед первым раундом, сек")
+    parser.add_argument('--catalog', nargs='?', const='', default=None,
+                        help="зарегистрировать успешные запуски в каталоге (без значения - catalog/catalog.sqlite)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    grid = json.loads(args.grid.read_text(encoding='utf-8')) if args.grid else {}
+    for target, name, values in args.param:
+        grid.setdefault(target, {})[name] = values
+    placements = args.placements or grid.get('placement') or ['same-core']
+    repeat = args.repeat or grid.get('repeat', 1)
+
+    configs = expand_grid(grid, placements, repeat)
+    args.output.mkdir(parents=True, exist_ok=True)
+    runs = run_sweep(configs, args.output, args.jobs, args.timeout, args.startup_delay)
+
+    index_path = write_index(runs, args.output)
+    rounds_path = write_rounds(runs, args.output)
+    statuses = {}
+    for run in runs:
+        statuses[run.result['status']] = statuses.get(run.result['status'], 0) + 1
+    print("Итог: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    print(f"Индекс запусков: {index_path}")
+    print(f"Раунды всех запусков: {rounds_path}")
+    if args.catalog is not None:
+        register_runs(runs, args.catalog)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""Общие настройки тестов: корень репозитория и каталоги скриптов в sys.path"""
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(REPO_ROOT))
+# attacker.py и victim.py - самостоятельные скрипты, а не пакеты
+for _subdir in ("attacker", "victim"):
+    sys.path.insert(0, str(REPO_ROOT / _subdir))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Сопоставление событий victim с раундами attacker (analysis.alignment)"""
+
+import numpy as np
+
+from analysis.alignment import NO_SECRET, align_rounds
+from sidechannel.events import EVENT_ACCESS, EVENT_COLUMNS, EVENT_SECRET
+
+
+def make_events(rows):
+    """rows - кортежи (timestamp, kind, secret, index); итерация = номер строки"""
+    events = np.zeros((len(rows), len(EVENT_COLUMNS)), dtype=np.int64)
+    for i, (timestamp, kind, secret, index) in enumerate(rows):
+        events[i, EVENT_COLUMNS.index('timestamp_ns')] = timestamp
+        events[i, EVENT_COLUMNS.index('kind')] = kind
+        events[i, EVENT_COLUMNS.index('iteration')] = i
+        events[i, EVENT_COLUMNS.index('secret')] = secret
+        events[i, EVENT_COLUMNS.index('index')] = index
+    return events
+
+
+def test_rounds_get_secret_and_accesses():
+    # Запись нарочно не по порядку времени
+    events = make_events([
+        (150, EVENT_ACCESS, 3, 300),
+        (100, EVENT_SECRET, 3, -1),
+        (120, EVENT_ACCESS, 3, 310),
+        (250, EVENT_SECRET, 5, -1),
+        (260, EVENT_ACCESS, 5, 500),
+    ])
+    bounds = np.array([[0, 90], [90, 200], [200, 300], [300, 400]])
+    labels = align_rounds(bounds, events)
+
+    assert list(labels['secret']) == [NO_SECRET, 3, 5, 5]
+    assert list(labels['secret_start']) == [NO_SECRET, NO_SECRET, 3, 5]
+    assert list(labels['secret_changed']) == [False, True, True, False]
+    assert list(labels['accesses']) == [0, 2, 1, 0]
+    assert list(labels['last_index']) == [-1, 300, 500, -1]
+
+
+def test_secret_from_accesses_without_change_events():
+    events = make_events([(10, EVENT_ACCESS, 1, 0), (30, EVENT_ACCESS, 2, 64)])
+    labels = align_rounds(np.array([[0, 20], [20, 40]]), events)
+    assert list(labels['secret']) == [1, 2]
+    assert list(labels['accesses']) == [1, 1]
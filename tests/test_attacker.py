@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Цикл раундов attacker на симуляторе кеша: запись измерений при прерывании"""
+
+import os
+import signal
+
+import pytest
+
+import attacker
+from sidechannel.measurements import iter_column
+from sidechannel.npyfile import open_npy
+
+ROUNDS = 10
+BATCH = 4
+
+
+@pytest.fixture
+def sim_run(tmp_path, monkeypatch):
+    """attacker с бэкендом sim, файлами в tmp_path и без ожиданий между раундами"""
+    settings = {
+        'CACHE_BACKEND': 'sim', 'TOTAL_ROUNDS': ROUNDS, 'WRITE_BATCH_SIZE': BATCH,
+        'NUM_SETS': 16, 'ARRAY_SIZE': 16 * 4096, 'MEASUREMENTS_PER_ROUND': 4,
+        'ROUND_RATE_HZ': 0.0, 'PRIME_PROBE_WAIT_NS': 0, 'CALIBRATION_INTERVAL': 0,
+        'PROFILE_PHASES': False, 'PUBLISH_SOCKET': None, 'LOG_FILE': os.devnull,
+        'LOG_ECHO': False, 'PROFILE_WINDOW_PREFIX': str(tmp_path / 'window'),
+    }
+    for name in ('MEASUREMENTS_FILE', 'SETS_MATRIX_FILE', 'TIMESTAMPS_FILE',
+                 'BASELINES_FILE', 'SIM_EVENTS_FILE', 'PROFILE_FILE'):
+        settings[name] = str(tmp_path / os.path.basename(getattr(attacker, name)))
+    for name, value in settings.items():
+        monkeypatch.setattr(attacker, name, value)
+    monkeypatch.setattr(attacker, '_logger', None)
+    handler = signal.getsignal(signal.SIGTERM)
+    yield tmp_path
+    signal.signal(signal.SIGTERM, handler)
+    if attacker._logger is not None:
+        attacker._logger.close()
+
+
+def rounds_written(directory):
+    rounds = list(iter_column(str(directory / 'attacker_measurements.csv'), 'round'))
+    matrix = open_npy(directory / 'attacker_sets.npy')
+    timestamps = open_npy(directory / 'attacker_timestamps.npy')
+    return rounds, len(matrix), len(timestamps)
+
+
+def test_all_rounds_written(sim_run):
+    attacker.main()
+    rounds, matrix_rows, timestamp_rows = rounds_written(sim_run)
+    assert rounds == list(range(ROUNDS))
+    assert matrix_rows == timestamp_rows == ROUNDS
+
+
+def test_interrupt_during_flush_writes_no_duplicates(sim_run, monkeypatch):
+    save = attacker.save_measurements
+    calls = []
+
+    def interrupted(store, count, *writers):
+        # SIGTERM сразу после записи первой пачки, до возврата из сброса
+        save(store, count, *writers)
+        calls.append(count)
+        if len(calls) == 1:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(attacker, 'save_measurements', interrupted)
+    attacker.main()
+    assert calls[0] == BATCH
+    rounds, matrix_rows, timestamp_rows = rounds_written(sim_run)
+    assert rounds == list(range(BATCH))
+    assert matrix_rows == timestamp_rows == BATCH
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Выделение и заполнение буферов (sidechannel.buffers)"""
+
+import mmap
+
+import pytest
+
+from sidechannel.buffers import (FILL_PATTERN, FILL_RANDOM, FILL_ZERO, PAGE_SIZE,
+                                 allocate_buffer, pattern_bytes, random_bytes)
+
+
+def test_pattern_matches_reference():
+    size = 3 * 256 + 17
+    assert pattern_bytes(size) == bytes(i % 256 for i in range(size))
+
+
+def test_random_is_reproducible_with_seed():
+    assert random_bytes(1000, seed=7) == random_bytes(1000, seed=7)
+    assert random_bytes(1000, seed=7) != random_bytes(1000, seed=8)
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_allocate_fills_buffer(use_mmap):
+    size = 2 * PAGE_SIZE + 100
+    buf = allocate_buffer(size, FILL_PATTERN, use_mmap=use_mmap)
+    assert isinstance(buf, mmap.mmap if use_mmap else bytearray)
+    assert len(buf) == size
+    assert bytes(buf[:]) == pattern_bytes(size)
+
+    zero = allocate_buffer(size, FILL_ZERO, use_mmap=use_mmap)
+    assert bytes(zero[:]) == bytes(size)
+
+    noise = allocate_buffer(size, FILL_RANDOM, seed=3, use_mmap=use_mmap)
+    assert bytes(noise[:]) == random_bytes(size, seed=3)
+
+
+@pytest.mark.parametrize('size, fill', [(0, FILL_PATTERN), (-1, FILL_ZERO), (64, 'ones')])
+def test_allocate_rejects_bad_arguments(size, fill):
+    with pytest.raises(ValueError):
+        allocate_buffer(size, fill)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Симулятор кеша sidechannel.cachesim: векторная обработка пачек и модель victim"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from sidechannel.cachesim import (
+    VICTIM_BASE, CacheLevel, SecretAccessModel, parse_hierarchy, parse_size,
+)
+
+
+def reference_lru(lines, num_sets, ways):
+    """Последовательная LRU-модель: по OrderedDict на набор"""
+    sets = [OrderedDict() for _ in range(num_sets)]
+    hits = []
+    for line in lines:
+        entries = sets[line % num_sets]
+        tag = line // num_sets
+        hit = tag in entries
+        if hit:
+            entries.move_to_end(tag)
+        else:
+            if len(entries) == ways:
+                entries.popitem(last=False)
+            entries[tag] = True
+        hits.append(hit)
+    return np.array(hits)
+
+
+def random_lines(seed, count, distinct):
+    return np.random.default_rng(seed).integers(0, distinct, size=count)
+
+
+@pytest.mark.parametrize('batch', [1, 7, 500, 4000])
+def test_lru_matches_sequential_reference(batch):
+    lines = random_lines(1, 4000, 600)
+    level = CacheLevel('L', 16 * 4 * 64, 4, policy='lru')
+    hits = np.concatenate([level.access(lines[i:i + batch]) for i in range(0, len(lines), batch)])
+    np.testing.assert_array_equal(hits, reference_lru(lines.tolist(), 16, 4))
+    assert level.hits == int(hits.sum()) and level.misses == len(lines) - int(hits.sum())
+
+
+def test_plru_batch_matches_one_by_one():
+    lines = random_lines(2, 3000, 400)
+    batched = CacheLevel('L', 8 * 8 * 64, 8, policy='plru')
+    single = CacheLevel('L', 8 * 8 * 64, 8, policy='plru')
+    np.testing.assert_array_equal(batched.access(lines),
+                                  np.concatenate([single.access(lines[i:i + 1])
+                                                  for i in range(len(lines))]))
+
+
+def test_random_policy_is_deterministic_for_seed():
+    lines = random_lines(3, 2000, 300)
+    first = CacheLevel('L', 8 * 4 * 64, 4, policy='random', seed=5).access(lines)
+    second = CacheLevel('L', 8 * 4 * 64, 4, policy='random', seed=5).access(lines)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_level_validation():
+    with pytest.raises(ValueError):
+        CacheLevel('L', 1000, 4)
+    with pytest.raises(ValueError):
+        CacheLevel('L', 6 * 64, 6, policy='plru')
+    with pytest.raises(ValueError):
+        CacheLevel('L', 4 * 64, 4, policy='fifo')
+
+
+def test_hierarchy_latencies_and_flush():
+    cache = parse_hierarchy("L1:1K:2:1,L2:4K:4:5", memory_latency_ns=50)
+    address = VICTIM_BASE + 128
+    latency, served = cache.access([address, address], hit_levels=True)
+    assert latency.tolist() == [50, 1] and served.tolist() == [2, 0]
+
+    # Вытесняем линию из L1 (8 наборов x 2 пути): ещё две линии того же набора
+    cache.access([address + 512, address + 1024])
+    assert cache.access([address]).tolist() == [5]
+    cache.flush()
+    assert cache.access([address]).tolist() == [50]
+    assert cache.stats()['L1']['hits'] == 1
+
+
+def test_parse_hierarchy_errors():
+    assert parse_size('32K') == 32 * 1024 and parse_size('4096') == 4096
+    with pytest.raises(ValueError, match="Некорректный уровень"):
+        parse_hierarchy("L1:32K:8")
+
+
+def test_secret_access_model():
+    model = SecretAccessModel(array_size=1 << 16, stride=4096, interval_ns=1000, secret_period=3)
+    addresses = model.run(4500)  # итерации в моменты 0..4000
+    assert model.iteration == 5
+    assert len(addresses) == 5 * 64
+    # Секрет меняется каждые secret_period итераций
+    assert model.secret == (42 + 2 * 13) % 256
+    first_block = addresses[:64] - VICTIM_BASE
+    assert first_block[0] == model.index((42 + 13) % 256)
+    assert np.all(np.diff(first_block) % (1 << 16) == 64)
+    assert len(model.run(500)) == 0
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Каталог прогонов analysis.catalog на синтетических прогонах"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.catalog import (
+    Catalog, find_runs, parse_assignment, parse_filter, program_defaults, set_moments, PROGRAMS,
+)
+from analysis.synthetic import generate
+
+ROUNDS = 2000
+NUM_SETS = 32
+
+
+@pytest.fixture(scope='module')
+def runs(tmp_path_factory):
+    """Два прогона с утечкой в наборе 5 (вес Хэмминга секрета) и один без утечки"""
+    root = tmp_path_factory.mktemp('runs')
+    directories = {}
+    for name, leak_sets, seed in (('leaky-a', [5], 1), ('leaky-b', [5], 2), ('quiet', [], 3)):
+        directories[name] = root / name
+        generate(directories[name], ROUNDS, {'num_sets': NUM_SETS, 'leak_sets': leak_sets,
+                                             'leak_ns': 40.0, 'leak_model': 'hamming', 'seed': seed,
+                                             'chunk_rounds': 512})
+    return directories
+
+
+@pytest.fixture
+def catalog(tmp_path, runs):
+    with Catalog(tmp_path / 'catalog' / 'catalog.sqlite') as catalog:
+        for name, directory in runs.items():
+            placement = 'same-core' if name.startswith('leaky') else 'cross-core'
+            catalog.register(directory, run_id=name, placement=placement,
+                             params=[('attacker', 'NUM_SETS', str(NUM_SETS))])
+        yield catalog
+
+
+def test_parsers():
+    assert parse_filter('NUM_SETS>=512') == ('NUM_SETS', '>=', '512')
+    assert parse_assignment('attacker.num_sets=512') == ('attacker', 'NUM_SETS', '512')
+    with pytest.raises(ValueError):
+        parse_filter('NUM_SETS')
+    with pytest.raises(ValueError):
+        parse_assignment('defender.X=1')
+
+
+def test_program_defaults_read_from_sources():
+    defaults = program_defaults(PROGRAMS['attacker'])
+    assert defaults['NUM_SETS'] == 256
+    assert 'STRIDE' in program_defaults(PROGRAMS['victim'])
+
+
+def test_set_moments_chunked():
+    matrix = np.random.default_rng(0).normal(100, 5, size=(1000, 4))
+    mean, var = set_moments(matrix, chunk_rows=64)
+    np.testing.assert_allclose(mean, matrix.mean(axis=0))
+    np.testing.assert_allclose(var, matrix.var(axis=0, ddof=1))
+
+
+def test_register_stores_stats_and_columns(catalog, runs):
+    run = catalog.runs(['leaky-a']).iloc[0]
+    assert run['rounds'] == ROUNDS and run['placement'] == 'same-core'
+    measurements = pd.read_csv(runs['leaky-a'] / 'attacker_measurements.csv')
+    assert run['avg_mean'] == pytest.approx(measurements['avg_time_ns'].mean())
+    np.testing.assert_array_equal(catalog.column('leaky-a', 'round'), measurements['round'])
+    with pytest.raises(KeyError):
+        catalog.column('leaky-a', 'missing')
+
+
+def test_leakage_scores(catalog):
+    scores = catalog.set_scores(['leaky-a', 'quiet']).dropna(subset=['max_class_t'])
+    top = scores.loc[scores.groupby('run_id')['max_class_t'].idxmax()].set_index('run_id')
+    assert top.loc['leaky-a', 'set'] == 5
+    runs = catalog.runs(['leaky-a', 'quiet']).set_index('run_id')
+    assert runs.loc['leaky-a', 'leaky_sets'] >= 1
+    assert runs.loc['leaky-a', 'leakage_max_t'] > runs.loc['quiet', 'leakage_max_t']
+
+
+def test_query_filters_and_sort(catalog):
+    table = catalog.query(['placement=same-core'], sort=['-run_id'])
+    assert table['run_id'].tolist() == ['leaky-b', 'leaky-a']
+    assert catalog.query(['NUM_SETS=32', 'rounds>=2000'], limit=1)['run_id'].tolist() == ['leaky-a']
+    # Параметры синтетической модели - из synthetic_truth.json
+    assert len(catalog.query(['synthetic.LEAK_NS=40'])) == 3
+    assert catalog.query(['NUM_SETS=32', 'synthetic.SEED>1'])['run_id'].tolist() == ['leaky-b', 'quiet']
+    with pytest.raises(ValueError):
+        catalog.query(columns=['no_such_column'])
+
+
+def test_aggregate_by_placement(catalog):
+    table = catalog.aggregate(['placement'], metric='leakage_max_t').set_index('placement')
+    assert table.loc['same-core', 'runs'] == 2 and table.loc['cross-core', 'runs'] == 1
+    runs = catalog.runs(['leaky-a', 'leaky-b'])
+    assert table.loc['same-core', 'mean'] == pytest.approx(runs['leakage_max_t'].mean())
+    assert table.loc['same-core', 'rounds'] == 2 * ROUNDS
+
+
+def test_resolve_and_remove(catalog):
+    assert catalog.resolve(['qu']) == ['quiet']
+    with pytest.raises(ValueError, match="неоднозначно"):
+        catalog.resolve(['leaky'])
+    catalog.remove('quiet')
+    with pytest.raises(ValueError, match="не найден"):
+        catalog.resolve(['quiet'])
+
+
+def test_find_runs_in_sweep_dataset(tmp_path, runs):
+    assert find_runs(runs['quiet']) == [runs['quiet']]
+    for name, status in (('a', 'ok'), ('b', 'failed')):
+        directory = tmp_path / 'runs' / name
+        directory.mkdir(parents=True)
+        (directory / 'attacker_measurements.csv').write_text('round\n', encoding='utf-8')
+        (directory / 'run.json').write_text(json.dumps({'status': status}), encoding='utf-8')
+    assert find_runs(tmp_path) == [tmp_path / 'runs' / 'a']
+
+
+def test_run_record_params(tmp_path, runs):
+    """Прогон sweep.py: явные параметры из run.json, остальные - значения по умолчанию"""
+    import shutil
+
+    directory = tmp_path / 'sweep-run'
+    shutil.copytree(runs['quiet'], directory)
+    (directory / 'synthetic_truth.json').unlink()
+    (directory / 'run.json').write_text(json.dumps({
+        'run_id': 'cross-core-0001', 'status': 'ok',
+        'config': {'placement': 'cross-core', 'attacker': {'NUM_SETS': '32'}, 'pairs': 4},
+    }), encoding='utf-8')
+    with Catalog(tmp_path / 'catalog.sqlite') as catalog:
+        row = catalog.register(directory, leakage=False)
+        assert row['run_id'] == 'cross-core-0001' and row['placement'] == 'cross-core'
+        params = catalog.params([row['run_id']]).set_index(['target', 'name'])
+        assert params.loc[('attacker', 'NUM_SETS'), 'number'] == 32
+        assert params.loc[('attacker', 'NUM_SETS'), 'explicit'] == 1
+        assert params.loc[('victim', 'STRIDE'), 'explicit'] == 0
+        assert params.loc[('harness', 'PAIRS'), 'number'] == 4
+        assert catalog.aggregate(['PAIRS'], metric='rounds')['runs'].tolist() == [1]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Переопределение констант через окружение (sidechannel.config)"""
+
+import os
+
+import pytest
+
+from sidechannel.config import apply_env, parse_value
+
+
+@pytest.mark.parametrize('text, current, expected', [
+    ('yes', False, True),
+    ('Off', True, False),
+    ('1_000', 5, 1000),
+    ('0x40', 5, 64),
+    ('2.5', 1.0, 2.5),
+    ('none', None, None),
+    ('/tmp/x', '/logs/x', '/tmp/x'),
+])
+def test_parse_value_follows_current_type(text, current, expected):
+    value = parse_value(text, current)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+def test_apply_env_overrides_constants():
+    namespace = {'ROUNDS': 10, 'VERBOSE': False, 'lowercase': 1, 'TABLE': [1, 2]}
+    environ = {'SC_ROUNDS': '20', 'SC_VERBOSE': 'true', 'SC_lowercase': '5',
+               'SC_TABLE': '3', 'SC_UNKNOWN': 'x'}
+    applied = apply_env(namespace, environ)
+    assert applied == {'ROUNDS': 20, 'VERBOSE': True}
+    assert namespace == {'ROUNDS': 20, 'VERBOSE': True, 'lowercase': 1, 'TABLE': [1, 2]}
+
+
+def test_log_dir_moves_default_paths():
+    namespace = {'LOG_FILE': '/logs/attacker.log', 'OTHER': '/var/log/x', 'TRACE': '/logs/t.bin'}
+    environ = {'SC_LOG_DIR': '/tmp/run', 'SC_TRACE': '/data/t.bin'}
+    apply_env(namespace, environ)
+    assert namespace['LOG_FILE'] == os.path.join('/tmp/run', 'attacker.log')
+    assert namespace['OTHER'] == '/var/log/x'
+    # Явное значение константы важнее переноса каталога
+    assert namespace['TRACE'] == '/data/t.bin'
+
+
+def test_bad_value_raises():
+    with pytest.raises(ValueError):
+        apply_env({'ROUNDS': 10}, {'SC_ROUNDS': 'many'})
+    with pytest.raises(ValueError):
+        parse_value('maybe', True)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Фоновый логгер sidechannel.logger"""
+
+from sidechannel.logger import BackgroundLogger
+
+
+def test_writes_all_messages_in_order(tmp_path, capsys):
+    path = tmp_path / 'activity.log'
+    logger = BackgroundLogger(str(path), "TEST", batch_size=7, echo=False)
+    for i in range(100):
+        logger.log(f"сообщение {i}")
+    logger.close()
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [line.split("TEST: ")[1] for line in lines] == [f"сообщение {i}" for i in range(100)]
+    assert logger.activity() == 100 + logger.writes
+    assert capsys.readouterr().out == ""
+
+
+def test_echo_to_stdout(tmp_path, capsys):
+    logger = BackgroundLogger(str(tmp_path / 'activity.log'), "TEST")
+    logger.log("видно в stdout")
+    logger.close()
+    assert "TEST: видно в stdout" in capsys.readouterr().out
+
+
+def test_overflow_is_counted(tmp_path):
+    logger = BackgroundLogger(str(tmp_path / 'activity.log'), "TEST", queue_size=1,
+                              flush_interval=10, echo=False)
+    for i in range(1000):
+        logger.log(f"{i}")
+    assert logger.dropped > 0
+    assert logger.messages == 1000
+    logger.close()
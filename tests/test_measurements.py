@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Потоковая запись измерений и индекс целых строк (sidechannel.measurements)"""
+
+import os
+
+from sidechannel.measurements import (
+    MeasurementWriter, committed_length, index_path, iter_column, read_index,
+)
+
+COLUMNS = ['round', 'avg_time_ns']
+
+
+def write_rounds(path, rounds, close=True, batch_size=10):
+    writer = MeasurementWriter(str(path), columns=COLUMNS, batch_size=batch_size)
+    for i in range(rounds):
+        writer.append({'round': i, 'avg_time_ns': 100.0 + i})
+    if close:
+        writer.close()
+    else:
+        writer._file.flush()
+    return writer
+
+
+def test_closed_file_is_complete(tmp_path):
+    path = tmp_path / 'measurements.csv'
+    write_rounds(path, 25)
+    assert committed_length(path) == (os.path.getsize(path), True)
+    assert read_index(path)['rounds'] == 25
+    assert list(iter_column(path, 'avg_time_ns')) == [100.0 + i for i in range(25)]
+
+
+def test_crashed_writer_keeps_whole_batches(tmp_path):
+    path = tmp_path / 'measurements.csv'
+    write_rounds(path, 25, close=False)  # пачки по 10: записано 20 раундов
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("20,12")  # оборванная строка
+    length, complete = committed_length(path)
+    assert not complete
+    assert length == read_index(path)['offset']
+    assert len(list(iter_column(path, 'round'))) == 20
+
+
+def test_tail_after_index_counted_to_last_newline(tmp_path):
+    path = tmp_path / 'measurements.csv'
+    write_rounds(path, 20, close=False)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("20,120.0\n21,1")
+    length, complete = committed_length(path)
+    assert not complete
+    assert list(iter_column(path, 'round', length)) == list(range(21))
+
+
+def test_file_without_index_is_complete(tmp_path):
+    """Логи, записанные до появления индекса, целые"""
+    path = tmp_path / 'measurements.csv'
+    write_rounds(path, 15)
+    os.remove(index_path(path))
+    assert committed_length(path) == (os.path.getsize(path), True)
+    assert len(list(iter_column(path, 'round'))) == 15
+
+
+def test_torn_index_line_ignored(tmp_path):
+    path = tmp_path / 'measurements.csv'
+    write_rounds(path, 30, close=False)
+    with open(index_path(path), 'a', encoding='utf-8') as f:
+        f.write('{"rounds": 4')
+    assert read_index(path)['rounds'] == 30
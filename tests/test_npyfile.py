@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Потоковая запись .npy без NumPy (sidechannel.npyfile)"""
+
+import numpy as np
+import pytest
+
+from sidechannel.npyfile import NpyAppendWriter, open_npy, read_array, read_header
+
+
+def test_rows_readable_by_numpy(tmp_path):
+    path = tmp_path / 'matrix.npy'
+    with NpyAppendWriter(path, 'I', 3, batch_rows=4) as writer:
+        for i in range(10):
+            writer.append((i, i * 2, i * 3))
+        writer.extend([100, 101, 102, 200, 201, 202])
+    expected = [[i, i * 2, i * 3] for i in range(10)] + [[100, 101, 102], [200, 201, 202]]
+    np.testing.assert_array_equal(np.load(path), expected)
+    np.testing.assert_array_equal(open_npy(path), expected)
+    assert np.load(path).dtype == np.dtype('<u4')
+
+
+def test_write_block_and_header_row_count(tmp_path):
+    path = tmp_path / 'columns.npy'
+    block = np.arange(12, dtype='<f8').reshape(6, 2)
+    writer = NpyAppendWriter(path, 'd', 2)
+    writer.append((-1.0, -2.0))
+    writer.write_block(block)
+    # Заголовок обновлён после пачки - файл читается np.load и до закрытия
+    assert np.load(path).shape == (7, 2)
+    writer.close()
+    np.testing.assert_array_equal(np.load(path)[1:], block)
+
+
+def test_unflushed_and_torn_rows_are_skipped(tmp_path):
+    path = tmp_path / 'partial.npy'
+    writer = NpyAppendWriter(path, 'q', 2, batch_rows=2)
+    for i in range(5):
+        writer.append((i, -i))  # пятая строка остаётся в буфере
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02\x03')  # оборванная строка после сбоя
+    assert open_npy(path).shape == (4, 2)
+    values, width = read_array(path)
+    assert width == 2 and list(values) == [0, 0, 1, -1, 2, -2, 3, -3]
+    writer.close()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.npy'
+    NpyAppendWriter(path, 'B', 4).close()
+    assert open_npy(path).shape == (0, 4)
+    assert read_header(path)[:2] == ('|u1', 4)
+
+
+def test_invalid_input(tmp_path):
+    with pytest.raises(ValueError):
+        NpyAppendWriter(tmp_path / 'x.npy', 'f', 1)
+    with NpyAppendWriter(tmp_path / 'y.npy', 'i', 3) as writer:
+        with pytest.raises(ValueError):
+            writer.append((1, 2))
+        with pytest.raises(ValueError):
+            writer.extend([1, 2, 3, 4])
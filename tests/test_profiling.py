@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Гистограммы фаз sidechannel.profiling"""
+
+import random
+
+import pytest
+
+from sidechannel.profiling import PhaseHistogram, PhaseProfiler, bucket_bounds, bucket_index, phase_total
+
+
+def test_bucket_bounds_contain_value():
+    for value in (0, 1, 63, 64, 65, 1000, 123_456, 10**9):
+        low, high = bucket_bounds(bucket_index(value))
+        assert low <= value <= high
+
+
+def test_percentiles_and_merge():
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(10, 1)) for _ in range(20_000)]
+    first, second = PhaseHistogram(), PhaseHistogram()
+    for i, value in enumerate(values):
+        (first if i % 2 else second).record(value)
+    first.merge(second)
+    ordered = sorted(values)
+    assert first.count == len(values) and first.total == sum(values)
+    assert (first.min, first.max) == (ordered[0], ordered[-1])
+    for q in (50, 99):
+        assert first.percentile(q) == pytest.approx(ordered[int(len(values) * q / 100)], rel=0.05)
+
+    restored = PhaseHistogram.from_dict(first.to_dict())
+    assert restored.counts == first.counts and restored.percentile(99) == first.percentile(99)
+
+
+def test_overlapping_phase_excluded_from_shares():
+    profiler = PhaseProfiler("victim", ("process", "events"))
+    profiler.histogram("process").record(3000)
+    profiler.histogram("events").record(1000)
+    profiler.histogram("lag", overlapping=True).record(50_000)
+
+    assert profiler.to_dict()['overlapping'] == ["lag"]
+    assert phase_total(profiler.histograms, profiler.overlapping) == 4000
+    summary = profiler.summary()
+    assert "75.0% времени" in summary[0] and "25.0% времени" in summary[1]
+    assert "вне долей времени" in summary[2]
+
+
+def test_workload_lag_is_overlapping():
+    from sidechannel.workload import FixedSchedule, Pacer, WorkloadEngine
+
+    profiler = PhaseProfiler("victim", ("process",))
+    WorkloadEngine(Pacer(100), FixedSchedule(), profiler=profiler)
+    assert "lag" in profiler.overlapping
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Потоковая статистика sidechannel.stats: Уэлфорд и EWMA-базовые линии наборов"""
+
+import json
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+from sidechannel.stats import RunningStats, SetBaselines
+
+
+def test_running_stats_matches_statistics():
+    rng = random.Random(1)
+    values = [rng.gauss(300, 40) for _ in range(5000)]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(statistics.fmean(values))
+    assert stats.variance == pytest.approx(statistics.variance(values))
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+
+def test_running_stats_single_value():
+    stats = RunningStats()
+    stats.add(5.0)
+    assert stats.variance == 0.0 and stats.stdev == 0.0
+
+
+def test_set_baselines_welford_and_ewma():
+    rng = np.random.default_rng(2)
+    rounds = rng.normal(200, 15, size=(300, 8))
+    baselines = SetBaselines(8, alpha=0.1, warmup=10)
+    for times in rounds:
+        baselines.update(times.tolist())
+
+    np.testing.assert_allclose(baselines.mean, rounds.mean(axis=0))
+    np.testing.assert_allclose(baselines.variance(), rounds.var(axis=0, ddof=1))
+
+    # Рекуррентные формулы EWMA (Finch, 2009) на одном наборе
+    ewma, ewvar = rounds[0, 3], 0.0
+    for x in rounds[1:, 3]:
+        diff = x - ewma
+        ewma += 0.1 * diff
+        ewvar = 0.9 * (ewvar + 0.1 * diff * diff)
+    assert baselines.ewma[3] == pytest.approx(ewma)
+    assert baselines.ewvar[3] == pytest.approx(ewvar)
+
+
+def test_spike_flagged_only_after_warmup():
+    baselines = SetBaselines(4, alpha=0.05, warmup=5)
+    quiet = [100.0, 101.0, 99.0, 100.0]
+    spike = [100.0, 100.0, 500.0, 100.0]
+    baselines.update(quiet)
+    assert baselines.update(spike) == 0  # история ещё не накоплена
+    for _ in range(100):
+        assert baselines.update(quiet) == 0
+    assert baselines.ready
+    assert baselines.update(spike, z_threshold=3.0) == 1
+    assert baselines.max_z > 3.0
+
+
+def test_constant_history_uses_noise_floor():
+    baselines = SetBaselines(2, warmup=1)
+    for _ in range(10):
+        baselines.update([50.0, 50.0])
+    # Дисперсия нулевая - z-score ограничен MIN_STDEV_NS, а не бесконечен
+    assert baselines.update([52.0, 50.0], z_threshold=1.5) == 1
+    assert baselines.max_z == pytest.approx(2.0)
+
+
+def test_save_round_trip(tmp_path):
+    baselines = SetBaselines(3)
+    baselines.update([1.0, 2.0, 3.0])
+    baselines.update([3.0, 2.0, 1.0])
+    path = tmp_path / 'baselines.json'
+    baselines.save(path)
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['count'] == 2 and data['mean'] == [2.0, 2.0, 2.0]
+    assert data['variance'] == [2.0, 0.0, 2.0]
+
+
+@pytest.mark.parametrize('covered', [2, 300, 999, 1000])
+def test_set_mean_variance_merges_saved_baselines(tmp_path, covered):
+    from analyze_results import set_mean_variance
+
+    matrix = np.random.default_rng(5).integers(100, 900, size=(1000, 4)).astype(np.uint32)
+    baselines = SetBaselines(4)
+    for row in matrix[:covered]:
+        baselines.update([float(value) for value in row])
+    path = tmp_path / 'baselines.json'
+    baselines.save(path)
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    for saved in (None, data):
+        mean, variance = set_mean_variance(matrix, saved)
+        assert np.allclose(mean, matrix.mean(axis=0))
+        assert np.allclose(variance, matrix.var(axis=0, ddof=1))
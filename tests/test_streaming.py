@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Потоковые агрегаты analysis.streaming и счёт раундов выше порога в конвейере"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import pipeline
+from analysis.streaming import (
+    HIST_SUB, Downsampler, Moments, histogram_count_above, histogram_percentile,
+    log_bin_extremes, log_histogram, rolling_mean,
+)
+
+
+def count_above(values, threshold):
+    values = np.asarray(values, dtype=np.float64)
+    return histogram_count_above(log_histogram(values), threshold, *log_bin_extremes(values))
+
+
+@pytest.mark.parametrize('threshold', [11.0, 11.99, 12.0, 12.01, 100.0])
+def test_count_above_constant(threshold):
+    values = np.full(500, 12.0)
+    assert count_above(values, threshold) == int((values > threshold).sum())
+
+
+def test_count_above_integer_values():
+    rng = np.random.default_rng(1)
+    values = rng.integers(10, 400, size=20_000).astype(np.float64)
+    for threshold in (12.0, 63.5, 64.0, 100.0, 123.7, 255.0, 399.0, 399.5):
+        assert count_above(values, threshold) == int((values > threshold).sum()), threshold
+
+
+def test_count_above_continuous_within_one_bin():
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(5, 0.5, size=50_000)
+    for threshold in np.percentile(values, [50, 90, 99]):
+        exact = int((values > threshold).sum())
+        # Приближённо учитывается только интервал с порогом
+        bin_share = len(values) / HIST_SUB
+        assert abs(count_above(values, threshold) - exact) <= bin_share
+
+
+def test_count_above_empty():
+    assert count_above([], 1.0) == 0
+
+
+def test_bin_extremes_merge_matches_single_pass():
+    rng = np.random.default_rng(3)
+    values = rng.exponential(100, size=10_000)
+    a_min, a_max = log_bin_extremes(values[:3000])
+    b_min, b_max = log_bin_extremes(values[3000:])
+    full_min, full_max = log_bin_extremes(values)
+    np.testing.assert_array_equal(np.minimum(a_min, b_min), full_min)
+    np.testing.assert_array_equal(np.maximum(a_max, b_max), full_max)
+
+
+def test_percentile_relative_error():
+    rng = np.random.default_rng(4)
+    values = rng.lognormal(6, 1, size=100_000)
+    counts = log_histogram(values)
+    for q in (1, 50, 99, 99.9):
+        estimate = histogram_percentile(counts, q, values.min(), values.max())
+        assert estimate == pytest.approx(np.percentile(values, q), rel=1.0 / HIST_SUB)
+
+
+def test_moments_chunk_merge():
+    rng = np.random.default_rng(5)
+    values = rng.normal(1000, 50, size=10_001)
+    moments = Moments()
+    for chunk in np.array_split(values, 7):
+        moments.update(chunk)
+    restored = Moments.from_state(moments.to_state())
+    assert restored.count == len(values)
+    assert restored.mean == pytest.approx(values.mean())
+    assert restored.std == pytest.approx(values.std(ddof=1))
+    assert (restored.minimum, restored.maximum) == (values.min(), values.max())
+
+
+def test_rolling_mean_across_chunks():
+    values = np.arange(50, dtype=np.float64)
+    expected = pd.Series(values).rolling(5).mean().to_numpy()
+    tail, parts = [], []
+    for chunk in np.array_split(values, 6):
+        rolling, tail = rolling_mean(tail, chunk, 5)
+        parts.append(rolling)
+    np.testing.assert_allclose(np.concatenate(parts), expected, equal_nan=True)
+
+
+def test_downsampler_keeps_extremes():
+    n = 10_000
+    avg = np.full(n, 50.0)
+    avg[1234], avg[8765] = 1.0, 999.0
+    sampler = Downsampler(64)
+    for chunk in np.array_split(np.arange(n), 9):
+        sampler.update(chunk, avg[chunk], avg[chunk], avg[chunk], np.zeros(len(chunk)),
+                       np.full(len(chunk), np.nan))
+    points = sampler.points()
+    assert sampler.rows == n
+    assert len(points['x']) <= 64
+    assert points['avg_y'].min() == 1.0 and points['avg_y'].max() == 999.0
+    assert 1234 in points['avg_x'] and 8765 in points['avg_x']
+
+
+def write_measurements(path, avg, overrun):
+    n = len(avg)
+    pd.DataFrame({
+        'round': np.arange(n),
+        'timestamp': 1000.0 + np.arange(n) * 0.05,
+        'avg_time_ns': avg,
+        'max_time_ns': avg,
+        'min_time_ns': avg,
+        'stdev_time_ns': np.zeros(n),
+        'suspicious_count': np.zeros(n, dtype=np.int64),
+        'overrun_ns': overrun,
+    }).to_csv(path, index=False)
+
+
+def test_pipeline_quantized_run(tmp_path):
+    """Прогон симулятора: все пробы читаются за одно и то же время"""
+    path = tmp_path / 'attacker_measurements.csv'
+    write_measurements(path, np.full(500, 12.0), np.full(500, 100_000))
+    stats = pipeline.run(path, cache_dir=tmp_path / 'cache').stats
+    assert stats['anomaly_rounds'] == 0
+    assert stats['summary_high_rounds'] == 0
+    assert stats['late_rounds'] == 0
+
+
+def test_pipeline_counts_are_exact_and_cached(tmp_path):
+    rng = np.random.default_rng(6)
+    # Целые до 128 нс: в каждом интервале не больше одного различного значения
+    avg = rng.integers(60, 128, size=3000).astype(np.float64)
+    overrun = rng.integers(0, 200_000, size=3000)
+    path = tmp_path / 'attacker_measurements.csv'
+    write_measurements(path, avg, overrun)
+    params = {'late_round_ns': 150_000}
+    first = pipeline.run(path, params, cache_dir=tmp_path / 'cache')
+    stats = first.stats
+    assert stats['anomaly_rounds'] == int((avg > stats['anomaly_threshold']).sum())
+    assert stats['summary_high_rounds'] == int((avg > stats['summary_threshold']).sum())
+    assert stats['late_rounds'] == int((overrun > 150_000).sum())
+
+    # Другой порог опоздания - пересчёт состояния, а не устаревший кеш
+    stats = pipeline.run(path, {'late_round_ns': 50_000}, cache_dir=tmp_path / 'cache').stats
+    assert stats['late_rounds'] == int((overrun > 50_000).sum())
+    cached = pipeline.run(path, params, cache_dir=tmp_path / 'cache')
+    assert cached.stats['late_rounds'] == int((overrun > 150_000).sum())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Кодек трассы обращений victim (sidechannel.trace) и её воспроизведение"""
+
+import numpy as np
+import pytest
+
+from sidechannel.trace import TraceVictimModel, TraceWriter, block_runs, load_trace, replay
+
+
+def write_trace(path, timestamps, array_size=4096, sync_interval=4096):
+    """Итерации process_secret: блок 64 строк из secret * 64 байт, secret = номер % 7"""
+    expected = []
+    with TraceWriter(path, sync_interval=sync_interval, batch_rows=3) as writer:
+        for iteration, timestamp in enumerate(timestamps):
+            secret = iteration % 7
+            runs = block_runs(secret * 1000 % array_size, 64 * 64, array_size)
+            writer.record(iteration, secret, runs, timestamp_ns=timestamp)
+            expected.append((secret, [start + step * k for start, count, step in runs
+                                      for k in range(count)]))
+    return expected
+
+
+def test_block_runs_wraps_buffer():
+    runs = block_runs(4000, 256, 4096)
+    assert runs == [(4000, 2, 64), (32, 2, 64)]
+    assert sum(count for _, count, _ in block_runs(0, 4096, 4096)) == 64
+
+
+@pytest.mark.parametrize('sync_interval', [4096, 5])
+def test_round_trip(tmp_path, sync_interval):
+    timestamps = [10**12 + 1000 * i for i in range(200)]
+    expected = write_trace(tmp_path / 'trace.npy', timestamps, sync_interval=sync_interval)
+    trace = load_trace(tmp_path / 'trace.npy')
+    assert len(trace) == 200
+    np.testing.assert_array_equal(trace.timestamp_ns, timestamps)
+    np.testing.assert_array_equal(trace.iteration, np.arange(200))
+    for i, (secret, offsets) in enumerate(expected):
+        assert trace.secret[i] == secret
+        np.testing.assert_array_equal(
+            trace.offsets[trace.first[i]:trace.first[i] + trace.count[i]], offsets)
+
+
+def test_large_time_step_forces_sync(tmp_path):
+    timestamps = [0, 10, 10 + (1 << 33), 20 + (1 << 33)]
+    write_trace(tmp_path / 'trace.npy', timestamps)
+    np.testing.assert_array_equal(load_trace(tmp_path / 'trace.npy').timestamp_ns, timestamps)
+
+
+def test_truncated_trace_keeps_whole_iterations(tmp_path):
+    path = tmp_path / 'trace.npy'
+    write_trace(path, [1000 * i for i in range(50)])
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 24)  # полторы строки с конца
+    trace = load_trace(path)
+    assert 0 < len(trace) <= 50
+    assert trace.accesses == int(trace.count.sum())
+
+
+def test_replay_batches(tmp_path):
+    write_trace(tmp_path / 'trace.npy', [1000 * i for i in range(30)])
+    trace = load_trace(tmp_path / 'trace.npy')
+    seen = []
+    total = replay(trace, seen.append, base=1 << 20, batch=100, start=5, stop=25)
+    addresses = np.concatenate(seen)
+    assert total == len(addresses) == int(trace.count[5:25].sum())
+    np.testing.assert_array_equal(
+        addresses, (1 << 20) + trace.offsets[trace.first[5]:trace.first[24] + trace.count[24]])
+
+
+def test_model_follows_trace_time(tmp_path):
+    write_trace(tmp_path / 'trace.npy', [5000 + 1000 * i for i in range(10)])
+    model = TraceVictimModel(load_trace(tmp_path / 'trace.npy'), base=0)
+    first = model.run(1500)     # итерации в моменты 0 и 1000
+    assert len(first) == 2 * 64
+    assert model.secret == 1
+    assert len(model.run(100_000)) == 8 * 64
+    assert len(model.run(100_000)) == 0
+
+
+def test_model_loops(tmp_path):
+    write_trace(tmp_path / 'trace.npy', [1000 * i for i in range(10)])
+    model = TraceVictimModel(load_trace(tmp_path / 'trace.npy'), base=0, loop=True)
+    # Период повтора - 9000 нс трассы плюс средний интервал 1000 нс
+    assert len(model.run(30_000)) == 30 * 64
+
+
+@pytest.mark.parametrize('timestamps', [[1000], [7, 7, 7]])
+def test_zero_span_loop_rejected(tmp_path, timestamps):
+    write_trace(tmp_path / 'trace.npy', timestamps)
+    trace = load_trace(tmp_path / 'trace.npy')
+    with pytest.raises(ValueError):
+        TraceVictimModel(trace, base=0, loop=True)
+    # Без повтора трасса воспроизводится один раз
+    assert len(TraceVictimModel(trace, base=0).run(10)) == len(timestamps) * 64
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Режимы защиты SecretProcessor: значения и паттерн обращений"""
+
+import pytest
+
+import victim
+
+SECRETS = [0, 5, 31, 5, 255, 128, 31]
+
+
+@pytest.mark.parametrize('array_size, stride', [(256 * 512, 4096), (10_000, 1000), (256 * 512, 100)])
+def test_constant_time_matches_unprotected_values(array_size, stride):
+    plain = victim.SecretProcessor(array_size, stride, mitigation="none")
+    masked = victim.SecretProcessor(array_size, stride, mitigation="constant_time")
+    for secret in SECRETS:
+        plain.process_secret(secret)
+        masked.process_secret(secret)
+    assert masked.data == plain.data
+    assert masked.secret_updates == plain.secret_updates == len(SECRETS)
+
+
+def test_constant_time_wraps_and_carries():
+    processor = victim.SecretProcessor(64 * 16, 64 * 6, mitigation="constant_time")
+    processor.data[:] = b"\xff" * len(processor.data)
+    # Блок секрета 2 - линии 12..15 и, по кругу, 0..1; 0xff + 1 не переносится в соседний байт
+    processor.process_secret(2)
+    lines = processor.data[::victim.CACHE_LINE_SIZE]
+    assert lines == b"\x00" * 2 + b"\xff" * 10 + b"\x00" * 4
+
+
+def test_constant_time_access_pattern_is_independent_of_secret():
+    processor = victim.SecretProcessor(256 * 512, 4096, mitigation="constant_time")
+    patterns = {tuple(processor._access(secret * 4096 % processor.array_size)) for secret in range(256)}
+    assert patterns == {((0, 256 * 512 // victim.CACHE_LINE_SIZE, victim.CACHE_LINE_SIZE),)}
@@ -6,104 +6,306 @@
 которые могут быть обнаружены через cache side-channel
 """
 
+import atexit
+import random
 import time
 import sys
-import random
-from datetime import datetime
+import signal
+
+from sidechannel.buffers import allocate_buffer, FILL_RANDOM
+from sidechannel.config import apply_env
+from sidechannel.events import EventWriter
+from sidechannel.logger import BackgroundLogger
+from sidechannel.measurements import MeasurementWriter
+from sidechannel.profiling import PhaseProfiler, WindowProfiler, timer_ns
+from sidechannel.trace import TraceWriter, block_runs
+from sidechannel.workload import RATE_COLUMNS, Pacer, WorkloadEngine, make_schedule
 
 # Размер массива данных (должен быть достаточно большим для эффекта кеша)
 ARRAY_SIZE = 256 * 512  # 128KB при байтах
 STRIDE = 4096  # Шаг доступа (размер страницы)
 ITERATIONS = 1000
 LOG_FILE = "/logs/victim_activity.log"
+LOG_ECHO = True  # Дублировать лог в stdout
+EVENTS_FILE = "/logs/victim_events.npy"  # Структурированные события (monotonic, нс)
+TRACE_FILE = "/logs/victim_trace.npy"  # Трасса всех обращений к памяти ("" - не записывать)
+RANDOM_SEED = 2025  # Seed для заполнения массива (воспроизводимость запусков)
+USE_MMAP = False  # Выделять массив данных через анонимный mmap
+DURATION_SECONDS = 60.0  # Продолжительность работы
+TARGET_RATE = 100.0  # Обработок секрета в секунду на поток нагрузки (0 - без пауз)
+DUTY_CYCLE = 1.0  # Доля активной части цикла нагрузки (остаток цикла - простой)
+DUTY_PERIOD = 1.0  # Длительность цикла нагрузки, сек
+BURST_SIZE = 1  # Обработок подряд без пауз в одной пачке
+SECRET_SCHEDULE = "sequential"  # Расписание секретов: fixed, sequential, random, file
+SECRET_PERIOD = 100  # Смена секрета каждые N итераций (sequential, random)
+SECRET_FILE = ""  # Секреты для расписания file: victim_events.npy, victim_trace.npy или текст
+WORKERS = 1  # Потоков нагрузки (дополнительные - без событий и трассы)
+WORKER_MODE = "process"  # Дополнительные потоки нагрузки: process или thread
+RATE_FILE = "/logs/victim_rate.csv"  # Запрошенная и достигнутая частота по интервалам ("" - не записывать)
+RATE_INTERVAL = 1.0  # Интервал записи частоты, сек
+PROFILE_PHASES = True  # Гистограммы длительностей фаз итерации (sidechannel.profiling)
+PROFILE_FILE = "/logs/victim_profile.json"
+PROFILE_WINDOW_ITERATIONS = 1000  # Итераций в окне профилирования (окно открывает SIGUSR1 или PROFILE_WINDOW_START)
+PROFILE_WINDOW_START = -1  # Первая итерация окна профилирования (-1 - только по SIGUSR1)
+PROFILE_WINDOW_MODE = "cprofile"  # cprofile или sample (выборка стека)
+PROFILE_WINDOW_PREFIX = "/logs/victim_window"  # Файлы окна: <префикс>_<первая>-<последняя>.prof/.txt/.folded
+MITIGATION = "none"  # Защита: none, constant_time, noise, fixed_slot (см. SecretProcessor)
+NOISE_BLOCKS = 4  # Ложных блоков на итерацию в режиме noise
+
+MITIGATIONS = ("none", "constant_time", "noise", "fixed_slot")
+ITERATION_PHASES = ("process", "events", "logging")  # + lag - опоздание начала итерации (WorkloadEngine)
+CACHE_LINE_SIZE = 64
+
+# Таблицы bytes.translate: +1 по модулю 256 и тождественная (запись без изменения)
+_INCREMENT = bytes((value + 1) % 256 for value in range(256))
+_IDENTITY = bytes(range(256))
+
+# Переопределения констант из окружения (SC_<ИМЯ>, SC_LOG_DIR - каталог логов)
+ENV_OVERRIDES = apply_env(globals())
+
+
+def _rotate_bytes(value, shift, size):
+    """Циклический сдвиг size-байтового целого value на shift байт к старшим разрядам"""
+    bits = 8 * size
+    shift *= 8
+    return ((value << shift) | (value >> (bits - shift))) & ((1 << bits) - 1)
 
 
 class SecretProcessor:
-    """Класс для имитации обработки секретных данных с характерным паттерном доступа к памяти"""
+    """
+    Класс для имитации обработки секретных данных с характерным паттерном доступа к памяти
 
-    def __init__(self, array_size, stride):
+    Режимы защиты (mitigation):
+      none          - обращения только к линиям блока, выбранного секретом
+      constant_time - на каждой итерации читаются и записываются все линии
+                      массива, секрет влияет лишь на значения
+      noise         - кроме блока секрета читаются noise_blocks случайных блоков
+      fixed_slot    - блоки обрабатываются по кругу в фиксированном порядке,
+                      независимом от секрета; значение меняется, только когда
+                      очередь доходит до блока секрета (для остальных - запись
+                      без изменения тем же кодом)
+    Все режимы работают срезами с шагом линии (bytes.translate) - без цикла
+    интерпретатора по обращениям, поэтому режимы различаются только
+    паттерном обращений.
+    """
+
+    def __init__(self, array_size, stride, seed=RANDOM_SEED, use_mmap=USE_MMAP, trace=None,
+                 mitigation=MITIGATION, noise_blocks=NOISE_BLOCKS):
+        """trace - TraceWriter для записи всех обращений (опционально)"""
+        if mitigation not in MITIGATIONS:
+            raise ValueError(f"Неизвестный режим защиты: {mitigation!r}")
         self.array_size = array_size
         self.stride = stride
-        # Создаём большой массив для работы с памятью
-        self.data = bytearray(array_size)
-        # Инициализируем массив случайными данными
-        for i in range(array_size):
-            self.data[i] = random.randint(0, 255)
+        self.seed = seed
+        self.use_mmap = use_mmap
+        # Создаём большой массив для работы с памятью,
+        # инициализированный детерминированными случайными данными
+        self.data = allocate_buffer(array_size, fill=FILL_RANDOM, seed=seed, use_mmap=use_mmap)
 
         self.secret_value = 42  # Имитация секретного значения
         self.access_count = 0
+        self.trace = trace
+        self.mitigation = mitigation
+        self.noise_blocks = noise_blocks
+        self.num_blocks = -(-array_size // stride)
+        self.secret_updates = 0  # Итераций, изменивших блок секрета
+        self._rng = random.Random(seed)
+        self._access = {
+            "none": self._access_secret_block,
+            "constant_time": self._access_all_lines,
+            "noise": self._access_with_noise,
+            "fixed_slot": self._access_fixed_slot,
+        }[mitigation]
 
     def process_secret(self, secret_byte):
         """
         Обрабатывает секретный байт с характерным паттерном доступа к памяти
         Паттерн зависит от значения секрета - это и есть side-channel!
+        (если не включена защита, см. mitigation)
         """
         # Вычисляем индекс на основе секретного значения
         index = (secret_byte * self.stride) % self.array_size
-
-        # Создаём паттерн обращений к памяти
-        # Атакующий может обнаружить эти обращения через кеш
-        for offset in range(0, self.stride, 64):  # 64 байта - размер cache line
-            idx = (index + offset) % self.array_size
-            # Чтение и запись для загрузки в кеш
-            self.data[idx] = (self.data[idx] + 1) % 256
+        runs = self._access(index)
+        if self.trace is not None:
+            # Обращения итерации - непрерывные отрезки с шагом линии
+            self.trace.record(self.access_count, secret_byte, runs)
 
         self.access_count += 1
         return index
 
-    def simulate_workload(self, duration_seconds=30):
+    def _access_secret_block(self, index):
+        """Без защиты: линии блока секрета"""
+        # Чтение и запись линий блока загружают их в кеш -
+        # атакующий может обнаружить эти обращения
+        runs = self._update_block(index, _INCREMENT)
+        self.secret_updates += 1
+        return runs
+
+    def _update_block(self, index, table):
+        """Чтение и запись линий блока одним срезом на отрезок; возвращает отрезки"""
+        data = self.data
+        runs = block_runs(index, self.stride, self.array_size, CACHE_LINE_SIZE)
+        for start, count, step in runs:
+            lines = slice(start, start + (count - 1) * step + 1, step)
+            data[lines] = data[lines].translate(table)
+        return runs
+
+    def _access_all_lines(self, index):
+        """
+        Все линии массива: копия по одному байту с линии, +1 по маске блока секрета, запись обратно
+
+        Копия складывается с маской целиком (побайтовое сложение по модулю 256
+        в одном большом целом), поэтому каждая линия читается и записывается
+        одинаково - секрет определяет только значения маски, а не позиции
+        """
+        data = self.data
+        phase = index % CACHE_LINE_SIZE
+        lines = slice(phase, self.array_size, CACHE_LINE_SIZE)
+        values = data[lines]
+        size = len(values)
+        ones = int.from_bytes(b"\x01" * size, "little")
+        high = ones * 0x80
+        mask = _rotate_bytes(int.from_bytes(b"\x01" * min(-(-self.stride // CACHE_LINE_SIZE), size), "little"),
+                             index // CACHE_LINE_SIZE % size, size)
+        packed = int.from_bytes(values, "little")
+        # Байты маски - 0 или 1: старший бит складывается отдельно, без переноса в соседний байт
+        packed = ((packed & (high ^ (ones * 0xFF))) + mask) ^ (packed & high)
+        data[lines] = packed.to_bytes(size, "little")
+        self.secret_updates += 1
+        return [(phase, size, CACHE_LINE_SIZE)]
+
+    def _access_with_noise(self, index):
+        """Блок секрета и noise_blocks случайных блоков (только чтение)"""
+        runs = self._update_block(index, _INCREMENT)
+        data = self.data
+        for block in self._rng.sample(range(self.num_blocks), min(self.noise_blocks, self.num_blocks)):
+            for start, count, step in block_runs(block * self.stride, self.stride,
+                                                 self.array_size, CACHE_LINE_SIZE):
+                _ = data[start:start + (count - 1) * step + 1:step]
+                runs.append((start, count, step))
+        self.secret_updates += 1
+        return runs
+
+    def _access_fixed_slot(self, index):
+        """Блок очередного слота; значение меняется только в слоте блока секрета"""
+        slot_index = (self.access_count % self.num_blocks) * self.stride
+        hit = slot_index == index
+        self.secret_updates += hit
+        return self._update_block(slot_index, _INCREMENT if hit else _IDENTITY)
+
+    def simulate_workload(self, duration_seconds=30, events=None, engine=None, profiler=None, window=None):
         """
         Имитирует рабочую нагрузку с периодической обработкой секретных данных
+
+        events   - EventWriter для записи смен секрета и обращений
+                   с метками времени (опционально)
+        engine   - WorkloadEngine: частота обработок, расписание секретов
+                   и потоки нагрузки (по умолчанию - make_engine())
+        profiler - PhaseProfiler: длительности фаз итерации (ITERATION_PHASES)
+        window   - WindowProfiler: профилирование окна итераций по запросу
+        Дополнительные потоки нагрузки обрабатывают те же секреты своими
+        копиями SecretProcessor, без событий и трассы.
+        Возвращает число итераций основного потока.
         """
+        if engine is None:
+            engine = make_engine()
         log(f"Запуск симуляции рабочей нагрузки на {duration_seconds} секунд")
         log(f"Размер массива: {self.array_size} байт")
         log(f"Шаг доступа (stride): {self.stride} байт")
         log(f"Начальное секретное значение: {self.secret_value}")
+        log(f"Нагрузка: {engine.pacer.describe()}, потоков: {engine.workers} ({engine.worker_mode}), "
+            f"расписание секретов: {type(engine.schedule).__name__}")
+        if profiler is not None:
+            process_phase, events_phase, logging_phase = (profiler.histogram(phase)
+                                                          for phase in ITERATION_PHASES)
 
-        start_time = time.time()
-        iteration = 0
+        def step(iteration, secret):
+            if window is not None:
+                window.before(iteration)
+            mark = timer_ns()
 
-        try:
-            while time.time() - start_time < duration_seconds:
-                # Изменяем секретное значение каждые несколько итераций
-                if iteration % 100 == 0:
-                    self.secret_value = (self.secret_value + 13) % 256
-                    log(f"[Итерация {iteration}] Новое секретное значение: {self.secret_value}")
+            # Смена секретного значения по расписанию
+            changed = iteration == 0 or secret != self.secret_value
+            if changed:
+                self.secret_value = secret
+                if events is not None:
+                    events.secret_changed(iteration, self.secret_value)
 
-                # Обрабатываем секретное значение
-                accessed_index = self.process_secret(self.secret_value)
+            # Обрабатываем секретное значение
+            access_ns = time.monotonic_ns()
+            started = timer_ns()
+            accessed_index = self.process_secret(self.secret_value)
+            processed = timer_ns()
+            if events is not None:
+                events.accessed(iteration, self.secret_value, accessed_index, access_ns)
+            recorded = timer_ns()
 
-                # Периодически логируем активность
-                if iteration % 50 == 0:
-                    log(f"[Итерация {iteration}] Обработан секрет {self.secret_value}, "
-                        f"доступ к индексу {accessed_index}, всего обращений: {self.access_count}")
+            # Логируем смену секрета и периодически - активность
+            logged = changed or iteration % 50 == 0
+            if changed:
+                log(f"[Итерация {iteration}] Новое секретное значение: {self.secret_value}")
+            if iteration % 50 == 0:
+                log(f"[Итерация {iteration}] Обработан секрет {self.secret_value}, "
+                    f"доступ к индексу {accessed_index}, всего обращений: {self.access_count}")
 
-                iteration += 1
+            if profiler is not None:
+                process_phase.record(processed - started)
+                events_phase.record(started - mark + recorded - processed)
+                if logged:
+                    logging_phase.record(timer_ns() - recorded)
+            if window is not None:
+                window.after(iteration)
 
-                # Небольшая задержка для создания наблюдаемого паттерна
-                time.sleep(0.01)
+        def worker_factory(worker):
+            processor = SecretProcessor(self.array_size, self.stride, seed=self.seed, use_mmap=self.use_mmap,
+                                        mitigation=self.mitigation, noise_blocks=self.noise_blocks)
+            return lambda iteration, secret: processor.process_secret(secret)
 
+        try:
+            engine.run(step, duration_seconds, worker_factory)
         except KeyboardInterrupt:
             log("Получен сигнал прерывания")
 
-        elapsed = time.time() - start_time
+        iteration = engine.completed[0]
+        elapsed = max(engine.elapsed, 1e-9)
         log(f"Симуляция завершена. Выполнено итераций: {iteration}, "
-            f"время работы: {elapsed:.2f} сек, итераций/сек: {iteration / elapsed:.2f}")
+            f"время работы: {elapsed:.2f} сек, итераций/сек: {iteration / elapsed:.2f}"
+            f"{'' if engine.pacer.unlimited else f' (запрошено {engine.pacer.requested_rate:g})'}, "
+            f"опозданий: {engine.late[0]}")
+        if engine.workers > 1:
+            log("Итераций по потокам нагрузки: " + ", ".join(map(str, engine.completed)))
 
         return iteration
 
 
+def make_engine(rate_writer=None, profiler=None):
+    """WorkloadEngine с параметрами нагрузки из констант модуля"""
+    pacer = Pacer(TARGET_RATE, DUTY_CYCLE, DUTY_PERIOD, BURST_SIZE)
+    schedule = make_schedule(SECRET_SCHEDULE, SECRET_PERIOD, seed=RANDOM_SEED, path=SECRET_FILE)
+    return WorkloadEngine(pacer, schedule, WORKERS, WORKER_MODE, rate_writer, RATE_INTERVAL,
+                          profiler=profiler)
+
+
+_logger = None
+
+
+def get_logger():
+    """Возвращает фоновый логгер (создаётся при первом обращении)"""
+    global _logger
+    if _logger is None:
+        _logger = BackgroundLogger(LOG_FILE, "VICTIM", echo=LOG_ECHO)
+        atexit.register(_logger.close)
+    return _logger
+
+
 def log(message):
-    """Логирование с временной меткой"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    log_message = f"[{timestamp}] VICTIM: {message}"
-    print(log_message, flush=True)
+    """Логирование с временной меткой (запись выполняет фоновый поток)"""
+    get_logger().log(message)
 
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_message + "\n")
-    except Exception as e:
-        print(f"Ошибка записи в лог: {e}", flush=True)
+
+def _terminate(signum, frame):
+    """SIGTERM (docker stop) обрабатывается как прерывание, чтобы дописать события"""
+    raise KeyboardInterrupt
 
 
 def main():
@@ -112,19 +314,54 @@ def main():
     log("VICTIM: Старт программы-жертвы side-channel атаки")
     log("=" * 70)
 
-    # Создаём процессор секретных данных
-    processor = SecretProcessor(ARRAY_SIZE, STRIDE)
+    if ENV_OVERRIDES:
+        log("Параметры из окружения: " + ", ".join(f"{k}={v}" for k, v in ENV_OVERRIDES.items()))
+
+    # Создаём процессор секретных данных и нагрузку
+    rate_writer = MeasurementWriter(RATE_FILE, columns=RATE_COLUMNS, batch_size=WORKERS) if RATE_FILE else None
+    profiler = PhaseProfiler("victim", ITERATION_PHASES) if PROFILE_PHASES else None
+    engine = make_engine(rate_writer, profiler)
+    window = WindowProfiler(PROFILE_WINDOW_PREFIX, PROFILE_WINDOW_ITERATIONS, PROFILE_WINDOW_MODE,
+                            PROFILE_WINDOW_START, log=log)
+    window.install()
+    trace = TraceWriter(TRACE_FILE) if TRACE_FILE else None
+    processor = SecretProcessor(ARRAY_SIZE, STRIDE, seed=RANDOM_SEED, use_mmap=USE_MMAP, trace=trace,
+                                mitigation=MITIGATION, noise_blocks=NOISE_BLOCKS)
+    log(f"Режим защиты: {MITIGATION}"
+        f"{f' ({NOISE_BLOCKS} ложных блоков)' if MITIGATION == 'noise' else ''}")
 
     # Запускаем симуляцию рабочей нагрузки
     # В реальности это могла бы быть криптографическая операция,
     # обработка аутентификационных данных и т.д.
-    duration = 60  # 60 секунд работы
+    duration = DURATION_SECONDS
 
     log(f"Начало симуляции обработки секретных данных ({duration} секунд)")
-    iterations = processor.simulate_workload(duration)
+    signal.signal(signal.SIGTERM, _terminate)
+    with EventWriter(EVENTS_FILE) as events:
+        try:
+            iterations = processor.simulate_workload(duration, events, engine, profiler, window)
+        finally:
+            window.finish()
+            if profiler is not None:
+                profiler.save(PROFILE_FILE)
+            if processor.trace is not None:
+                processor.trace.close()
+            if rate_writer is not None:
+                rate_writer.close()
+    log(f"События victim сохранены в {EVENTS_FILE} ({events.rows_written} записей)")
+    if rate_writer is not None:
+        log(f"Частота нагрузки по интервалам сохранена в {RATE_FILE} ({rate_writer.rounds_written} записей)")
+    if processor.trace is not None:
+        log(f"Трасса обращений сохранена в {TRACE_FILE} ({processor.trace.iterations} итераций, "
+            f"{processor.trace.accesses} обращений, {processor.trace.rows_written} записей)")
+    if profiler is not None:
+        log(f"Гистограммы фаз итерации сохранены в {PROFILE_FILE}:")
+        for line in profiler.summary():
+            log(f"  {line}")
 
     log("=" * 70)
-    log(f"VICTIM: Завершение работы. Всего выполнено итераций: {iterations}")
+    log(f"VICTIM: Завершение работы. Всего выполнено итераций: {iterations}, "
+        f"из них изменили блок секрета: {processor.secret_updates}")
     log("=" * 70)
 
 